@@ -176,6 +176,24 @@ class ReportPagination(StandardResultsSetPagination):
         return Response(response)
 
 
+class ReportQueryPagination(ReportPagination):
+    """A paginator for report data already limited to one page by the query handler."""
+
+    def get_count(self, queryset):
+        """Determine a report data's count."""
+        return self.count
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Override queryset pagination."""
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+
+        return queryset
+
+
 class ReportRankedPagination(ReportPagination):
     """A specialty paginator for ranked report data."""
 
@@ -1,21 +1,26 @@
 """Data export syncer."""
 from abc import ABC
 from abc import abstractmethod
+from concurrent.futures import as_completed
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from itertools import product
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from celery.utils.log import get_task_logger
 from dateutil.rrule import DAILY
 from dateutil.rrule import MONTHLY
 from dateutil.rrule import rrule
 from django.conf import settings
+from django.core.cache import caches
 from django.utils.translation import gettext as _
 
 from api.provider.models import Provider
 
 LOG = get_task_logger(__name__)
+SYNC_PROGRESS_CACHE_TIMEOUT = 7 * 24 * 60 * 60  # 1 week
 
 
 class SyncedFileInColdStorageError(Exception):
@@ -35,7 +40,7 @@ class SyncerInterface(ABC):
     """Data syncer interface."""
 
     @abstractmethod
-    def sync_bucket(self, schema_name, destination_bucket_name, date_range):
+    def sync_bucket(self, schema_name, destination_bucket_name, date_range, sync_id=None):
         """
         Sync all files in our bucket for one account to customer account.
 
@@ -43,6 +48,7 @@ class SyncerInterface(ABC):
             schema_name (str): account schema name to sync
             destination_bucket_name (str): name of the customer bucket
             date_range (tuple): Pair of date objects of inclusive start and exclusive end dates for which to sync data.
+            sync_id (str): identifier under which progress is saved, so a restarted sync can resume
 
         Returns:
             None
@@ -50,8 +56,51 @@ class SyncerInterface(ABC):
         """
 
 
+class SyncProgress:
+    """
+    The prefixes of a sync that have been completely copied.
+
+    Progress is kept in the worker cache, which is shared by every worker
+    and survives restarts, so a retried sync skips the prefixes it already
+    copied. Only cold storage errors are retried (see sync_data_to_customer),
+    any other error ends the export request. A sync without an id does not
+    keep any progress.
+    """
+
+    cache = caches["worker"]
+
+    def __init__(self, sync_id=None):
+        """Load the saved progress of a sync."""
+        self.cache_key = f"data-export-sync:{sync_id}" if sync_id else None
+        self.completed = set(self.cache.get(self.cache_key, ())) if self.cache_key else set()
+
+    def is_complete(self, prefix):
+        """Return True if every object under the prefix has been copied."""
+        return prefix in self.completed
+
+    def mark_complete(self, prefix):
+        """Save a prefix as completely copied."""
+        self.completed.add(prefix)
+        if self.cache_key:
+            self.cache.set(self.cache_key, self.completed, SYNC_PROGRESS_CACHE_TIMEOUT)
+
+    def clear(self):
+        """Forget the progress of a finished sync."""
+        self.completed = set()
+        if self.cache_key:
+            self.cache.delete(self.cache_key)
+
+
 class AwsS3Syncer(SyncerInterface):
-    """Data syncer for syncing files in S3."""
+    """
+    Data syncer for syncing files in S3.
+
+    Prefixes are synced concurrently on a bounded thread pool, each one by
+    listing the source and destination objects and copying, server side,
+    only the objects missing or changed at the destination. A destination
+    bucket that does not allow listing gets every object copied. The S3
+    client retries throttled and failed requests with exponential backoff.
+    """
 
     def __init__(self, s3_source_bucket_name):
         """
@@ -61,100 +110,213 @@ class AwsS3Syncer(SyncerInterface):
             s3_source_bucket_name (str): name of the our bucket
 
         """
-        self.s3_resource = boto3.resource("s3", settings.S3_REGION)
-        self.s3_source_bucket = self.s3_resource.Bucket(s3_source_bucket_name)
+        self.max_workers = settings.DATA_EXPORT_SYNC_WORKERS
+        client_config = Config(
+            max_pool_connections=self.max_workers,
+            retries={"max_attempts": settings.DATA_EXPORT_SYNC_MAX_ATTEMPTS, "mode": "standard"},
+        )
+        self.s3_client = boto3.client("s3", settings.S3_REGION, config=client_config)
+        self.s3_source_bucket_name = s3_source_bucket_name
+        self.can_list_destination = True
+
+    def _list_objects(self, bucket_name, prefix):
+        """Return the objects under a prefix, keyed by object key."""
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        return {
+            s3_object["Key"]: s3_object
+            for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix)
+            for s3_object in page.get("Contents", [])
+        }
+
+    def _list_destination_objects(self, bucket_name, prefix):
+        """
+        Return the destination objects under a prefix, keyed by object key.
+
+        Customer buckets are only required to grant s3:PutObject and s3:GetObject,
+        so when listing is denied nothing is treated as already synced.
+        """
+        if not self.can_list_destination:
+            return {}
+        try:
+            return self._list_objects(bucket_name, prefix)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "AccessDenied":
+                raise e
+            LOG.info(_("Listing %s is not allowed, copying every object."), bucket_name)
+            self.can_list_destination = False
+            return {}
+
+    @staticmethod
+    def _is_synced(source_object, destination_object):
+        """
+        Return True if the destination object is a copy of the source object.
+
+        A server-side copy of a multipart upload gets a new ETag, so those
+        copies are matched by size and by being newer than the source.
+        """
+        if destination_object is None or destination_object["Size"] != source_object["Size"]:
+            return False
+        if destination_object["ETag"] == source_object["ETag"]:
+            return True
+        return "-" in source_object["ETag"] and destination_object["LastModified"] >= source_object["LastModified"]
 
-    def _copy_object(self, s3_destination_bucket, source_object):
+    def _copy_object(self, s3_destination_bucket_name, source_object):
         """
         Copy a source object to the destination bucket.
 
         Args:
-            s3_destination_bucket (boto3.s3.Bucket): the destination bucket object
-            source_object (boto3.s3.Object): our source object
+            s3_destination_bucket_name (str): the destination bucket name
+            source_object (dict): our source object, as listed by list_objects_v2
 
         """
-        LOG.debug("copying S3 object %s to %s", source_object.key, s3_destination_bucket)
+        key = source_object["Key"]
+        LOG.debug("copying S3 object %s to %s", key, s3_destination_bucket_name)
         try:
-            destination_object = s3_destination_bucket.Object(source_object.key)
-            destination_object.copy_from(
+            self.s3_client.copy_object(
                 ACL="bucket-owner-full-control",
-                CopySource={"Bucket": source_object.bucket_name, "Key": source_object.key},
+                Bucket=s3_destination_bucket_name,
+                Key=key,
+                CopySource={"Bucket": self.s3_source_bucket_name, "Key": key},
             )
         except ClientError as e:
             # If we run into an InvalidObjectState error, and object is in glacier, retrieve it
-            if source_object.storage_class == "GLACIER" and e.response["Error"]["Code"] == "InvalidObjectState":
+            if source_object.get("StorageClass") == "GLACIER" and e.response["Error"]["Code"] == "InvalidObjectState":
                 request = {"Days": 2, "GlacierJobParameters": {"Tier": "Standard"}}
-                source_object.restore_object(RestoreRequest=request)
-                LOG.info(_("Glacier Storage restore for %s is in progress."), source_object.key)
+                self.s3_client.restore_object(Bucket=self.s3_source_bucket_name, Key=key, RestoreRequest=request)
+                LOG.info(_("Glacier Storage restore for %s is in progress."), key)
                 raise SyncedFileInColdStorageError(
-                    f"Requested file {source_object.key} is currently in AWS Glacier Storage, "
+                    f"Requested file {key} is currently in AWS Glacier Storage, "
                     f"an request has been made to restore the file."
                 )
             # if object cannot be copied because restore is already in progress raise
             # SyncedFileInColdStorageError and wait a while longer
             elif e.response["Error"]["Code"] == "RestoreAlreadyInProgress":
-                LOG.info(_("Glacier Storage restore for %s is in progress."), source_object.key)
+                LOG.info(_("Glacier Storage restore for %s is in progress."), key)
                 raise SyncedFileInColdStorageError(
-                    f"Requested file {source_object.key} has not yet been restored from AWS Glacier Storage."
+                    f"Requested file {key} has not yet been restored from AWS Glacier Storage."
                 )
             raise e
 
-    def sync_bucket(self, schema_name, s3_destination_bucket_name, date_range):
+    def _sync_prefix(self, s3_destination_bucket_name, prefix):
+        """
+        Copy the objects under a prefix that are missing or changed at the destination.
+
+        Every object is attempted before a cold storage error is raised, so
+        all of the restores a prefix needs are requested at once.
+
+        Returns:
+            (int): The number of objects copied.
+
+        """
+        LOG.debug("sync_bucket checking prefix %s", prefix)
+        source_objects = self._list_objects(self.s3_source_bucket_name, prefix)
+        if not source_objects:
+            return 0
+        destination_objects = self._list_destination_objects(s3_destination_bucket_name, prefix)
+        copied = 0
+        cold_storage_error = None
+        for key, source_object in source_objects.items():
+            if self._is_synced(source_object, destination_objects.get(key)):
+                continue
+            try:
+                self._copy_object(s3_destination_bucket_name, source_object)
+                copied += 1
+            except SyncedFileInColdStorageError as error:
+                cold_storage_error = error
+        if cold_storage_error:
+            raise cold_storage_error
+        return copied
+
+    def _get_prefixes(self, schema_name, date_range):
+        """Return the month and day prefixes of every provider for the date range."""
+        start_date, end_date = date_range
+        # rrule is inclusive for both dates, so we need to make end_date exclusive
+        end_date = end_date - timedelta(days=1)
+        days = rrule(DAILY, dtstart=start_date, until=end_date)
+        months = rrule(MONTHLY, dtstart=start_date, until=end_date)
+        providers = Provider.objects.filter(customer__schema_name=schema_name).all()
+
+        prefixes = []
+        # Copy the specific month level files
+        for month, provider in product(months, providers):
+            # We need to normalize capitalization and "-local" dev providers.
+            provider_slug = provider.type.lower().split("-")[0]
+            prefixes.append(
+                f"{settings.S3_BUCKET_PATH}/{schema_name}/"
+                f"{provider_slug}/{provider.uuid}/"
+                f"{month.year:04d}/{month.month:02d}/00/"
+            )
+        # Copy all the day files
+        for day, provider in product(days, providers):
+            # We need to normalize capitalization and "-local" dev providers.
+            provider_slug = provider.type.lower().split("-")[0]
+            prefixes.append(
+                f"{settings.S3_BUCKET_PATH}/{schema_name}/"
+                f"{provider_slug}/{provider.uuid}/"
+                f"{day.year:04d}/{day.month:02d}/{day.day:02d}/"
+            )
+        return prefixes
+
+    def sync_bucket(self, schema_name, s3_destination_bucket_name, date_range, sync_id=None):
         """
         Sync buckets if the ENABLE_S3_ARCHIVING flag is set.
 
+        Prefixes are saved as complete as they finish, from the main thread so
+        the worker threads never touch the database. A cold storage error lets
+        the other prefixes run, so every restore is requested in one pass, and
+        any other error cancels the prefixes not yet started. The first error
+        is raised once the pool is done.
+
         Args:
             schema_name (str): account schema name to sync
             s3_destination_bucket_name (str): name of the customer bucket
             date_range (tuple): Pair of date objects of inclusive start and exclusive end dates for which to sync data.
+            sync_id (str): identifier under which progress is saved, so a restarted sync can resume
 
         """
-        if settings.ENABLE_S3_ARCHIVING:
-            LOG.info(
-                "Beginning sync_bucket to %s for %s from %s to %s",
-                s3_destination_bucket_name,
-                schema_name,
-                date_range[0],
-                date_range[1],
-            )
-            start_date, end_date = date_range
-            # rrule is inclusive for both dates, so we need to make end_date exclusive
-            end_date = end_date - timedelta(days=1)
-            days = rrule(DAILY, dtstart=start_date, until=end_date)
-            months = rrule(MONTHLY, dtstart=start_date, until=end_date)
-            s3_destination_bucket = self.s3_resource.Bucket(s3_destination_bucket_name)
-            providers = Provider.objects.filter(customer__schema_name=schema_name).all()
-
-            # Copy the specific month level files
-            for month, provider in product(months, providers):
-                # We need to normalize capitalization and "-local" dev providers.
-                provider_slug = provider.type.lower().split("-")[0]
-                prefix = (
-                    f"{settings.S3_BUCKET_PATH}/{schema_name}/"
-                    f"{provider_slug}/{provider.uuid}/"
-                    f"{month.year:04d}/{month.month:02d}/00/"
-                )
-                LOG.debug("sync_bucket checking prefix %s", prefix)
-                for source_object in self.s3_source_bucket.objects.filter(Prefix=prefix):
-                    self._copy_object(s3_destination_bucket, source_object)
-
-            # Copy all the day files
-            for day, provider in product(days, providers):
-                # We need to normalize capitalization and "-local" dev providers.
-                provider_slug = provider.type.lower().split("-")[0]
-                prefix = (
-                    f"{settings.S3_BUCKET_PATH}/{schema_name}/"
-                    f"{provider_slug}/{provider.uuid}/"
-                    f"{day.year:04d}/{day.month:02d}/{day.day:02d}/"
-                )
-                LOG.debug("sync_bucket checking prefix %s", prefix)
-                for source_object in self.s3_source_bucket.objects.filter(Prefix=prefix):
-                    self._copy_object(s3_destination_bucket, source_object)
-
-            LOG.info(
-                "Completed sync_bucket to %s for %s from %s to %s",
-                s3_destination_bucket_name,
-                schema_name,
-                date_range[0],
-                date_range[1],
-            )
+        if not settings.ENABLE_S3_ARCHIVING:
+            return
+        LOG.info(
+            "Beginning sync_bucket to %s for %s from %s to %s",
+            s3_destination_bucket_name,
+            schema_name,
+            date_range[0],
+            date_range[1],
+        )
+        progress = SyncProgress(sync_id)
+        prefixes = [
+            prefix for prefix in self._get_prefixes(schema_name, date_range) if not progress.is_complete(prefix)
+        ]
+        if progress.completed:
+            LOG.info("Resuming sync_bucket with %s prefixes already synced", len(progress.completed))
+
+        copied = 0
+        errors = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._sync_prefix, s3_destination_bucket_name, prefix): prefix for prefix in prefixes
+            }
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                error = future.exception()
+                if error is None:
+                    copied += future.result()
+                    progress.mark_complete(futures[future])
+                    continue
+                errors.append(error)
+                if not isinstance(error, SyncedFileInColdStorageError):
+                    for pending in futures:
+                        pending.cancel()
+
+        if errors:
+            raise errors[0]
+        progress.clear()
+        LOG.info(
+            "Completed sync_bucket to %s for %s from %s to %s, copied %s objects",
+            s3_destination_bucket_name,
+            schema_name,
+            date_range[0],
+            date_range[1],
+            copied,
+        )
@@ -1,9 +1,10 @@
 """Collection of tests for the data export syncer."""
+import hashlib
+import threading
+from collections import defaultdict
 from datetime import date
+from datetime import datetime
 from datetime import timedelta
-from itertools import product
-from unittest.mock import call
-from unittest.mock import Mock
 from unittest.mock import patch
 
 import faker
@@ -17,11 +18,66 @@ from django.test.utils import override_settings
 
 from api.dataexport.syncer import AwsS3Syncer
 from api.dataexport.syncer import SyncedFileInColdStorageError
+from api.dataexport.syncer import SyncProgress
 from masu.test import MasuTestCase
 
 fake = faker.Faker()
 
 
+class LocalS3:
+    """An in-memory stand-in for the parts of the S3 client the syncer uses."""
+
+    def __init__(self):
+        """Initialize the stand-in."""
+        self.buckets = defaultdict(dict)
+        self.list_calls = []
+        self.copy_calls = []
+        self.restore_calls = []
+        self.copy_errors = {}
+        self.list_errors = {}
+        self._lock = threading.Lock()
+
+    def put(self, bucket, key, body=b"data", etag=None, storage_class="STANDARD", last_modified=None):
+        """Store an object."""
+        self.buckets[bucket][key] = {
+            "Key": key,
+            "Body": body,
+            "ETag": etag or f'"{hashlib.md5(body).hexdigest()}"',
+            "Size": len(body),
+            "StorageClass": storage_class,
+            "LastModified": last_modified or datetime.now(),
+        }
+
+    def get_paginator(self, operation_name):
+        """Return the list_objects_v2 paginator."""
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        """List the objects under a prefix in one page."""
+        with self._lock:
+            self.list_calls.append((Bucket, Prefix))
+        if Bucket in self.list_errors:
+            raise ClientError(
+                error_response={"Error": {"Code": self.list_errors[Bucket]}}, operation_name="ListObjectsV2"
+            )
+        contents = [dict(obj) for key, obj in sorted(self.buckets[Bucket].items()) if key.startswith(Prefix)]
+        return [{"Contents": contents}] if contents else [{}]
+
+    def copy_object(self, ACL, Bucket, Key, CopySource):
+        """Copy an object server side."""
+        with self._lock:
+            self.copy_calls.append((Bucket, Key, ACL))
+        if Key in self.copy_errors:
+            raise ClientError(error_response={"Error": {"Code": self.copy_errors[Key]}}, operation_name="CopyObject")
+        source = self.buckets[CopySource["Bucket"]][CopySource["Key"]]
+        # A copy of a multipart upload is stored as a single part with a new ETag
+        self.put(Bucket, Key, source["Body"], etag=None if "-" in source["ETag"] else source["ETag"])
+
+    def restore_object(self, Bucket, Key, RestoreRequest):
+        """Request the restore of an archived object."""
+        self.restore_calls.append((Bucket, Key))
+
+
 @override_settings(ENABLE_S3_ARCHIVING=True)
 class AwsS3SyncerTest(TestCase):
     """AwsS3Syncer test case without pre-loaded test data."""
@@ -29,45 +85,48 @@ class AwsS3SyncerTest(TestCase):
     @patch("api.dataexport.syncer.boto3")
     def test_sync_file_fail_disabled(self, mock_boto3):
         """Test syncing a file from one S3 bucket to another fails due to it being disabled."""
+        s3 = LocalS3()
+        mock_boto3.client.return_value = s3
         source_bucket_name = fake.slug()
         destination_bucket_name = fake.slug()
         account = fake.word()
-
-        start_date = date(2019, 1, 1)
-        end_date = date(2019, 3, 1)
-        date_range = (start_date, end_date)
-
-        source_object = Mock()
-        source_object.key = f"{settings.S3_BUCKET_PATH}/{account}{fake.file_path()}"
-        source_object.bucket_name = source_bucket_name
-
-        self.assertNotEqual(source_bucket_name, destination_bucket_name)
-
-        mock_resource = mock_boto3.resource
-        mock_buckets = mock_resource.return_value.Bucket
-        mock_filter = mock_buckets.return_value.objects.filter
-        mock_filter.return_value = (source_object,)
-        mock_destination_object = mock_buckets.return_value.Object
-        mock_copy_from = mock_destination_object.return_value.copy_from
+        s3.put(source_bucket_name, f"{settings.S3_BUCKET_PATH}/{account}{fake.file_path()}")
 
         with self.settings(ENABLE_S3_ARCHIVING=False):
             syncer = AwsS3Syncer(source_bucket_name)
-            syncer.sync_bucket(account, destination_bucket_name, date_range)
+            syncer.sync_bucket(account, destination_bucket_name, (date(2019, 1, 1), date(2019, 3, 1)))
 
-        mock_resource.assert_called_with("s3", settings.S3_REGION)
-        mock_buckets.assert_called_once_with(source_bucket_name)
-        mock_filter.assert_not_called()
-        mock_destination_object.assert_not_called()
-        mock_copy_from.assert_not_called()
+        self.assertEqual(s3.list_calls, [])
+        self.assertEqual(s3.copy_calls, [])
+
+    @patch("api.dataexport.syncer.boto3")
+    def test_client_retries_with_backoff(self, mock_boto3):
+        """Test that the S3 client is sized for the pool and retries failed requests."""
+        with self.settings(DATA_EXPORT_SYNC_WORKERS=4, DATA_EXPORT_SYNC_MAX_ATTEMPTS=7):
+            AwsS3Syncer(fake.slug())
+        config = mock_boto3.client.call_args[1]["config"]
+        self.assertEqual(config.max_pool_connections, 4)
+        self.assertEqual(config.retries, {"max_attempts": 7, "mode": "standard"})
 
 
 @override_settings(ENABLE_S3_ARCHIVING=True)
 class AwsS3SyncerTestWithData(MasuTestCase):
     """AwsS3Syncer test case with pre-loaded masu test data."""
 
-    def get_expected_filter_calls(self, schema_name, days, months):
+    def setUp(self):
+        """Set up a local S3 stand-in for each test."""
+        super().setUp()
+        self.s3 = LocalS3()
+        patcher = patch("api.dataexport.syncer.boto3")
+        self.addCleanup(patcher.stop)
+        patcher.start().client.return_value = self.s3
+        self.source_bucket_name = fake.slug()
+        self.destination_bucket_name = fake.slug()
+        self.date_range = (date(2019, 1, 1), date(2019, 3, 1))
+
+    def get_expected_prefixes(self, schema_name, days, months):
         """
-        Get list of expected filter calls with all appropriate providers and dates.
+        Get the expected prefixes with all appropriate providers and dates.
 
         Args:
             schema_name (str): account schema name to sync
@@ -75,7 +134,7 @@ class AwsS3SyncerTestWithData(MasuTestCase):
             months (list): list of datetime.date objects for months to sync
 
         Returns:
-            list of expected mock.call objects.
+            set of expected prefixes.
 
         """
         expected_providers = [
@@ -85,209 +144,154 @@ class AwsS3SyncerTestWithData(MasuTestCase):
             self.azure_provider,
             self.gcp_provider,
         ]
-        expected_filter_calls = []
-
-        for day, provider in product(days, expected_providers):
-            expected_filter_calls.append(
-                call(
-                    Prefix=(
-                        f"{settings.S3_BUCKET_PATH}/{schema_name}/"
-                        f"{provider.type.lower().replace('-local', '')}/{provider.uuid}/"
-                        f"{day.year:04d}/{day.month:02d}/{day.day:02d}/"
-                    )
-                )
+        expected_prefixes = set()
+        for provider in expected_providers:
+            provider_path = (
+                f"{settings.S3_BUCKET_PATH}/{schema_name}/"
+                f"{provider.type.lower().replace('-local', '')}/{provider.uuid}/"
             )
-        for month, provider in product(months, expected_providers):
-            expected_filter_calls.append(
-                call(
-                    Prefix=(
-                        f"{settings.S3_BUCKET_PATH}/{schema_name}/"
-                        f"{provider.type.replace('-local', '').lower()}/{provider.uuid}/"
-                        f"{month.year:04d}/{month.month:02d}/00/"
-                    )
-                )
-            )
-        return expected_filter_calls
+            for day in days:
+                expected_prefixes.add(f"{provider_path}{day.year:04d}/{day.month:02d}/{day.day:02d}/")
+            for month in months:
+                expected_prefixes.add(f"{provider_path}{month.year:04d}/{month.month:02d}/00/")
+        return expected_prefixes
+
+    def get_key(self, day, table_name="table", daily=True):
+        """Return the key of an exported AWS file."""
+        day_part = f"{day.day:02d}" if daily else "00"
+        return (
+            f"{settings.S3_BUCKET_PATH}/{self.schema}/aws/{self.aws_provider.uuid}/"
+            f"{day.year:04d}/{day.month:02d}/{day_part}/{table_name}.csv.gz"
+        )
 
-    @patch("api.dataexport.syncer.boto3")
-    def test_sync_single_file_success(self, mock_boto3):
-        """
-        Test syncing a file from one S3 bucket to another succeeds.
+    def sync(self, sync_id=None):
+        """Run the syncer over the test date range."""
+        syncer = AwsS3Syncer(self.source_bucket_name)
+        syncer.sync_bucket(self.schema, self.destination_bucket_name, self.date_range, sync_id=sync_id)
 
-        Also assert that all the appropriate provider filters are iterated.
+    def test_sync_success(self):
         """
-        source_bucket_name = fake.slug()
-        destination_bucket_name = fake.slug()
-        schema_name = self.schema
-
-        start_date = date(2019, 1, 1)
-        end_date = date(2019, 3, 1)
-        date_range = (start_date, end_date)
-
-        end_date = end_date - timedelta(days=1)
-        days = rrule(DAILY, dtstart=start_date, until=end_date)
-        months = rrule(MONTHLY, dtstart=start_date, until=end_date)
-
-        source_object = Mock()
-        source_object.key = f"{settings.S3_BUCKET_PATH}/{schema_name}{fake.file_path()}"
-        source_object.bucket_name = source_bucket_name
-
-        self.assertNotEqual(source_bucket_name, destination_bucket_name)
+        Test syncing files from one S3 bucket to another succeeds.
 
-        mock_resource = mock_boto3.resource
-        mock_buckets = mock_resource.return_value.Bucket
-        mock_filter = mock_buckets.return_value.objects.filter
-        mock_filter.return_value = (source_object,)
-        mock_destination_object = mock_buckets.return_value.Object
-        mock_copy_from = mock_destination_object.return_value.copy_from
-
-        syncer = AwsS3Syncer(source_bucket_name)
-        syncer.sync_bucket(schema_name, destination_bucket_name, date_range)
-
-        mock_resource.assert_called_with("s3", settings.S3_REGION)
-        mock_buckets.assert_any_call(source_bucket_name)
-        mock_buckets.assert_any_call(destination_bucket_name)
-
-        expected_filter_calls = self.get_expected_filter_calls(schema_name, days, months)
-        mock_filter.assert_has_calls(expected_filter_calls, any_order=True)
-        self.assertEqual(len(mock_filter.call_args_list), len(expected_filter_calls))
-
-        mock_destination_object.assert_called_with(source_object.key)
-        mock_copy_from.assert_called_with(
-            ACL="bucket-owner-full-control", CopySource={"Bucket": source_bucket_name, "Key": source_object.key}
+        Also assert that all the appropriate provider prefixes are listed.
+        """
+        keys = [
+            self.get_key(date(2019, 1, 5)),
+            self.get_key(date(2019, 2, 28)),
+            self.get_key(date(2019, 2, 1), daily=False),
+        ]
+        for key in keys:
+            self.s3.put(self.source_bucket_name, key, fake.binary(length=64))
+        self.s3.put(self.source_bucket_name, self.get_key(date(2019, 3, 1)))
+
+        self.sync()
+
+        end_date = self.date_range[1] - timedelta(days=1)
+        days = rrule(DAILY, dtstart=self.date_range[0], until=end_date)
+        months = rrule(MONTHLY, dtstart=self.date_range[0], until=end_date)
+        expected_prefixes = self.get_expected_prefixes(self.schema, days, months)
+        source_prefixes = [prefix for bucket, prefix in self.s3.list_calls if bucket == self.source_bucket_name]
+        self.assertEqual(len(source_prefixes), len(expected_prefixes))
+        self.assertEqual(set(source_prefixes), expected_prefixes)
+
+        destination = self.s3.buckets[self.destination_bucket_name]
+        self.assertEqual(set(destination), set(keys))
+        for key in keys:
+            self.assertEqual(destination[key]["Body"], self.s3.buckets[self.source_bucket_name][key]["Body"])
+        self.assertTrue(all(acl == "bucket-owner-full-control" for _, _, acl in self.s3.copy_calls))
+
+    def test_sync_file_fail_no_file(self):
+        """Test that nothing is copied, and no destination listed, when there are no matching files."""
+        self.sync()
+        self.assertEqual(self.s3.copy_calls, [])
+        self.assertFalse(any(bucket == self.destination_bucket_name for bucket, _ in self.s3.list_calls))
+
+    def test_sync_skips_synced_objects(self):
+        """Test that objects with a matching ETag and size at the destination are not copied again."""
+        synced_key = self.get_key(date(2019, 1, 5))
+        changed_key = self.get_key(date(2019, 1, 6))
+        multipart_key = self.get_key(date(2019, 1, 7))
+        self.s3.put(self.source_bucket_name, synced_key, b"same")
+        self.s3.put(self.destination_bucket_name, synced_key, b"same")
+        self.s3.put(self.source_bucket_name, changed_key, b"new data")
+        self.s3.put(self.destination_bucket_name, changed_key, b"old")
+        self.s3.put(
+            self.source_bucket_name, multipart_key, b"parts", etag='"abc-2"', last_modified=datetime(2019, 1, 8)
         )
+        self.s3.put(self.destination_bucket_name, multipart_key, b"parts")
 
-    @patch("api.dataexport.syncer.boto3")
-    def test_sync_file_fail_no_file(self, mock_boto3):
-        """Test syncing a file from one S3 bucket to another fails due to no matching files."""
-        source_bucket_name = fake.slug()
-        destination_bucket_name = fake.slug()
-        schema_name = self.schema
+        self.sync()
 
-        start_date = date(2019, 1, 1)
-        end_date = date(2019, 3, 1)
-        date_range = (start_date, end_date)
+        copied_keys = [key for _, key, _ in self.s3.copy_calls]
+        self.assertEqual(copied_keys, [changed_key])
+        self.assertEqual(self.s3.buckets[self.destination_bucket_name][changed_key]["Body"], b"new data")
 
-        end_date = end_date - timedelta(days=1)
-        days = rrule(DAILY, dtstart=start_date, until=end_date)
-        months = rrule(MONTHLY, dtstart=start_date, until=end_date)
+    def test_sync_destination_listing_denied(self):
+        """Test that every object is copied when the destination bucket cannot be listed."""
+        keys = [self.get_key(date(2019, 1, 5)), self.get_key(date(2019, 1, 6))]
+        for key in keys:
+            self.s3.put(self.source_bucket_name, key, b"same")
+            self.s3.put(self.destination_bucket_name, key, b"same")
+        self.s3.list_errors[self.destination_bucket_name] = "AccessDenied"
 
-        self.assertNotEqual(source_bucket_name, destination_bucket_name)
+        self.sync()
 
-        mock_resource = mock_boto3.resource
-        mock_buckets = mock_resource.return_value.Bucket
-        mock_filter = mock_buckets.return_value.objects.filter
-        mock_filter.return_value = ()
-        mock_destination_object = mock_buckets.return_value.Object
-        mock_copy_from = mock_destination_object.return_value.copy_from
+        self.assertEqual(sorted(key for _, key, _ in self.s3.copy_calls), sorted(keys))
 
-        syncer = AwsS3Syncer(source_bucket_name)
-        syncer.sync_bucket(schema_name, destination_bucket_name, date_range)
+    def test_sync_resumes_after_failure(self):
+        """Test that a restarted sync skips the prefixes it already copied."""
+        sync_id = fake.uuid4()
+        good_key = self.get_key(date(2019, 1, 5))
+        cold_key = self.get_key(date(2019, 1, 6))
+        cold_prefix = cold_key.rsplit("/", 1)[0] + "/"
+        self.s3.put(self.source_bucket_name, good_key)
+        self.s3.put(self.source_bucket_name, cold_key, storage_class="GLACIER")
+        self.s3.copy_errors[cold_key] = "RestoreAlreadyInProgress"
 
-        mock_resource.assert_called_with("s3", settings.S3_REGION)
-        mock_buckets.assert_any_call(source_bucket_name)
-        mock_buckets.assert_any_call(destination_bucket_name)
+        with self.assertRaises(SyncedFileInColdStorageError):
+            self.sync(sync_id)
+        self.assertIn(good_key, self.s3.buckets[self.destination_bucket_name])
+        completed = SyncProgress(sync_id).completed
+        self.assertIn(good_key.rsplit("/", 1)[0] + "/", completed)
+        self.assertNotIn(cold_prefix, completed)
 
-        expected_filter_calls = self.get_expected_filter_calls(schema_name, days, months)
-        mock_filter.assert_has_calls(expected_filter_calls, any_order=True)
-        self.assertEqual(len(mock_filter.call_args_list), len(expected_filter_calls))
+        del self.s3.copy_errors[cold_key]
+        self.s3.list_calls.clear()
+        self.sync(sync_id)
 
-        mock_destination_object.assert_not_called()
-        mock_copy_from.assert_not_called()
+        self.assertEqual({prefix for _, prefix in self.s3.list_calls}, {cold_prefix})
+        self.assertIn(cold_key, self.s3.buckets[self.destination_bucket_name])
+        self.assertEqual(SyncProgress(sync_id).completed, set())
 
-    @patch("api.dataexport.syncer.boto3")
-    def test_sync_file_in_glacier(self, mock_boto3):
+    def test_sync_file_in_glacier(self):
         """Test syncing a file in glacier will call restore, and raise an exception."""
-        client_error_glacier = ClientError(
-            error_response={"Error": {"Code": "InvalidObjectState"}}, operation_name=Mock()
-        )
-        source_bucket_name = fake.slug()
-        destination_bucket_name = fake.slug()
-        schema_name = self.schema
-
-        start_date = date(2019, 1, 1)
-        end_date = date(2019, 3, 1)
-        date_range = (start_date, end_date)
-
-        source_object = Mock()
-        source_object.key = f"{settings.S3_BUCKET_PATH}/{schema_name}{fake.file_path()}"
-        source_object.bucket_name = source_bucket_name
-        source_object.storage_class = "GLACIER"
-
-        self.assertNotEqual(source_bucket_name, destination_bucket_name)
-
-        mock_resource = mock_boto3.resource
-        mock_buckets = mock_resource.return_value.Bucket
-        mock_filter = mock_buckets.return_value.objects.filter
-        mock_filter.return_value = (source_object,)
-        mock_destination_object = mock_buckets.return_value.Object
-        mock_copy_from = mock_destination_object.return_value.copy_from
-        mock_copy_from.side_effect = client_error_glacier
+        glacier_key = self.get_key(date(2019, 1, 5))
+        other_key = self.get_key(date(2019, 1, 5), "other")
+        self.s3.put(self.source_bucket_name, glacier_key, storage_class="GLACIER")
+        self.s3.put(self.source_bucket_name, other_key)
+        self.s3.copy_errors[glacier_key] = "InvalidObjectState"
+
         with self.assertRaises(SyncedFileInColdStorageError):
-            syncer = AwsS3Syncer(source_bucket_name)
-            syncer.sync_bucket(schema_name, destination_bucket_name, date_range)
-        source_object.restore_object.assert_called()
+            self.sync()
+        self.assertEqual(self.s3.restore_calls, [(self.source_bucket_name, glacier_key)])
+        self.assertIn(other_key, self.s3.buckets[self.destination_bucket_name])
 
-    @patch("api.dataexport.syncer.boto3")
-    def test_sync_glacier_file_restore_in_progress(self, mock_boto3):
+    def test_sync_glacier_file_restore_in_progress(self):
         """Test syncing a file that is currently being restored from glacier will raise an exception."""
-        restore_in_progress_error = ClientError(
-            error_response={"Error": {"Code": "RestoreAlreadyInProgress"}}, operation_name=Mock()
-        )
-        source_bucket_name = fake.slug()
-        destination_bucket_name = fake.slug()
-        schema_name = self.schema
-
-        start_date = date(2019, 1, 1)
-        end_date = date(2019, 3, 1)
-        date_range = (start_date, end_date)
-
-        source_object = Mock()
-        source_object.key = f"{settings.S3_BUCKET_PATH}/{schema_name}{fake.file_path()}"
-        source_object.bucket_name = source_bucket_name
-        source_object.storage_class = "GLACIER"
-
-        self.assertNotEqual(source_bucket_name, destination_bucket_name)
-
-        mock_resource = mock_boto3.resource
-        mock_buckets = mock_resource.return_value.Bucket
-        mock_filter = mock_buckets.return_value.objects.filter
-        mock_filter.return_value = (source_object,)
-        mock_destination_object = mock_buckets.return_value.Object
-        mock_copy_from = mock_destination_object.return_value.copy_from
-        mock_copy_from.side_effect = restore_in_progress_error
+        glacier_key = self.get_key(date(2019, 1, 5))
+        self.s3.put(self.source_bucket_name, glacier_key, storage_class="GLACIER")
+        self.s3.copy_errors[glacier_key] = "RestoreAlreadyInProgress"
 
         with self.assertRaises(SyncedFileInColdStorageError):
-            syncer = AwsS3Syncer(source_bucket_name)
-            syncer.sync_bucket(schema_name, destination_bucket_name, date_range)
-        source_object.restore_object.assert_not_called()
+            self.sync()
+        self.assertEqual(self.s3.restore_calls, [])
 
-    @patch("api.dataexport.syncer.boto3")
-    def test_sync_fail_boto3_client_exception(self, mock_boto3):
+    def test_sync_fail_boto3_client_exception(self):
         """Test that if an client error, we raise that error."""
-        client_error = ClientError(error_response={"Error": {"Code": fake.word()}}, operation_name=Mock())
-        source_bucket_name = fake.slug()
-        destination_bucket_name = fake.slug()
-        schema_name = self.schema
-
-        start_date = date(2019, 1, 1)
-        end_date = date(2019, 3, 1)
-        date_range = (start_date, end_date)
-
-        source_object = Mock()
-        source_object.key = f"{settings.S3_BUCKET_PATH}/{schema_name}{fake.file_path()}"
-        source_object.bucket_name = source_bucket_name
-        self.assertNotEqual(source_bucket_name, destination_bucket_name)
-
-        mock_resource = mock_boto3.resource
-        mock_buckets = mock_resource.return_value.Bucket
-        mock_filter = mock_buckets.return_value.objects.filter
-        mock_filter.return_value = (source_object,)
-        mock_destination_object = mock_buckets.return_value.Object
-        mock_copy_from = mock_destination_object.return_value.copy_from
-        mock_copy_from.side_effect = client_error
+        key = self.get_key(date(2019, 1, 5))
+        self.s3.put(self.source_bucket_name, key)
+        self.s3.copy_errors[key] = fake.word()
 
         with self.assertRaises(ClientError):
-            syncer = AwsS3Syncer(source_bucket_name)
-            syncer.sync_bucket(schema_name, destination_bucket_name, date_range)
-        source_object.restore_object.assert_not_called()
+            self.sync()
+        self.assertEqual(self.s3.restore_calls, [])
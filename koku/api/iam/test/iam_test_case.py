@@ -23,6 +23,7 @@ from uuid import UUID
 
 import prestodb
 from django.conf import settings
+from django.core.cache import caches
 from django.db import connection
 from django.db.models.signals import post_save
 from django.test import override_settings
@@ -91,6 +92,12 @@ class IamTestCase(TestCase):
         cls.provider_uuid = UUID("00000000-0000-0000-0000-000000000001")
         cls.factory = RequestFactory()
 
+    def setUp(self):
+        """Set up each test."""
+        super().setUp()
+        # Cached report data from an earlier test would hide the fixtures of this one
+        caches["default"].clear()
+
     @classmethod
     def tearDownClass(cls):
         """Tear down the class."""
@@ -28,6 +28,16 @@ OCP_NODE_MONTH = "node_cost_per_month"
 OCP_CLUSTER_MONTH = "cluster_cost_per_month"
 OCP_PVC_MONTH = "pvc_cost_per_month"
 
+# The usage cost bucket that each usage metric is charged to
+USAGE_METRIC_TYPE_MAP = {
+    OCP_METRIC_CPU_CORE_USAGE_HOUR: "cpu",
+    OCP_METRIC_CPU_CORE_REQUEST_HOUR: "cpu",
+    OCP_METRIC_MEM_GB_USAGE_HOUR: "memory",
+    OCP_METRIC_MEM_GB_REQUEST_HOUR: "memory",
+    OCP_METRIC_STORAGE_GB_USAGE_MONTH: "storage",
+    OCP_METRIC_STORAGE_GB_REQUEST_MONTH: "storage",
+}
+
 INFRASTRUCTURE_COST_TYPE = "Infrastructure"
 SUPPLEMENTARY_COST_TYPE = "Supplementary"
 
@@ -30,6 +30,8 @@ from api.provider.models import Provider
 from api.provider.models import Sources
 from api.utils import DateHelper
 from cost_models.models import CostModelMap
+from koku.cache import invalidate_finalized_view_cache
+from koku.cache import invalidate_report_deltas_cache
 from masu.processor.tasks import refresh_materialized_views
 from reporting.provider.aws.models import AWSCostEntryBill
 from reporting.provider.azure.models import AzureCostEntryBill
@@ -268,3 +270,6 @@ def provider_post_delete_callback(*args, **kwargs):
     refresh_materialized_views.s(
         provider.customer.schema_name, provider.type, provider_uuid=provider.uuid, synchronous=True
     ).apply()
+    # The source's data is gone from every month, not just the ones the refresh covers
+    invalidate_report_deltas_cache(provider.customer.schema_name, provider.type)
+    invalidate_finalized_view_cache(provider.customer.schema_name, provider.type)
@@ -298,6 +298,9 @@ class QueryHandler:
         start_filter, end_filter = self._get_time_based_filters(delta)
         filters.add(query_filter=start_filter)
         filters.add(query_filter=end_filter)
+        # usage_start never follows usage_end, so bounding it as well returns the same rows
+        # and lets the planner prune the summary partitions after the end of the range.
+        filters.add(field="usage_start", operation="lte", parameter=end_filter.parameter)
 
         return filters
 
@@ -33,6 +33,7 @@ from api.models import Tenant
 from api.models import User
 from api.provider.models import Provider
 from api.report.queries import ReportQueryHandler
+from koku.cache import get_tag_keys
 from reporting.models import OCPAllCostLineItemDailySummary
 from reporting.provider.aws.models import AWSOrganizationalUnit
 
@@ -62,6 +63,7 @@ class QueryParameters:
         "gcp": [(Provider.PROVIDER_GCP, "account", "gcp.account"), (Provider.PROVIDER_GCP, "project", "gcp.project")],
         "ibm": [(Provider.PROVIDER_IBM, "account", "ibm.account")],
     }
+    TAG_PREFIXES = ("tag:", "and:tag:", "or:tag:")
 
     def __init__(self, request, caller, **kwargs):
         """Constructor.
@@ -86,9 +88,10 @@ class QueryParameters:
         self.tag_handler = caller.tag_handler
 
         self.tag_keys = []
+        self._tag_key_registry = frozenset()
         if self.report_type != "tags":
             for tag_model in self.tag_handler:
-                self.tag_keys.extend(self._get_tag_keys(tag_model))
+                self._tag_key_registry |= self._get_tag_keys(tag_model)
 
         self._validate()  # sets self.parameters
 
@@ -118,26 +121,29 @@ class QueryParameters:
         return pformat(self.__repr__())
 
     def _get_tag_keys(self, model):
-        """Get a list of tag keys to validate filters."""
-        with tenant_context(self.tenant):
-            tags = model.objects.values("key")
-            tag_list = [":".join(["tag", tag.get("key")]) for tag in tags]
-            tag_list.extend([":".join(["and:tag", tag.get("key")]) for tag in tags])
-            tag_list.extend([":".join(["or:tag", tag.get("key")]) for tag in tags])
-        return tag_list
+        """Get the set of tag keys to validate filters."""
+        return get_tag_keys(self.tenant.schema_name, model)
+
+    def _is_tag_param(self, param):
+        """Return True if the parameter is a tag key prefixed with tag:, and:tag: or or:tag:."""
+        if not isinstance(param, str):
+            return False
+        for prefix in self.TAG_PREFIXES:
+            if param.startswith(prefix):
+                return param.partition(prefix)[2] in self._tag_key_registry
+        return False
 
     def _process_tag_query_params(self, query_params):
         """Reduce the set of tag keys based on those being queried."""
-        tag_key_set = set(self.tag_keys)
         param_tag_keys = set()
         for key, value in query_params.items():
             if isinstance(value, (dict, list)):
                 for inner_key in value:
-                    if inner_key in tag_key_set:
+                    if self._is_tag_param(inner_key):
                         param_tag_keys.add(inner_key)
-            elif value in tag_key_set:
+            elif self._is_tag_param(value):
                 param_tag_keys.add(value)
-            if key in tag_key_set:
+            if self._is_tag_param(key):
                 param_tag_keys.add(key)
         return param_tag_keys
 
@@ -322,7 +328,7 @@ class QueryParameters:
             error = {"details": "Invalid query parameter format."}
             raise ValidationError(error)
 
-        if self.tag_keys:
+        if self._tag_key_registry:
             self.tag_keys = self._process_tag_query_params(query_params)
             qps = self.serializer(data=query_params, tag_keys=self.tag_keys, context={"request": self.request})
         else:
@@ -0,0 +1,532 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Index advice for the query shapes of the report API.
+
+A query shape is a report URL, e.g. reports/openshift/costs/?group_by[project]=*.
+Shapes are replayed through the report query handlers, the SQL they run is
+explained with EXPLAIN (ANALYZE, BUFFERS) and the filters of the slow scans
+of reporting tables are turned into btree or GIN index candidates.
+"""
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connection
+from django.db import migrations
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+from django.test import RequestFactory
+from django.urls import resolve
+from tenant_schemas.utils import schema_context
+
+from api.iam.models import Customer
+from api.iam.models import User
+from api.query_params import QueryParameters
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_QUERY_SHAPES = [
+    "reports/openshift/costs/?filter[resolution]=daily",
+    "reports/openshift/costs/?group_by[cluster]=*",
+    "reports/openshift/costs/?group_by[project]=*&filter[time_scope_value]=-2&filter[time_scope_units]=month",
+    "reports/openshift/compute/?group_by[node]=*",
+    "reports/openshift/memory/?group_by[project]=*&filter[resolution]=monthly",
+    "reports/openshift/volumes/?group_by[project]=*",
+    "reports/openshift/infrastructures/all/costs/?group_by[project]=*",
+    "reports/aws/costs/?group_by[account]=*",
+    "reports/aws/costs/?group_by[service]=*&filter[time_scope_value]=-2&filter[time_scope_units]=month",
+    "reports/aws/instance-types/?group_by[account]=*",
+    "reports/aws/storage/?group_by[region]=*",
+    "reports/azure/costs/?group_by[subscription_guid]=*",
+    "reports/gcp/costs/?group_by[account]=*",
+]
+
+SCAN_NODE_TYPES = ("Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan")
+QUAL_KEYS = ("Index Cond", "Recheck Cond", "Filter")
+# A scan is worth an index when it reads at least this many rows it then throws away
+MIN_ROWS_REMOVED = 1000
+MAX_KEY_COLUMNS = 4
+MAX_INCLUDE_COLUMNS = 6
+# Constant filters that every scan of a table shares become partial index predicates
+# when they are on columns with at most this many values
+MAX_PARTIAL_DISTINCT = 10
+# Large values that would bloat a covering index
+UNCOVERABLE_TYPES = ("json", "jsonb", "hstore")
+
+CapturedStatement = namedtuple("CapturedStatement", ["sql", "params"])
+ShapeResult = namedtuple("ShapeResult", ["shape", "duration", "statements", "error"])
+Predicate = namedtuple("Predicate", ["kind", "column", "text", "constant"])
+ColumnInfo = namedtuple("ColumnInfo", ["data_type", "n_distinct"])
+Scan = namedtuple("Scan", ["table_name", "predicates", "output", "duration", "blocks", "shape"])
+
+_COLUMN = r"\(*(?P<column>[a-z_][a-z0-9_]*)\)*(?:::[a-z ]+(?:\[\])?)?"
+_CONSTANT = r"(?:'(?:[^']|'')*'(?:::[a-z ]+)?|-?\d+(?:\.\d+)?)"
+_PREDICATE_PATTERNS = (
+    ("contains", re.compile(rf"^{_COLUMN} @> ")),
+    ("exists", re.compile(rf"^{_COLUMN} \?[|&]? ")),
+    ("null", re.compile(rf"^{_COLUMN} IS (?:NOT )?NULL$")),
+    ("in", re.compile(rf"^{_COLUMN} = ANY ")),
+    ("eq", re.compile(rf"^{_COLUMN} = (?P<constant>{_CONSTANT})?")),
+    ("range", re.compile(rf"^{_COLUMN} (?:>=|<=|>|<) ")),
+)
+_TAG_VALUE = re.compile(r"\((?P<column>[a-z_][a-z0-9_]*) -> '(?P<key>[^']*)'")
+_INDEX_DEFINITION = re.compile(r"^CREATE (?:UNIQUE )?INDEX (?P<name>\S+) ON (?:ONLY )?\S+ USING (?P<method>\w+) ")
+
+
+def split_top_level(text, separator):
+    """Split text on a separator that is outside parentheses and quotes."""
+    parts = []
+    depth = 0
+    quoted = False
+    start = 0
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and text.startswith(separator, index):
+            parts.append(text[start:index].strip())
+            index += len(separator)
+            start = index
+            continue
+        index += 1
+    parts.append(text[start:].strip())
+    return [part for part in parts if part]
+
+
+def _take_parenthesized(text):
+    """Split "(inner) rest" into the text inside the leading parentheses and the rest."""
+    depth = 0
+    quoted = False
+    for index, char in enumerate(text):
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+            if depth == 0:
+                return text[1:index], text[index + 1 :]  # noqa: E203
+    return text, ""
+
+
+def strip_parentheses(text):
+    """Remove the parentheses that wrap a whole expression."""
+    text = text.strip()
+    while text.startswith("("):
+        inner, rest = _take_parenthesized(text)
+        if rest.strip():
+            break
+        text = inner.strip()
+    return text
+
+
+def normalize_predicate(condition):
+    """Return a condition as sorted, parenthesized AND-ed predicates, so equal conditions compare equal."""
+    predicates = split_top_level(strip_parentheses(condition), " AND ")
+    return " AND ".join(sorted(f"({strip_parentheses(predicate)})" for predicate in predicates))
+
+
+def parse_predicates(condition, alias=None):
+    """Split a plan condition into its AND-ed predicates and classify them.
+
+    Args:
+        condition (str): A Filter, Index Cond or Recheck Cond of an EXPLAIN plan
+        alias (str): The relation alias that qualifies columns in VERBOSE plans
+
+    Returns:
+        (list): Predicate tuples. Predicates that no index can serve have kind "other".
+
+    """
+    if alias:
+        condition = re.sub(rf"(?<![\w']){re.escape(alias)}\.", "", condition)
+    predicates = []
+    for text in split_top_level(strip_parentheses(condition), " AND "):
+        text = strip_parentheses(text)
+        for kind, pattern in _PREDICATE_PATTERNS:
+            match = pattern.match(text)
+            if match:
+                constant = kind == "null" or (kind == "eq" and match.group("constant") == text.split(" = ", 1)[1])
+                predicates.append(Predicate(kind, match.group("column"), text, constant))
+                break
+        else:
+            tag_value = _TAG_VALUE.search(text)
+            column = tag_value.group("column") if tag_value else None
+            predicates.append(Predicate("other", column, text, False))
+    return predicates
+
+
+def iter_plan_nodes(plan):
+    """Yield every node of an EXPLAIN plan."""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+
+class IndexCandidate:
+    """A btree or GIN index on a reporting table, proposed or already existing."""
+
+    def __init__(self, table_name, method, columns, include=None, predicate=None, opclass=None):
+        """Initialize the candidate.
+
+        Args:
+            table_name (str): The table, partitioned table or materialized view to index
+            method (str): The index access method, btree or gin
+            columns (list): The key columns
+            include (list): The non-key columns of a covering btree index
+            predicate (str): The WHERE clause of a partial index
+            opclass (str): The operator class of a GIN index column
+
+        """
+        self.table_name = table_name
+        self.method = method
+        self.columns = list(columns)
+        self.include = list(include or [])
+        self.predicate = predicate
+        self.opclass = opclass
+        self.duration = 0.0
+        self.blocks = 0
+        self.shapes = set()
+
+    @classmethod
+    def from_definition(cls, table_name, definition):
+        """Parse an index definition from pg_indexes."""
+        match = _INDEX_DEFINITION.match(definition)
+        if not match:
+            return None
+        rest = definition[match.end() :]  # noqa: E203
+        columns_text, rest = _take_parenthesized(rest)
+        include = []
+        predicate = None
+        rest = rest.strip()
+        if rest.startswith("INCLUDE"):
+            include_text, rest = _take_parenthesized(rest[len("INCLUDE") :].strip())  # noqa: E203
+            include = [column.strip() for column in split_top_level(include_text, ",")]
+            rest = rest.strip()
+        if rest.startswith("WHERE"):
+            predicate = normalize_predicate(rest[len("WHERE") :])  # noqa: E203
+        columns = []
+        opclass = None
+        for column in split_top_level(columns_text, ","):
+            name, _, column_opclass = column.partition(" ")
+            columns.append(name.strip('"'))
+            opclass = opclass or column_opclass.strip() or None
+        return cls(table_name, match.group("method"), columns, include, predicate, opclass)
+
+    @property
+    def definition(self):
+        """Return the CREATE INDEX statement of the candidate after the index name."""
+        if self.method == "gin" and self.opclass:
+            columns = ", ".join(f"{column} {self.opclass}" for column in self.columns)
+        else:
+            columns = ", ".join(self.columns)
+        definition = f"ON {self.table_name} USING {self.method} ({columns})"
+        if self.include:
+            definition += f" INCLUDE ({', '.join(self.include)})"
+        if self.predicate:
+            definition += f" WHERE {self.predicate}"
+        return definition
+
+    @property
+    def name(self):
+        """Return a name that is unique to the index definition and fits in an identifier."""
+        digest = hashlib.md5(self.definition.encode("utf-8")).hexdigest()[:8]
+        table_name = self.table_name.replace("reporting_", "", 1)
+        return f"{table_name}_{'_'.join(self.columns)}"[:50].rstrip("_") + f"_{digest}_idx"
+
+    @property
+    def create_sql(self):
+        """Return the CREATE INDEX statement."""
+        return f"CREATE INDEX IF NOT EXISTS {self.name} {self.definition}"
+
+    @property
+    def drop_sql(self):
+        """Return the DROP INDEX statement."""
+        return f"DROP INDEX IF EXISTS {self.name}"
+
+    def serves(self, other):
+        """Return True if this index serves every scan that the other index would."""
+        if self.table_name != other.table_name or self.method != other.method:
+            return False
+        if self.predicate and self.predicate != other.predicate:
+            return False
+        if self.method == "gin":
+            return other.columns == self.columns and (
+                self.opclass in (None, "jsonb_ops") or self.opclass == other.opclass
+            )
+        if self.columns[: len(other.columns)] != other.columns:
+            return False
+        return set(other.include) <= set(self.columns + self.include)
+
+    def __repr__(self):
+        """Unambiguous representation."""
+        return f"IndexCandidate({self.create_sql!r})"
+
+
+def replay_query_shape(shape, schema_name):
+    """Run the report query of an API query shape and capture the SQL it executes.
+
+    The request goes straight to the view's query handler as an org admin of the
+    tenant, so neither RBAC nor the view cache is involved.
+    """
+    url = shape if shape.startswith("/") else f"{settings.API_PATH_PREFIX.rstrip('/')}/v1/{shape}"
+    statements = []
+
+    def capture(execute, sql, params, many, context):
+        if not many and sql.split(None, 1)[0].upper() in ("SELECT", "WITH"):
+            statements.append(CapturedStatement(sql, params))
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        match = resolve(urlsplit(url).path)
+        view = match.func.view_class()
+        request = RequestFactory().get(url)
+        request.user = User(username="index-advisor", customer=Customer.objects.get(schema_name=schema_name))
+        request.user.access = None
+        with connection.execute_wrapper(capture):
+            params = QueryParameters(request=request, caller=view, **match.kwargs)
+            view.query_handler(params).execute_query()
+    except Exception as error:
+        LOG.warning(f"Query shape {shape} could not be replayed: {error}")
+        return ShapeResult(shape, time.perf_counter() - start, statements, error)
+    return ShapeResult(shape, time.perf_counter() - start, statements, None)
+
+
+def explain_statement(statement, schema_name):
+    """Return the EXPLAIN (ANALYZE, BUFFERS) plan of a captured statement."""
+    with schema_context(schema_name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, VERBOSE, FORMAT JSON) {statement.sql}", statement.params)
+            plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+class IndexAdvisor:
+    """Collect EXPLAIN plans of report query shapes and propose indexes for them."""
+
+    def __init__(self, schema_name):
+        """Initialize the advisor for a tenant schema."""
+        self.schema_name = schema_name
+        self.results = []
+        self.notes = set()
+        self._scans = []
+        self._parents = None
+        self._columns = {}
+        self._indexes = {}
+
+    def replay(self, shapes):
+        """Replay the query shapes and analyze the plans of the SQL they run."""
+        for shape in shapes:
+            result = replay_query_shape(shape, self.schema_name)
+            self.results.append(result)
+            for statement in result.statements:
+                try:
+                    plan = explain_statement(statement, self.schema_name)
+                except Exception as error:
+                    LOG.warning(f"Statement of query shape {shape} could not be explained: {error}")
+                    continue
+                self.analyze_plan(plan, shape)
+        return self.results
+
+    def analyze_plan(self, plan, shape):
+        """Collect the scans of reporting tables in a plan that throw away many rows."""
+        for node in iter_plan_nodes(plan["Plan"]):
+            if node.get("Node Type") not in SCAN_NODE_TYPES or "Relation Name" not in node:
+                continue
+            table_name = self.get_parent_table(node["Relation Name"])
+            if not table_name.startswith("reporting_"):
+                continue
+            loops = node.get("Actual Loops", 1)
+            rows_removed = node.get("Rows Removed by Filter", 0) + node.get("Rows Removed by Index Recheck", 0)
+            if rows_removed * loops < MIN_ROWS_REMOVED:
+                continue
+            alias = node.get("Alias")
+            predicates = []
+            for key in QUAL_KEYS:
+                if node.get(key):
+                    predicates.extend(parse_predicates(node[key], alias))
+            output = [
+                re.sub(rf"^{re.escape(alias)}\.", "", column) if alias else column for column in node.get("Output", [])
+            ]
+            duration = node.get("Actual Total Time", 0) * loops
+            blocks = node.get("Shared Hit Blocks", 0) + node.get("Shared Read Blocks", 0)
+            self._scans.append(Scan(table_name, predicates, output, duration, blocks, shape))
+
+    def get_candidates(self, table_name, predicates, output, shared_constants=()):
+        """Return the indexes that would serve a scan with these predicates and output columns.
+
+        Constant predicates in shared_constants, which every scan of the table has, may
+        become the predicate of a partial index instead of key columns.
+        """
+        columns = self.get_columns(table_name)
+        candidates = []
+        for kind in ("contains", "exists"):
+            for column in dict.fromkeys(predicate.column for predicate in predicates if predicate.kind == kind):
+                opclass = "jsonb_path_ops" if kind == "contains" else None
+                candidates.append(IndexCandidate(table_name, "gin", [column], opclass=opclass))
+
+        partial = []
+        equality = []
+        ranges = []
+        for predicate in predicates:
+            n_distinct = columns.get(predicate.column, ColumnInfo(None, None)).n_distinct
+            if predicate.text in shared_constants and (
+                predicate.kind == "null" or (n_distinct and 0 < n_distinct <= MAX_PARTIAL_DISTINCT)
+            ):
+                partial.append(predicate.text)
+            elif predicate.kind in ("eq", "in"):
+                equality.append(predicate.column)
+            elif predicate.kind == "range":
+                ranges.append(predicate.column)
+            elif predicate.kind == "other" and predicate.column:
+                self.notes.add(f"{table_name}: tag value match cannot use an index: {predicate.text}")
+
+        # Equality columns go first, the most selective first, then one range column
+        equality = sorted(dict.fromkeys(equality), key=lambda column: -self._distinct_values(columns, column))
+        keys = list(dict.fromkeys(equality + ranges[:1]))[:MAX_KEY_COLUMNS]
+        if keys:
+            include = [column for column in dict.fromkeys(output) if column not in keys]
+            coverable = all(
+                column in columns
+                and columns[column].data_type not in UNCOVERABLE_TYPES
+                and not columns[column].data_type.endswith("[]")
+                for column in include
+            )
+            if not coverable or len(include) > MAX_INCLUDE_COLUMNS:
+                include = []
+            predicate = normalize_predicate(" AND ".join(partial)) if partial else None
+            candidates.append(IndexCandidate(table_name, "btree", keys, include, predicate))
+
+        existing = self.get_indexes(table_name)
+        return [candidate for candidate in candidates if not any(index.serves(candidate) for index in existing)]
+
+    @staticmethod
+    def _distinct_values(columns, column):
+        """Return a sortable estimate of the number of values of a column."""
+        n_distinct = columns.get(column, ColumnInfo(None, None)).n_distinct or 0
+        # Negative n_distinct is a fraction of the row count, so it beats any absolute count
+        return -n_distinct * 1e12 if n_distinct < 0 else n_distinct
+
+    def get_candidates_by_benefit(self, limit=None):
+        """Return the proposed indexes, most time spent in the scans they serve first.
+
+        A candidate is dropped when a candidate with more benefit already serves its scans.
+        """
+        shared_constants = {}
+        for scan in self._scans:
+            constants = {predicate.text for predicate in scan.predicates if predicate.constant}
+            shared_constants[scan.table_name] = shared_constants.get(scan.table_name, constants) & constants
+
+        candidates = {}
+        for scan in self._scans:
+            for candidate in self.get_candidates(
+                scan.table_name, scan.predicates, scan.output, shared_constants[scan.table_name]
+            ):
+                candidate = candidates.setdefault(candidate.create_sql, candidate)
+                candidate.duration += scan.duration
+                candidate.blocks += scan.blocks
+                candidate.shapes.add(scan.shape)
+
+        proposed = []
+        for candidate in sorted(candidates.values(), key=lambda index: index.duration, reverse=True):
+            if any(index.serves(candidate) for index in proposed):
+                continue
+            proposed.append(candidate)
+        return proposed[:limit] if limit else proposed
+
+    def get_parent_table(self, relation_name):
+        """Return the partitioned table a partition belongs to, or the relation itself."""
+        if self._parents is None:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT c.relname, p.relname
+                      FROM pg_inherits i
+                      JOIN pg_class c ON c.oid = i.inhrelid
+                      JOIN pg_class p ON p.oid = i.inhparent
+                      JOIN pg_namespace n ON n.oid = c.relnamespace
+                     WHERE n.nspname = %s
+                    """,
+                    [self.schema_name],
+                )
+                self._parents = dict(cursor.fetchall())
+        while relation_name in self._parents:
+            relation_name = self._parents[relation_name]
+        return relation_name
+
+    def get_columns(self, table_name):
+        """Return the type and number of distinct values of the columns of a table."""
+        if table_name not in self._columns:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT a.attname, format_type(a.atttypid, a.atttypmod), max(s.n_distinct)
+                      FROM pg_attribute a
+                      JOIN pg_class c ON c.oid = a.attrelid
+                      JOIN pg_namespace n ON n.oid = c.relnamespace
+                      LEFT JOIN pg_stats s
+                        ON s.schemaname = n.nspname AND s.tablename = c.relname AND s.attname = a.attname
+                     WHERE n.nspname = %s AND c.relname = %s AND a.attnum > 0 AND NOT a.attisdropped
+                     GROUP BY a.attname, a.atttypid, a.atttypmod
+                    """,
+                    [self.schema_name, table_name],
+                )
+                self._columns[table_name] = {
+                    name: ColumnInfo(data_type, n_distinct) for name, data_type, n_distinct in cursor.fetchall()
+                }
+        return self._columns[table_name]
+
+    def get_indexes(self, table_name):
+        """Return the existing indexes of a table."""
+        if table_name not in self._indexes:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT indexdef FROM pg_indexes WHERE schemaname = %s AND tablename = %s",
+                    [self.schema_name, table_name],
+                )
+                indexes = (IndexCandidate.from_definition(table_name, row[0]) for row in cursor.fetchall())
+                self._indexes[table_name] = [index for index in indexes if index]
+        return self._indexes[table_name]
+
+
+def write_migration(candidates, name="report_query_indexes", app_label="reporting"):
+    """Write a migration that creates the candidate indexes and return its path."""
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    leaf_nodes = loader.graph.leaf_nodes(app_label)
+    number = max((MigrationAutodetector.parse_number(leaf) or 0 for _, leaf in leaf_nodes), default=0) + 1
+    migration = migrations.Migration(f"{number:04d}_{name}", app_label)
+    migration.dependencies = leaf_nodes
+    migration.operations = [
+        migrations.RunSQL(candidate.create_sql, reverse_sql=candidate.drop_sql) for candidate in candidates
+    ]
+    writer = MigrationWriter(migration)
+    with open(writer.path, "w") as migration_file:
+        migration_file.write(writer.as_string())
+    return writer.path
@@ -40,6 +40,7 @@ class OCPReportQueryHandler(ReportQueryHandler):
     """Handles report queries and responses for OCP."""
 
     provider = Provider.PROVIDER_OCP
+    sql_pagination = True
 
     def __init__(self, parameters):
         """Establish OCP report query handler.
@@ -119,7 +120,7 @@ class OCPReportQueryHandler(ReportQueryHandler):
 
         with tenant_context(self.tenant):
             query = self.query_table.objects.filter(self.query_filter)
-            query_data = query.annotate(**self.annotations)
+            query_data = self.paginate_query(query.annotate(**self.annotations))
             group_by_value = self._get_group_by()
 
             query_group_by = ["date"] + group_by_value
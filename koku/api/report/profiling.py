@@ -0,0 +1,230 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Opt-in profiling of report API requests."""
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+from django.utils.cache import patch_cache_control
+from prometheus_client import Histogram
+
+PROFILE_HEADER = "HTTP_X_KOKU_PROFILE"
+PROFILE_LABELS = ["report_type", "group_by"]
+MB = 1024 * 1024
+
+REPORT_PHASE_DURATION = Histogram(
+    "report_request_phase_seconds",
+    "Duration of a phase of a profiled report request",
+    PROFILE_LABELS + ["phase"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float("inf")),
+)
+REPORT_SQL_QUERIES = Histogram(
+    "report_request_sql_queries",
+    "Number of SQL queries run by a profiled report request",
+    PROFILE_LABELS,
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250, float("inf")),
+)
+REPORT_SQL_DURATION = Histogram(
+    "report_request_sql_seconds",
+    "Time spent executing SQL for a profiled report request",
+    PROFILE_LABELS,
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float("inf")),
+)
+REPORT_ROWS_FETCHED = Histogram(
+    "report_request_rows_fetched",
+    "Number of database rows returned to a profiled report request",
+    PROFILE_LABELS,
+    buckets=(10, 100, 1000, 10000, 100000, 1000000, float("inf")),
+)
+REPORT_ALLOCATION_PEAK = Histogram(
+    "report_request_allocation_peak_bytes",
+    "Peak Python memory allocated while serving a profiled report request",
+    PROFILE_LABELS,
+    buckets=(MB, 4 * MB, 16 * MB, 64 * MB, 256 * MB, 1024 * MB, float("inf")),
+)
+
+
+class _TracemallocUsers:
+    """
+    Share tracemalloc, which traces the whole process, between the profiled requests of a process.
+
+    Tracing starts with the first profiled request and stops when the last one
+    ends. The peak only belongs to a request if it started tracing and no other
+    profiled request overlapped it, otherwise it is not reported.
+    """
+
+    def __init__(self):
+        """Initialize the count of profiled requests."""
+        self.lock = threading.Lock()
+        self.users = 0
+        self.started = False
+        self.overlapped = False
+
+    def acquire(self):
+        """Start tracing unless another profiled request already did."""
+        with self.lock:
+            if self.users == 0:
+                self.started = not tracemalloc.is_tracing()
+                if self.started:
+                    tracemalloc.start()
+                self.overlapped = False
+            else:
+                self.overlapped = True
+            self.users += 1
+
+    def release(self):
+        """Stop tracing after the last profiled request and return its peak, if it is its own."""
+        with self.lock:
+            self.users -= 1
+            if self.users > 0 or not self.started:
+                return None
+            peak = None if self.overlapped else tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.started = False
+            return peak
+
+
+TRACEMALLOC_USERS = _TracemallocUsers()
+
+
+def get_group_by_shape(parameters):
+    """Return a label naming the group_by keys used by a report request."""
+    group_by = parameters.get("group_by") or {}
+    return ",".join(sorted(group_by)) or "none"
+
+
+def profiled(phase):
+    """Time a query handler method as a profiling phase of the request."""
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.profiler.phase(phase):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class ReportProfiler:
+    """
+    Collect per-phase timings for a single report request.
+
+    A disabled profiler does no work, so report code can time its phases
+    unconditionally. An enabled profiler also counts the SQL queries run on
+    the default connection, the rows they return and the peak Python memory
+    allocated, then exports everything as Prometheus histograms.
+    """
+
+    def __init__(self, report_type=None, enabled=False):
+        """Initialize the profiler."""
+        self.report_type = report_type
+        self.group_by = "none"
+        self.enabled = enabled
+        self.phases = {}
+        self.sql_count = 0
+        self.sql_duration = 0.0
+        self.rows_fetched = 0
+        self.allocation_peak = None
+        self._active_phases = set()
+
+    @classmethod
+    def for_request(cls, request, report_type):
+        """Return a profiler that is enabled if this request is sampled or asks to be profiled."""
+        enabled = (settings.REPORT_PROFILING_HEADER_ENABLED and PROFILE_HEADER in request.META) or (
+            random.random() < settings.REPORT_PROFILING_SAMPLE_RATE
+        )
+        return cls(report_type, enabled)
+
+    def __enter__(self):
+        """Start collecting SQL and allocation statistics."""
+        if self.enabled:
+            connection.execute_wrappers.append(self._record_sql)
+            TRACEMALLOC_USERS.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stop collecting and export the statistics of a successful request."""
+        if not self.enabled:
+            return False
+        connection.execute_wrappers.remove(self._record_sql)
+        self.allocation_peak = TRACEMALLOC_USERS.release()
+        if exc_type is None:
+            self._observe()
+        return False
+
+    @contextmanager
+    def phase(self, name):
+        """Time a phase of the request. Nested calls for the same phase are counted once."""
+        if not self.enabled or name in self._active_phases:
+            yield
+            return
+        self._active_phases.add(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+            self._active_phases.discard(name)
+
+    def _record_sql(self, execute, sql, params, many, context):
+        """Count and time a SQL query."""
+        start = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        finally:
+            self.sql_duration += time.perf_counter() - start
+            self.sql_count += 1
+        rowcount = context["cursor"].rowcount
+        if rowcount and rowcount > 0:
+            self.rows_fetched += rowcount
+        return result
+
+    def _observe(self):
+        """Export the collected statistics."""
+        labels = {"report_type": self.report_type, "group_by": self.group_by}
+        for name, duration in self.phases.items():
+            REPORT_PHASE_DURATION.labels(phase=name, **labels).observe(duration)
+        REPORT_SQL_QUERIES.labels(**labels).observe(self.sql_count)
+        REPORT_SQL_DURATION.labels(**labels).observe(self.sql_duration)
+        REPORT_ROWS_FETCHED.labels(**labels).observe(self.rows_fetched)
+        if self.allocation_peak is not None:
+            REPORT_ALLOCATION_PEAK.labels(**labels).observe(self.allocation_peak)
+
+    def server_timing(self):
+        """Return the collected statistics as a Server-Timing header value."""
+        entries = [f"{name};dur={duration * 1000:.1f}" for name, duration in self.phases.items()]
+        entries.append(
+            f'sql;dur={self.sql_duration * 1000:.1f};desc="{self.sql_count} queries, {self.rows_fetched} rows"'
+        )
+        if self.allocation_peak is not None:
+            entries.append(f'alloc;desc="{self.allocation_peak} bytes peak"')
+        return ", ".join(entries)
+
+    def add_server_timing(self, response):
+        """Add the Server-Timing header to the response of a profiled request."""
+        if self.enabled:
+            response["Server-Timing"] = self.server_timing()
+            # Keep the view cache from serving these timings to other requests
+            patch_cache_control(response, private=True)
+        return response
@@ -35,6 +35,9 @@ from api.models import Provider
 from api.query_filter import QueryFilter
 from api.query_filter import QueryFilterCollection
 from api.query_handler import QueryHandler
+from api.report.profiling import profiled
+from api.report.profiling import ReportProfiler
+from koku.cache import get_report_deltas
 
 LOG = logging.getLogger(__name__)
 
@@ -63,6 +66,12 @@ def check_view_filter_and_group_by_criteria(filter_set, group_by_set):
 class ReportQueryHandler(QueryHandler):
     """Handles report queries and responses."""
 
+    # Handlers that can apply page limits to their query via paginate_query and execute_query_page
+    # when REPORT_QUERY_PAGINATION is enabled
+    sql_pagination = False
+    # Replaced by the view when the request is profiled
+    profiler = ReportProfiler()
+
     def __init__(self, parameters):
         """Establish report query handler.
 
@@ -78,9 +87,49 @@ class ReportQueryHandler(QueryHandler):
         self._delta = parameters.delta
         self._offset = parameters.get_filter("offset", default=0)
         self.query_delta = {"value": None, "percent": None}
+        self.query_count = None
+        self._page = None
 
         self.query_filter = self._get_filter()
 
+    def execute_query_page(self, limit, offset):
+        """Execute the query for one page of the date buckets of the report.
+
+        The report data holds one entry for each date in the time interval, so
+        querying only the dates in the page gives the same response as paginating
+        the whole report after the query runs.
+
+        Args:
+            limit (int): The number of dates in the page
+            offset (int): The number of dates before the page
+
+        Returns:
+            (Dict): Dictionary response of query params, data, and total. query_count
+                is the number of dates in the time interval.
+
+        """
+        time_interval = self.time_interval
+        self.query_count = len(time_interval)
+        self.time_interval = time_interval[offset : offset + limit]  # noqa: E203
+        self._page = (limit, offset)
+        try:
+            return self.execute_query()
+        finally:
+            self._page = None
+            self.time_interval = time_interval
+
+    def paginate_query(self, query):
+        """Restrict a query to the dates in the current page."""
+        if self._page is None:
+            return query
+        if not self.time_interval:
+            return query.none()
+        start_date = self.time_interval[0]
+        end_date = self.time_interval[-1]
+        if self.resolution == "monthly":
+            end_date = self.dh.month_end(end_date)
+        return query.filter(usage_start__gte=start_date.date(), usage_start__lte=end_date.date())
+
     @property
     def query_table_access_keys(self):
         """Return the access keys specific for selecting the query table."""
@@ -467,6 +516,7 @@ class ReportQueryHandler(QueryHandler):
 
         return data
 
+    @profiled("post_processing")
     def _apply_group_by(self, query_data, group_by=None):
         """Group data by date for given time interval then group by list.
 
@@ -566,6 +616,7 @@ class ReportQueryHandler(QueryHandler):
         data.update(new_data)
         return data
 
+    @profiled("post_processing")
     def _transform_data(self, groups, group_index, data):
         """Transform dictionary data points to lists."""
         tag_prefix = self._mapper.tag_column + "__"
@@ -797,8 +848,51 @@ class ReportQueryHandler(QueryHandler):
 
         return previous_dict
 
-    def _get_previous_totals_filter(self, filter_dates):
-        """Filter previous time range to exlude days from the current range.
+    def _create_previous_total_sum(self, previous_query, dates=None):
+        """Get the delta total of the time period previous to the current report.
+
+        Args:
+            previous_query (Query): A Django ORM query
+            dates (list): YYYY-MM-DD date strings to limit the total to
+        Returns:
+            (Decimal) The total
+
+        """
+        delta_field = self._mapper._report_type_map.get("delta_key").get(self._delta)
+        if dates:
+            previous_query = previous_query.filter(usage_start__in=dates)
+        return previous_query.aggregate(value=delta_field).get("value") or 0
+
+    def _get_previous_totals(self, cache_args, get_totals):
+        """Return totals of the previous time period.
+
+        Previous periods are usually closed months, so the totals are cached
+        until masu rebuilds the summaries for that period.
+
+        Args:
+            cache_args (tuple): What the totals depend on besides the report and its filters
+            get_totals (callable): Computes the totals from the previous period's query
+        """
+        date_delta = self._get_date_delta()
+        delta_filter = self._get_filter(delta=True)
+        cache_args = (
+            self.query_table._meta.db_table,
+            self.parameters.report_type,
+            self._delta,
+            self.resolution,
+            str(delta_filter),
+        ) + cache_args
+        return get_report_deltas(
+            self.tenant.schema_name,
+            self.provider,
+            self.start_datetime - date_delta,
+            self.end_datetime - date_delta,
+            cache_args,
+            lambda: get_totals(self.query_table.objects.filter(delta_filter)),
+        )
+
+    def _get_previous_totals_dates(self, filter_dates):
+        """Return the days of the previous time range that match days in the current range.
 
         Specifically this covers days in the current range that have not yet
         happened, but that data exists for in the previous range.
@@ -807,23 +901,11 @@ class ReportQueryHandler(QueryHandler):
             filter_dates (list) A list of date strings of dates to filter
 
         Returns:
-            (django.db.models.query_utils.Q) The OR date filter
+            (list) The matching YYYY-MM-DD date strings in the previous range
 
         """
         date_delta = self._get_date_delta()
-        prev_total_filters = None
-
-        for i in range(len(filter_dates)):
-            date = self.string_to_date(filter_dates[i])
-            date = date - date_delta
-            filter_dates[i] = self.date_to_string(date)
-
-        for date in filter_dates:
-            if prev_total_filters:
-                prev_total_filters = prev_total_filters | Q(usage_start=date)
-            else:
-                prev_total_filters = Q(usage_start=date)
-        return prev_total_filters
+        return [self.date_to_string(self.string_to_date(date) - date_delta) for date in filter_dates]
 
     def add_deltas(self, query_data, query_sum):
         """Calculate and add cost deltas to a result set.
@@ -837,9 +919,10 @@ class ReportQueryHandler(QueryHandler):
 
         """
         delta_group_by = ["date"] + self._get_group_by()
-        delta_filter = self._get_filter(delta=True)
-        previous_query = self.query_table.objects.filter(delta_filter)
-        previous_dict = self._create_previous_totals(previous_query, delta_group_by)
+        previous_dict = self._get_previous_totals(
+            ("grouped", tuple(delta_group_by)),
+            lambda previous_query: self._create_previous_totals(previous_query, delta_group_by),
+        )
         for row in query_data:
             key = tuple(row[key] for key in delta_group_by)
             previous_total = previous_dict.get(key) or 0
@@ -857,15 +940,16 @@ class ReportQueryHandler(QueryHandler):
                 current_total_sum = Decimal(query_sum.get("cost", {}).get("total").get("value") or 0)
             else:
                 current_total_sum = Decimal(query_sum.get("cost") or 0)
-        delta_field = self._mapper._report_type_map.get("delta_key").get(self._delta)
-        prev_total_sum = previous_query.aggregate(value=delta_field)
+        dates = []
         if self.resolution == "daily":
-            dates = [entry.get("date") for entry in query_data]
-            prev_total_filters = self._get_previous_totals_filter(dates)
-            if prev_total_filters:
-                prev_total_sum = previous_query.filter(prev_total_filters).aggregate(value=delta_field)
+            dates = sorted(set(self._get_previous_totals_dates([entry.get("date") for entry in query_data])))
+        # The total is cached on its own, the delta aggregates are not all sums of the grouped totals
+        prev_total_sum = self._get_previous_totals(
+            ("total", tuple(dates)),
+            lambda previous_query: self._create_previous_total_sum(previous_query, dates),
+        )
 
-        prev_total_sum = Decimal(prev_total_sum.get("value") or 0)
+        prev_total_sum = Decimal(prev_total_sum)
 
         total_delta = current_total_sum - prev_total_sum
         total_delta_percent = self._percent_delta(current_total_sum, prev_total_sum)
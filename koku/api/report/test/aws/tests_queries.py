@@ -25,6 +25,7 @@ from unittest.mock import patch
 from unittest.mock import PropertyMock
 
 from dateutil.relativedelta import relativedelta
+from django.core.cache import caches
 from django.db.models import Count
 from django.db.models import DecimalField
 from django.db.models import F
@@ -32,11 +33,13 @@ from django.db.models import Func
 from django.db.models import Sum
 from django.db.models import Value
 from django.db.models.functions import Coalesce
+from django.test.utils import override_settings
 from django.urls import reverse
 from rest_framework.exceptions import ValidationError
 from tenant_schemas.utils import tenant_context
 
 from api.iam.test.iam_test_case import IamTestCase
+from api.models import Provider
 from api.report.aws.query_handler import AWSReportQueryHandler
 from api.report.aws.view import AWSCostView
 from api.report.aws.view import AWSInstanceTypeView
@@ -46,6 +49,7 @@ from api.report.test.aws.test_views import _calculate_accounts_and_subous
 from api.tags.aws.queries import AWSTagQueryHandler
 from api.tags.aws.view import AWSTagView
 from api.utils import DateHelper
+from koku.cache import invalidate_report_deltas_cache
 from reporting.models import AWSComputeSummary
 from reporting.models import AWSComputeSummaryByAccount
 from reporting.models import AWSComputeSummaryByRegion
@@ -905,6 +909,60 @@ class AWSReportQueryTest(IamTestCase):
         self.assertAlmostEqual(delta.get("value"), expected_delta_value, 6)
         self.assertEqual(delta.get("percent"), expected_delta_percent)
 
+    @override_settings(REPORT_DELTAS_CACHE_ENABLED=True)
+    def test_execute_query_w_delta_cached(self):
+        """Test that previous-period totals are reused until the period is rebuilt."""
+        self.addCleanup(caches["default"].clear)
+        dh = DateHelper()
+        url = "?filter[time_scope_units]=month&filter[time_scope_value]=-1&filter[resolution]=monthly&group_by[account]=*&delta=cost"  # noqa: E501
+        path = reverse("reports-aws-costs")
+
+        def run_query():
+            handler = AWSReportQueryHandler(self.mocked_query_params(url, AWSCostView, path))
+            with patch.object(
+                AWSReportQueryHandler, "_create_previous_totals", wraps=handler._create_previous_totals
+            ) as mock_previous:
+                query_output = handler.execute_query()
+            return query_output, mock_previous.call_count
+
+        expected, calls = run_query()
+        self.assertEqual(calls, 1)
+
+        cached, calls = run_query()
+        self.assertEqual(calls, 0)
+        self.assertEqual(cached.get("delta"), expected.get("delta"))
+        self.assertEqual(cached.get("data"), expected.get("data"))
+
+        # Rebuilding the current month leaves the previous month cached
+        invalidate_report_deltas_cache(self.schema_name, Provider.PROVIDER_AWS, dh.this_month_start, dh.today)
+        _, calls = run_query()
+        self.assertEqual(calls, 0)
+
+        invalidate_report_deltas_cache(self.schema_name, Provider.PROVIDER_AWS, dh.last_month_start, dh.last_month_end)
+        _, calls = run_query()
+        self.assertEqual(calls, 1)
+
+    def test_execute_query_w_delta_cached_daily(self):
+        """Test that the cached daily delta total matches the total computed without the cache."""
+        url = "?filter[time_scope_units]=month&filter[time_scope_value]=-1&filter[resolution]=daily&group_by[account]=*&delta=cost"  # noqa: E501
+        path = reverse("reports-aws-costs")
+
+        def run_query():
+            handler = AWSReportQueryHandler(self.mocked_query_params(url, AWSCostView, path))
+            return handler.execute_query()
+
+        with override_settings(REPORT_DELTAS_CACHE_ENABLED=False):
+            expected = run_query()
+        total_sum = AWSReportQueryHandler._create_previous_total_sum
+        with patch.object(
+            AWSReportQueryHandler, "_create_previous_total_sum", autospec=True, side_effect=total_sum
+        ) as mock_total:
+            run_query()
+            cached = run_query()
+        self.assertEqual(mock_total.call_count, 1)
+        self.assertEqual(cached.get("delta"), expected.get("delta"))
+        self.assertEqual(cached.get("data"), expected.get("data"))
+
     def test_execute_query_orderby_delta(self):
         """Test execute_query with ordering by delta ascending."""
         url = "?filter[time_scope_units]=month&filter[time_scope_value]=-1&filter[resolution]=monthly&order_by[delta]=asc&group_by[account]=*&delta=cost"  # noqa: E501
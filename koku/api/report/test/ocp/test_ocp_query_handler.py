@@ -120,6 +120,45 @@ class OCPReportQueryHandlerTest(IamTestCase):
         self.assertIsNotNone(result_cost_total)
         self.assertEqual(result_cost_total, expected_cost_total)
 
+    def test_paginate_query(self):
+        """Test that a page of dates limits the rows the query returns to those dates."""
+        url = "?filter[time_scope_units]=day&filter[time_scope_value]=-10&filter[resolution]=daily&group_by[project]=*"
+        query_params = self.mocked_query_params(url, OCPCpuView)
+        handler = OCPReportQueryHandler(query_params)
+        page_dates = handler.time_interval[2:5]
+        with tenant_context(self.tenant):
+            query = handler.query_table.objects.filter(handler.query_filter)
+            full_rows = list(query.values("usage_start", "namespace"))
+            handler.time_interval = page_dates
+            handler._page = (3, 2)
+            page_rows = list(handler.paginate_query(query).values("usage_start", "namespace"))
+
+        expected_dates = {date.date() for date in page_dates}
+        expected = [row for row in full_rows if row["usage_start"] in expected_dates]
+        self.assertEqual(len(page_rows), len(expected))
+        self.assertTrue(all(row["usage_start"] in expected_dates for row in page_rows))
+        self.assertLess(len(page_rows), len(full_rows))
+
+    def test_execute_query_page(self):
+        """Test that a page of dates matches the same page of the whole report."""
+        url = "?filter[time_scope_units]=day&filter[time_scope_value]=-10&filter[resolution]=daily&group_by[project]=*"
+        query_params = self.mocked_query_params(url, OCPCpuView)
+        handler = OCPReportQueryHandler(query_params)
+        time_interval = handler.time_interval
+        expected = handler.execute_query()
+
+        handler = OCPReportQueryHandler(query_params)
+        output = handler.execute_query_page(3, 2)
+        self.assertEqual(output.get("data"), expected.get("data")[2:5])
+        self.assertEqual(output.get("total"), expected.get("total"))
+        self.assertEqual(handler.query_count, len(time_interval))
+        self.assertEqual(handler.time_interval, time_interval)
+        self.assertIsNone(handler._page)
+
+        handler = OCPReportQueryHandler(query_params)
+        output = handler.execute_query_page(3, 1000)
+        self.assertEqual(output.get("data"), [])
+
     def test_get_cluster_capacity_monthly_resolution(self):
         """Test that cluster capacity returns a full month's capacity."""
         url = "?filter[time_scope_units]=month&filter[time_scope_value]=-1&filter[resolution]=monthly"
@@ -516,9 +555,7 @@ class OCPReportQueryHandlerTest(IamTestCase):
             ("node", "cluster", "project"),
             ("node", "project", "cluster"),
         ]
-        base_url = (
-            "?filter[time_scope_units]=month&filter[time_scope_value]=-1&filter[resolution]=monthly&filter[limit]=3"
-        )  # noqa: E501
+        base_url = "?filter[time_scope_units]=month&filter[time_scope_value]=-1&filter[resolution]=monthly&filter[limit]=3"  # noqa: E501
         tolerance = 1
         for group_by in group_by_list:
             sub_url = "&group_by[%s]=*&group_by[%s]=*&group_by[%s]=*" % group_by
@@ -31,6 +31,7 @@ from django.db.models import Value
 from django.db.models.functions import Coalesce
 from django.http import HttpRequest
 from django.http import QueryDict
+from django.test.utils import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.request import Request
@@ -1506,6 +1507,72 @@ class OCPReportViewTest(IamTestCase):
             self.assertEqual(len(data), limit)
         self.assertEqual(data[0].get("date"), start_date)
 
+    @override_settings(REPORT_QUERY_PAGINATION=True)
+    def test_execute_query_sql_pagination(self):
+        """Test that a report paginated in the query matches the report paginated after it."""
+        url = reverse("reports-openshift-cpu")
+        client = APIClient()
+        params = {
+            "filter[resolution]": "daily",
+            "filter[time_scope_value]": "-10",
+            "filter[time_scope_units]": "day",
+            "group_by[project]": "*",
+            "limit": 3,
+            "offset": 2,
+        }
+        url = url + "?" + urlencode(params, quote_via=quote_plus)
+        response = client.get(url, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with override_settings(REPORT_QUERY_PAGINATION=False):
+            expected = client.get(url, **self.headers)
+        self.assertEqual(expected.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(len(response.json().get("data")), 3)
+
+    @override_settings(REPORT_QUERY_PAGINATION=True)
+    def test_execute_query_sql_pagination_past_last_page(self):
+        """Test that an offset past the last date returns no data and the full count."""
+        url = reverse("reports-openshift-cpu")
+        client = APIClient()
+        params = {
+            "filter[resolution]": "daily",
+            "filter[time_scope_value]": "-10",
+            "filter[time_scope_units]": "day",
+            "group_by[project]": "*",
+            "limit": 5,
+            "offset": 1000,
+        }
+        url = url + "?" + urlencode(params, quote_via=quote_plus)
+        response = client.get(url, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with override_settings(REPORT_QUERY_PAGINATION=False):
+            expected = client.get(url, **self.headers)
+        response_data = response.json()
+        self.assertEqual(response_data.get("data"), [])
+        self.assertEqual(response_data, expected.json())
+
+    def test_execute_query_monthly_group_by_not_limited(self):
+        """Test that the default limit pages over dates, so a monthly report keeps every project."""
+        url = reverse("reports-openshift-cpu")
+        client = APIClient()
+        params = {
+            "filter[resolution]": "monthly",
+            "filter[time_scope_value]": "-1",
+            "filter[time_scope_units]": "month",
+            "group_by[project]": "*",
+        }
+        url = url + "?" + urlencode(params, quote_via=quote_plus)
+        with patch("api.common.pagination.ReportPagination.default_limit", 1):
+            response = client.get(url, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_data = response.json()
+        projects = response_data.get("data")[0].get("projects", [])
+        self.assertEqual(response_data.get("meta", {}).get("count"), 1)
+        self.assertGreater(len(projects), 1)
+
     def test_execute_query_filter_limit_offset_pagination(self):
         """Test that the ranked group pagination works."""
         limit = 1
@@ -0,0 +1,192 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Test the report query index advisor."""
+import os
+import tempfile
+from unittest.mock import patch
+from unittest.mock import PropertyMock
+
+from api.iam.test.iam_test_case import IamTestCase
+from api.report.index_advisor import ColumnInfo
+from api.report.index_advisor import explain_statement
+from api.report.index_advisor import IndexAdvisor
+from api.report.index_advisor import IndexCandidate
+from api.report.index_advisor import parse_predicates
+from api.report.index_advisor import replay_query_shape
+from api.report.index_advisor import write_migration
+
+TABLE_NAME = "reporting_ocpusagelineitem_daily_summary"
+COLUMNS = {
+    "cluster_id": ColumnInfo("character varying(50)", 3),
+    "data_source": ColumnInfo("character varying(64)", 2),
+    "namespace": ColumnInfo("character varying(253)", -0.2),
+    "node": ColumnInfo("character varying(253)", 40),
+    "pod_labels": ColumnInfo("jsonb", -0.5),
+    "pod_usage_cpu_core_hours": ColumnInfo("numeric(18,6)", -1),
+    "usage_start": ColumnInfo("date", 30),
+}
+
+
+def scan_plan(condition, rows_removed=50000, output=None):
+    """Return an EXPLAIN plan with a sequential scan of a daily summary partition."""
+    return {
+        "Plan": {
+            "Node Type": "Aggregate",
+            "Plans": [
+                {
+                    "Node Type": "Seq Scan",
+                    "Relation Name": f"{TABLE_NAME}_2021_03",
+                    "Alias": "summary",
+                    "Filter": condition,
+                    "Rows Removed by Filter": rows_removed,
+                    "Actual Loops": 1,
+                    "Actual Total Time": 250.0,
+                    "Shared Hit Blocks": 100,
+                    "Shared Read Blocks": 2000,
+                    "Output": output or [],
+                }
+            ],
+        }
+    }
+
+
+class IndexAdvisorTest(IamTestCase):
+    """Test cases for the index advisor."""
+
+    def setUp(self):
+        """Set up an advisor that sees a fixed daily summary table."""
+        super().setUp()
+        self.advisor = IndexAdvisor(self.schema_name)
+        self.advisor._parents = {f"{TABLE_NAME}_2021_03": TABLE_NAME}
+        self.advisor._columns = {TABLE_NAME: COLUMNS}
+        self.advisor._indexes = {TABLE_NAME: []}
+
+    def test_parse_predicates(self):
+        """Test that plan conditions are split into classified predicates."""
+        condition = (
+            "(((summary.data_source)::text = 'Pod'::text) AND (summary.usage_start >= '2021-03-01'::date) "
+            "AND ((summary.namespace)::text = ANY ('{a,b}'::text[])) AND (summary.pod_labels ? 'app'::text) "
+            "AND (upper(((summary.pod_labels -> 'app'::text))::text) ~~ '%WEB%'::text))"
+        )
+        predicates = parse_predicates(condition, "summary")
+        self.assertEqual(
+            [(predicate.kind, predicate.column, predicate.constant) for predicate in predicates],
+            [
+                ("eq", "data_source", True),
+                ("range", "usage_start", False),
+                ("in", "namespace", False),
+                ("exists", "pod_labels", False),
+                ("other", "pod_labels", False),
+            ],
+        )
+        self.assertEqual(predicates[0].text, "(data_source)::text = 'Pod'::text")
+
+    def test_btree_candidate(self):
+        """Test that filtered scans propose a partial covering btree index."""
+        output = ["summary.node", "summary.pod_usage_cpu_core_hours"]
+        for cluster_id in ("cluster-1", "cluster-2"):
+            condition = (
+                "(((summary.data_source)::text = 'Pod'::text) AND (summary.usage_start >= '2021-03-01'::date) "
+                "AND ((summary.namespace)::text = 'web'::text) "
+                f"AND ((summary.cluster_id)::text = '{cluster_id}'::text))"
+            )
+            self.advisor.analyze_plan(scan_plan(condition, output=output), cluster_id)
+
+        candidates = self.advisor.get_candidates_by_benefit()
+        self.assertEqual(len(candidates), 1)
+        candidate = candidates[0]
+        self.assertEqual(candidate.table_name, TABLE_NAME)
+        self.assertEqual(candidate.columns, ["namespace", "cluster_id", "usage_start"])
+        self.assertEqual(candidate.include, ["node", "pod_usage_cpu_core_hours"])
+        self.assertEqual(candidate.predicate, "((data_source)::text = 'Pod'::text)")
+        self.assertEqual(candidate.duration, 500.0)
+        self.assertEqual(candidate.blocks, 4200)
+        self.assertEqual(candidate.shapes, {"cluster-1", "cluster-2"})
+
+    def test_gin_candidates(self):
+        """Test that tag containment and key filters propose GIN indexes."""
+        self.advisor.analyze_plan(scan_plan("""(summary.pod_labels @> '{"app": "web"}'::jsonb)"""), "contains")
+        self.advisor.analyze_plan(scan_plan("(summary.pod_labels ? 'app'::text)"), "exists")
+
+        candidates = {candidate.opclass: candidate for candidate in self.advisor.get_candidates_by_benefit()}
+        self.assertEqual(set(candidates), {"jsonb_path_ops", None})
+        self.assertIn("USING gin (pod_labels jsonb_path_ops)", candidates["jsonb_path_ops"].create_sql)
+        self.assertIn("USING gin (pod_labels)", candidates[None].create_sql)
+
+    def test_existing_index_serves_candidate(self):
+        """Test that no index is proposed when an existing index serves the scan."""
+        self.advisor._indexes[TABLE_NAME] = [
+            IndexCandidate.from_definition(
+                TABLE_NAME, f"CREATE INDEX pod_labels_idx ON ONLY acct10001.{TABLE_NAME} USING gin (pod_labels)"
+            ),
+            IndexCandidate.from_definition(
+                TABLE_NAME,
+                f"CREATE INDEX summary_idx ON ONLY acct10001.{TABLE_NAME} USING btree (node, usage_start)",
+            ),
+        ]
+        condition = (
+            """((summary.pod_labels @> '{"app": "web"}'::jsonb) AND ((summary.node)::text = 'node-1'::text) """
+            "AND (summary.usage_start >= '2021-03-01'::date))"
+        )
+        self.advisor.analyze_plan(scan_plan(condition), "shape")
+        self.assertEqual(self.advisor.get_candidates_by_benefit(), [])
+
+    def test_small_scans_are_ignored(self):
+        """Test that scans that discard few rows propose nothing."""
+        self.advisor.analyze_plan(scan_plan("((summary.node)::text = 'node-1'::text)", rows_removed=10), "shape")
+        self.assertEqual(self.advisor.get_candidates_by_benefit(), [])
+
+    def test_index_definition(self):
+        """Test that an index definition is parsed and compared with candidates."""
+        index = IndexCandidate.from_definition(
+            TABLE_NAME,
+            f"CREATE INDEX summary_idx ON {TABLE_NAME} USING btree (cluster_id, usage_start) INCLUDE (node) "
+            "WHERE ((data_source)::text = 'Pod'::text)",
+        )
+        self.assertEqual(index.method, "btree")
+        self.assertEqual(index.columns, ["cluster_id", "usage_start"])
+        self.assertEqual(index.include, ["node"])
+        self.assertTrue(index.serves(IndexCandidate(TABLE_NAME, "btree", ["cluster_id"], [], index.predicate)))
+        self.assertFalse(index.serves(IndexCandidate(TABLE_NAME, "btree", ["cluster_id"])))
+        self.assertFalse(index.serves(IndexCandidate(TABLE_NAME, "btree", ["usage_start"], [], index.predicate)))
+        self.assertLessEqual(len(index.name), 63)
+
+    def test_replay_query_shape(self):
+        """Test that a query shape runs its report query and captures the SQL."""
+        result = replay_query_shape("reports/openshift/costs/?group_by[cluster]=*", self.schema_name)
+        self.assertIsNone(result.error)
+        self.assertTrue(result.statements)
+        plan = explain_statement(result.statements[-1], self.schema_name)
+        self.assertIn("Plan", plan)
+
+    def test_replay_invalid_query_shape(self):
+        """Test that a query shape that fails validation is reported, not raised."""
+        result = replay_query_shape("reports/openshift/costs/?group_by[invalid]=*", self.schema_name)
+        self.assertIsNotNone(result.error)
+
+    def test_write_migration(self):
+        """Test that the proposed indexes are written as a reporting migration."""
+        candidate = IndexCandidate(TABLE_NAME, "gin", ["pod_labels"], opclass="jsonb_path_ops")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "migration.py")
+            with patch("api.report.index_advisor.MigrationWriter.path", new_callable=PropertyMock, return_value=path):
+                self.assertEqual(write_migration([candidate]), path)
+            with open(path) as migration_file:
+                migration = migration_file.read()
+        self.assertIn(candidate.create_sql, migration)
+        self.assertIn(candidate.drop_sql, migration)
+        self.assertIn("('reporting', ", migration)
@@ -209,6 +209,7 @@ class ReportQueryHandlerTest(IamTestCase):
 
     def setUp(self):
         """Test setup."""
+        super().setUp()
         self.mock_tag_key = FAKE.word()
         self.mock_view = Mock(
             spec=ReportView,
@@ -245,6 +246,16 @@ class ReportQueryHandlerTest(IamTestCase):
         self.assertEqual(rqh.start_datetime, expected_start)
         self.assertEqual(rqh.end_datetime, expected_end)
 
+    def test_get_filter_bounds_usage_start(self):
+        """Test that the time filters bound the usage_start partition key on both ends."""
+        dh = DateHelper()
+        params = self.mocked_query_params(f"?start_date={dh.this_month_start}&end_date={dh.today}", self.mock_view)
+        rqh = create_test_handler(params)
+        filters = rqh._get_filter()
+        self.assertIn(QueryFilter(field="usage_start", operation="gte", parameter=dh.this_month_start.date()), filters)
+        self.assertIn(QueryFilter(field="usage_start", operation="lte", parameter=dh.today.date()), filters)
+        self.assertIn(QueryFilter(field="usage_end", operation="lte", parameter=dh.today.date()), filters)
+
     def test_set_operator_specified_filters_and(self):
         """Test that AND/OR terms are correctly applied to param filters."""
         operator = "and"
@@ -15,7 +15,14 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 """Test the Report views."""
+import copy
+import tracemalloc
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache
 from django.test import RequestFactory
+from django.test.utils import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -25,9 +32,49 @@ from api.common.pagination import ReportPagination
 from api.common.pagination import ReportRankedPagination
 from api.iam.test.iam_test_case import IamTestCase
 from api.iam.test.iam_test_case import RbacPermissions
+from api.report.profiling import REPORT_SQL_QUERIES
+from api.report.profiling import ReportProfiler
+from api.report.view import _convert_report_units
+from api.report.view import _convert_units
 from api.report.view import _fill_in_missing_units
 from api.report.view import _find_unit
 from api.report.view import get_paginator
+from api.utils import UnitConverter
+
+
+def _build_storage_report(num_dates, num_projects):
+    """Build a storage report grouped by project, with some units left blank."""
+    data = []
+    for day in range(num_dates):
+        date = f"2021-01-{day + 1:02d}"
+        projects = []
+        for project in range(num_projects):
+            name = f"project-{project}"
+            value = {
+                "date": date,
+                "project": name,
+                "units": "" if project % 10 == 0 else "GB-Mo",
+                "total": Decimal(project) + Decimal("0.25"),
+                "usage": {"value": Decimal(project), "units": "GB-Mo"},
+                "request": {"total": {"value": float(project) / 3, "units": "GB-Mo" if project % 7 else None}},
+            }
+            projects.append({"project": name, "values": [value]})
+        data.append({"date": date, "projects": projects})
+    return {
+        "units": "GiB",
+        "group_by": {"project": ["*"]},
+        "data": data,
+        "total": {"value": Decimal("12.5"), "units": "GB-Mo"},
+    }
+
+
+def _legacy_convert_report_units(report, to_unit):
+    """Convert report units the way ReportView did before _convert_report_units."""
+    from_unit = _find_unit()(report["data"])
+    if from_unit:
+        report = _fill_in_missing_units(from_unit)(report)
+        report = _convert_units(UnitConverter(), report, to_unit)
+    return report
 
 
 class ReportViewTest(IamTestCase):
@@ -107,6 +154,108 @@ class ReportViewTest(IamTestCase):
                 self.assertEqual(response.accepted_media_type, "text/csv")
                 self.assertIsInstance(response.accepted_renderer, CSVRenderer)
 
+    @override_settings(REPORT_PROFILING_HEADER_ENABLED=True)
+    def test_endpoint_profile_header(self):
+        """Test that a request with the profile header returns its phase timings."""
+        cache.clear()
+        labels = {"report_type": "OCP:cpu", "group_by": "project"}
+        before = REPORT_SQL_QUERIES.collect()[0]
+        count_before = sum(
+            sample.value for sample in before.samples if sample.name.endswith("_count") and sample.labels == labels
+        )
+
+        url = reverse("reports-openshift-cpu") + "?group_by[project]=*"
+        response = self.client.get(url, HTTP_X_KOKU_PROFILE="1", **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        server_timing = response.get("Server-Timing")
+        self.assertIsNotNone(server_timing)
+        for phase in ("parameters;dur=", "query;dur=", "post_processing;dur=", "pagination;dur=", "sql;dur="):
+            self.assertIn(phase, server_timing)
+
+        after = REPORT_SQL_QUERIES.collect()[0]
+        count_after = sum(
+            sample.value for sample in after.samples if sample.name.endswith("_count") and sample.labels == labels
+        )
+        self.assertEqual(count_after, count_before + 1)
+
+    def test_endpoint_profile_header_disabled(self):
+        """Test that the profile header is ignored unless it is enabled."""
+        cache.clear()
+        url = reverse("reports-openshift-cpu")
+        response = self.client.get(url, HTTP_X_KOKU_PROFILE="1", **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.get("Server-Timing"))
+
+    @override_settings(REPORT_PROFILING_SAMPLE_RATE=1.0)
+    def test_endpoint_profile_sampled(self):
+        """Test that sampled requests are profiled without the header."""
+        cache.clear()
+        url = reverse("reports-openshift-memory")
+        response = self.client.get(url, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("sql;dur=", response.get("Server-Timing"))
+        self.assertIn("private", response.get("Cache-Control"))
+
+    def test_profiler_nested_phase(self):
+        """Test that a nested phase with the same name is only timed once."""
+        profiler = ReportProfiler("OCP:cpu", enabled=True)
+        with profiler.phase("post_processing"):
+            with profiler.phase("post_processing"):
+                pass
+        self.assertEqual(list(profiler.phases), ["post_processing"])
+
+        disabled = ReportProfiler("OCP:cpu")
+        with disabled.phase("query"):
+            pass
+        self.assertEqual(disabled.phases, {})
+
+    def test_profiler_overlapping_requests(self):
+        """Test that tracemalloc keeps tracing until the last of overlapping profiled requests ends."""
+        self.assertFalse(tracemalloc.is_tracing())
+        first = ReportProfiler("OCP:cpu", enabled=True)
+        second = ReportProfiler("OCP:cpu", enabled=True)
+        with first:
+            with second:
+                self.assertTrue(tracemalloc.is_tracing())
+            self.assertTrue(tracemalloc.is_tracing())
+        self.assertFalse(tracemalloc.is_tracing())
+        # The peak of overlapping requests is shared, so neither reports it
+        self.assertIsNone(first.allocation_peak)
+        self.assertIsNone(second.allocation_peak)
+
+        with ReportProfiler("OCP:cpu", enabled=True) as alone:
+            pass
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertIsNotNone(alone.allocation_peak)
+
+    def test_convert_report_units_matches_legacy(self):
+        """Test that the single pass conversion matches finding, filling and converting separately."""
+        report = _build_storage_report(3, 25)
+        expected = _legacy_convert_report_units(copy.deepcopy(report), "GiB")
+        result = _convert_report_units(UnitConverter(), report, "GiB")
+        self.assertEqual(result, expected)
+        self.assertEqual(result["data"][0]["projects"][0]["values"][0]["units"], "GiB-Mo")
+        self.assertIsInstance(result["data"][0]["projects"][1]["values"][0]["total"], Decimal)
+
+    def test_convert_report_units_no_units(self):
+        """Test that a report without units in its data is left unchanged."""
+        report = {"units": "GiB", "data": [{"date": "2021-01-01", "values": [{"total": 1, "units": ""}]}]}
+        expected = copy.deepcopy(report)
+        self.assertEqual(_convert_report_units(UnitConverter(), report, "GiB"), expected)
+
+    def test_convert_report_units_factor_cached(self):
+        """Test that each unit pair is converted by pint once for a large report."""
+        report = _build_storage_report(30, 700)
+        converter = UnitConverter()
+        expected = _legacy_convert_report_units(copy.deepcopy(report), "GiB")
+
+        with patch.object(converter, "convert_quantity", wraps=converter.convert_quantity) as mock_convert:
+            result = _convert_report_units(converter, report, "GiB")
+
+        self.assertEqual(result, expected)
+        # One float and one Decimal factor for GB to GiB
+        self.assertEqual(mock_convert.call_count, 2)
+
     def test_find_unit_list(self):
         """Test that the correct unit is returned."""
         expected_unit = "Hrs"
@@ -17,6 +17,7 @@
 """View for Reports."""
 import logging
 
+from django.conf import settings
 from django.utils.decorators import method_decorator
 from django.utils.translation import ugettext as _
 from django.views.decorators.vary import vary_on_headers
@@ -30,8 +31,11 @@ from rest_framework.views import APIView
 from api.common import CACHE_RH_IDENTITY_HEADER
 from api.common.pagination import OrgUnitPagination
 from api.common.pagination import ReportPagination
+from api.common.pagination import ReportQueryPagination
 from api.common.pagination import ReportRankedPagination
 from api.query_params import QueryParameters
+from api.report.profiling import get_group_by_shape
+from api.report.profiling import ReportProfiler
 from api.utils import UnitConverter
 
 LOG = logging.getLogger(__name__)
@@ -52,6 +56,31 @@ def get_paginator(filter_query_params, count, group_by_params=False):
     return paginator
 
 
+def get_query_paginator(params, handler, request):
+    """Return a paginator whose page can be applied in the handler's query, if the report supports it.
+
+    The page is only applied in the query with REPORT_QUERY_PAGINATION. Ranked
+    (filter[limit]/filter[offset]), delta and CSV reports are paginated after the query runs.
+    """
+    if not settings.REPORT_QUERY_PAGINATION or not getattr(handler, "sql_pagination", False):
+        return None
+    if params.delta:
+        # The total delta is computed over the dates in the report data
+        return None
+    filter_query_params = params.parameters.get("filter", {})
+    if "limit" in filter_query_params or "offset" in filter_query_params:
+        return None
+    if params.accept_type and "text/csv" in params.accept_type:
+        return None
+
+    paginator = ReportQueryPagination()
+    paginator.limit = paginator.get_limit(request)
+    if paginator.limit is None:
+        return None
+    paginator.offset = paginator.get_offset(request)
+    return paginator
+
+
 def _find_unit():
     """Find the original unit for a report dataset."""
     unit = None
@@ -134,6 +163,70 @@ def _convert_units(converter, data, to_unit):
     return data
 
 
+def _convert_total(converter, block, value_key, to_unit):
+    """Convert a single total and its units in place."""
+    from_unit = block.get("units", "")
+    suffix = None
+    if "-Mo" in from_unit:
+        from_unit, suffix = from_unit.split("-")
+    block[value_key] = converter.convert_magnitude(block.get(value_key), from_unit, to_unit)
+    block["units"] = to_unit + "-" + suffix if suffix else to_unit
+
+
+def _convert_report_units(converter, report, to_unit):  # noqa: C901
+    """Find, fill in and convert the units of a JSON structured report.
+
+    This gives the same result as _find_unit on the report data followed by
+    _fill_in_missing_units and _convert_units on the whole report, but walks
+    the report once and converts every total with a cached factor instead of
+    building a quantity for each one.
+
+    Args:
+        converter (api.utils.UnitConverter) Object doing unit conversion
+        report (dict): The report output, with its entries under "data"
+        to_unit (str): The unit type to convert to
+
+    Returns:
+        (dict) The unit converted report, unchanged if its data has no units
+
+    """
+    from_unit = None
+    missing_units = []
+    totals = []
+
+    def __collect(block, in_data):
+        nonlocal from_unit
+        if isinstance(block, list):
+            for entry in block:
+                __collect(entry, in_data)
+        elif isinstance(block, dict):
+            for key, value in block.items():
+                if key == "units":
+                    if not value:
+                        missing_units.append(block)
+                    elif in_data and from_unit is None:
+                        from_unit = value
+                else:
+                    if key == "total":
+                        totals.append(block)
+                    __collect(value, in_data or (block is report and key == "data"))
+
+    __collect(report, False)
+    if from_unit is None:
+        return report
+
+    for block in missing_units:
+        block["units"] = from_unit
+
+    for block in totals:
+        if isinstance(block["total"], dict):
+            _convert_total(converter, block["total"], "value", to_unit)
+        else:
+            _convert_total(converter, block, "total", to_unit)
+
+    return report
+
+
 class ReportView(APIView):
     """
     A shared view for all koku reports.
@@ -157,27 +250,45 @@ class ReportView(APIView):
         """
         LOG.debug(f"API: {request.path} USER: {request.user.username}")
 
-        try:
-            params = QueryParameters(request=request, caller=self, **kwargs)
-        except ValidationError as exc:
-            return Response(data=exc.detail, status=status.HTTP_400_BAD_REQUEST)
-        handler = self.query_handler(params)
-        output = handler.execute_query()
+        profiler = ReportProfiler.for_request(request, f"{self.provider}:{self.report}")
+        with profiler:
+            response = self._get_report(request, profiler, **kwargs)
+        return profiler.add_server_timing(response)
+
+    def _get_report(self, request, profiler, **kwargs):
+        """Build the report response, timing each phase with the request profiler."""
+        with profiler.phase("parameters"):
+            try:
+                params = QueryParameters(request=request, caller=self, **kwargs)
+            except ValidationError as exc:
+                return Response(data=exc.detail, status=status.HTTP_400_BAD_REQUEST)
+        profiler.group_by = get_group_by_shape(params.parameters)
+
+        with profiler.phase("query"):
+            handler = self.query_handler(params)
+            handler.profiler = profiler
+            query_paginator = get_query_paginator(params, handler, request)
+            if query_paginator:
+                output = handler.execute_query_page(query_paginator.limit, query_paginator.offset)
+            else:
+                output = handler.execute_query()
         max_rank = handler.max_rank
 
         if "units" in params.parameters:
-            from_unit = _find_unit()(output["data"])
-            if from_unit:
+            with profiler.phase("units"):
                 try:
                     to_unit = params.parameters.get("units")
-                    unit_converter = UnitConverter()
-                    output = _fill_in_missing_units(from_unit)(output)
-                    output = _convert_units(unit_converter, output, to_unit)
+                    output = _convert_report_units(UnitConverter(), output, to_unit)
                 except (DimensionalityError, UndefinedUnitError):
                     error = {"details": _("Unit conversion failed.")}
                     raise ValidationError(error)
 
-        paginator = get_paginator(params.parameters.get("filter", {}), max_rank, request.query_params)
-        paginated_result = paginator.paginate_queryset(output, request)
-        LOG.debug(f"DATA: {output}")
-        return paginator.get_paginated_response(paginated_result)
+        with profiler.phase("pagination"):
+            if query_paginator and handler.query_count is not None:
+                paginator = query_paginator
+                paginator.count = handler.query_count
+            else:
+                paginator = get_paginator(params.parameters.get("filter", {}), max_rank, request.query_params)
+            paginated_result = paginator.paginate_queryset(output, request)
+            LOG.debug(f"DATA: {output}")
+            return paginator.get_paginated_response(paginated_result)
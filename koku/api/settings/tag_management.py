@@ -37,6 +37,7 @@ from api.tags.gcp.queries import GCPTagQueryHandler
 from api.tags.gcp.view import GCPTagView
 from api.tags.ocp.queries import OCPTagQueryHandler
 from api.tags.ocp.view import OCPTagView
+from koku.cache import invalidate_finalized_view_cache
 from koku.cache import invalidate_view_cache_for_tenant_and_source_type
 from reporting.models import AWSEnabledTagKeys
 from reporting.models import AzureEnabledTagKeys
@@ -228,6 +229,7 @@ class TagManagementSettings:
                     updated[ix] = True
             if updated[ix]:
                 invalidate_view_cache_for_tenant_and_source_type(self.schema, provider)
+                invalidate_finalized_view_cache(self.schema, provider)
         return any(updated)
 
     def handle_settings(self, settings):
@@ -22,9 +22,11 @@ from unittest.mock import Mock
 from unittest.mock import patch
 from uuid import uuid4
 
+from django.core.cache import caches
 from django.core.exceptions import PermissionDenied
 from django.http import HttpRequest
 from django.test import TestCase
+from django.test.utils import override_settings
 from faker import Faker
 from querystring_parser import parser
 from rest_framework.serializers import ValidationError
@@ -92,6 +94,8 @@ class QueryParametersTests(TestCase):
         )
         self.provider = random.choice(PROVIDERS).lower()
         self.test_read_access = {random.choice(ACCESS_KEYS[self.provider]): {"read": ["*"]}}
+        # The tag key registry is cached, start each test with the tag keys of its own mocks
+        caches["default"].clear()
 
     def test_constructor(self):
         """Test that constructor creates a QueryParameters object.
@@ -650,6 +654,45 @@ class QueryParametersTests(TestCase):
         params = QueryParameters(fake_request, fake_view)
         self.assertEqual(params.tag_keys, expected)
 
+    def test_tag_key_registry_read_once(self):
+        """Test that a large tag key registry is read from the database once across requests."""
+        fake_uri = (
+            "filter[resolution]=monthly&"
+            "filter[time_scope_value]=-1&"
+            "filter[time_scope_units]=month&"
+            "filter[tag:key-17]=prod&"
+            "group_by[or:tag:key-42]=*"
+        )
+        tag_keys = [f"key-{i}" for i in range(20000)]
+        tag_rows = [{"key": key} for key in tag_keys]
+        fake_objects = Mock(values=Mock(return_value=tag_rows))
+        fake_request = Mock(
+            spec=HttpRequest,
+            user=Mock(access=Mock(get=lambda key, default: default), customer=Mock(schema_name="acct10001")),
+            GET=Mock(urlencode=Mock(return_value=fake_uri)),
+        )
+        fake_view = Mock(
+            spec=ReportView,
+            provider=self.FAKE.word(),
+            query_handler=Mock(provider=random.choice(PROVIDERS)),
+            report=self.FAKE.word(),
+            serializer=Mock,
+            tag_handler=[Mock(objects=fake_objects, _meta=Mock(db_table=f"tag_registry_{uuid4().hex}"))],
+        )
+        requests = 20
+
+        with override_settings(TAG_KEYS_CACHE_ENABLED=False):
+            for _ in range(requests):
+                params = QueryParameters(fake_request, fake_view)
+        self.assertEqual(params.tag_keys, {"tag:key-17", "or:tag:key-42"})
+        self.assertEqual(fake_objects.values.call_count, requests)
+
+        fake_objects.values.reset_mock()
+        for _ in range(requests):
+            params = QueryParameters(fake_request, fake_view)
+        self.assertEqual(params.tag_keys, {"tag:key-17", "or:tag:key-42"})
+        self.assertEqual(fake_objects.values.call_count, 1)
+
     def test_get_providers(self):
         """Test get providers returns the correct access keys."""
         fake_request = Mock(
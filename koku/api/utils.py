@@ -18,6 +18,7 @@
 import calendar
 import datetime
 import logging
+from decimal import Decimal
 
 import pint
 import pytz
@@ -285,6 +286,7 @@ class UnitConverter:
         """Initialize the UnitConverter."""
         self.unit_registry = pint.UnitRegistry()
         self.Quantity = self.unit_registry.Quantity
+        self._conversion_factors = {}
 
     def validate_unit(self, unit):
         """Validate that the unit type exists in the registry.
@@ -333,3 +335,41 @@ class UnitConverter:
         from_unit = self.validate_unit(from_unit)
         to_unit = self.validate_unit(to_unit)
         return self.Quantity(value, from_unit).to(to_unit)
+
+    def get_conversion_factor(self, from_unit, to_unit, decimal=False):
+        """Return the factor that converts a magnitude between comparable units.
+
+        The factor is computed once for each pair of units and reused.
+
+        Args:
+            from_unit (str): The starting unit to convert from
+            to_unit (str): The ending unit to convert to
+            decimal (bool): Return the factor pint applies to Decimal magnitudes
+
+        Returns:
+            (float or Decimal): The multiplier from from_unit to to_unit
+
+        """
+        key = (from_unit, to_unit, decimal)
+        factor = self._conversion_factors.get(key)
+        if factor is None:
+            factor = self.convert_quantity(Decimal(1) if decimal else 1.0, from_unit, to_unit).magnitude
+            self._conversion_factors[key] = factor
+        return factor
+
+    def convert_magnitude(self, value, from_unit, to_unit):
+        """Convert a magnitude between comparable units without building a quantity.
+
+        This gives the same magnitude as convert_quantity for multiplicative
+        units, such as the byte and hour based units used in reports.
+
+        Args:
+            value (Any numeric type): The magnitude of the quantity
+            from_unit (str): The starting unit to convert from
+            to_unit (str): The ending unit to convert to
+
+        Returns:
+            (Any numeric type): The converted magnitude
+
+        """
+        return value * self.get_conversion_factor(from_unit, to_unit, isinstance(value, Decimal))
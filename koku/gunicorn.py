@@ -10,7 +10,18 @@ SOURCES = ENVIRONMENT.bool("SOURCES", default=False)
 
 bind = "unix:/var/run/koku/gunicorn.sock"
 cpu_resources = int(os.environ.get("POD_CPU_LIMIT", multiprocessing.cpu_count()))
-workers = 1 if SOURCES else cpu_resources * 2 + 1
+
+# "sync" serves one request at a time per process. "gthread" serves up to GUNICORN_THREADS
+# requests per process on threads, which suits report endpoints that mostly wait on
+# Postgres, RBAC and Redis, with fewer processes and so less memory per pod.
+worker_class = ENVIRONMENT.get_value("GUNICORN_WORKER_CLASS", default="sync")
+if worker_class == "gthread":
+    threads = ENVIRONMENT.int("GUNICORN_THREADS", default=4)
+    default_workers = cpu_resources + 1
+else:
+    threads = 1
+    default_workers = cpu_resources * 2 + 1
+workers = 1 if SOURCES else ENVIRONMENT.int("GUNICORN_WORKERS", default=default_workers)
 
 timeout = int(os.environ.get("TIMEOUT", "90"))
 loglevel = os.environ.get("LOG_LEVEL", "INFO")
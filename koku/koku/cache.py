@@ -15,14 +15,29 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 """Cache functions."""
+import datetime
+import hashlib
 import logging
+import threading
+from urllib.parse import parse_qsl
+from urllib.parse import urlencode
+from uuid import uuid4
 
+from cachetools import TTLCache
+from dateutil import parser
+from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from django.core.cache import caches
 from django.core.cache.backends.dummy import DummyCache
 from django.core.cache.backends.locmem import LocMemCache
+from django.middleware.cache import CacheMiddleware
+from django.utils import timezone
+from django.utils.decorators import decorator_from_middleware_with_args
+from django.utils.deprecation import MiddlewareMixin
 from django_redis.cache import RedisCache
+from prometheus_client import Counter
 from redis import Redis
+from tenant_schemas.utils import schema_context
 
 from api.provider.models import Provider
 
@@ -43,12 +58,23 @@ OPENSHIFT_AWS_CACHE_PREFIX = "openshift-aws-view"
 OPENSHIFT_AZURE_CACHE_PREFIX = "openshift-azure-view"
 OPENSHIFT_ALL_CACHE_PREFIX = "openshift-all-view"
 SOURCES_PREFIX = "sources"
+TAG_KEYS_CACHE_PREFIX = "tag-keys"
+REPORT_DELTAS_CACHE_PREFIX = "report-deltas"
 
+FINALIZED_CACHE_SUFFIX = "-finalized"
 
-def invalidate_view_cache_for_tenant_and_cache_key(schema_name, cache_key_prefix=None):
-    """Invalidate our view cache for a specific tenant and source type.
+VIEW_CACHE_REQUESTS_COUNTER = Counter(
+    "koku_view_cache_requests", "Number of cacheable view requests", ["key_prefix", "tier", "result"]
+)
 
-    If cache_key_prefix is None, all views will be invalidated.
+TAG_KEYS_LOCAL_CACHE = TTLCache(maxsize=10000, ttl=settings.TAG_KEYS_CACHE_LOCAL_TTL)
+TAG_KEYS_LOCAL_CACHE_LOCK = threading.Lock()
+
+
+def _get_cache_keys():
+    """Return the default cache and the keys it holds.
+
+    The cache is None if views caching is disabled.
     """
     cache = caches["default"]
     if isinstance(cache, RedisCache):
@@ -61,13 +87,23 @@ def invalidate_view_cache_for_tenant_and_cache_key(schema_name, cache_key_prefix
         all_keys = [key.split(":") for key in all_keys]
         all_keys = [":".join(splits[-2:]) for splits in all_keys]
     elif isinstance(cache, DummyCache):
-        LOG.info("Skipping cache invalidation because views caching is disabled.")
-        return
+        return None, []
     else:
         msg = "Using an unsupported caching backend!"
         raise KokuCacheError(msg)
 
-    all_keys = all_keys if all_keys is not None else []
+    return cache, all_keys if all_keys is not None else []
+
+
+def invalidate_view_cache_for_tenant_and_cache_key(schema_name, cache_key_prefix=None):
+    """Invalidate our view cache for a specific tenant and source type.
+
+    If cache_key_prefix is None, all views will be invalidated.
+    """
+    cache, all_keys = _get_cache_keys()
+    if cache is None:
+        LOG.info("Skipping cache invalidation because views caching is disabled.")
+        return
 
     if cache_key_prefix:
         keys_to_invalidate = [key for key in all_keys if (schema_name in key and cache_key_prefix in key)]
@@ -82,8 +118,8 @@ def invalidate_view_cache_for_tenant_and_cache_key(schema_name, cache_key_prefix
     LOG.info(msg)
 
 
-def invalidate_view_cache_for_tenant_and_source_type(schema_name, source_type):
-    """"Invalidate our view cache for a specific tenant and source type."""
+def _view_cache_prefixes(source_type):
+    """Return the view cache prefixes of the views that read a source type's data."""
     cache_key_prefixes = ()
     if source_type in (Provider.PROVIDER_AWS, Provider.PROVIDER_AWS_LOCAL):
         cache_key_prefixes = (AWS_CACHE_PREFIX, OPENSHIFT_AWS_CACHE_PREFIX, OPENSHIFT_ALL_CACHE_PREFIX)
@@ -98,6 +134,302 @@ def invalidate_view_cache_for_tenant_and_source_type(schema_name, source_type):
         cache_key_prefixes = (AZURE_CACHE_PREFIX, OPENSHIFT_AZURE_CACHE_PREFIX, OPENSHIFT_ALL_CACHE_PREFIX)
     elif source_type in (Provider.PROVIDER_GCP, Provider.PROVIDER_GCP_LOCAL):
         cache_key_prefixes = (GCP_CACHE_PREFIX,)
+    return cache_key_prefixes
 
-    for cache_key_prefix in cache_key_prefixes:
+
+def invalidate_view_cache_for_tenant_and_source_type(schema_name, source_type):
+    """"Invalidate our view cache for a specific tenant and source type."""
+    for cache_key_prefix in _view_cache_prefixes(source_type):
         invalidate_view_cache_for_tenant_and_cache_key(schema_name, cache_key_prefix)
+
+
+def get_finalized_cache_prefix(cache_key_prefix):
+    """Return the cache prefix of the finalized tier for a view cache prefix.
+
+    The prefix must not contain the view cache prefix, so that the
+    invalidation done after every summary leaves the finalized tier alone.
+    """
+    return cache_key_prefix.replace("-view", FINALIZED_CACHE_SUFFIX)
+
+
+def get_last_finalized_date():
+    """Return the last day of the most recent month whose cost data is final.
+
+    A month is final once CACHE_FINALIZED_GRACE_DAYS days of the following
+    month have passed, which leaves time for the month's bills to be finalized
+    and processed.
+    """
+    today = timezone.now().date()
+    last_month_end = today.replace(day=1) - datetime.timedelta(days=1)
+    if today.day > settings.CACHE_FINALIZED_GRACE_DAYS:
+        return last_month_end
+    return last_month_end.replace(day=1) - datetime.timedelta(days=1)
+
+
+def invalidate_finalized_view_cache(schema_name, source_type, start_date=None):
+    """Invalidate the finalized view cache tier for a specific tenant and source type.
+
+    If start_date is given, the tier is only invalidated when it is in a
+    finalized month, i.e. when finalized data is being reprocessed.
+    """
+    if start_date and _to_date(start_date) > get_last_finalized_date():
+        return
+    for cache_key_prefix in _view_cache_prefixes(source_type):
+        invalidate_view_cache_for_tenant_and_cache_key(schema_name, get_finalized_cache_prefix(cache_key_prefix))
+
+
+def normalize_query_string(query_string):
+    """Return a canonical form of a query string for use in cache keys.
+
+    Parameters are decoded and re-encoded the same way and grouped by name.
+    Parameters of the same family, e.g. group_by[account] and group_by[service],
+    keep their order because it changes the report.
+    """
+    params = parse_qsl(query_string, keep_blank_values=True)
+    params.sort(key=lambda param: param[0].split("[")[0])
+    return urlencode(params)
+
+
+def is_finalized_request(request):
+    """Return whether the time window of a report request is entirely in finalized months."""
+    params = request.GET
+    start_date = params.get("start_date")
+    end_date = params.get("end_date")
+    if start_date or end_date:
+        try:
+            return bool(start_date) and _to_date(end_date) <= get_last_finalized_date()
+        except (TypeError, ValueError, OverflowError):
+            return False
+    if params.get("filter[time_scope_value]") == "-2":
+        # The previous month
+        return timezone.now().date().replace(day=1) - datetime.timedelta(days=1) <= get_last_finalized_date()
+    return False
+
+
+class _NormalizedCacheRequest:
+    """A request as seen by the cache middleware, with its query string normalized."""
+
+    def __init__(self, request):
+        """Wrap the request."""
+        object.__setattr__(self, "_request", request)
+
+    def __getattr__(self, name):
+        """Read attributes from the wrapped request."""
+        return getattr(self._request, name)
+
+    def __setattr__(self, name, value):
+        """Set attributes on the wrapped request."""
+        setattr(self._request, name, value)
+
+    def build_absolute_uri(self, location=None):
+        """Return the absolute URI of the request with a normalized query string."""
+        if location is not None:
+            return self._request.build_absolute_uri(location)
+        uri = self._request.build_absolute_uri(self._request.path)
+        query_string = normalize_query_string(self._request.META.get("QUERY_STRING", ""))
+        return f"{uri}?{query_string}" if query_string else uri
+
+
+class ViewCacheMiddleware(MiddlewareMixin):
+    """
+    Cache views in two tiers.
+
+    Responses for time windows that are entirely in finalized months go to a
+    long-lived tier that is only invalidated when finalized data is
+    reprocessed. Every other response goes to the regular tier that masu
+    invalidates whenever a summary completes. Cache keys use a normalized
+    query string so that equivalent requests share entries.
+    """
+
+    def __init__(self, get_response=None, key_prefix=None):
+        """Initialize the middleware."""
+        super().__init__(get_response)
+        self.key_prefix = key_prefix
+        self.tiers = {
+            "default": CacheMiddleware(
+                get_response, cache_timeout=settings.CACHE_MIDDLEWARE_SECONDS, key_prefix=key_prefix
+            ),
+            "finalized": CacheMiddleware(
+                get_response,
+                cache_timeout=settings.CACHE_FINALIZED_SECONDS,
+                key_prefix=get_finalized_cache_prefix(key_prefix),
+            ),
+        }
+
+    def process_request(self, request):
+        """Return the cached response of the request's tier, if there is one."""
+        tier = "finalized" if is_finalized_request(request) else "default"
+        request._view_cache_tier = tier
+        response = self.tiers[tier].process_request(_NormalizedCacheRequest(request))
+        if request.method in ("GET", "HEAD"):
+            result = "miss" if response is None else "hit"
+            VIEW_CACHE_REQUESTS_COUNTER.labels(key_prefix=self.key_prefix, tier=tier, result=result).inc()
+        return response
+
+    def process_response(self, request, response):
+        """Store the response in the request's tier."""
+        tier = getattr(request, "_view_cache_tier", "default")
+        return self.tiers[tier].process_response(_NormalizedCacheRequest(request), response)
+
+
+def cache_view(key_prefix):
+    """Cache a view in the two-tier view cache under a key prefix."""
+    return decorator_from_middleware_with_args(ViewCacheMiddleware)(key_prefix=key_prefix)
+
+
+def _tag_keys_cache_key(schema_name, model, version):
+    """Return the cache key for a version of a tenant's tag summary table."""
+    return f"{schema_name}:{TAG_KEYS_CACHE_PREFIX}-{model._meta.db_table}.{version}"
+
+
+def _tag_keys_version_key(schema_name):
+    """Return the cache key of the current version of a tenant's tag keys."""
+    return f"{schema_name}:{TAG_KEYS_CACHE_PREFIX}-version"
+
+
+def _get_tag_keys_version(cache, schema_name):
+    """Return the current version of a tenant's tag keys, or None if the cache is unavailable."""
+    version_key = _tag_keys_version_key(schema_name)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid4().hex, None)
+        version = cache.get(version_key)
+    return version
+
+
+def get_tag_keys(schema_name, model):
+    """Return the set of tag keys in a tenant's tag summary table.
+
+    The keys are cached in-process and in the default cache under the
+    tenant's current version, which masu bumps when it rebuilds the tenant's
+    tag summaries. Each lookup reads the version from the default cache, so
+    every process sees new keys as soon as the version changes.
+    """
+    if not settings.TAG_KEYS_CACHE_ENABLED:
+        with schema_context(schema_name):
+            return frozenset(tag.get("key") for tag in model.objects.values("key"))
+
+    with schema_context(schema_name):
+        cache = caches["default"]
+        version = _get_tag_keys_version(cache, schema_name)
+        if version is None:
+            return frozenset(tag.get("key") for tag in model.objects.values("key"))
+
+        cache_key = _tag_keys_cache_key(schema_name, model, version)
+        with TAG_KEYS_LOCAL_CACHE_LOCK:
+            tag_keys = TAG_KEYS_LOCAL_CACHE.get(cache_key)
+        if tag_keys is not None:
+            return tag_keys
+
+        tag_keys = cache.get(cache_key)
+        if tag_keys is None:
+            tag_keys = frozenset(tag.get("key") for tag in model.objects.values("key"))
+            cache.set(cache_key, tag_keys)
+
+    with TAG_KEYS_LOCAL_CACHE_LOCK:
+        TAG_KEYS_LOCAL_CACHE[cache_key] = tag_keys
+    return tag_keys
+
+
+def invalidate_tag_keys_cache(schema_name):
+    """Invalidate the cached tag keys for a tenant by moving it to a new version."""
+    if not settings.TAG_KEYS_CACHE_ENABLED:
+        return
+    with TAG_KEYS_LOCAL_CACHE_LOCK:
+        for key in [key for key in TAG_KEYS_LOCAL_CACHE if key.startswith(f"{schema_name}:")]:
+            TAG_KEYS_LOCAL_CACHE.pop(key, None)
+    with schema_context(schema_name):
+        caches["default"].set(_tag_keys_version_key(schema_name), uuid4().hex, None)
+
+
+def _to_date(value):
+    """Return a date for a date, datetime or date string."""
+    if isinstance(value, str):
+        value = parser.parse(value)
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return value
+
+
+def _months_in_range(start_date, end_date):
+    """Return the YYYY-MM months from the start date through the end date."""
+    month = _to_date(start_date).replace(day=1)
+    end_date = _to_date(end_date)
+    months = []
+    while month <= end_date:
+        months.append(month.strftime("%Y-%m"))
+        month += relativedelta(months=1)
+    return months
+
+
+def _report_deltas_providers(source_type):
+    """Return the report providers whose deltas read data from a source type."""
+    if source_type in (Provider.PROVIDER_AWS, Provider.PROVIDER_AWS_LOCAL):
+        return (Provider.PROVIDER_AWS, Provider.OCP_AWS, Provider.OCP_ALL)
+    elif source_type in (Provider.PROVIDER_OCP,):
+        return (Provider.PROVIDER_OCP, Provider.OCP_AWS, Provider.OCP_AZURE, Provider.OCP_ALL)
+    elif source_type in (Provider.PROVIDER_AZURE, Provider.PROVIDER_AZURE_LOCAL):
+        return (Provider.PROVIDER_AZURE, Provider.OCP_AZURE, Provider.OCP_ALL)
+    elif source_type in (Provider.PROVIDER_GCP, Provider.PROVIDER_GCP_LOCAL):
+        return (Provider.PROVIDER_GCP,)
+    return ()
+
+
+def get_report_deltas(schema_name, provider, start_date, end_date, cache_args, get_totals):
+    """Return the previous-period totals for a report delta.
+
+    Args:
+        schema_name (str): The tenant schema
+        provider (str): The report provider, e.g. AWS or OCP_AWS
+        start_date, end_date (date): The previous period
+        cache_args (tuple): Everything else the totals depend on (table, group by, filters, access)
+        get_totals (callable): Computes the totals on a cache miss
+
+    The totals are cached until masu rebuilds summaries for a month in the
+    previous period, so closed months are only queried once.
+    """
+    if not settings.REPORT_DELTAS_CACHE_ENABLED:
+        return get_totals()
+
+    months = "_".join(_months_in_range(start_date, end_date))
+    digest = hashlib.md5(repr(cache_args).encode("utf-8")).hexdigest()
+    cache_key = f"{schema_name}:{REPORT_DELTAS_CACHE_PREFIX}-{provider}-{months}.{digest}"
+    with schema_context(schema_name):
+        cache = caches["default"]
+        totals = cache.get(cache_key)
+        if totals is None:
+            totals = get_totals()
+            cache.set(cache_key, totals, settings.REPORT_DELTAS_CACHE_TTL)
+    return totals
+
+
+def invalidate_report_deltas_cache(schema_name, source_type, start_date=None, end_date=None):
+    """Invalidate the cached report deltas of a tenant that read a source type's data for a date range.
+
+    If no date range is given, the deltas for every period are invalidated.
+    """
+    if not settings.REPORT_DELTAS_CACHE_ENABLED:
+        return
+    cache, all_keys = _get_cache_keys()
+    if cache is None:
+        return
+
+    months = None
+    if start_date and end_date:
+        months = set(_months_in_range(start_date, end_date))
+    prefixes = [f"{REPORT_DELTAS_CACHE_PREFIX}-{provider}-" for provider in _report_deltas_providers(source_type)]
+    keys_to_invalidate = []
+    for key in all_keys:
+        if schema_name not in key:
+            continue
+        for prefix in prefixes:
+            _, found, period = key.partition(prefix)
+            if found and (months is None or months.intersection(period.split(".")[0].split("_"))):
+                keys_to_invalidate.append(key)
+                break
+
+    with schema_context(schema_name):
+        for key in keys_to_invalidate:
+            cache.delete(key)
+
+    LOG.info(f"Invalidated report deltas cache for\n\ttenant: {schema_name}\n\tmonths: {months or 'all'}")
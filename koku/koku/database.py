@@ -38,7 +38,7 @@ LOG = logging.getLogger(__name__)
 
 engines = {
     "sqlite": "django.db.backends.sqlite3",
-    "postgresql": "tenant_schemas.postgresql_backend",
+    "postgresql": "koku.pg_backend",
     "mysql": "django.db.backends.mysql",
 }
 
@@ -72,6 +72,12 @@ def config():
         "PASSWORD": ENVIRONMENT.get_value("DATABASE_PASSWORD", default="postgres"),
         "HOST": ENVIRONMENT.get_value(f"{service_name}_SERVICE_HOST", default="localhost"),
         "PORT": ENVIRONMENT.get_value(f"{service_name}_SERVICE_PORT", default=15432),
+        # Seconds a connection is kept open for reuse by later requests and tasks, 0 to close it after each one
+        "CONN_MAX_AGE": ENVIRONMENT.int("DATABASE_CONN_MAX_AGE", default=60),
+        # Check that a kept connection still works before a request or task reuses it
+        "CONN_HEALTH_CHECKS": ENVIRONMENT.bool("DATABASE_CONN_HEALTH_CHECKS", default=True),
+        # Connections kept in a per-process pool shared by threads, 0 to disable the pool
+        "POOL_SIZE": ENVIRONMENT.int("DATABASE_POOL_SIZE", default=0),
     }
 
     database_cert = ENVIRONMENT.get_value("DATABASE_SERVICE_CERT", default=None)
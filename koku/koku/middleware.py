@@ -16,6 +16,7 @@
 #
 """Custom Koku Middleware."""
 import binascii
+import copy
 import logging
 import threading
 from http import HTTPStatus
@@ -56,6 +57,8 @@ from koku.rbac import RbacService
 TIME_TO_CACHE = 900  # in seconds (15 minutes)
 MAX_CACHE_SIZE = 10000
 USER_CACHE = TTLCache(maxsize=MAX_CACHE_SIZE, ttl=TIME_TO_CACHE)
+# cachetools caches are not thread safe, hold this lock to use USER_CACHE under threaded workers
+USER_CACHE_LOCK = threading.Lock()
 
 
 LOG = logging.getLogger(__name__)
@@ -116,6 +119,9 @@ class KokuTenantMiddleware(BaseTenantMiddleware):
     """A subclass of the Django-tenant-schemas tenant middleware.
     Determines which schema to use based on the customer's schema
     found from the user tied to a request.
+
+    The schema is set on the database connection of the thread serving the
+    request, so concurrent requests on threaded workers do not share it.
     """
 
     tenant_lock = threading.Lock()
@@ -137,8 +143,12 @@ class KokuTenantMiddleware(BaseTenantMiddleware):
             if hasattr(request, "user") and hasattr(request.user, "username"):
                 username = request.user.username
                 try:
-                    if username not in USER_CACHE:
-                        USER_CACHE[username] = User.objects.get(username=username)
+                    with USER_CACHE_LOCK:
+                        is_cached = username in USER_CACHE
+                    if not is_cached:
+                        user = User.objects.get(username=username)
+                        with USER_CACHE_LOCK:
+                            USER_CACHE[username] = user
                         LOG.debug(f"User added to cache: {username}")
                 except User.DoesNotExist:
                     return HttpResponseUnauthorizedRequest()
@@ -161,7 +171,9 @@ class KokuTenantMiddleware(BaseTenantMiddleware):
         """Override the tenant selection logic."""
         schema_name = "public"
         tenant_username = request.user.username
-        if tenant_username not in KokuTenantMiddleware.tenant_cache:
+        with KokuTenantMiddleware.tenant_lock:
+            tenant = KokuTenantMiddleware.tenant_cache.get(tenant_username)
+        if tenant is None:
             if not is_no_auth(request):
                 user = User.objects.get(username=tenant_username)
                 customer = user.customer
@@ -175,7 +187,7 @@ class KokuTenantMiddleware(BaseTenantMiddleware):
             with KokuTenantMiddleware.tenant_lock:
                 KokuTenantMiddleware.tenant_cache[tenant_username] = tenant
             LOG.debug(f"Tenant added to cache: {tenant_username}")
-        return KokuTenantMiddleware.tenant_cache[tenant_username]
+        return tenant
 
 
 class IdentityHeaderMiddleware(MiddlewareMixin):
@@ -186,6 +198,7 @@ class IdentityHeaderMiddleware(MiddlewareMixin):
     header = RH_IDENTITY_HEADER
     rbac = RbacService()
     customer_cache = TTLCache(maxsize=MAX_CACHE_SIZE, ttl=TIME_TO_CACHE)
+    customer_lock = threading.Lock()
 
     @staticmethod
     def create_customer(account):
@@ -293,12 +306,13 @@ class IdentityHeaderMiddleware(MiddlewareMixin):
             }
             LOG.info(stmt)
             try:
-                if account not in IdentityHeaderMiddleware.customer_cache:
-                    IdentityHeaderMiddleware.customer_cache[account] = Customer.objects.filter(
-                        account_id=account
-                    ).get()
+                with IdentityHeaderMiddleware.customer_lock:
+                    customer = IdentityHeaderMiddleware.customer_cache.get(account)
+                if customer is None:
+                    customer = Customer.objects.filter(account_id=account).get()
+                    with IdentityHeaderMiddleware.customer_lock:
+                        IdentityHeaderMiddleware.customer_cache[account] = customer
                     LOG.debug(f"Customer added to cache: {account}")
-                customer = IdentityHeaderMiddleware.customer_cache[account]
             except Customer.DoesNotExist:
                 customer = IdentityHeaderMiddleware.create_customer(account)
             except OperationalError as err:
@@ -307,15 +321,18 @@ class IdentityHeaderMiddleware(MiddlewareMixin):
                 return HttpResponseFailedDependency({"source": "Database", "exception": err})
 
             try:
-                if username not in USER_CACHE:
+                with USER_CACHE_LOCK:
+                    user = USER_CACHE.get(username)
+                if user is None:
                     user = User.objects.get(username=username)
-                    USER_CACHE[username] = user
+                    with USER_CACHE_LOCK:
+                        USER_CACHE[username] = user
                     LOG.debug(f"User added to cache: {username}")
-                else:
-                    user = USER_CACHE[username]
             except User.DoesNotExist:
                 user = IdentityHeaderMiddleware.create_user(username, email, customer, request)
 
+            # The cached user is shared by concurrent requests, annotate a copy of it for this one
+            user = copy.copy(user)
             user.identity_header = {"encoded": rh_auth_header, "decoded": json_rh_auth}
             user.admin = is_admin
             user.req_id = req_id
@@ -0,0 +1,167 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""PostgreSQL backend that reuses connections and search_path settings.
+
+This extends the tenant_schemas backend with:
+
+* health checks of persistent connections (CONN_MAX_AGE), run once per
+  request or task before a reused connection is handed out,
+* an optional per-process pool of connections (POOL_SIZE), for threaded
+  workers whose threads come and go,
+* skipping SET search_path when the schema of a schema_context or
+  tenant_context is the one the connection already uses.
+"""
+import os
+import threading
+
+import psycopg2.extras
+from prometheus_client import Counter
+from psycopg2.pool import PoolError
+from psycopg2.pool import ThreadedConnectionPool
+from tenant_schemas.postgresql_backend import base
+from tenant_schemas.utils import get_public_schema_name
+
+DB_NEW_CONNECTIONS_COUNTER = Counter(
+    "koku_db_new_connections", "Number of database connections opened or taken from the pool", ["source"]
+)
+DB_SEARCH_PATH_REUSED_COUNTER = Counter(
+    "koku_db_search_path_reused", "Number of SET search_path statements skipped because the path was already set"
+)
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(alias, size, conn_params):
+    """Return the connection pool of a database alias for this process, creating it if needed."""
+    # Keyed on the pid so a forked worker never uses its parent's connections
+    key = (alias, os.getpid())
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = ThreadedConnectionPool(size, size, **conn_params)
+            _POOLS[key] = pool
+        return pool
+
+
+def close_pools():
+    """Close every pooled connection of this process."""
+    with _POOLS_LOCK:
+        for key in [key for key in _POOLS if key[1] == os.getpid()]:
+            _POOLS.pop(key).closeall()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """A tenant_schemas DatabaseWrapper that reuses connections and search paths."""
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the wrapper."""
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+        self.applied_search_path = None
+        self._pool = None
+
+    @property
+    def health_check_enabled(self):
+        """Return True if persistent connections are checked before they are reused."""
+        return self.settings_dict.get("CONN_MAX_AGE") != 0 and self.settings_dict.get("CONN_HEALTH_CHECKS", False)
+
+    def get_search_path(self):
+        """Return the search path tenant_schemas sets for the current schema."""
+        public_schema_name = get_public_schema_name()
+        if self.schema_name == public_schema_name:
+            search_path = [public_schema_name]
+        elif self.include_public_schema:
+            search_path = [self.schema_name, public_schema_name]
+        else:
+            search_path = [self.schema_name]
+        return search_path + list(base.EXTRA_SEARCH_PATHS)
+
+    def get_new_connection(self, conn_params):
+        """Open a connection, or take one from the pool when POOL_SIZE is set."""
+        pool_size = self.settings_dict.get("POOL_SIZE")
+        if pool_size:
+            pool = get_pool(self.alias, pool_size, conn_params)
+            try:
+                connection = pool.getconn()
+            except PoolError:
+                # Every pooled connection is in use, fall back to a connection of our own
+                pass
+            else:
+                if not connection.closed:
+                    self._pool = pool
+                    self.isolation_level = connection.isolation_level
+                    psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+                    DB_NEW_CONNECTIONS_COUNTER.labels(source="pool").inc()
+                    return connection
+                pool.putconn(connection, close=True)
+        DB_NEW_CONNECTIONS_COUNTER.labels(source="connect").inc()
+        return super().get_new_connection(conn_params)
+
+    def connect(self):
+        """Connect, forgetting the search path of any previous connection."""
+        self.applied_search_path = None
+        super().connect()
+        self.health_check_done = True
+
+    def ensure_connection(self):
+        """Check a reused connection once before using it, reconnecting if it is broken."""
+        if (
+            self.connection is not None
+            and self.health_check_enabled
+            and not self.health_check_done
+            and not self.in_atomic_block
+        ):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        """Close the connection if needed and check it again before the next request reuses it."""
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def _close(self):
+        """Close the connection, or return it to its pool."""
+        pool, self._pool = self._pool, None
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.putconn(self.connection, close=self.errors_occurred)
+
+    def rollback(self):
+        """Roll back, which also undoes a SET search_path run in the transaction."""
+        self.applied_search_path = None
+        self.search_path_set = False
+        super().rollback()
+
+    def _savepoint_rollback(self, sid):
+        """Roll back to a savepoint, which may undo a SET search_path run after it."""
+        self.applied_search_path = None
+        self.search_path_set = False
+        super()._savepoint_rollback(sid)
+
+    def _cursor(self, name=None):
+        """Return a cursor, skipping SET search_path if the connection already uses the path."""
+        search_path = self.get_search_path()
+        if not self.search_path_set and self.connection is not None and self.applied_search_path == search_path:
+            self.search_path_set = True
+            DB_SEARCH_PATH_REUSED_COUNTER.inc()
+        cursor = super()._cursor(name=name)
+        self.applied_search_path = search_path if self.search_path_set else None
+        return cursor
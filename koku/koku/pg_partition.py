@@ -18,11 +18,18 @@ import json
 import logging
 import os
 import re
+import time
 import uuid
+from collections import namedtuple
+from concurrent.futures import as_completed
+from concurrent.futures import ThreadPoolExecutor
 
 import ciso8601
 from dateutil.relativedelta import relativedelta
+from django.conf import settings
 from django.db import connection as conn
+from django.db import DatabaseError
+from django.db import OperationalError
 from django.db import transaction
 
 
@@ -1253,6 +1260,418 @@ SELECT * FROM __mv_recs_{self.tx_id} ;
                     self._attach_partition()
 
 
+RepartitionResult = namedtuple(
+    "RepartitionResult", ["schema_name", "partitioned_table", "partitions", "rows", "lock_wait", "seconds"]
+)
+
+# pg_get_indexdef() of a partitioned table index, up to the column list
+_PARTITIONED_INDEX_TARGET = re.compile(r"^CREATE (UNIQUE )?INDEX \S+ ON (ONLY )?\S+ ")
+# Attempts made to take the locks needed to attach the staged partitions
+_ATTACH_ATTEMPTS = 3
+# CHECK constraint matching the bounds of a staged partition, so attaching it does not scan it
+_STAGING_BOUNDS = "__repartition_bounds"
+# CHECK constraint excluding the staged bounds from the default partition, so attaching does not scan it either
+_DEFAULT_EXCLUDES = "__repartition_excludes"
+# Trigger recording the rows written to the default partition while it is copied
+_CHANGE_TRIGGER = "__repartition_changes"
+
+
+class StagedPartitionDefaultData(PartitionDefaultData):
+    """
+    Move data from a default partition into new month range partitions without holding
+    locks that block queries for the length of the copy.
+
+    Each month of data is copied into an unattached staging table in keyset batches,
+    each batch in its own transaction. The staging table gets the indexes and constraints
+    of the partitioned table, and a CHECK constraint matching its bounds so that attaching
+    it does not scan it. A trigger records the keys of the rows written to the default partition
+    while it is copied. A final short transaction blocks writes to the default partition,
+    copies again only the recorded rows, removes the copied rows from the default partition,
+    validates a CHECK constraint excluding the new bounds from it once and attaches the
+    staging tables as partitions without scanning the default partition for each of them.
+    ATTACH PARTITION only takes a SHARE UPDATE EXCLUSIVE lock on the partitioned table,
+    so queries keep running.
+    (PostgreSQL has no ATTACH PARTITION CONCURRENTLY, this is the closest equivalent.)
+    Params:
+        schema_name (str) : Schema containing the partitioned data and tracking table
+        partitioned_table (str) : Partitioned table name
+        default_partition (str) : Default partition table name
+        batch_size (int) : Rows copied per transaction
+        lock_timeout (int) : Milliseconds to wait for each lock taken to attach the partitions
+    """
+
+    def __init__(self, schema_name, partitioned_table, default_partition=None, batch_size=None, lock_timeout=None):
+        super().__init__(schema_name, partitioned_table, default_partition=default_partition)
+        self.batch_size = batch_size or settings.REPARTITION_BATCH_SIZE
+        self.lock_timeout = settings.REPARTITION_LOCK_TIMEOUT if lock_timeout is None else lock_timeout
+        self.lock_wait = 0.0
+
+    def _qualified_name(self, table_name):
+        return f'"{self.schema_name}"."{table_name}"'
+
+    def _get_key_columns(self):
+        sql = """
+SELECT a.attname::text as "column_name"
+  FROM pg_constraint c
+  JOIN pg_attribute a
+    ON a.attrelid = c.conrelid
+   AND a.attnum = any(c.conkey)
+ WHERE c.conrelid = %s::regclass
+   AND c.contype = 'p'
+ ORDER
+    BY array_position(c.conkey, a.attnum);
+"""
+        cur = conn_execute(sql, (self._qualified_name(self.partitioned_table),), _conn=self.conn)
+        return [r["column_name"] for r in fetchall(cur)]
+
+    def _create_staging_table(self, staging_table, p_from, p_to):
+        # Staging tables are named apart from the partitions so that a partition created for the same
+        # month in the meantime fails loudly instead of silently reusing the unattached staging table.
+        # One left over from an interrupted repartition is replaced.
+        sql = f"""
+DROP TABLE IF EXISTS {self._qualified_name(staging_table)} ;
+CREATE TABLE {self._qualified_name(staging_table)}
+       (LIKE {self._qualified_name(self.partitioned_table)} INCLUDING ALL EXCLUDING INDEXES) ;
+ALTER TABLE {self._qualified_name(staging_table)}
+  ADD CONSTRAINT "{_STAGING_BOUNDS}"
+      CHECK ("{self.partition_key}" IS NOT NULL AND "{self.partition_key}" >= %s AND "{self.partition_key}" < %s) ;
+"""
+        conn_execute(sql, (p_from, p_to), _conn=self.conn)
+
+    def _copy_to_staging(self, staging_table, p_from, p_to, key_columns):
+        """
+        Copy one month of data from the default partition in batches ordered by the primary key.
+        Returns:
+            int : The number of rows copied
+        """
+        key = ", ".join(f'"{c}"' for c in key_columns)
+        rows = 0
+        last_key = None
+        while True:
+            params = [p_from, p_to]
+            after = ""
+            if last_key:
+                after = f"AND ({key}) > %s"
+                params.append(last_key)
+            params.append(self.batch_size)
+            copy_sql = f"""
+WITH __batch AS (
+SELECT *
+  FROM {self._qualified_name(self.default_partition)}
+ WHERE "{self.partition_key}" >= %s
+   AND "{self.partition_key}" < %s
+       {after}
+ ORDER
+    BY {key}
+ LIMIT %s
+),
+__copy AS (
+INSERT INTO {self._qualified_name(staging_table)}
+SELECT * FROM __batch
+)
+SELECT count(*) over () as "__num_rows", {key}
+  FROM __batch
+ ORDER
+    BY {key} DESC
+ LIMIT 1;
+"""
+            with transaction.atomic():
+                cur = conn_execute(copy_sql, params, _conn=self.conn)
+                batch = cur.fetchone()
+            if batch is None:
+                return rows
+            rows += batch[0]
+            if batch[0] < self.batch_size:
+                return rows
+            last_key = tuple(batch[1:])
+
+    def _copy_all_to_staging(self, staging_table, p_from, p_to):
+        copy_sql = f"""
+INSERT INTO {self._qualified_name(staging_table)}
+SELECT *
+  FROM {self._qualified_name(self.default_partition)}
+ WHERE "{self.partition_key}" >= %s
+   AND "{self.partition_key}" < %s ;
+"""
+        with transaction.atomic():
+            cur = conn_execute(copy_sql, (p_from, p_to), _conn=self.conn)
+        return cur.rowcount
+
+    def _create_staging_indexes(self, staging_table):
+        # Attaching a table with matching indexes and constraints reuses them instead of building them
+        index_sql = """
+SELECT pg_get_indexdef(i.indexrelid) as "index_def"
+  FROM pg_index i
+ WHERE i.indrelid = %s::regclass
+   AND NOT EXISTS (
+           SELECT 1
+             FROM pg_constraint c
+            WHERE c.conrelid = i.indrelid
+              AND c.conindid = i.indexrelid
+       );
+"""
+        constraint_sql = """
+SELECT pg_get_constraintdef(c.oid) as "constraint_def"
+  FROM pg_constraint c
+ WHERE c.conrelid = %s::regclass
+   AND c.contype in ('p', 'u', 'x', 'f');
+"""
+        staging = self._qualified_name(staging_table)
+        parent = (self._qualified_name(self.partitioned_table),)
+        for rec in fetchall(conn_execute(index_sql, parent, _conn=self.conn)):
+            index_sql = _PARTITIONED_INDEX_TARGET.sub(
+                lambda m: f"CREATE {m.group(1) or ''}INDEX ON {staging} ", rec["index_def"]
+            )
+            conn_execute(index_sql, _conn=self.conn)
+        for rec in fetchall(conn_execute(constraint_sql, parent, _conn=self.conn)):
+            conn_execute(f"ALTER TABLE {staging} ADD {rec['constraint_def']} ;", _conn=self.conn)
+
+    def _change_names(self):
+        """Return the qualified names of the change table and trigger function of the default partition."""
+        return (
+            self._qualified_name(f"__{self.default_partition}_changes"),
+            self._qualified_name(f"__{self.default_partition}_track_changes"),
+        )
+
+    def _track_default_changes(self, key_columns):
+        """
+        Record the key of every row inserted, updated or deleted in the default partition from now on,
+        so that only those rows are copied again once writes are blocked.
+        Tables without a primary key record the partition key, and any change copies its month again.
+        """
+        change_table, change_function = self._change_names()
+        columns = key_columns or [self.partition_key]
+        select_list = ", ".join(f'"{c}"' for c in columns)
+        old_values = ", ".join(f'OLD."{c}"' for c in columns)
+        new_values = ", ".join(f'NEW."{c}"' for c in columns)
+        sql = f"""
+DROP TABLE IF EXISTS {change_table} ;
+CREATE TABLE {change_table} AS
+SELECT {select_list}
+  FROM {self._qualified_name(self.default_partition)}
+  WITH NO DATA ;
+CREATE OR REPLACE FUNCTION {change_function}() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        INSERT INTO {change_table} VALUES ({old_values});
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        INSERT INTO {change_table} VALUES ({new_values});
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql ;
+DROP TRIGGER IF EXISTS "{_CHANGE_TRIGGER}" ON {self._qualified_name(self.default_partition)} ;
+CREATE TRIGGER "{_CHANGE_TRIGGER}"
+ AFTER INSERT OR UPDATE OR DELETE ON {self._qualified_name(self.default_partition)}
+   FOR EACH ROW EXECUTE PROCEDURE {change_function}() ;
+"""
+        conn_execute(sql, _conn=self.conn)
+
+    def _drop_change_tracking(self):
+        change_table, change_function = self._change_names()
+        sql = f"""
+DROP TRIGGER IF EXISTS "{_CHANGE_TRIGGER}" ON {self._qualified_name(self.default_partition)} ;
+DROP FUNCTION IF EXISTS {change_function}() ;
+DROP TABLE IF EXISTS {change_table} ;
+"""
+        conn_execute(sql, _conn=self.conn)
+
+    def _reconcile_changes(self, staging_table, p_from, p_to, num_rows, key_columns):
+        """
+        Copy again the rows of one staged month written to the default partition during the copy.
+        Returns:
+            int : The number of rows in the staging table
+        """
+        change_table, _ = self._change_names()
+        staging = self._qualified_name(staging_table)
+        if not key_columns:
+            changed_sql = f"""
+SELECT EXISTS (
+       SELECT 1
+         FROM {change_table}
+        WHERE "{self.partition_key}" >= %s
+          AND "{self.partition_key}" < %s
+) as "changed";
+"""
+            if not conn_execute(changed_sql, (p_from, p_to), _conn=self.conn).fetchone()[0]:
+                return num_rows
+            conn_execute(f"TRUNCATE {staging} ;", _conn=self.conn)
+            return self._copy_all_to_staging(staging_table, p_from, p_to)
+
+        key = ", ".join(f'"{c}"' for c in key_columns)
+        # The staging table only holds its own month, so every recorded key is removed from it
+        # and the rows that are still in that month of the default partition are copied again.
+        delete_sql = f"""
+DELETE
+  FROM {staging}
+ WHERE ({key}) IN (SELECT {key} FROM {change_table}) ;
+"""
+        insert_sql = f"""
+INSERT INTO {staging}
+SELECT *
+  FROM {self._qualified_name(self.default_partition)}
+ WHERE "{self.partition_key}" >= %s
+   AND "{self.partition_key}" < %s
+   AND ({key}) IN (SELECT {key} FROM {change_table}) ;
+"""
+        num_rows -= conn_execute(delete_sql, _conn=self.conn).rowcount
+        num_rows += conn_execute(insert_sql, (p_from, p_to), _conn=self.conn).rowcount
+        return num_rows
+
+    def _exclude_from_default(self, staged):
+        """
+        Add a validated CHECK constraint to the default partition that excludes the staged bounds.
+        Attaching a partition then proves the default partition holds none of its rows from the
+        constraint instead of scanning it, so it is scanned once for all the staged partitions.
+        """
+        default_partition = self._qualified_name(self.default_partition)
+        excludes = " AND ".join(f'("{self.partition_key}" < %s OR "{self.partition_key}" >= %s)' for _ in staged)
+        params = [bound for s in staged for bound in (s[2], s[3])]
+        conn_execute(
+            f'ALTER TABLE {default_partition} ADD CONSTRAINT "{_DEFAULT_EXCLUDES}" CHECK ({excludes}) NOT VALID ;',
+            params,
+            _conn=self.conn,
+        )
+        conn_execute(f'ALTER TABLE {default_partition} VALIDATE CONSTRAINT "{_DEFAULT_EXCLUDES}" ;', _conn=self.conn)
+
+    def _attach_staged_partitions(self, staged, key_columns):
+        default_partition = self._qualified_name(self.default_partition)
+        with transaction.atomic():
+            conn_execute("SET LOCAL lock_timeout = %s ;", (self.lock_timeout,), _conn=self.conn)
+
+            # Readers can still use the default partition, writers wait until it is emptied
+            start = time.monotonic()
+            conn_execute(f"LOCK TABLE {default_partition} IN EXCLUSIVE MODE ;", _conn=self.conn)
+            self.lock_wait += time.monotonic() - start
+
+            # Rows written to the default partition during the copy (inserted, updated or deleted) were
+            # recorded by the change trigger and only those are copied again. Nothing can change the
+            # default partition while the lock is held, so the trigger is no longer needed.
+            reconciled = []
+            for partition_name, staging_table, p_from, p_to, num_rows in staged:
+                num_rows = self._reconcile_changes(staging_table, p_from, p_to, num_rows, key_columns)
+                reconciled.append((partition_name, staging_table, p_from, p_to, num_rows))
+            self._drop_change_tracking()
+
+            month_sql = f"""
+SELECT DISTINCT
+       date_trunc('month', "{self.partition_key}")::date as "partition_start"
+  FROM {default_partition} ;
+"""
+            default_months = {r["partition_start"] for r in fetchall(conn_execute(month_sql, _conn=self.conn))}
+            if default_months <= {s[2] for s in reconciled}:
+                # Everything was copied, which leaves nothing for the attach to scan
+                conn_execute(f"TRUNCATE {default_partition} ;", _conn=self.conn)
+            else:
+                for partition_name, staging_table, p_from, p_to, num_rows in reconciled:
+                    delete_sql = f"""
+DELETE
+  FROM {default_partition}
+ WHERE "{self.partition_key}" >= %s
+   AND "{self.partition_key}" < %s ;
+"""
+                    conn_execute(delete_sql, (p_from, p_to), _conn=self.conn)
+            self._exclude_from_default(reconciled)
+
+            for partition_name, staging_table, p_from, p_to, num_rows in reconciled:
+                conn_execute(
+                    f'ALTER TABLE {self._qualified_name(staging_table)} RENAME TO "{partition_name}" ;',
+                    _conn=self.conn,
+                )
+                # The tracking trigger leaves the renamed staging table alone, as it already exists
+                self.partition_name = partition_name
+                self.partition_parameters = {"from": p_from, "to": p_to}
+                self._create_partititon_tracking_record()
+
+                attach_sql = f"""
+ALTER TABLE {self._qualified_name(self.partitioned_table)}
+      ATTACH PARTITION {self._qualified_name(partition_name)}
+      FOR VALUES FROM (%s) TO (%s) ;
+"""
+                start = time.monotonic()
+                conn_execute(attach_sql, (p_from, p_to), _conn=self.conn)
+                self.lock_wait += time.monotonic() - start
+                conn_execute(
+                    f'ALTER TABLE {self._qualified_name(partition_name)} DROP CONSTRAINT "{_STAGING_BOUNDS}" ;',
+                    _conn=self.conn,
+                )
+            conn_execute(f'ALTER TABLE {default_partition} DROP CONSTRAINT "{_DEFAULT_EXCLUDES}" ;', _conn=self.conn)
+
+        return reconciled
+
+    def _attach_with_retries(self, staged, key_columns):
+        for attempt in range(1, _ATTACH_ATTEMPTS + 1):
+            try:
+                return self._attach_staged_partitions(staged, key_columns)
+            except OperationalError as err:
+                if attempt == _ATTACH_ATTEMPTS:
+                    raise
+                LOG.warning(f"Attaching partitions of {self.schema_name}.{self.partitioned_table} failed: {err}")
+
+    def _drop_staging_tables(self, staging_tables):
+        for staging_table in staging_tables:
+            try:
+                with transaction.atomic():
+                    conn_execute(f"DROP TABLE IF EXISTS {self._qualified_name(staging_table)} ;", _conn=self.conn)
+            except DatabaseError as err:
+                LOG.warning(f"Could not drop staging table {self.schema_name}.{staging_table}: {err}")
+        try:
+            with transaction.atomic():
+                self._drop_change_tracking()
+        except DatabaseError as err:
+            LOG.warning(f"Could not drop the change trigger of {self.schema_name}.{self.default_partition}: {err}")
+
+    def repartition_default_data(self):
+        """
+        Move the data of the default partition into new partitions
+        Returns:
+            RepartitionResult : What was moved and how long attaching waited for locks
+        """
+        start = time.monotonic()
+        self.lock_wait = 0.0
+        new_partitions = self._get_new_partitions_from_default()
+        key_columns = self._get_key_columns() if new_partitions else []
+        created = []
+        staged = []
+        try:
+            if new_partitions:
+                with transaction.atomic():
+                    self._track_default_changes(key_columns)
+            for p_from, p_to in new_partitions:
+                partition_name = f"{self.partitioned_table}_{p_from.strftime('%Y_%m')}"
+                staging_table = f"__{partition_name}"
+                LOG.info(
+                    f"Staging {self.schema_name}.{self.default_partition} data for {self.partition_key} "
+                    + f"values from {p_from} to {p_to} in {self.schema_name}.{staging_table}"
+                )
+                with transaction.atomic():
+                    self._create_staging_table(staging_table, p_from, p_to)
+                created.append(staging_table)
+                if key_columns:
+                    num_rows = self._copy_to_staging(staging_table, p_from, p_to, key_columns)
+                else:
+                    num_rows = self._copy_all_to_staging(staging_table, p_from, p_to)
+                with transaction.atomic():
+                    self._create_staging_indexes(staging_table)
+                staged.append((partition_name, staging_table, p_from, p_to, num_rows))
+
+            if staged:
+                staged = self._attach_with_retries(staged, key_columns)
+        except Exception:
+            self._drop_staging_tables(created)
+            raise
+
+        return RepartitionResult(
+            self.schema_name,
+            self.partitioned_table,
+            len(staged),
+            sum(s[4] for s in staged),
+            self.lock_wait,
+            time.monotonic() - start,
+        )
+
+
 def get_partitioned_tables_with_default(schema_name=None, partitioned_table_name=None):
     default_partition_sql = """
 SELECT dp.relnamespace::regnamespace::text as "schema_name",
@@ -1281,21 +1700,63 @@ SELECT dp.relnamespace::regnamespace::text as "schema_name",
     return default_partitions
 
 
-# This is a crawler interface to the PartitionDefaultData class
-def repartition_default_data(schema_name=None, partitioned_table_name=None):
+def _repartition_default_partition(default_rec):
+    default_partitioner = StagedPartitionDefaultData(
+        default_rec["schema_name"],
+        default_rec["partitioned_table"],
+        default_partition=default_rec["default_partition"],
+    )
+    return default_partitioner.repartition_default_data()
+
+
+def _repartition_default_partition_in_thread(default_rec):
+    try:
+        return _repartition_default_partition(default_rec)
+    finally:
+        conn.close()
+
+
+# This is a crawler interface to the StagedPartitionDefaultData class
+def repartition_default_data(schema_name=None, partitioned_table_name=None, max_workers=None):
     """
     Move any data in a default partition to the requisite partition.
-    Unless constrained to a schema or table, it will crawl over all schemata and default table partitions
+    Unless constrained to a schema or table, it will crawl over all schemata and default table partitions.
+    Default partitions are independent of each other, so up to max_workers of them are repartitioned
+    at once, each on its own connection. Inside a transaction they are repartitioned one at a time
+    on the current connection, since other connections could not see its uncommitted data.
+    A failure is raised once every default partition has been tried.
     Params:
         schema_name (str) : Constrain to specified schema
         partitioned_table_name (str) : Constrain to specified partitioned table
+        max_workers (int) : Number of default partitions repartitioned at once
+    Returns:
+        list(RepartitionResult) : The results of the default partitions that were repartitioned
     """
     default_partitions = get_partitioned_tables_with_default(schema_name, partitioned_table_name)
-
-    for default_rec in default_partitions:
-        default_partitioner = PartitionDefaultData(
-            default_rec["schema_name"],
-            default_rec["partitioned_table"],
-            default_partition=default_rec["default_partition"],
-        )
-        default_partitioner.repartition_default_data()
+    max_workers = max_workers or settings.REPARTITION_MAX_WORKERS
+
+    results = []
+    if max_workers == 1 or conn.in_atomic_block:
+        for default_rec in default_partitions:
+            results.append(_repartition_default_partition(default_rec))
+        return results
+
+    # Every default partition gets its chance before the first failure is raised
+    errors = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_repartition_default_partition_in_thread, default_rec): default_rec
+            for default_rec in default_partitions
+        }
+        for future in as_completed(futures):
+            default_rec = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as err:
+                LOG.error(
+                    f"Repartitioning {default_rec['schema_name']}.{default_rec['default_partition']} failed: {err}"
+                )
+                errors.append(err)
+    if errors:
+        raise errors[0]
+    return results
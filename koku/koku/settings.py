@@ -180,6 +180,11 @@ WSGI_APPLICATION = "koku.wsgi.application"
 
 WORKER_CACHE_KEY = "worker"
 CACHE_MIDDLEWARE_SECONDS = ENVIRONMENT.get_value("CACHE_TIMEOUT", default=3600)
+# Report responses for finalized months are cached in a separate tier that is only
+# invalidated when finalized data is reprocessed. A month is finalized once this many
+# days of the next month have passed.
+CACHE_FINALIZED_SECONDS = ENVIRONMENT.int("CACHE_FINALIZED_TIMEOUT", default=604800)
+CACHE_FINALIZED_GRACE_DAYS = ENVIRONMENT.int("CACHE_FINALIZED_GRACE_DAYS", default=15)
 
 HOSTNAME = ENVIRONMENT.get_value("HOSTNAME", default="localhost")
 
@@ -233,6 +238,21 @@ else:
 
 if ENVIRONMENT.get_value("CACHED_VIEWS_DISABLED", default=False):
     CACHES.update({"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
+
+# Per-tenant tag key registry used to validate report query parameters.
+TAG_KEYS_CACHE_ENABLED = ENVIRONMENT.bool("TAG_KEYS_CACHE_ENABLED", default=True)
+# Seconds an API process keeps its local copy of a tenant's tag keys
+TAG_KEYS_CACHE_LOCAL_TTL = ENVIRONMENT.int("TAG_KEYS_CACHE_LOCAL_TTL", default=60)
+# Previous-period totals used for report deltas, kept until masu rebuilds the period's summaries.
+REPORT_DELTAS_CACHE_ENABLED = ENVIRONMENT.bool("REPORT_DELTAS_CACHE_ENABLED", default=True)
+REPORT_DELTAS_CACHE_TTL = ENVIRONMENT.int("REPORT_DELTAS_CACHE_TTL", default=86400)
+
+# Opt-in profiling of report API requests.
+# Fraction of report requests profiled, between 0 and 1
+REPORT_PROFILING_SAMPLE_RATE = ENVIRONMENT.float("REPORT_PROFILING_SAMPLE_RATE", default=0.0)
+# Allow a client to profile a single request with the X-Koku-Profile header
+REPORT_PROFILING_HEADER_ENABLED = ENVIRONMENT.bool("REPORT_PROFILING_HEADER_ENABLED", default=False)
+
 DATABASES = {"default": database.config()}
 
 DATABASE_ROUTERS = ("tenant_schemas.routers.TenantSyncRouter",)
@@ -244,6 +264,8 @@ HIVE_DATABASE_PASSWORD = ENVIRONMENT.get_value("HIVE_DATABASE_PASSWORD", default
 
 #
 TENANT_MODEL = "api.Tenant"
+# Only SET search_path when the schema of a connection changes, see koku.pg_backend
+TENANT_LIMIT_SET_CALLS = True
 
 PROMETHEUS_EXPORT_MIGRATIONS = False
 
@@ -459,6 +481,24 @@ S3_ACCESS_KEY = ENVIRONMENT.get_value("S3_ACCESS_KEY", default=None)
 S3_SECRET = ENVIRONMENT.get_value("S3_SECRET", default=None)
 ENABLE_S3_ARCHIVING = ENVIRONMENT.bool("ENABLE_S3_ARCHIVING", default=False)
 ENABLE_PARQUET_PROCESSING = ENVIRONMENT.bool("ENABLE_PARQUET_PROCESSING", default=False)
+# Seconds to wait for more manifests of a provider before summarizing them in one run.
+# Off by default, so summaries are queued as soon as a manifest is ready.
+SUMMARY_COALESCE_WINDOW = ENVIRONMENT.int("SUMMARY_COALESCE_WINDOW", default=0)
+# Query only the dates in the requested page of OCP reports instead of paginating the whole report.
+REPORT_QUERY_PAGINATION = ENVIRONMENT.bool("REPORT_QUERY_PAGINATION", default=False)
+# Copy report line items into Postgres on a separate thread while the next batch is parsed.
+REPORT_PROCESSING_PIPELINED_COPY = ENVIRONMENT.bool("REPORT_PROCESSING_PIPELINED_COPY", default=False)
+# Cluster summarized daily summary partitions on (usage_start, source_uuid) when their rows drift out of date order.
+# CLUSTER holds an exclusive lock on the partition while it is rewritten.
+REPORT_SUMMARY_CLUSTER_PARTITIONS = ENVIRONMENT.bool("REPORT_SUMMARY_CLUSTER_PARTITIONS", default=False)
+# File format of the normalized data export, either "csv.gz" or "parquet"
+NORMALIZED_DATA_EXPORT_FORMAT = ENVIRONMENT.get_value("NORMALIZED_DATA_EXPORT_FORMAT", default="csv.gz")
+# Size in MB of each part of a streamed multipart upload (S3 requires at least 5)
+NORMALIZED_DATA_EXPORT_PART_SIZE = ENVIRONMENT.int("NORMALIZED_DATA_EXPORT_PART_SIZE", default=16)
+# Export GCP BigQuery results straight to daily Parquet files instead of going through CSV
+ENABLE_GCP_ARROW_EXPORT = ENVIRONMENT.bool("ENABLE_GCP_ARROW_EXPORT", default=False)
+# Keep archiving daily CSV files to S3 when the GCP Arrow export is enabled
+GCP_ARROW_EXPORT_CSV_ARCHIVES = ENVIRONMENT.bool("GCP_ARROW_EXPORT_CSV_ARCHIVES", default=False)
 
 # Presto Settings
 PRESTO_HOST = ENVIRONMENT.get_value("PRESTO_HOST", default=None)
@@ -466,6 +506,22 @@ PRESTO_PORT = ENVIRONMENT.get_value("PRESTO_PORT", default=None)
 
 # Time to wait between cold storage retrieval for data export. Default is 3 hours
 COLD_STORAGE_RETRIVAL_WAIT_TIME = int(os.getenv("COLD_STORAGE_RETRIVAL_WAIT_TIME", default="10800"))
+# Number of S3 prefixes synced at once for a data export
+DATA_EXPORT_SYNC_WORKERS = ENVIRONMENT.int("DATA_EXPORT_SYNC_WORKERS", default=16)
+# Attempts made for each S3 request of a data export sync, with exponential backoff
+DATA_EXPORT_SYNC_MAX_ATTEMPTS = ENVIRONMENT.int("DATA_EXPORT_SYNC_MAX_ATTEMPTS", default=10)
+
+# Maximum MB of reporting tables read by the nightly vacuum, 0 for no limit
+VACUUM_IO_BUDGET = ENVIRONMENT.int("VACUUM_IO_BUDGET", default=0)
+# Number of tables vacuumed at once by the nightly vacuum
+VACUUM_MAX_WORKERS = ENVIRONMENT.int("VACUUM_MAX_WORKERS", default=4)
+
+# Number of default partitions repartitioned at once, each on its own connection
+REPARTITION_MAX_WORKERS = ENVIRONMENT.int("REPARTITION_MAX_WORKERS", default=4)
+# Rows copied from a default partition to a staging partition per transaction
+REPARTITION_BATCH_SIZE = ENVIRONMENT.int("REPARTITION_BATCH_SIZE", default=50000)
+# Milliseconds to wait for the locks needed to attach staged partitions before retrying
+REPARTITION_LOCK_TIMEOUT = ENVIRONMENT.int("REPARTITION_LOCK_TIMEOUT", default=5000)
 
 # Sources Client API Endpoints
 KOKU_SOURCES_CLIENT_HOST = ENVIRONMENT.get_value("KOKU_SOURCES_CLIENT_HOST", default="localhost")
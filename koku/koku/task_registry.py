@@ -0,0 +1,291 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Registry of the celery tasks running on each worker."""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from uuid import uuid4
+
+from celery import bootsteps
+from celery.signals import task_postrun
+from celery.signals import task_prerun
+from celery.signals import worker_process_shutdown
+from django.core.cache import caches
+
+LOG = logging.getLogger(__name__)
+
+# Seconds between two heartbeats of a worker
+HEARTBEAT_INTERVAL = 30
+# A worker without a heartbeat for this many seconds is offline
+HEARTBEAT_TIMEOUT = 3 * HEARTBEAT_INTERVAL
+# Seconds a process may hold the lock guarding a registry entry
+LOCK_TIMEOUT = 30
+# Seconds after which a task still registered as running is assumed lost
+TASK_TIMEOUT = 24 * 60 * 60
+
+# The tasks registered by this process, {task_id: task_name}
+_PROCESS_TASKS = {}
+
+
+class TaskRegistryLockError(Exception):
+    """The lock guarding a registry entry could not be taken."""
+
+
+class TaskRegistry:
+    """The celery tasks running on each worker, kept in the worker cache.
+
+    Workers record each task as it starts and finishes through the celery
+    task_prerun and task_postrun signals, and record that they are alive
+    with a heartbeat listing the pool processes running their tasks. Checking
+    whether a task is running reads the entry of its task name instead of
+    broadcasting an inspect request to every worker. Tasks registered by a
+    worker that stopped sending heartbeats, or by a pool process that is gone
+    (killed for memory or by the hard time limit, so that task_postrun never
+    ran), are ignored.
+
+    Format:
+
+        cache_key                               |  value
+        "celery-registry:workers"               |  {"celery@koku-worker-0", "celery@koku-worker-1"}
+        "celery-registry:heartbeat:{hostname}"  |  {"time": ..., "pids": [...]}, expires when the worker stops
+        "celery-registry:names"                 |  {"masu.processor.tasks.update_summary_tables", ...}
+        "celery-registry:tasks:{task_name}"     |  {task_id: {"name": ..., "args": [...], "hostname": ..., "pid": ...}}
+
+    """
+
+    workers_key = "celery-registry:workers"
+    names_key = "celery-registry:names"
+
+    @property
+    def cache(self):
+        """Return the worker cache."""
+        return caches["worker"]
+
+    @staticmethod
+    def _heartbeat_key(hostname):
+        """Return the cache key of a worker heartbeat."""
+        return f"celery-registry:heartbeat:{hostname}"
+
+    @staticmethod
+    def _tasks_key(task_name):
+        """Return the cache key of the running tasks with a task name."""
+        return f"celery-registry:tasks:{task_name}"
+
+    @contextmanager
+    def _lock(self, key):
+        """Serialize updates of a registry entry across workers.
+
+        Raises:
+            (TaskRegistryLockError): The lock was not released by its holder in time.
+
+        """
+        lock_key = f"{key}:lock"
+        token = uuid4().hex
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while not self.cache.add(lock_key, token, LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                raise TaskRegistryLockError(f"Timed out waiting for {lock_key}")
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            # A lock held past its timeout may already belong to another process
+            if self.cache.get(lock_key) == token:
+                self.cache.delete(lock_key)
+
+    def _add_member(self, key, member):
+        """Add a member to a set kept in the cache."""
+        if member in self.cache.get(key, set()):
+            return
+        with self._lock(key):
+            members = self.cache.get(key, set())
+            members.add(member)
+            self.cache.set(key, members, None)
+
+    def _discard_member(self, key, member):
+        """Remove a member from a set kept in the cache."""
+        with self._lock(key):
+            members = self.cache.get(key, set())
+            if member in members:
+                members.remove(member)
+                self.cache.set(key, members, None)
+
+    def heartbeat(self, hostname, pids=None):
+        """Record that a worker is alive.
+
+        Args:
+            hostname (str): The worker hostname.
+            pids (list): The pool processes of the worker, None if unknown.
+
+        """
+        self.cache.set(self._heartbeat_key(hostname), {"time": time.time(), "pids": pids}, HEARTBEAT_TIMEOUT)
+        self._add_member(self.workers_key, hostname)
+
+    def worker_stopped(self, hostname):
+        """Record that a worker shut down."""
+        self.cache.delete(self._heartbeat_key(hostname))
+        self._discard_member(self.workers_key, hostname)
+
+    def get_live_workers(self):
+        """Return the hostnames of the workers with a recent heartbeat."""
+        return set(self._get_live_pids())
+
+    def _get_live_pids(self):
+        """Return the pool processes of the workers with a recent heartbeat, {hostname: pids or None}."""
+        hostnames = self.cache.get(self.workers_key, set())
+        heartbeats = self.cache.get_many([self._heartbeat_key(hostname) for hostname in hostnames])
+        return {
+            hostname: heartbeats[self._heartbeat_key(hostname)].get("pids")
+            for hostname in hostnames
+            if self._heartbeat_key(hostname) in heartbeats
+        }
+
+    def task_started(self, task_id, task_name, args, hostname, pid=None, now=None):
+        """Register a task that started running on a worker."""
+        now = time.time() if now is None else now
+        self._add_member(self.names_key, task_name)
+        key = self._tasks_key(task_name)
+        with self._lock(key):
+            tasks = {
+                running_id: task
+                for running_id, task in self.cache.get(key, {}).items()
+                if now - task["started"] < TASK_TIMEOUT
+            }
+            tasks[task_id] = {
+                "name": task_name,
+                "args": list(args or []),
+                "hostname": hostname,
+                "pid": pid,
+                "started": now,
+            }
+            self.cache.set(key, tasks, TASK_TIMEOUT)
+
+    def task_finished(self, task_id, task_name):
+        """Remove a task that finished running."""
+        key = self._tasks_key(task_name)
+        with self._lock(key):
+            tasks = self.cache.get(key, {})
+            if tasks.pop(task_id, None) is not None:
+                self.cache.set(key, tasks, TASK_TIMEOUT)
+
+    def get_running_tasks(self, task_name=None):
+        """Return the tasks running on live workers, keyed by task id.
+
+        Args:
+            task_name (str): Only return the tasks with this name.
+
+        Returns:
+            (dict): {task_id: {"name": ..., "args": [...], "hostname": ..., "pid": ..., "started": ...}}
+
+        """
+        task_names = [task_name] if task_name else self.cache.get(self.names_key, set())
+        entries = self.cache.get_many([self._tasks_key(name) for name in task_names])
+        if not entries:
+            return {}
+        live_pids = self._get_live_pids()
+        return {
+            task_id: task
+            for tasks in entries.values()
+            for task_id, task in tasks.items()
+            if self._is_live(task, live_pids)
+        }
+
+    @staticmethod
+    def _is_live(task, live_pids):
+        """Return True if the worker process that registered a task is still running."""
+        if task["hostname"] not in live_pids:
+            return False
+        pids = live_pids[task["hostname"]]
+        return pids is None or task.get("pid") is None or task["pid"] in pids
+
+    def is_running(self, task_name, check_args=None, exclude_task_id=None):
+        """Check if a task is running, optionally with all of check_args among its args.
+
+        Args:
+            task_name (str): The full name of the task.
+            check_args (list): Args the running task must have been called with.
+            exclude_task_id (str): A task id to ignore, usually the task doing the check.
+
+        """
+        for task_id, task in self.get_running_tasks(task_name).items():
+            if task_id == exclude_task_id:
+                continue
+            if all(arg in task["args"] for arg in check_args or []):
+                return True
+        return False
+
+
+class WorkerHeartbeat(bootsteps.StartStopStep):
+    """Send the task registry heartbeat of a worker while it runs."""
+
+    requires = {"celery.worker.components:Timer"}
+
+    def __init__(self, worker, **kwargs):
+        """Initialize the step."""
+        self.timer_ref = None
+
+    @staticmethod
+    def _pool_pids(worker):
+        """Return the pids of the processes running the tasks of a worker, None while unknown."""
+        pool = getattr(worker, "pool", None)
+        if pool is None:
+            return None
+        # Pools without child processes run their tasks in the worker process
+        return list(pool.info.get("processes") or [os.getpid()])
+
+    def beat(self, worker):
+        """Refresh the heartbeat of the worker and of its pool processes."""
+        TaskRegistry().heartbeat(worker.hostname, self._pool_pids(worker))
+
+    def start(self, worker):
+        """Record the worker as alive and keep refreshing its heartbeat."""
+        self.beat(worker)
+        self.timer_ref = worker.timer.call_repeatedly(HEARTBEAT_INTERVAL, self.beat, (worker,))
+
+    def stop(self, worker):
+        """Record the worker as stopped."""
+        if self.timer_ref:
+            self.timer_ref.cancel()
+            self.timer_ref = None
+        TaskRegistry().worker_stopped(worker.hostname)
+
+
+@task_prerun.connect
+def register_task_start(task_id=None, task=None, args=None, **kwargs):
+    """Register a task as it starts running on a worker."""
+    # Tasks run eagerly are not running on a worker
+    if not task.request.is_eager:
+        _PROCESS_TASKS[task_id] = task.name
+        TaskRegistry().task_started(task_id, task.name, args, task.request.hostname, pid=os.getpid())
+
+
+@task_postrun.connect
+def register_task_end(task_id=None, task=None, **kwargs):
+    """Remove a task from the registry once it finishes."""
+    if not task.request.is_eager:
+        _PROCESS_TASKS.pop(task_id, None)
+        TaskRegistry().task_finished(task_id, task.name)
+
+
+@worker_process_shutdown.connect
+def register_process_end(**kwargs):
+    """Remove the tasks of a pool process that exits while they run."""
+    registry = TaskRegistry()
+    for task_id, task_name in list(_PROCESS_TASKS.items()):
+        registry.task_finished(task_id, task_name)
+    _PROCESS_TASKS.clear()
@@ -15,33 +15,34 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 """Test Celery utility functions."""
-from unittest.mock import patch
-
 from api.iam.test.iam_test_case import IamTestCase
 from koku.celery import is_task_currently_running
+from koku.task_registry import TaskRegistry
 
 
 class CeleryTest(IamTestCase):
-    @patch("koku.celery.CELERY_INSPECT")
-    def test_is_task_currently_running(self, mock_inspect):
-        """Test the various conditions for our running task checker."""
-        mock_inspect.active.return_value = {
-            "celery@koku-worker-1": [
-                {
-                    "id": "26256b1d-b0d8-4822-ba70-73da82af9542",
-                    "name": "masu.processor.tasks.update_summary_tables",
-                    "args": ["acct10001", "AWS-local", "2878097c-7693-4a4a-9726-e75124457805", "2020-08-01", None],
-                    "kwargs": {},
-                    "type": "masu.processor.tasks.update_summary_tables",
-                    "hostname": "celery@koku-worker-1",
-                    "time_start": 1597940661.4609702,
-                    "acknowledged": True,
-                    "delivery_info": {"exchange": "", "routing_key": "celery", "priority": 0, "redelivered": False},
-                    "worker_pid": 68,
-                }
-            ]
-        }
+    def setUp(self):
+        """Register a running task."""
+        super().setUp()
+        self.registry = TaskRegistry()
+        self.registry.heartbeat("celery@koku-worker-1")
+        self.registry.task_started(
+            "26256b1d-b0d8-4822-ba70-73da82af9542",
+            "masu.processor.tasks.update_summary_tables",
+            ["acct10001", "AWS-local", "2878097c-7693-4a4a-9726-e75124457805", "2020-08-01", None],
+            "celery@koku-worker-1",
+        )
 
+    def tearDown(self):
+        """Remove the running task."""
+        self.registry.task_finished(
+            "26256b1d-b0d8-4822-ba70-73da82af9542", "masu.processor.tasks.update_summary_tables"
+        )
+        self.registry.worker_stopped("celery@koku-worker-1")
+        super().tearDown()
+
+    def test_is_task_currently_running(self):
+        """Test the various conditions for our running task checker."""
         # No task ID
         self.assertTrue(
             is_task_currently_running("masu.processor.tasks.update_summary_tables", None, check_args=["acct10001"])
@@ -0,0 +1,152 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Test the celery task registry."""
+from unittest.mock import Mock
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.test import TestCase
+
+from koku.task_registry import register_process_end
+from koku.task_registry import register_task_end
+from koku.task_registry import register_task_start
+from koku.task_registry import TASK_TIMEOUT
+from koku.task_registry import TaskRegistry
+from koku.task_registry import TaskRegistryLockError
+from koku.task_registry import WorkerHeartbeat
+
+TASK_NAME = "masu.processor.tasks.update_summary_tables"
+
+
+class TaskRegistryTest(TestCase):
+    """Test cases for the celery task registry."""
+
+    def setUp(self):
+        """Start from an empty registry."""
+        super().setUp()
+        caches["worker"].clear()
+        self.registry = TaskRegistry()
+
+    def test_task_started_and_finished(self):
+        """Test that a task is running between its start and finish."""
+        self.registry.heartbeat("celery@worker-1")
+        self.registry.task_started("task-1", TASK_NAME, ["acct10001", "AWS"], "celery@worker-1")
+        self.assertTrue(self.registry.is_running(TASK_NAME))
+        self.assertTrue(self.registry.is_running(TASK_NAME, ["acct10001"]))
+        self.assertFalse(self.registry.is_running(TASK_NAME, ["acct10002"]))
+        self.assertFalse(self.registry.is_running(TASK_NAME, exclude_task_id="task-1"))
+        self.assertFalse(self.registry.is_running("masu.processor.tasks.update_cost_model_costs"))
+
+        self.registry.task_finished("task-1", TASK_NAME)
+        self.assertFalse(self.registry.is_running(TASK_NAME))
+
+    def test_get_running_tasks(self):
+        """Test that the running tasks of every name are returned."""
+        self.registry.heartbeat("celery@worker-1")
+        self.registry.task_started("task-1", TASK_NAME, [], "celery@worker-1")
+        self.registry.task_started("task-2", "masu.celery.tasks.vacuum_schemas", [], "celery@worker-1")
+        self.assertEqual(set(self.registry.get_running_tasks()), {"task-1", "task-2"})
+        self.assertEqual(set(self.registry.get_running_tasks(TASK_NAME)), {"task-1"})
+
+    def test_tasks_of_offline_workers_ignored(self):
+        """Test that tasks of a worker without a heartbeat are not running."""
+        self.registry.heartbeat("celery@worker-1")
+        self.registry.task_started("task-1", TASK_NAME, [], "celery@worker-2")
+        self.assertFalse(self.registry.is_running(TASK_NAME))
+
+        self.registry.heartbeat("celery@worker-2")
+        self.assertTrue(self.registry.is_running(TASK_NAME))
+        self.assertEqual(self.registry.get_live_workers(), {"celery@worker-1", "celery@worker-2"})
+
+        self.registry.worker_stopped("celery@worker-2")
+        self.assertFalse(self.registry.is_running(TASK_NAME))
+        self.assertEqual(self.registry.get_live_workers(), {"celery@worker-1"})
+
+    def test_lost_tasks_pruned(self):
+        """Test that tasks registered for longer than TASK_TIMEOUT are dropped."""
+        self.registry.heartbeat("celery@worker-1")
+        self.registry.task_started("task-1", TASK_NAME, [], "celery@worker-1", now=0)
+        self.registry.task_started("task-2", TASK_NAME, [], "celery@worker-1", now=TASK_TIMEOUT)
+        self.assertEqual(set(self.registry.get_running_tasks(TASK_NAME)), {"task-2"})
+
+    def test_tasks_of_dead_processes_ignored(self):
+        """Test that tasks of a pool process that was killed are not running."""
+        self.registry.heartbeat("celery@worker-1", pids=[101, 102])
+        self.registry.task_started("task-1", TASK_NAME, [], "celery@worker-1", pid=101)
+        self.assertTrue(self.registry.is_running(TASK_NAME))
+
+        # The pool replaced process 101, e.g. after the hard time limit or an OOM kill
+        self.registry.heartbeat("celery@worker-1", pids=[102, 103])
+        self.assertFalse(self.registry.is_running(TASK_NAME))
+        self.assertEqual(self.registry.get_live_workers(), {"celery@worker-1"})
+
+    def test_process_shutdown_removes_its_tasks(self):
+        """Test that a pool process exiting removes the tasks it registered."""
+        self.registry.heartbeat("celery@worker-1")
+        task = Mock(request=Mock(hostname="celery@worker-1", is_eager=False))
+        task.name = TASK_NAME
+        register_task_start(task_id="task-1", task=task, args=[])
+        self.assertTrue(self.registry.is_running(TASK_NAME))
+
+        register_process_end()
+        self.assertFalse(self.registry.is_running(TASK_NAME))
+
+    def test_lock_timeout(self):
+        """Test that a lock held by another process is neither skipped nor released."""
+        self.registry.cache.set(f"{self.registry.workers_key}:lock", "other-process", 30)
+        with patch("koku.task_registry.LOCK_TIMEOUT", 0):
+            with self.assertRaises(TaskRegistryLockError):
+                self.registry.worker_stopped("celery@worker-1")
+        self.assertEqual(self.registry.cache.get(f"{self.registry.workers_key}:lock"), "other-process")
+
+    def test_lock_released_by_owner_only(self):
+        """Test that a lock taken over after its timeout is left to its new holder."""
+        lock_key = f"{self.registry.workers_key}:lock"
+        with self.registry._lock(self.registry.workers_key):
+            self.registry.cache.set(lock_key, "other-process", 30)
+        self.assertEqual(self.registry.cache.get(lock_key), "other-process")
+
+    def test_signals_register_worker_tasks(self):
+        """Test that tasks are registered by the prerun and postrun signals, except eager ones."""
+        self.registry.heartbeat("celery@worker-1")
+        task = Mock(request=Mock(hostname="celery@worker-1", is_eager=False))
+        task.name = TASK_NAME
+        register_task_start(task_id="task-1", task=task, args=["acct10001"])
+        self.assertTrue(self.registry.is_running(TASK_NAME, ["acct10001"]))
+        register_task_end(task_id="task-1", task=task)
+        self.assertFalse(self.registry.is_running(TASK_NAME))
+
+        task.request.is_eager = True
+        register_task_start(task_id="task-2", task=task, args=["acct10001"])
+        self.assertFalse(self.registry.is_running(TASK_NAME))
+
+    def test_worker_heartbeat_step(self):
+        """Test that the worker step keeps the worker alive until it stops."""
+        worker = Mock(hostname="celery@worker-1")
+        worker.pool.info = {"processes": [101, 102]}
+        step = WorkerHeartbeat(worker)
+        step.start(worker)
+        worker.timer.call_repeatedly.assert_called_once()
+        self.assertEqual(self.registry.get_live_workers(), {"celery@worker-1"})
+        self.registry.task_started("task-1", TASK_NAME, [], "celery@worker-1", pid=101)
+        self.assertTrue(self.registry.is_running(TASK_NAME))
+        self.registry.task_started("task-2", TASK_NAME, [], "celery@worker-1", pid=999)
+        self.assertEqual(set(self.registry.get_running_tasks(TASK_NAME)), {"task-1"})
+
+        step.stop(worker)
+        worker.timer.call_repeatedly.return_value.cancel.assert_called_once()
+        self.assertEqual(self.registry.get_live_workers(), set())
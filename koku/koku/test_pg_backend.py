@@ -0,0 +1,137 @@
+#
+# Copyright 2020 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Test the connection reuse of the koku PostgreSQL backend."""
+from unittest.mock import patch
+
+from django.db import connection
+from django.db import connections
+from django.db import transaction
+from prometheus_client import REGISTRY
+from tenant_schemas.utils import schema_context
+
+from api.iam.test.iam_test_case import IamTestCase
+from koku.pg_backend.base import close_pools
+from koku.pg_backend.base import DatabaseWrapper
+
+
+def make_wrapper(**settings):
+    """Return a new connection to the test database with extra settings."""
+    return DatabaseWrapper({**connection.settings_dict, **settings}, alias="pg_backend_test")
+
+
+def current_schema():
+    """Return the schema the default connection resolves unqualified tables in."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT current_schema()")
+        return cursor.fetchone()[0]
+
+
+class PGBackendTest(IamTestCase):
+    """Test cases for the koku PostgreSQL backend."""
+
+    def test_search_path_reused(self):
+        """Test that entering the schema a connection already uses does not set the search path again."""
+        reused_before = REGISTRY.get_sample_value("koku_db_search_path_reused_total") or 0
+        with schema_context(self.schema_name):
+            self.assertEqual(current_schema(), self.schema_name)
+        with schema_context(self.schema_name):
+            self.assertEqual(current_schema(), self.schema_name)
+        self.assertGreater(REGISTRY.get_sample_value("koku_db_search_path_reused_total"), reused_before)
+
+        with schema_context("public"):
+            self.assertEqual(current_schema(), "public")
+
+    def test_search_path_after_savepoint_rollback(self):
+        """Test that a search path undone by a savepoint rollback is set again."""
+        with schema_context(self.schema_name):
+            self.assertEqual(current_schema(), self.schema_name)
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    connection.set_schema_to_public()
+                    self.assertEqual(current_schema(), "public")
+                    raise ValueError("rolled back")
+            self.assertIsNone(connection.applied_search_path)
+            connection.set_schema(self.schema_name)
+            self.assertEqual(current_schema(), self.schema_name)
+
+    def test_search_path_after_rollback(self):
+        """Test that a search path undone by rolling back the outer transaction is set again."""
+        # The test case runs in a transaction, so register a connection of its own to roll back
+        wrapper = make_wrapper()
+        self.addCleanup(wrapper.close)
+        setattr(connections._connections, wrapper.alias, wrapper)
+        self.addCleanup(delattr, connections._connections, wrapper.alias)
+
+        def search_path():
+            with wrapper.cursor() as cursor:
+                cursor.execute("SHOW search_path")
+                return cursor.fetchone()[0]
+
+        wrapper.set_schema(self.schema_name)
+        with self.assertRaises(ValueError):
+            with transaction.atomic(using=wrapper.alias):
+                self.assertIn(self.schema_name, search_path())
+                raise ValueError("rolled back")
+        self.assertIsNone(wrapper.applied_search_path)
+        self.assertFalse(wrapper.search_path_set)
+        self.assertIn(self.schema_name, search_path())
+
+    def test_health_check_reconnects(self):
+        """Test that a persistent connection is checked before reuse and replaced when broken."""
+        wrapper = make_wrapper(CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True)
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        first = wrapper.connection
+
+        # End of a request: the connection is kept, and checked again on the next one
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertIs(wrapper.connection, first)
+        self.assertFalse(wrapper.health_check_done)
+        with patch.object(wrapper, "is_usable", return_value=True) as mock_usable:
+            wrapper.ensure_connection()
+            wrapper.ensure_connection()
+        mock_usable.assert_called_once()
+        self.assertIs(wrapper.connection, first)
+
+        wrapper.close_if_unusable_or_obsolete()
+        with patch.object(wrapper, "is_usable", return_value=False):
+            wrapper.ensure_connection()
+        self.assertIsNot(wrapper.connection, first)
+
+    def test_no_health_check_without_persistent_connections(self):
+        """Test that connections closed after each request are not checked."""
+        wrapper = make_wrapper(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=True)
+        self.assertFalse(wrapper.health_check_enabled)
+
+    def test_pool_reuses_connections(self):
+        """Test that closed connections go back to the pool and the next connect takes them."""
+        self.addCleanup(close_pools)
+        wrapper = make_wrapper(CONN_MAX_AGE=0, POOL_SIZE=1)
+        wrapper.ensure_connection()
+        first = wrapper.connection
+        wrapper.close()
+        self.assertFalse(first.closed)
+
+        wrapper.ensure_connection()
+        self.assertIs(wrapper.connection, first)
+
+        # The pool is empty, so another thread gets a connection of its own
+        other = make_wrapper(CONN_MAX_AGE=0, POOL_SIZE=1)
+        other.ensure_connection()
+        self.assertIsNot(other.connection, first)
+        other.close()
+        wrapper.close()
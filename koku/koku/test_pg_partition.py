@@ -1,4 +1,5 @@
 import uuid
+from unittest.mock import patch
 
 from django.db import connection as conn
 from tenant_schemas.utils import schema_context
@@ -623,3 +624,138 @@ select (
                 )
                 res = cur.fetchone()
             self.assertEqual(res, (1, 2))
+
+    def test_repartition_all_tables_error(self):
+        """
+        Test that a failed repartition is raised to the caller
+        """
+        with patch("koku.pg_partition._repartition_default_partition", side_effect=ppart.DatabaseError("boom")):
+            with self.assertRaises(ppart.DatabaseError):
+                ppart.repartition_default_data(schema_name=self.schema_name)
+
+    def test_staged_repartition_table(self):
+        """
+        Repartition one table through staging tables in keyset batches
+        """
+        table_name = AWSCostEntryLineItemDailySummary._meta.db_table
+        with schema_context(self.schema_name):
+            aws_lids = list(AWSCostEntryLineItemDailySummary.objects.order_by("-usage_start")[:2])
+            usage_start = aws_lids[0].usage_start.replace(year=(aws_lids[0].usage_start.year + 12), day=1)
+            for lids in aws_lids:
+                lids.usage_start = usage_start
+                lids.save()
+            newpart = f"{table_name}_{usage_start.strftime('%Y_%m')}"
+
+            result = ppart.StagedPartitionDefaultData(
+                self.schema_name, table_name, batch_size=1
+            ).repartition_default_data()
+            self.assertEqual(result.partitions, 1)
+            self.assertEqual(result.rows, 2)
+
+            with conn.cursor() as cur:
+                cur.execute(f"select count(*) from {table_name}_default;")
+                self.assertEqual(cur.fetchone()[0], 0)
+                cur.execute(f"select count(*) from {newpart};")
+                self.assertEqual(cur.fetchone()[0], 2)
+                cur.execute(
+                    """
+select c.relispartition,
+       (select count(*) from pg_index i where i.indrelid = c.oid) as "num_indexes",
+       (select count(*) from pg_constraint k where k.conrelid = c.oid and k.conname = %s) as "num_bounds",
+       (select count(*) from pg_index i where i.indrelid = p.oid) as "num_parent_indexes"
+  from pg_class c
+  join pg_class p
+    on p.relname = %s
+   and p.relnamespace = c.relnamespace
+ where c.relnamespace = %s::regnamespace
+   and c.relname = %s;
+""",
+                    ("__repartition_bounds", table_name, self.schema_name, newpart),
+                )
+                is_partition, num_indexes, num_bounds, num_parent_indexes = cur.fetchone()
+            self.assertTrue(is_partition)
+            self.assertEqual(num_indexes, num_parent_indexes)
+            self.assertEqual(num_bounds, 0)
+
+            with conn.cursor() as cur:
+                cur.execute(
+                    "select active, partition_parameters from partitioned_tables where table_name = %s;", (newpart,)
+                )
+                active, partition_parameters = cur.fetchone()
+            self.assertTrue(active)
+            self.assertFalse(partition_parameters["default"])
+
+    def test_staged_repartition_default_updated(self):
+        """
+        Test that a row updated in the default partition during the copy is moved with its update
+        """
+        table_name = AWSCostEntryLineItemDailySummary._meta.db_table
+        with schema_context(self.schema_name):
+            aws_lids = AWSCostEntryLineItemDailySummary.objects.order_by("-usage_start")[0]
+            aws_lids.usage_start = aws_lids.usage_start.replace(year=(aws_lids.usage_start.year + 13))
+            aws_lids.save()
+            newpart = f"{table_name}_{aws_lids.usage_start.strftime('%Y_%m')}"
+
+            partitioner = ppart.StagedPartitionDefaultData(self.schema_name, table_name)
+            create_staging_indexes = partitioner._create_staging_indexes
+
+            def update_then_create_indexes(staging_table):
+                AWSCostEntryLineItemDailySummary.objects.filter(uuid=aws_lids.uuid).update(unblended_cost=42)
+                create_staging_indexes(staging_table)
+
+            with patch.object(partitioner, "_create_staging_indexes", side_effect=update_then_create_indexes):
+                result = partitioner.repartition_default_data()
+            self.assertEqual(result.rows, 1)
+
+            with conn.cursor() as cur:
+                cur.execute(f"select count(*) from {table_name}_default;")
+                self.assertEqual(cur.fetchone()[0], 0)
+                cur.execute(f"select unblended_cost from {newpart} where uuid = %s;", (aws_lids.uuid,))
+                self.assertEqual(cur.fetchone()[0], 42)
+
+    def test_staged_repartition_default_inserted(self):
+        """
+        Test that rows inserted into the default partition during the copy are moved with the copied rows
+        """
+        table_name = AWSCostEntryLineItemDailySummary._meta.db_table
+        with schema_context(self.schema_name):
+            aws_lids, inserted = AWSCostEntryLineItemDailySummary.objects.order_by("-usage_start")[:2]
+            aws_lids.usage_start = aws_lids.usage_start.replace(year=(aws_lids.usage_start.year + 14))
+            aws_lids.save()
+            newpart = f"{table_name}_{aws_lids.usage_start.strftime('%Y_%m')}"
+
+            partitioner = ppart.StagedPartitionDefaultData(self.schema_name, table_name)
+            copy_to_staging = partitioner._copy_to_staging
+
+            def copy_then_insert(*args):
+                num_rows = copy_to_staging(*args)
+                inserted.usage_start = aws_lids.usage_start
+                inserted.save()
+                return num_rows
+
+            with patch.object(partitioner, "_copy_to_staging", side_effect=copy_then_insert):
+                result = partitioner.repartition_default_data()
+            self.assertEqual(result.rows, 2)
+
+            with conn.cursor() as cur:
+                cur.execute(f"select count(*) from {table_name}_default;")
+                self.assertEqual(cur.fetchone()[0], 0)
+                cur.execute(f"select count(*) from {newpart};")
+                self.assertEqual(cur.fetchone()[0], 2)
+                cur.execute("select to_regclass(%s);", (f"{self.schema_name}.__{newpart}",))
+                self.assertIsNone(cur.fetchone()[0])
+                cur.execute("select to_regclass(%s);", (f"{self.schema_name}.__{table_name}_default_changes",))
+                self.assertIsNone(cur.fetchone()[0])
+                cur.execute(
+                    """
+select (select count(*) from pg_trigger t where t.tgrelid = %s::regclass and t.tgname = %s),
+       (select count(*) from pg_constraint c where c.conrelid = %s::regclass and c.conname = %s);
+""",
+                    (
+                        f"{self.schema_name}.{table_name}_default",
+                        "__repartition_changes",
+                        f"{self.schema_name}.{table_name}_default",
+                        "__repartition_excludes",
+                    ),
+                )
+                self.assertEqual(cur.fetchone(), (0, 0))
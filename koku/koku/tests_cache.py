@@ -17,20 +17,41 @@
 """Test view caching functions."""
 import logging
 import random
+from datetime import date
+from datetime import datetime
+from unittest.mock import Mock
+from unittest.mock import patch
 
+import pytz
 from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory
 from django.test.utils import override_settings
+from prometheus_client import REGISTRY
+from tenant_schemas.utils import schema_context
 
 from api.iam.test.iam_test_case import IamTestCase
+from api.models import Provider
 from koku.cache import AWS_CACHE_PREFIX
 from koku.cache import AZURE_CACHE_PREFIX
+from koku.cache import cache_view
+from koku.cache import get_finalized_cache_prefix
+from koku.cache import get_last_finalized_date
+from koku.cache import get_report_deltas
+from koku.cache import get_tag_keys
+from koku.cache import invalidate_report_deltas_cache
+from koku.cache import invalidate_tag_keys_cache
 from koku.cache import invalidate_view_cache_for_tenant_and_cache_key
 from koku.cache import invalidate_view_cache_for_tenant_and_source_type
+from koku.cache import is_finalized_request
 from koku.cache import KokuCacheError
+from koku.cache import normalize_query_string
 from koku.cache import OPENSHIFT_ALL_CACHE_PREFIX
 from koku.cache import OPENSHIFT_AWS_CACHE_PREFIX
 from koku.cache import OPENSHIFT_AZURE_CACHE_PREFIX
 from koku.cache import OPENSHIFT_CACHE_PREFIX
+from koku.cache import TAG_KEYS_LOCAL_CACHE
+from reporting.models import AWSTagsSummary
 
 
 LOG = logging.getLogger(__name__)
@@ -59,6 +80,7 @@ class KokuCacheTest(IamTestCase):
         """Tear down the test."""
         super().tearDown()
         self.cache.clear()
+        TAG_KEYS_LOCAL_CACHE.clear()
 
     def test_invalidate_view_cache_for_tenant_and_cache_key(self):
         """Test that specific cache data is deleted."""
@@ -132,3 +154,165 @@ class KokuCacheTest(IamTestCase):
 
         for key in azure_cache_data:
             self.assertIsNone(self.cache.get(key))
+
+    @override_settings(TAG_KEYS_CACHE_ENABLED=True)
+    def test_get_tag_keys_cached(self):
+        """Test that tag keys are read from the database once until invalidated."""
+        with schema_context(self.schema_name):
+            expected = set(AWSTagsSummary.objects.values_list("key", flat=True))
+
+        with self.assertNumQueries(1):
+            tag_keys = get_tag_keys(self.schema_name, AWSTagsSummary)
+        self.assertEqual(tag_keys, expected)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_tag_keys(self.schema_name, AWSTagsSummary), expected)
+
+        TAG_KEYS_LOCAL_CACHE.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_tag_keys(self.schema_name, AWSTagsSummary), expected)
+
+        invalidate_tag_keys_cache(self.schema_name)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_tag_keys(self.schema_name, AWSTagsSummary), expected)
+
+    def test_get_tag_keys_invalidated_in_other_processes(self):
+        """Test that a local copy is not used once another process invalidates the tag keys."""
+        with schema_context(self.schema_name):
+            expected = set(AWSTagsSummary.objects.values_list("key", flat=True))
+
+        get_tag_keys(self.schema_name, AWSTagsSummary)
+        with self.assertNumQueries(0):
+            get_tag_keys(self.schema_name, AWSTagsSummary)
+
+        # Another process only shares the default cache, its local copies are its own
+        local_copies = dict(TAG_KEYS_LOCAL_CACHE)
+        invalidate_tag_keys_cache(self.schema_name)
+        TAG_KEYS_LOCAL_CACHE.update(local_copies)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_tag_keys(self.schema_name, AWSTagsSummary), expected)
+
+    @override_settings(TAG_KEYS_CACHE_ENABLED=False)
+    def test_get_tag_keys_cache_disabled(self):
+        """Test that tag keys are read from the database every time when the registry is disabled."""
+        get_tag_keys(self.schema_name, AWSTagsSummary)
+        with self.assertNumQueries(1):
+            get_tag_keys(self.schema_name, AWSTagsSummary)
+
+    @override_settings(REPORT_DELTAS_CACHE_ENABLED=True)
+    def test_report_deltas_invalidated_by_period(self):
+        """Test that cached deltas are only invalidated by rebuilds of their period and source."""
+        previous = (date(2021, 1, 1), date(2021, 1, 31))
+        spanning = (date(2021, 1, 20), date(2021, 2, 18))
+        get_totals = Mock(return_value=({}, {}))
+
+        def get_deltas(provider, period):
+            get_report_deltas(self.schema_name, provider, *period, ("costs",), get_totals)
+
+        get_deltas(Provider.OCP_AWS, previous)
+        get_deltas(Provider.PROVIDER_AZURE, spanning)
+        self.assertEqual(get_totals.call_count, 2)
+
+        get_deltas(Provider.OCP_AWS, previous)
+        get_deltas(Provider.PROVIDER_AZURE, spanning)
+        self.assertEqual(get_totals.call_count, 2)
+
+        invalidate_report_deltas_cache(self.schema_name, Provider.PROVIDER_AWS, "2021-02-01", "2021-02-28")
+        invalidate_report_deltas_cache(self.schema_name, Provider.PROVIDER_GCP, "2021-01-01", "2021-02-28")
+        get_deltas(Provider.OCP_AWS, previous)
+        get_deltas(Provider.PROVIDER_AZURE, spanning)
+        self.assertEqual(get_totals.call_count, 2)
+
+        invalidate_report_deltas_cache(self.schema_name, Provider.PROVIDER_AWS, "2021-01-15", "2021-01-16")
+        get_deltas(Provider.OCP_AWS, previous)
+        get_deltas(Provider.PROVIDER_AZURE, spanning)
+        self.assertEqual(get_totals.call_count, 3)
+
+        invalidate_report_deltas_cache(self.schema_name, Provider.PROVIDER_OCP, "2021-02-01", "2021-02-28")
+        get_deltas(Provider.OCP_AWS, previous)
+        get_deltas(Provider.PROVIDER_AZURE, spanning)
+        self.assertEqual(get_totals.call_count, 3)
+
+        invalidate_report_deltas_cache(self.schema_name, Provider.PROVIDER_AZURE, "2021-02-01", "2021-02-28")
+        get_deltas(Provider.PROVIDER_AZURE, spanning)
+        self.assertEqual(get_totals.call_count, 4)
+
+    def test_normalize_query_string(self):
+        """Test that equivalent query strings normalize to the same value."""
+        expected = normalize_query_string("filter[time_scope_value]=-1&group_by[account]=*&delta=cost")
+        self.assertEqual(
+            normalize_query_string("delta=cost&group_by%5Baccount%5D=%2A&filter%5Btime_scope_value%5D=-1"), expected
+        )
+        # The order of group bys changes the report
+        self.assertNotEqual(
+            normalize_query_string("group_by[account]=*&group_by[service]=*"),
+            normalize_query_string("group_by[service]=*&group_by[account]=*"),
+        )
+
+    @override_settings(CACHE_FINALIZED_GRACE_DAYS=15)
+    def test_is_finalized_request(self):
+        """Test that only requests for finalized months are finalized."""
+        factory = RequestFactory()
+        with patch("koku.cache.timezone.now", return_value=datetime(2021, 3, 20, tzinfo=pytz.UTC)):
+            self.assertEqual(get_last_finalized_date(), date(2021, 2, 28))
+            self.assertTrue(is_finalized_request(factory.get("/", {"filter[time_scope_value]": "-2"})))
+            self.assertFalse(is_finalized_request(factory.get("/", {"filter[time_scope_value]": "-1"})))
+            self.assertFalse(is_finalized_request(factory.get("/")))
+            self.assertTrue(
+                is_finalized_request(factory.get("/", {"start_date": "2021-01-01", "end_date": "2021-02-28"}))
+            )
+            self.assertFalse(
+                is_finalized_request(factory.get("/", {"start_date": "2021-02-01", "end_date": "2021-03-01"}))
+            )
+            self.assertFalse(is_finalized_request(factory.get("/", {"start_date": "2021-01-01", "end_date": "x"})))
+
+        with patch("koku.cache.timezone.now", return_value=datetime(2021, 3, 10, tzinfo=pytz.UTC)):
+            self.assertEqual(get_last_finalized_date(), date(2021, 1, 31))
+            self.assertFalse(is_finalized_request(factory.get("/", {"filter[time_scope_value]": "-2"})))
+
+    def test_finalized_cache_prefix(self):
+        """Test that summary invalidation does not reach the finalized tier."""
+        for cache_key_prefix in CACHE_PREFIXES:
+            finalized_prefix = get_finalized_cache_prefix(cache_key_prefix)
+            self.assertNotEqual(finalized_prefix, cache_key_prefix)
+            for prefix in CACHE_PREFIXES:
+                self.assertNotIn(prefix, finalized_prefix)
+
+    @override_settings(CACHE_FINALIZED_GRACE_DAYS=15)
+    def test_cache_view_replayed_requests(self):
+        """Test the hit ratio of the view cache on a replayed request log."""
+        factory = RequestFactory()
+        responses = []
+
+        def view(request):
+            responses.append(request.GET.urlencode())
+            return HttpResponse("report")
+
+        cached_view = cache_view(AWS_CACHE_PREFIX)(view)
+        request_log = [
+            "filter[time_scope_value]=-2&filter[time_scope_units]=month&group_by[account]=*",
+            "group_by[account]=*&filter[time_scope_units]=month&filter[time_scope_value]=-2",
+            "filter%5Btime_scope_value%5D=-2&filter%5Btime_scope_units%5D=month&group_by%5Baccount%5D=%2A",
+            "filter[time_scope_value]=-1&group_by[service]=*&group_by[account]=*",
+            "filter[time_scope_value]=-1&group_by[account]=*&group_by[service]=*",
+            "group_by[service]=*&group_by[account]=*&filter[time_scope_value]=-1",
+        ]
+
+        def get_sample(tier, result):
+            labels = {"key_prefix": AWS_CACHE_PREFIX, "tier": tier, "result": result}
+            return REGISTRY.get_sample_value("koku_view_cache_requests_total", labels) or 0
+
+        before = {
+            (tier, result): get_sample(tier, result) for tier in ("default", "finalized") for result in ("hit", "miss")
+        }
+        with patch("koku.cache.timezone.now", return_value=datetime(2021, 3, 20, tzinfo=pytz.UTC)):
+            for query_string in request_log:
+                response = cached_view(factory.get(f"/api/v1/reports/aws/costs/?{query_string}"))
+                self.assertEqual(response.status_code, 200)
+
+        hits = len(request_log) - len(responses)
+        self.assertEqual(hits, 3)
+        self.assertEqual(get_sample("finalized", "hit") - before[("finalized", "hit")], 2)
+        self.assertEqual(get_sample("finalized", "miss") - before[("finalized", "miss")], 1)
+        self.assertEqual(get_sample("default", "hit") - before[("default", "hit")], 1)
+        self.assertEqual(get_sample("default", "miss") - before[("default", "miss")], 2)
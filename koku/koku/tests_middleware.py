@@ -206,6 +206,27 @@ class IdentityHeaderMiddlewareTest(IamTestCase):
         self.assertEquals(IdentityHeaderMiddleware.customer_cache.currsize, 0)
         self.assertEquals(MD.USER_CACHE.currsize, 0)
 
+    @patch("koku.middleware.IdentityHeaderMiddleware._get_access", return_value={})
+    @patch("koku.middleware.USER_CACHE", TTLCache(5, 30))
+    def test_cached_user_not_shared_between_requests(self, _):
+        """Test that requests of the same user on other threads do not overwrite each other's identity."""
+        middleware = IdentityHeaderMiddleware()
+        first_request = self.request
+        middleware.process_request(first_request)
+
+        second_request = self._create_request_context(
+            self.customer_data, self.user_data, create_customer=False, create_user=False, is_admin=False
+        )["request"]
+        second_request.path = "/api/v1/tags/aws/"
+        second_request.META["QUERY_STRING"] = ""
+        middleware.process_request(second_request)
+
+        self.assertEqual(first_request.user.username, second_request.user.username)
+        self.assertTrue(first_request.user.admin)
+        self.assertFalse(second_request.user.admin)
+        self.assertNotEqual(first_request.user.identity_header, second_request.user.identity_header)
+        self.assertIsNot(first_request.user, MD.USER_CACHE[self.user_data["username"]])
+
     def test_process_no_customer(self):
         """Test that the customer, tenant and user are not created."""
         customer = self._create_customer_data()
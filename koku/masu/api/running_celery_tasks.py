@@ -25,7 +25,7 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
-from koku.celery import CELERY_INSPECT
+from koku.task_registry import TaskRegistry
 
 LOG = logging.getLogger(__name__)
 
@@ -36,11 +36,5 @@ LOG = logging.getLogger(__name__)
 @renderer_classes(tuple(api_settings.DEFAULT_RENDERER_CLASSES))
 def running_celery_tasks(request):
     """Get the task ids of running cerlery tasks."""
-    active_dict = CELERY_INSPECT.active()
-    active_tasks = []
-    if active_dict:
-        for task_list in active_dict.values():
-            active_tasks.extend(task_list)
-    if active_tasks:
-        active_tasks = [dikt.get("id", "") for dikt in active_tasks]
+    active_tasks = list(TaskRegistry().get_running_tasks())
     return Response({"active_tasks": active_tasks})
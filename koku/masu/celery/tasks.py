@@ -33,6 +33,8 @@ from api.iam.models import Tenant
 from api.models import Provider
 from api.utils import DateHelper
 from koku.celery import app
+from masu.celery.export import table_export_settings
+from masu.celery.export import TableExportSetting
 from masu.config import Config
 from masu.database.report_manifest_db_accessor import ReportManifestDBAccessor
 from masu.external.accounts.hierarchy.aws.aws_org_unit_crawler import AWSOrgUnitCrawler
@@ -40,7 +42,11 @@ from masu.external.date_accessor import DateAccessor
 from masu.processor.orchestrator import Orchestrator
 from masu.processor.tasks import autovacuum_tune_schema
 from masu.processor.tasks import vacuum_schema
+from masu.processor.tracing import stage_timer
 from masu.util.aws.common import get_s3_resource
+from masu.util.common import dictify_table_export_settings
+from masu.util.upload import export_query_to_s3
+from masu.util.upload import get_upload_path
 
 LOG = get_task_logger(__name__)
 _DB_FETCH_BATCH_SIZE = 2000
@@ -153,6 +159,95 @@ def delete_archived_data(schema_name, provider_type, provider_uuid):
     deleted_archived_with_prefix(settings.S3_BUCKET_NAME, prefix)
 
 
+@app.task(name="masu.celery.tasks.upload_normalized_data", queue_name="upload")
+def upload_normalized_data():
+    """
+    Scheduled task to export normalized data to our S3 bucket.
+
+    Every table in table_export_settings is exported for the current and
+    previous month, one file per month or per day depending on the table.
+    Each file is exported by its own query_and_upload_to_s3 task so the
+    query_upload workers export independent tables and days concurrently.
+    """
+    if not settings.ENABLE_S3_ARCHIVING:
+        LOG.info("Skipping upload_normalized_data. Upload feature is disabled.")
+        return
+
+    dh = DateHelper()
+    periods = [(dh.this_month_start, dh.today), (dh.last_month_start, dh.last_month_end)]
+    accounts, _ = Orchestrator.get_accounts()
+    for account in accounts:
+        # Exported tables do not use the local designation
+        source_type = account["provider_type"].lower().split("-")[0]
+        for table_export_setting in table_export_settings:
+            if table_export_setting.provider != source_type:
+                continue
+            for start_date, end_date in periods:
+                if table_export_setting.iterate_daily:
+                    date_ranges = [(day, day) for day in dh.list_days(start_date, end_date)]
+                else:
+                    date_ranges = [(start_date, end_date)]
+                for export_start, export_end in date_ranges:
+                    query_and_upload_to_s3.delay(
+                        account["schema_name"],
+                        account["provider_type"],
+                        str(account["provider_uuid"]),
+                        dictify_table_export_settings(table_export_setting),
+                        export_start.strftime("%Y-%m-%d"),
+                        export_end.strftime("%Y-%m-%d"),
+                    )
+
+
+@app.task(
+    name="masu.celery.tasks.query_and_upload_to_s3",
+    queue_name="query_upload",
+    autoretry_for=(ClientError,),
+    max_retries=3,
+    retry_backoff=10,
+)
+def query_and_upload_to_s3(schema_name, provider_type, provider_uuid, table_export_setting, start_date, end_date):
+    """
+    Stream the rows of one exported table and date range to our S3 bucket.
+
+    Args:
+        schema_name (str): Koku user account (schema) name.
+        provider_type (str): Koku backend provider type identifier.
+        provider_uuid (str): Koku backend provider UUID.
+        table_export_setting (dict): Settings for the table export, see table_export_settings.
+        start_date (str): Start of the exported date range, as YYYY-MM-DD.
+        end_date (str): End of the exported date range, as YYYY-MM-DD.
+
+    """
+    if not settings.ENABLE_S3_ARCHIVING:
+        LOG.info("Skipping query_and_upload_to_s3. Upload feature is disabled.")
+        return
+
+    table_export_setting = TableExportSetting(**table_export_setting)
+    file_format = settings.NORMALIZED_DATA_EXPORT_FORMAT
+    # The customer data sync reads normalized, lower case provider paths
+    provider_slug = provider_type.lower().split("-")[0]
+    upload_path = get_upload_path(
+        schema_name,
+        provider_slug,
+        provider_uuid,
+        datetime.strptime(start_date, "%Y-%m-%d").date(),
+        table_export_setting.output_name,
+        table_export_setting.iterate_daily,
+        file_format,
+    )
+    sql = table_export_setting.sql.format(schema=schema_name)
+    params = {"start_date": start_date, "end_date": end_date, "provider_uuid": provider_uuid}
+    context = {"schema_name": schema_name, "provider_uuid": provider_uuid, "upload_path": upload_path}
+    with stage_timer("export", provider_type, context) as span:
+        rows, size = export_query_to_s3(
+            get_s3_resource().meta.client, settings.S3_BUCKET_NAME, upload_path, sql, params, file_format
+        )
+        span.add_rows(rows)
+        span.add_bytes(size)
+    if not rows:
+        LOG.info("No data to export for %s from %s to %s.", upload_path, start_date, end_date)
+
+
 @app.task(
     name="masu.celery.tasks.sync_data_to_customer",
     queue_name="customer_data_sync",
@@ -178,6 +273,7 @@ def sync_data_to_customer(dump_request_uuid):
             dump_request.created_by.customer.schema_name,
             dump_request.bucket_name,
             (dump_request.start_date, dump_request.end_date),
+            sync_id=str(dump_request.uuid),
         )
     except ClientError:
         LOG.exception(
@@ -210,7 +306,7 @@ def sync_data_to_customer(dump_request_uuid):
 
 @app.task(name="masu.celery.tasks.vacuum_schemas", queue_name="reporting")
 def vacuum_schemas():
-    """Vacuum all schemas."""
+    """Vacuum the reporting tables of all schemas that need it."""
     tenants = Tenant.objects.values("schema_name")
     schema_names = [
         tenant.get("schema_name")
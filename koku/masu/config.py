@@ -139,3 +139,16 @@ class Config:
     KAFKA_CONNECT = False if os.getenv("KAFKA_CONNECT", "False") == "False" else True
 
     RETRY_SECONDS = int(os.getenv("RETRY_SECONDS", "10"))
+
+    # Number of providers the orchestrator polls for manifests at the same time. 1 polls serially.
+    POLLING_CONCURRENCY = int(os.getenv("POLLING_CONCURRENCY", "1"))
+
+    # Seconds the orchestrator waits on the manifest discovery of a polling cycle before moving on.
+    # Providers still being discovered are skipped by the next cycles until they finish.
+    POLLING_PROVIDER_TIMEOUT = int(os.getenv("POLLING_PROVIDER_TIMEOUT", "600"))
+
+    # Number of sibling org units the AWS org crawler lists at the same time. 1 uses the serial crawl.
+    AWS_ORG_CRAWL_CONCURRENCY = int(os.getenv("AWS_ORG_CRAWL_CONCURRENCY", "1"))
+
+    # Maximum AWS Organizations API calls per second made by the concurrent org crawl.
+    AWS_ORG_API_RATE_LIMIT = float(os.getenv("AWS_ORG_API_RATE_LIMIT", "5"))
@@ -36,6 +36,7 @@ from tenant_schemas.utils import schema_context
 import koku.presto_database as kpdb
 from api.metrics import constants as metric_constants
 from api.utils import DateHelper
+from koku.cache import invalidate_tag_keys_cache
 from koku.database import JSONBBuildObject
 from masu.config import Config
 from masu.database import AWS_CUR_TABLE_MAP
@@ -670,6 +671,7 @@ class OCPReportDBAccessor(ReportDBAccessorBase):
         else:
             LOG.info("PRESTO OCP: Commit actions")
             presto_conn.commit()
+            invalidate_tag_keys_cache(self.schema)
         finally:
             LOG.info("PRESTO OCP: Close connection")
             presto_conn.close()
@@ -1598,118 +1600,87 @@ class OCPReportDBAccessor(ReportDBAccessorBase):
             ),
         )
 
-    def populate_tag_usage_costs(  # noqa: C901
-        self, infrastructure_rates, supplementary_rates, start_date, end_date, cluster_id
+    @staticmethod
+    def _flatten_tag_rates(cost_type, tag_rates, tag_default_rates):
+        """Flatten the nested tag rate dictionaries into one row per rate for set-based SQL."""
+        rows = []
+        for metric, tags in tag_rates.items():
+            usage_type = metric_constants.USAGE_METRIC_TYPE_MAP.get(metric)
+            if usage_type is None:
+                continue
+            labels_field = "volume_labels" if usage_type == "storage" else "pod_labels"
+            for tag_key, tag_values in tags.items():
+                for tag_value, rate_value in tag_values.items():
+                    rows.append(
+                        {
+                            "cost_type": cost_type,
+                            "metric": metric,
+                            "usage_type": usage_type,
+                            "labels_field": labels_field,
+                            "tag_key": tag_key,
+                            "tag_value": tag_value,
+                            "skip_values": None,
+                            "rate": str(rate_value),
+                        }
+                    )
+        for metric, tags in tag_default_rates.items():
+            usage_type = metric_constants.USAGE_METRIC_TYPE_MAP.get(metric)
+            if usage_type is None:
+                continue
+            labels_field = "volume_labels" if usage_type == "storage" else "pod_labels"
+            for tag_key, tag_values in tags.items():
+                rate_value = tag_values.get("default_value")
+                if not rate_value:
+                    continue
+                rows.append(
+                    {
+                        "cost_type": cost_type,
+                        "metric": metric,
+                        "usage_type": usage_type,
+                        "labels_field": labels_field,
+                        "tag_key": tag_key,
+                        "tag_value": None,
+                        "skip_values": tag_values.get("defined_keys", []),
+                        "rate": str(rate_value),
+                    }
+                )
+        return rows
+
+    def populate_all_tag_usage_costs(
+        self,
+        infrastructure_rates,
+        supplementary_rates,
+        default_infrastructure_rates,
+        default_supplementary_rates,
+        start_date,
+        end_date,
+        cluster_id,
     ):
         """
-        Update the reporting_ocpusagelineitem_daily_summary table with
-        usage costs based on tag rates.
-        Due to the way the tag_keys are stored it loops through all of
-        the tag keys to filter and update costs.
-
-        The data structure for infrastructure and supplementary rates are
-        a dictionary that include the metric name, the tag key,
-        the tag value names, and the tag value, for example:
+        Update the reporting_ocpusagelineitem_daily_summary table with usage costs from every tag rate.
+
+        Every tag rate and tag default is passed to the database at once and
+        each line item is updated in a single statement. Only the usage types
+        already in a line item's usage cost are updated.
+
+        The data structure for infrastructure and supplementary rates is a
+        dictionary of the metric, the tag key, and the rate of each tag value,
+        for example:
             {'cpu_core_usage_per_hour': {
                 'app': {
                     'far': '0.2000000000', 'manager': '100.0000000000', 'walk': '5.0000000000'
                     }
                 }
             }
-        """
-        # defines the usage type for each metric
-        metric_usage_type_map = {
-            "cpu_core_usage_per_hour": "cpu",
-            "cpu_core_request_per_hour": "cpu",
-            "memory_gb_usage_per_hour": "memory",
-            "memory_gb_request_per_hour": "memory",
-            "storage_gb_usage_per_month": "storage",
-            "storage_gb_request_per_month": "storage",
-        }
-        # define the rates so the loop can operate on both rate types
-        rate_types = [
-            {"rates": infrastructure_rates, "sql_file": "sql/infrastructure_tag_rates.sql"},
-            {"rates": supplementary_rates, "sql_file": "sql/supplementary_tag_rates.sql"},
-        ]
-        # Cast start_date and end_date to date object, if they aren't already
-        if isinstance(start_date, str):
-            start_date = datetime.datetime.strptime(start_date, "%Y-%m-%d").date()
-            end_date = datetime.datetime.strptime(end_date, "%Y-%m-%d").date()
-        if isinstance(start_date, datetime.datetime):
-            start_date = start_date.date()
-            end_date = end_date.date()
-        # updates costs from tags
-        for rate_type in rate_types:
-            rate = rate_type.get("rates")
-            sql_file = rate_type.get("sql_file")
-            for metric in rate:
-                tags = rate.get(metric, {})
-                usage_type = metric_usage_type_map.get(metric)
-                if usage_type == "storage":
-                    labels_field = "volume_labels"
-                else:
-                    labels_field = "pod_labels"
-                table_name = OCP_REPORT_TABLE_MAP["line_item_daily_summary"]
-                for tag_key in tags:
-                    tag_vals = tags.get(tag_key, {})
-                    value_names = list(tag_vals.keys())
-                    for val_name in value_names:
-                        rate_value = tag_vals[val_name]
-                        key_value_pair = f'{{"{tag_key}": "{val_name}"}}'
-                        tag_rates_sql = pkgutil.get_data("masu.database", sql_file)
-                        tag_rates_sql = tag_rates_sql.decode("utf-8")
-                        tag_rates_sql_params = {
-                            "start_date": start_date,
-                            "end_date": end_date,
-                            "rate": rate_value,
-                            "cluster_id": cluster_id,
-                            "schema": self.schema,
-                            "usage_type": usage_type,
-                            "metric": metric,
-                            "k_v_pair": key_value_pair,
-                            "labels_field": labels_field,
-                        }
-                        tag_rates_sql, tag_rates_sql_params = self.jinja_sql.prepare_query(
-                            tag_rates_sql, tag_rates_sql_params
-                        )
-                        self._execute_raw_sql_query(
-                            table_name, tag_rates_sql, start_date, end_date, bind_params=list(tag_rates_sql_params)
-                        )
-
-    def populate_tag_usage_default_costs(  # noqa: C901
-        self, infrastructure_rates, supplementary_rates, start_date, end_date, cluster_id
-    ):
-        """
-        Update the reporting_ocpusagelineitem_daily_summary table
-        with usage costs based on tag rates.
-
-        The data structure for infrastructure and supplementary rates
-        are a dictionary that includes the metric, the tag key,
-        the default value, and the values for that key that have
-        rates defined and do not need the default applied,
-        for example:
-            {
-                'cpu_core_usage_per_hour': {
-                    'app': {
-                        'default_value': '100.0000000000', 'defined_keys': ['far', 'manager', 'walk']
+        The default rates hold, for each metric and tag key, the rate of the
+        values without a rate of their own, for example:
+            {'cpu_core_usage_per_hour': {
+                'app': {
+                    'default_value': '100.0000000000', 'defined_keys': ['far', 'manager', 'walk']
                     }
                 }
             }
         """
-        # defines the usage type for each metric
-        metric_usage_type_map = {
-            "cpu_core_usage_per_hour": "cpu",
-            "cpu_core_request_per_hour": "cpu",
-            "memory_gb_usage_per_hour": "memory",
-            "memory_gb_request_per_hour": "memory",
-            "storage_gb_usage_per_month": "storage",
-            "storage_gb_request_per_month": "storage",
-        }
-        # define the rates so the loop can operate on both rate types
-        rate_types = [
-            {"rates": infrastructure_rates, "sql_file": "sql/default_infrastructure_tag_rates.sql"},
-            {"rates": supplementary_rates, "sql_file": "sql/default_supplementary_tag_rates.sql"},
-        ]
         # Cast start_date and end_date to date object, if they aren't already
         if isinstance(start_date, str):
             start_date = datetime.datetime.strptime(start_date, "%Y-%m-%d").date()
@@ -1718,45 +1689,25 @@ class OCPReportDBAccessor(ReportDBAccessorBase):
             start_date = start_date.date()
             end_date = end_date.date()
 
-        # updates costs from tags
-        for rate_type in rate_types:
-            rate = rate_type.get("rates")
-            sql_file = rate_type.get("sql_file")
-            for metric in rate:
-                tags = rate.get(metric, {})
-                usage_type = metric_usage_type_map.get(metric)
-                if usage_type == "storage":
-                    labels_field = "volume_labels"
-                else:
-                    labels_field = "pod_labels"
-                table_name = OCP_REPORT_TABLE_MAP["line_item_daily_summary"]
-                for tag_key in tags:
-                    key_value_pair = []
-                    tag_vals = tags.get(tag_key)
-                    rate_value = tag_vals.get("default_value", 0)
-                    if rate_value == 0:
-                        continue
-                    value_names = tag_vals.get("defined_keys", [])
-                    for value_to_skip in value_names:
-                        key_value_pair.append(f'{{"{tag_key}": "{value_to_skip}"}}')
-                    json.dumps(key_value_pair)
-                    tag_rates_sql = pkgutil.get_data("masu.database", sql_file)
-                    tag_rates_sql = tag_rates_sql.decode("utf-8")
-                    tag_rates_sql_params = {
-                        "start_date": start_date,
-                        "end_date": end_date,
-                        "rate": rate_value,
-                        "cluster_id": cluster_id,
-                        "schema": self.schema,
-                        "usage_type": usage_type,
-                        "metric": metric,
-                        "tag_key": tag_key,
-                        "k_v_pair": key_value_pair,
-                        "labels_field": labels_field,
-                    }
-                    tag_rates_sql, tag_rates_sql_params = self.jinja_sql.prepare_query(
-                        tag_rates_sql, tag_rates_sql_params
-                    )
-                    self._execute_raw_sql_query(
-                        table_name, tag_rates_sql, start_date, end_date, bind_params=list(tag_rates_sql_params)
-                    )
+        tag_rates = self._flatten_tag_rates(
+            metric_constants.INFRASTRUCTURE_COST_TYPE, infrastructure_rates, default_infrastructure_rates
+        ) + self._flatten_tag_rates(
+            metric_constants.SUPPLEMENTARY_COST_TYPE, supplementary_rates, default_supplementary_rates
+        )
+        if not tag_rates:
+            return
+
+        table_name = OCP_REPORT_TABLE_MAP["line_item_daily_summary"]
+        tag_rates_sql = pkgutil.get_data("masu.database", "sql/tag_rates_usage_costs.sql")
+        tag_rates_sql = tag_rates_sql.decode("utf-8")
+        tag_rates_sql_params = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "cluster_id": cluster_id,
+            "schema": self.schema,
+            "tag_rates": json.dumps(tag_rates),
+        }
+        tag_rates_sql, tag_rates_sql_params = self.jinja_sql.prepare_query(tag_rates_sql, tag_rates_sql_params)
+        self._execute_raw_sql_query(
+            table_name, tag_rates_sql, start_date, end_date, bind_params=list(tag_rates_sql_params)
+        )
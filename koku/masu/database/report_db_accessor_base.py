@@ -26,9 +26,11 @@ from dateutil.relativedelta import relativedelta
 from django.db import connection
 from django.db import transaction
 from jinjasql import JinjaSql
+from psycopg2.extras import execute_values
 from tenant_schemas.utils import schema_context
 
 import koku.presto_database as kpdb
+from koku.cache import invalidate_tag_keys_cache
 from masu.config import Config
 from masu.database.koku_database_access import KokuDBAccess
 from masu.database.koku_database_access import mini_transaction_delete
@@ -37,6 +39,31 @@ from reporting_common import REPORT_COLUMN_MAP
 
 LOG = logging.getLogger(__name__)
 
+# Tables whose keys back the tag key registry used to validate report queries
+TAG_SUMMARY_TABLE_SUFFIXES = ("tags_summary", "label_summary")
+
+# Summary partitions whose usage_start correlation is below this are clustered after summarization
+CLUSTER_CORRELATION_THRESHOLD = 0.9
+# The (usage_start, source_uuid) index every partitioned daily summary table is clustered on
+CLUSTER_INDEX_DEFINITION = "%USING btree (usage_start, source_uuid)"
+CLUSTER_CANDIDATE_SQL = """
+SELECT (SELECT s.correlation
+          FROM pg_stats s
+         WHERE s.schemaname = n.nspname
+           AND s.tablename = c.relname
+           AND s.attname = 'usage_start'),
+       (SELECT i.relname
+          FROM pg_index x
+          JOIN pg_class i ON i.oid = x.indexrelid
+         WHERE x.indrelid = c.oid
+           AND pg_get_indexdef(x.indexrelid) LIKE %s
+         LIMIT 1)
+  FROM pg_class c
+  JOIN pg_namespace n ON n.oid = c.relnamespace
+ WHERE n.nspname = %s
+   AND c.relname = %s
+"""
+
 
 class ReportDBAccessorException(Exception):
     """An error in the DB accessor."""
@@ -149,8 +176,13 @@ class ReportDBAccessorBase(KokuDBAccess):
             cursor.db.set_schema(self.schema)
             cursor.execute(upsert_sql)
 
-            delete_sql = f"DELETE FROM {temp_table_name}"
-            cursor.execute(delete_sql)
+            cursor.execute(f"TRUNCATE {temp_table_name}")
+
+    def drop_temp_table(self, temp_table_name):
+        """Drop a temporary table."""
+        with connection.cursor() as cursor:
+            cursor.db.set_schema(self.schema)
+            cursor.execute(f"DROP TABLE IF EXISTS {temp_table_name}")
 
     def bulk_insert_rows(self, file_obj, table, columns, sep=","):
         """Insert many rows using Postgres copy functionality.
@@ -284,6 +316,47 @@ class ReportDBAccessorBase(KokuDBAccess):
 
         return self._get_primary_key(table_name, data)
 
+    def bulk_insert_on_conflict(self, table, rows, conflict_columns=None, return_columns=None, set_columns=None):
+        """Insert many rows with a single INSERT ... ON CONFLICT ... RETURNING statement.
+
+        Conflicting rows are skipped, or updated when set_columns is given.
+        Skipped rows are not returned, so callers look those up separately.
+
+        Args:
+            table (DjangoModel): The table to insert into
+            rows (list): A list of dictionaries of data to insert
+            conflict_columns (list): Columns to check conflict on
+            return_columns (list): Columns to return along with the id of each row
+            set_columns (list): Columns to update on conflict
+
+        Returns:
+            (list): A dictionary of the id and return_columns of each inserted or updated row
+
+        """
+        if not rows:
+            return []
+        table_name = table()._meta.db_table
+        rows = [self.clean_data(row, table_name) for row in rows]
+        columns = list(dict.fromkeys(column for row in rows for column in row))
+        values = [[row.get(column) for column in columns] for row in rows]
+        return_columns = ["id"] + [column for column in return_columns or [] if column != "id"]
+
+        conflict_clause = f"({', '.join(conflict_columns)})" if conflict_columns else ""
+        if set_columns:
+            set_clause = ", ".join(f"{column} = excluded.{column}" for column in set_columns)
+            conflict_action = f"DO UPDATE SET {set_clause}"
+        else:
+            conflict_action = "DO NOTHING"
+        insert_sql = f"""
+            INSERT INTO {self.schema}.{table_name}({", ".join(columns)}) VALUES %s
+            ON CONFLICT {conflict_clause} {conflict_action}
+            RETURNING {", ".join(return_columns)}
+        """
+        with connection.cursor() as cursor:
+            cursor.db.set_schema(self.schema)
+            returned = execute_values(cursor, insert_sql, values, page_size=len(values), fetch=True)
+        return [dict(zip(return_columns, row)) for row in returned]
+
     def _get_primary_key(self, table_name, data):
         """Return the row id for a specific object."""
         with schema_context(self.schema):
@@ -359,6 +432,8 @@ class ReportDBAccessorBase(KokuDBAccess):
             cursor.db.set_schema(self.schema)
             cursor.execute(sql, params=bind_params)
         LOG.info("Finished updating %s.", table)
+        if isinstance(table, str) and table.endswith(TAG_SUMMARY_TABLE_SUFFIXES):
+            invalidate_tag_keys_cache(self.schema)
 
     def _execute_presto_raw_sql_query(self, schema, sql, bind_params=None):
         """Execute a single presto query"""
@@ -432,6 +507,50 @@ class ReportDBAccessorBase(KokuDBAccess):
         if created:
             LOG.info(f"Created a new partition for {newpart.partition_of_table_name} : {newpart.table_name}")
 
+    def cluster_summary_partitions(self, start_date, end_date):
+        """Cluster the daily summary partitions of a date range on (usage_start, source_uuid).
+
+        CLUSTER takes an ACCESS EXCLUSIVE lock and rewrites the partition, so a
+        partition is only clustered when the correlation of usage_start with its
+        physical order has fallen below CLUSTER_CORRELATION_THRESHOLD.
+
+        Args:
+            start_date (str, datetime.date): The first day of the range.
+            end_date (str, datetime.date): The last day of the range.
+
+        Returns:
+            (list): The names of the clustered partitions.
+
+        """
+        if isinstance(start_date, str):
+            start_date = ciso8601.parse_datetime(start_date).date()
+        if isinstance(end_date, str):
+            end_date = ciso8601.parse_datetime(end_date).date()
+        start_date = start_date.replace(day=1)
+
+        partitions = [
+            partition.table_name
+            for partition in self.get_existing_partitions(self.line_item_daily_summary_table)
+            if not partition.partition_parameters["default"]
+            and start_date <= ciso8601.parse_datetime(partition.partition_parameters["from"]).date() <= end_date
+        ]
+        clustered = []
+        with connection.cursor() as cursor:
+            cursor.db.set_schema(self.schema)
+            for partition in sorted(partitions):
+                cursor.execute(f"ANALYZE {self.schema}.{partition}")
+                cursor.execute(CLUSTER_CANDIDATE_SQL, [CLUSTER_INDEX_DEFINITION, self.schema, partition])
+                correlation, index_name = cursor.fetchone()
+                if index_name is None or correlation is None or abs(correlation) >= CLUSTER_CORRELATION_THRESHOLD:
+                    continue
+                LOG.info(
+                    f"Clustering {self.schema}.{partition} on {index_name}, usage_start correlation {correlation}"
+                )
+                cursor.execute(f"CLUSTER {self.schema}.{partition} USING {index_name}")
+                cursor.execute(f"ANALYZE {self.schema}.{partition}")
+                clustered.append(partition)
+        return clustered
+
     def delete_line_item_daily_summary_entries_for_date_range(self, source_uuid, start_date, end_date):
         msg = f"Deleting records from {self.line_item_daily_summary_table} from {start_date} to {end_date}"
         LOG.info(msg)
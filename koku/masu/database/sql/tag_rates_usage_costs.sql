@@ -0,0 +1,82 @@
+WITH tag_rates AS (
+    SELECT *
+    FROM jsonb_to_recordset({{tag_rates}}::jsonb) AS tr(
+        cost_type text,
+        metric text,
+        usage_type text,
+        labels_field text,
+        tag_key text,
+        tag_value text,
+        skip_values jsonb,
+        rate numeric
+    )
+),
+charges AS (
+    SELECT lids.uuid,
+        tr.cost_type,
+        tr.usage_type,
+        tr.rate * CASE
+            WHEN tr.metric = 'cpu_core_usage_per_hour' THEN lids.pod_usage_cpu_core_hours
+            WHEN tr.metric = 'cpu_core_request_per_hour' THEN lids.pod_request_cpu_core_hours
+            WHEN tr.metric = 'memory_gb_usage_per_hour' THEN lids.pod_usage_memory_gigabyte_hours
+            WHEN tr.metric = 'memory_gb_request_per_hour' THEN lids.pod_request_memory_gigabyte_hours
+            WHEN tr.metric = 'storage_gb_usage_per_month' THEN lids.persistentvolumeclaim_usage_gigabyte_months
+            WHEN tr.metric = 'storage_gb_request_per_month' THEN lids.volume_request_storage_gigabyte_months
+            END as charge
+    FROM {{schema | sqlsafe}}.reporting_ocpusagelineitem_daily_summary AS lids
+    CROSS JOIN tag_rates AS tr
+    CROSS JOIN LATERAL (
+        SELECT CASE
+            WHEN tr.labels_field = 'volume_labels' THEN lids.volume_labels
+            ELSE lids.pod_labels
+            END as labels
+    ) AS l
+    WHERE lids.cluster_id = {{cluster_id}}
+        AND lids.usage_start >= {{start_date}}
+        AND lids.usage_start <= {{end_date}}
+        AND l.labels ? tr.tag_key
+        AND (
+            (tr.tag_value IS NOT NULL AND l.labels ->> tr.tag_key = tr.tag_value)
+            OR (tr.tag_value IS NULL AND NOT tr.skip_values ? (l.labels ->> tr.tag_key))
+        )
+),
+row_charges AS (
+    SELECT uuid,
+        coalesce(sum(charge) FILTER (WHERE cost_type = 'Infrastructure' AND usage_type = 'cpu'), 0.0) as infra_cpu,
+        coalesce(sum(charge) FILTER (WHERE cost_type = 'Infrastructure' AND usage_type = 'memory'), 0.0) as infra_memory,
+        coalesce(sum(charge) FILTER (WHERE cost_type = 'Infrastructure' AND usage_type = 'storage'), 0.0) as infra_storage,
+        coalesce(sum(charge) FILTER (WHERE cost_type = 'Supplementary' AND usage_type = 'cpu'), 0.0) as sup_cpu,
+        coalesce(sum(charge) FILTER (WHERE cost_type = 'Supplementary' AND usage_type = 'memory'), 0.0) as sup_memory,
+        coalesce(sum(charge) FILTER (WHERE cost_type = 'Supplementary' AND usage_type = 'storage'), 0.0) as sup_storage
+    FROM charges
+    GROUP BY uuid
+)
+UPDATE {{schema | sqlsafe}}.reporting_ocpusagelineitem_daily_summary AS lids
+SET infrastructure_usage_cost = coalesce(
+        (
+            SELECT jsonb_object_agg(key,
+                value::numeric + CASE
+                    WHEN key = 'cpu' THEN rc.infra_cpu
+                    WHEN key = 'memory' THEN rc.infra_memory
+                    WHEN key = 'storage' THEN rc.infra_storage
+                    ELSE 0.0
+                    END)
+            FROM jsonb_each_text(lids.infrastructure_usage_cost)
+        ),
+        lids.infrastructure_usage_cost
+    ),
+    supplementary_usage_cost = coalesce(
+        (
+            SELECT jsonb_object_agg(key,
+                value::numeric + CASE
+                    WHEN key = 'cpu' THEN rc.sup_cpu
+                    WHEN key = 'memory' THEN rc.sup_memory
+                    WHEN key = 'storage' THEN rc.sup_storage
+                    ELSE 0.0
+                    END)
+            FROM jsonb_each_text(lids.supplementary_usage_cost)
+        ),
+        lids.supplementary_usage_cost
+    )
+FROM row_charges AS rc
+WHERE lids.uuid = rc.uuid
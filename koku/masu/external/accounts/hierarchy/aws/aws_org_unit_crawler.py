@@ -17,6 +17,9 @@
 """AWS org unit crawler."""
 # from tenant_schemas.utils import schema_context
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
 from botocore.exceptions import ClientError
@@ -24,6 +27,7 @@ from botocore.exceptions import ParamValidationError
 from django.db import transaction
 from tenant_schemas.utils import schema_context
 
+from masu.config import Config
 from masu.database.provider_db_accessor import ProviderDBAccessor
 from masu.external.accounts.hierarchy.account_crawler import AccountCrawler
 from masu.external.date_accessor import DateAccessor
@@ -34,6 +38,32 @@ from reporting.provider.aws.models import AWSOrganizationalUnit
 LOG = logging.getLogger(__name__)
 
 
+class RateLimiter:
+    """Thread safe limiter spacing calls evenly at a maximum rate."""
+
+    def __init__(self, calls_per_second):
+        """
+        Create a rate limiter.
+
+        Args:
+            calls_per_second (float): Maximum number of calls per second, 0 disables limiting.
+        """
+        self._interval = 1.0 / calls_per_second if calls_per_second > 0 else 0
+        self._lock = threading.Lock()
+        self._next_call = time.monotonic()
+
+    def wait(self):
+        """Block until the next call is allowed."""
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self._interval
+        if delay > 0:
+            time.sleep(delay)
+
+
 class AWSOrgUnitCrawler(AccountCrawler):
     """AWS org unit crawler."""
 
@@ -79,9 +109,13 @@ class AWSOrgUnitCrawler(AccountCrawler):
                     self.account.get("provider_uuid"), self.account_id, root_ou["Id"]
                 )
             )
-            self._crawl_org_for_accounts(root_ou, root_ou.get("Id"), level=0)
-            if not self.errors_raised:
-                self._mark_nodes_deleted()
+            if Config.AWS_ORG_CRAWL_CONCURRENCY > 1:
+                nodes = self._crawl_org_concurrently(root_ou)
+                self._save_org_nodes(nodes)
+            else:
+                self._crawl_org_for_accounts(root_ou, root_ou.get("Id"), level=0)
+                if not self.errors_raised:
+                    self._mark_nodes_deleted()
         except ParamValidationError as param_error:
             LOG.warn(msg=error_message)
             LOG.warn(param_error)
@@ -135,6 +169,173 @@ class AWSOrgUnitCrawler(AccountCrawler):
                 )
             )
 
+    def _crawl_org_concurrently(self, root_ou):
+        """
+        Crawl the organization one level at a time, listing sibling org units concurrently.
+
+        No database access happens during the crawl, the tree is returned for
+        _save_org_nodes to persist in bulk.
+
+        Args:
+            root_ou (dict): The root returned by the aws client list_roots
+        Returns:
+            (list): dicts of ou, unit_path, level and account (None for org unit nodes)
+        """
+        limiter = RateLimiter(Config.AWS_ORG_API_RATE_LIMIT)
+
+        def limited(function):
+            def call(**kwargs):
+                limiter.wait()
+                return function(**kwargs)
+
+            return call
+
+        list_accounts = limited(self._client.list_accounts_for_parent)
+        list_org_units = limited(self._client.list_organizational_units_for_parent)
+
+        def crawl_ou(ou):
+            accounts = self._depaginate_account_list(list_accounts, "Accounts", ParentId=ou.get("Id"))
+            sub_ous = self._depaginate_account_list(list_org_units, "OrganizationalUnits", ParentId=ou.get("Id"))
+            return accounts, sub_ous
+
+        nodes = []
+        current_level = [(root_ou, root_ou.get("Id"))]
+        level = 0
+        with ThreadPoolExecutor(max_workers=Config.AWS_ORG_CRAWL_CONCURRENCY) as executor:
+            while current_level:
+                futures = [(ou, prefix, executor.submit(crawl_ou, ou)) for ou, prefix in current_level]
+                next_level = []
+                for ou, prefix, future in futures:
+                    nodes.append({"ou": ou, "unit_path": prefix, "level": level, "account": None})
+                    try:
+                        accounts, sub_ous = future.result()
+                    except Exception:
+                        self.errors_raised = True
+                        LOG.exception(
+                            "Failure processing org_unit_id: {} for account with account schema: {},"
+                            " provider_uuid: {}, and account_id: {}".format(
+                                ou.get("Id"), self.schema, self.account.get("provider_uuid"), self.account_id
+                            )
+                        )
+                        continue
+                    for act_info in accounts:
+                        nodes.append({"ou": ou, "unit_path": prefix, "level": level, "account": act_info})
+                    for sub_ou in sub_ous:
+                        next_level.append((sub_ou, prefix + ("&%s" % sub_ou.get("Id"))))
+                current_level = next_level
+                level += 1
+        LOG.info(
+            "Crawled {} org units and accounts for account with provider_uuid: {} and account_id: {}".format(
+                len(nodes), self.account.get("provider_uuid"), self.account_id
+            )
+        )
+        return nodes
+
+    def _save_org_nodes(self, nodes):
+        """
+        Diff the crawled tree against the existing rows and apply it with bulk queries.
+
+        Args:
+            nodes (list): The tree returned by _crawl_org_concurrently
+        """
+        today = self._date_accessor.today()
+        with schema_context(self.schema), transaction.atomic():
+            self._bulk_save_account_aliases([node["account"] for node in nodes if node["account"]])
+            created, updated = self._bulk_save_org_units(nodes)
+            deleted = 0
+            if not self.errors_raised:
+                deleted_ids = [org_unit.id for org_unit in self._structure_yesterday.values()]
+                deleted = AWSOrganizationalUnit.objects.filter(id__in=deleted_ids).update(deleted_timestamp=today)
+        LOG.info(
+            "Org structure saved for account with provider_uuid: {} and account_id: {}. "
+            "created={}, updated={}, deleted={}".format(
+                self.account.get("provider_uuid"), self.account_id, created, updated, deleted
+            )
+        )
+
+    def _bulk_save_account_aliases(self, accounts):
+        """
+        Create missing account aliases and update changed names in bulk.
+
+        Args:
+            accounts (list): Account dicts returned by the aws client
+        """
+        new_account_ids = {
+            account.get("Id") for account in accounts if account.get("Id") not in self._account_alias_map
+        }
+        if new_account_ids:
+            AWSAccountAlias.objects.bulk_create(
+                [AWSAccountAlias(account_id=account_id) for account_id in new_account_ids], ignore_conflicts=True
+            )
+            for account_alias in AWSAccountAlias.objects.filter(account_id__in=new_account_ids):
+                self._account_alias_map[account_alias.account_id] = account_alias
+            LOG.info(f"Saved {len(new_account_ids)} new account aliases")
+        changed_aliases = {}
+        for account in accounts:
+            account_alias = self._account_alias_map[account.get("Id")]
+            account_name = account.get("Name")
+            if account_name and account_alias.account_alias != account_name:
+                account_alias.account_alias = account_name
+                changed_aliases[account_alias.account_id] = account_alias
+        if changed_aliases:
+            AWSAccountAlias.objects.bulk_update(changed_aliases.values(), ["account_alias"])
+
+    def _bulk_save_org_units(self, nodes):
+        """
+        Create new org unit and account nodes and restore returning ones in bulk.
+
+        Args:
+            nodes (list): The tree returned by _crawl_org_concurrently
+        Returns:
+            (int, int): Number of nodes created and updated
+        """
+        existing = {}
+        for org_unit in AWSOrganizationalUnit.objects.all():
+            key = (
+                org_unit.org_unit_name,
+                org_unit.org_unit_id,
+                org_unit.org_unit_path,
+                org_unit.account_alias_id,
+                org_unit.level,
+            )
+            existing.setdefault(key, org_unit)
+        to_create = {}
+        to_update = {}
+        for node in nodes:
+            unit_id = node["ou"].get("Id")
+            account_id = node["account"].get("Id") if node["account"] else None
+            account_alias = self._account_alias_map.get(account_id)
+            key = (
+                node["ou"].get("Name", unit_id),
+                unit_id,
+                node["unit_path"],
+                account_alias.id if account_alias else None,
+                node["level"],
+            )
+            # Remove key since we have seen it
+            self._structure_yesterday.pop(self._create_lookup_key(unit_id, account_id), None)
+            org_unit = existing.get(key)
+            if org_unit is None:
+                to_create[key] = AWSOrganizationalUnit(
+                    org_unit_name=key[0],
+                    org_unit_id=unit_id,
+                    org_unit_path=node["unit_path"],
+                    account_alias=account_alias,
+                    level=node["level"],
+                    provider=self.provider,
+                )
+                continue
+            if org_unit.deleted_timestamp is not None or (not org_unit.provider_id and self.provider):
+                org_unit.deleted_timestamp = None
+                # Self heal nodes saved before the provider foreign key existed.
+                org_unit.provider = org_unit.provider or self.provider
+                to_update[org_unit.id] = org_unit
+        if to_create:
+            AWSOrganizationalUnit.objects.bulk_create(to_create.values())
+        if to_update:
+            AWSOrganizationalUnit.objects.bulk_update(to_update.values(), ["deleted_timestamp", "provider"])
+        return len(to_create), len(to_update)
+
     def _init_session(self):
         """
         Set or get a session client for aws organizations
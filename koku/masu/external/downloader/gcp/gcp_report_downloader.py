@@ -20,8 +20,11 @@ import datetime
 import hashlib
 import logging
 import os
+from collections import defaultdict
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from google.cloud import bigquery
@@ -37,8 +40,10 @@ from masu.external import UNCOMPRESSED
 from masu.external.date_accessor import DateAccessor
 from masu.external.downloader.downloader_interface import DownloaderInterface
 from masu.external.downloader.report_downloader_base import ReportDownloaderBase
+from masu.processor.tracing import stage_timer
 from masu.util.aws.common import copy_local_report_file_to_s3_bucket
 from masu.util.common import get_path_prefix
+from masu.util.gcp.common import gcp_arrow_table_to_data_frame
 from providers.gcp.provider import GCPProvider
 
 DATA_DIR = Config.TMP_DIR
@@ -91,7 +96,8 @@ def create_daily_archives(request_id, account, provider_uuid, filename, filepath
     """
     daily_file_names = []
     if settings.ENABLE_S3_ARCHIVING or settings.ENABLE_PARQUET_PROCESSING:
-        daily_files = divide_csv_daily(filepath)
+        with stage_timer("daily_split", Provider.PROVIDER_GCP, context):
+            daily_files = divide_csv_daily(filepath)
         for daily_file in daily_files:
             # Push to S3
             s3_csv_path = get_path_prefix(
@@ -110,6 +116,79 @@ def create_daily_archives(request_id, account, provider_uuid, filename, filepath
     return daily_file_names
 
 
+def get_arrow_record_batches(query_job):
+    """
+    Yield the results of a BigQuery query job as Arrow record batches.
+
+    Args:
+        query_job (google.cloud.bigquery.QueryJob): The running query
+    """
+    rows = query_job.result()
+    if hasattr(rows, "to_arrow_iterable"):
+        yield from rows.to_arrow_iterable()
+    else:
+        yield from rows.to_arrow().to_batches()
+
+
+def divide_record_batches_daily(record_batches, column_names):
+    """
+    Partition Arrow record batches into one table per usage day.
+
+    Args:
+        record_batches (Iterable[pyarrow.RecordBatch]): BigQuery result batches
+        column_names (list): Names for the batch columns, in query order
+
+    Returns:
+        (dict): usage day (YYYY-MM-DD) to pyarrow.Table
+    """
+    usage_start_index = column_names.index("usage_start_time")
+    daily_batches = defaultdict(list)
+    for batch in record_batches:
+        batch = pa.RecordBatch.from_arrays(batch.columns, names=column_names)
+        usage_days = batch.column(usage_start_index).cast(pa.date32()).to_numpy(zero_copy_only=False)
+        for usage_day in np.unique(usage_days):
+            daily_batches[str(usage_day)].append(batch.filter(pa.array(usage_days == usage_day)))
+    return {usage_day: pa.Table.from_batches(batches) for usage_day, batches in daily_batches.items()}
+
+
+def create_daily_parquet_files(
+    request_id, account, provider_uuid, directory, daily_tables, manifest_id, start_date, context={}
+):
+    """
+    Write daily parquet files from partitioned Arrow tables.
+
+    Daily CSV files are archived to S3 as well when GCP_ARROW_EXPORT_CSV_ARCHIVES is set.
+
+    Args:
+        request_id (str): The request id
+        account (str): The account number
+        provider_uuid (str): The uuid of a provider
+        directory (str): The local directory to write files to
+        daily_tables (dict): usage day to pyarrow.Table
+        manifest_id (int): The manifest identifier
+        start_date (Datetime): The start datetime of incoming report
+        context (Dict): Logging context dictionary
+
+    Returns:
+        (list): Local paths of the daily parquet files
+    """
+    daily_file_names = []
+    s3_csv_path = get_path_prefix(account, Provider.PROVIDER_GCP, provider_uuid, start_date, Config.CSV_DATA_TYPE)
+    for usage_day, table in daily_tables.items():
+        data_frame = gcp_arrow_table_to_data_frame(table)
+        day_filepath = f"{directory}/{usage_day}.parquet"
+        data_frame.to_parquet(day_filepath, allow_truncated_timestamps=True, coerce_timestamps="ms")
+        daily_file_names.append(day_filepath)
+        if settings.GCP_ARROW_EXPORT_CSV_ARCHIVES:
+            csv_filepath = f"{directory}/{usage_day}.csv"
+            table.to_pandas().to_csv(csv_filepath, index=False, header=True)
+            copy_local_report_file_to_s3_bucket(
+                request_id, s3_csv_path, csv_filepath, f"{usage_day}.csv", manifest_id, start_date, context
+            )
+            os.remove(csv_filepath)
+    return daily_file_names
+
+
 class GCPReportDownloaderError(Exception):
     """GCP Report Downloader error."""
 
@@ -359,6 +438,7 @@ class GCPReportDownloader(ReportDownloaderBase, DownloaderInterface):
 
         Returns:
             tuple(str, str) with the local filesystem path to file and GCP's etag.
+            The path is None when the results are exported straight to daily parquet files.
 
         """
         try:
@@ -399,6 +479,9 @@ class GCPReportDownloader(ReportDownloaderBase, DownloaderInterface):
         directory_path = self._get_local_directory_path()
         full_local_path = self._get_local_file_path(directory_path, key)
         os.makedirs(directory_path, exist_ok=True)
+        if settings.ENABLE_PARQUET_PROCESSING and settings.ENABLE_GCP_ARROW_EXPORT:
+            return self._download_parquet(query_job, key, directory_path, manifest_id, start_date)
+
         msg = f"Downloading {key} to {full_local_path}"
         LOG.info(log_json(self.request_id, msg, self.context))
         try:
@@ -433,6 +516,50 @@ class GCPReportDownloader(ReportDownloaderBase, DownloaderInterface):
 
         return full_local_path, self.etag, dh.today, file_names
 
+    def _download_parquet(self, query_job, key, directory_path, manifest_id, start_date):
+        """
+        Write the query results straight to daily parquet files.
+
+        Returns:
+            tuple(None, str, datetime, list) matching download_file. No report file is
+            written, so its path is None, and the daily parquet files take the place
+            of the daily CSV files.
+
+        """
+        msg = f"Exporting {key} to daily parquet files in {directory_path}"
+        LOG.info(log_json(self.request_id, msg, self.context))
+        try:
+            daily_tables = divide_record_batches_daily(get_arrow_record_batches(query_job), self.gcp_big_query_columns)
+            file_names = create_daily_parquet_files(
+                self.request_id,
+                self.account,
+                self._provider_uuid,
+                directory_path,
+                daily_tables,
+                manifest_id,
+                start_date,
+                self.context,
+            )
+        except GoogleCloudError as err:
+            err_msg = (
+                "Could not query table for billing information."
+                f"\n  Provider: {self._provider_uuid}"
+                f"\n  Customer: {self.customer_name}"
+                f"\n  Response: {err.message}"
+            )
+            LOG.warning(err_msg)
+            raise GCPReportDownloaderError(err_msg)
+        except (OSError, IOError) as exc:
+            err_msg = (
+                "Could not create GCP billing data parquet files."
+                f"\n  Provider: {self._provider_uuid}"
+                f"\n  Customer: {self.customer_name}"
+                f"\n  Response: {exc}"
+            )
+            raise GCPReportDownloaderError(err_msg)
+
+        return None, self.etag, DateHelper().today, file_names
+
     def _get_local_directory_path(self):
         """
         Get the local directory path destination for downloading files.
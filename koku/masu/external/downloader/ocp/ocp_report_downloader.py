@@ -30,6 +30,7 @@ from masu.config import Config
 from masu.external import UNCOMPRESSED
 from masu.external.downloader.downloader_interface import DownloaderInterface
 from masu.external.downloader.report_downloader_base import ReportDownloaderBase
+from masu.processor.tracing import stage_timer
 from masu.util.aws.common import copy_local_report_file_to_s3_bucket
 from masu.util.common import get_path_prefix
 from masu.util.ocp import common as utils
@@ -87,7 +88,8 @@ def create_daily_archives(request_id, account, provider_uuid, filename, filepath
     """
     daily_file_names = []
     if settings.ENABLE_S3_ARCHIVING or settings.ENABLE_PARQUET_PROCESSING:
-        daily_files = divide_csv_daily(filepath, filename)
+        with stage_timer("daily_split", Provider.PROVIDER_OCP, context):
+            daily_files = divide_csv_daily(filepath, filename)
         for daily_file in daily_files:
             # Push to S3
             s3_csv_path = get_path_prefix(
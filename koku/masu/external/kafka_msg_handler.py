@@ -53,6 +53,7 @@ from masu.processor.report_processor import ReportProcessorError
 from masu.processor.tasks import record_all_manifest_files
 from masu.processor.tasks import record_report_status
 from masu.processor.tasks import summarize_reports
+from masu.processor.tracing import trace_context
 from masu.prometheus_stats import KAFKA_CONNECTION_ERRORS_COUNTER
 from masu.util.ocp import common as utils
 
@@ -608,18 +609,19 @@ def process_messages(msg):
 
     """
     process_complete = False
-    status, report_metas = handle_message(msg)
-
     value = json.loads(msg.value().decode("utf-8"))
     request_id = value.get("request_id", "no_request_id")
-    if report_metas:
-        for report_meta in report_metas:
-            report_meta["process_complete"] = process_report(request_id, report_meta)
-            LOG.info(f"Processing: {report_meta.get('current_file')} complete.")
-        process_complete = report_metas_complete(report_metas)
-        summary_task_id = summarize_manifest(report_meta)
-        if summary_task_id:
-            LOG.info(f"Summarization celery uuid: {summary_task_id}")
+
+    with trace_context(request_id):
+        status, report_metas = handle_message(msg)
+        if report_metas:
+            for report_meta in report_metas:
+                report_meta["process_complete"] = process_report(request_id, report_meta)
+                LOG.info(f"Processing: {report_meta.get('current_file')} complete.")
+            process_complete = report_metas_complete(report_metas)
+            summary_task_id = summarize_manifest(report_meta)
+            if summary_task_id:
+                LOG.info(f"Summarization celery uuid: {summary_task_id}")
 
     if status:
         if report_metas:
@@ -239,7 +239,9 @@ class ReportDownloader:
                 return {}
 
         return {
-            "file": file_name,
+            # Downloaders that only write split files, like the GCP parquet export, return no file
+            # and the report name still identifies the report stats of the file.
+            "file": file_name or local_file_name,
             "split_files": split_files,
             "compression": report_context.get("compression"),
             "start_date": date_time,
@@ -0,0 +1,82 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import resource
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from masu.util.aws.common import get_s3_resource
+from masu.util.upload import EXPORT_FORMATS
+from masu.util.upload import export_query_to_s3
+
+BENCHMARK_SQL = """
+    SELECT g AS id,
+           md5(g::text) AS resource_id,
+           now() - (g % 720) * interval '1 hour' AS usage_start,
+           g::numeric / 7 AS unblended_cost,
+           jsonb_build_object('app', g % 100) AS tags
+      FROM generate_series(1, %(rows)s) g
+"""
+
+
+class DiscardingS3Client:
+    """An S3 client stand-in that drops uploaded data, to benchmark the export alone."""
+
+    def create_multipart_upload(self, **kwargs):
+        return {"UploadId": "benchmark"}
+
+    def upload_part(self, PartNumber, **kwargs):
+        return {"ETag": str(PartNumber)}
+
+    def complete_multipart_upload(self, **kwargs):
+        pass
+
+    def abort_multipart_upload(self, **kwargs):
+        pass
+
+    def put_object(self, **kwargs):
+        pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark the streaming normalized data export on a generated table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20_000_000)
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default=settings.NORMALIZED_DATA_EXPORT_FORMAT)
+        parser.add_argument("--upload", action="store_true", help="Upload to S3_BUCKET_NAME instead of discarding")
+
+    def handle(self, *args, **options):
+        """Export the generated rows and report throughput and peak memory."""
+        s3_client = get_s3_resource().meta.client if options["upload"] else DiscardingS3Client()
+        key = f"{settings.S3_BUCKET_PATH}/benchmark/export.{options['format']}"
+
+        tracemalloc.start()
+        start = time.monotonic()
+        rows, size = export_query_to_s3(
+            s3_client, settings.S3_BUCKET_NAME, key, BENCHMARK_SQL, {"rows": options["rows"]}, options["format"]
+        )
+        duration = time.monotonic() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.stdout.write(f"Exported {rows} rows ({size / 1024 / 1024:.1f} MB) in {duration:.1f}s")
+        self.stdout.write(f"Rows per second: {rows / duration:.0f}")
+        self.stdout.write(f"Peak Python allocations: {peak / 1024 / 1024:.1f} MB")
+        self.stdout.write(f"Max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
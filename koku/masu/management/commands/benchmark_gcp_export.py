@@ -0,0 +1,148 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import csv
+import datetime
+import os
+import resource
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+from django.core.management.base import BaseCommand
+
+from api.models import Provider
+from masu.external.downloader.gcp.gcp_report_downloader import create_daily_parquet_files
+from masu.external.downloader.gcp.gcp_report_downloader import divide_csv_daily
+from masu.external.downloader.gcp.gcp_report_downloader import divide_record_batches_daily
+from masu.util.common import get_column_converters
+from masu.util.gcp.common import gcp_post_processor
+
+LABEL_TYPE = pa.list_(pa.struct([("key", pa.string()), ("value", pa.string())]))
+CREDIT_TYPE = pa.list_(
+    pa.struct([("name", pa.string()), ("amount", pa.float64()), ("full_name", pa.string()), ("id", pa.string())])
+)
+TIMESTAMP_TYPE = pa.timestamp("us", tz="UTC")
+# Rows spread over this many hourly usage periods, four days
+USAGE_HOURS = 96
+
+
+def billing_batch(size, start=datetime.datetime(2021, 2, 1, tzinfo=datetime.timezone.utc)):
+    """Return a record batch of BigQuery billing export rows and the BigQuery column list."""
+    usage_start = [start + datetime.timedelta(hours=idx % USAGE_HOURS) for idx in range(size)]
+    labels = [[{"key": "environment", "value": f"env-{idx % 3}"}] for idx in range(size)]
+    credits = [
+        [{"name": "FreeTier", "amount": -0.5, "full_name": None, "id": "c1"}] if idx % 2 else [] for idx in range(size)
+    ]
+    strings = pa.array([f"value-{idx % 100}" for idx in range(size)])
+    columns = {
+        "billing_account_id": strings,
+        "service.id": strings,
+        "service.description": pa.array(["Compute Engine"] * size),
+        "sku.id": strings,
+        "sku.description": strings,
+        "usage_start_time": pa.array(usage_start, TIMESTAMP_TYPE),
+        "usage_end_time": pa.array([value + datetime.timedelta(hours=1) for value in usage_start], TIMESTAMP_TYPE),
+        "project.id": strings,
+        "project.name": strings,
+        "project.labels": pa.array(labels, LABEL_TYPE),
+        "project.ancestry_numbers": pa.array([None] * size, pa.string()),
+        "labels": pa.array(labels, LABEL_TYPE),
+        "system_labels": pa.array([[]] * size, LABEL_TYPE),
+        "location.location": strings,
+        "location.country": strings,
+        "location.region": strings,
+        "location.zone": strings,
+        "export_time": pa.array(usage_start, TIMESTAMP_TYPE),
+        "cost": pa.array([1.25] * size),
+        "currency": pa.array(["USD"] * size),
+        "currency_conversion_rate": pa.array([1.0] * size),
+        "usage.amount": pa.array([3600.0] * size),
+        "usage.unit": pa.array(["seconds"] * size),
+        "usage.amount_in_pricing_units": pa.array([1.0] * size),
+        "usage.pricing_unit": pa.array(["hour"] * size),
+        "credits": pa.array(credits, CREDIT_TYPE),
+        "invoice.month": pa.array(["202102"] * size),
+        "cost_type": pa.array(["regular"] * size),
+    }
+    # BigQuery names selected struct fields by their leaf name
+    batch = pa.RecordBatch.from_arrays(list(columns.values()), names=[name.split(".")[-1] for name in columns])
+    return batch, list(columns)
+
+
+def query_batches(batch, num_rows):
+    """Yield the same batch until num_rows rows were returned, like a streamed query result."""
+    for offset in range(0, num_rows, batch.num_rows):
+        yield batch.slice(0, min(batch.num_rows, num_rows - offset))
+
+
+def export_csv(directory, batches, column_names):
+    """Export the query rows to CSV, split it by day and convert each day to parquet, as the CSV path does."""
+    csv_file = os.path.join(directory, "export.csv")
+    with open(csv_file, "w") as f:
+        writer = csv.writer(f)
+        writer.writerow(column_names)
+        for batch in batches:
+            writer.writerows(zip(*[column.to_pylist() for column in batch.columns]))
+    converters = get_column_converters(Provider.PROVIDER_GCP)
+    parquet_files = []
+    for daily_file in divide_csv_daily(csv_file):
+        daily_path = daily_file["filepath"]
+        col_names = pd.read_csv(daily_path, nrows=0).columns
+        day_converters = {col: str for col in col_names if col not in converters}
+        day_converters.update(converters)
+        data_frame = gcp_post_processor(pd.read_csv(daily_path, converters=day_converters))
+        parquet_file = daily_path.replace(".csv", ".parquet")
+        data_frame.to_parquet(parquet_file, allow_truncated_timestamps=True, coerce_timestamps="ms")
+        parquet_files.append(parquet_file)
+    return parquet_files
+
+
+def export_arrow(directory, batches, column_names):
+    """Partition the query batches by day and write each day to parquet, as the Arrow export does."""
+    daily_tables = divide_record_batches_daily(batches, column_names)
+    return create_daily_parquet_files(
+        "benchmark", "benchmark", "benchmark", directory, daily_tables, None, datetime.date(2021, 2, 1)
+    )
+
+
+class Command(BaseCommand):
+    help = "Benchmark the GCP CSV export and parquet conversion against the Arrow parquet export"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5_000_000)
+        parser.add_argument("--batch-size", type=int, default=10_000, help="Rows per query result batch")
+        parser.add_argument("--skip-csv", action="store_true", help="Only time the Arrow export")
+
+    def handle(self, *args, **options):
+        """Export the generated rows both ways and report throughput and memory."""
+        batch, column_names = billing_batch(options["batch_size"])
+        exports = [("arrow", export_arrow)]
+        if not options["skip_csv"]:
+            exports.insert(0, ("csv", export_csv))
+        for name, export in exports:
+            with tempfile.TemporaryDirectory() as directory:
+                start = time.perf_counter()
+                parquet_files = export(directory, query_batches(batch, options["rows"]), column_names)
+                duration = time.perf_counter() - start
+                size = sum(os.path.getsize(parquet_file) for parquet_file in parquet_files)
+            self.stdout.write(
+                f"{name}: {options['rows']} rows to {len(parquet_files)} daily parquet files "
+                f"({size / 1024 / 1024:.1f} MB) in {duration:.1f}s, {options['rows'] / duration:.0f} rows per second"
+            )
+        # ru_maxrss is the peak of the whole run, so run with --skip-csv for the Arrow export alone
+        self.stdout.write(f"Max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
@@ -0,0 +1,119 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import datetime
+import statistics
+import time
+
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db import transaction
+from tenant_schemas.utils import schema_context
+
+from api.models import Provider
+from masu.processor.report_summary_updater import SUMMARY_ACCESSORS
+
+# The prefixes of the BRIN and (usage_start, source_uuid) indexes of reporting migration 0171
+LAYOUT_INDEX_PREFIXES = {
+    Provider.PROVIDER_AWS: "aws_summ",
+    Provider.PROVIDER_AZURE: "azure_summ",
+    Provider.PROVIDER_GCP: "gcp_summ",
+    Provider.PROVIDER_OCP: "ocp_summ",
+}
+# The report query handlers bounded usage_start from below and usage_end from above
+BEFORE_PREDICATES = "usage_start >= %(start)s AND usage_end <= %(end)s"
+AFTER_PREDICATES = "usage_start >= %(start)s AND usage_end <= %(end)s AND usage_start <= %(end)s"
+BENCHMARK_SQL = """
+SELECT usage_start, source_uuid, count(*)
+  FROM {table_name}
+ WHERE {predicates}
+ GROUP BY usage_start, source_uuid
+"""
+
+
+def get_month_ranges(months):
+    """Return the first and last day of each of the last months, oldest first."""
+    this_month = datetime.date.today().replace(day=1)
+    starts = [this_month - relativedelta(months=offset) for offset in range(months - 1, -1, -1)]
+    return [(start, start + relativedelta(months=1, days=-1)) for start in starts]
+
+
+class Command(BaseCommand):
+    help = "Compare daily summary query plans and timings before and after the partition pruning and BRIN layout"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schema", required=True, help="A tenant schema with summarized data")
+        parser.add_argument("--provider-type", choices=sorted(LAYOUT_INDEX_PREFIXES), default=Provider.PROVIDER_OCP)
+        parser.add_argument("--months", type=int, default=12)
+        parser.add_argument("--runs", type=int, default=3)
+        parser.add_argument("--cluster", action="store_true", help="Also cluster the partitions for the after run")
+
+    def time_queries(self, sql, ranges, runs):
+        """Return the median duration in milliseconds of querying each range."""
+        durations = []
+        with connection.cursor() as cursor:
+            for start, end in ranges:
+                runs_ms = []
+                for _ in range(runs):
+                    begin = time.perf_counter()
+                    cursor.execute(sql, {"start": start, "end": end})
+                    cursor.fetchall()
+                    runs_ms.append((time.perf_counter() - begin) * 1000)
+                durations.append(statistics.median(runs_ms))
+        return durations
+
+    def explain(self, sql, start, end):
+        """Write the EXPLAIN (ANALYZE, BUFFERS) plan of a query."""
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", {"start": start, "end": end})
+            for (line,) in cursor.fetchall():
+                self.stdout.write(line)
+
+    def handle(self, *args, **options):
+        """Query each month with the old layout in a transaction that is rolled back, then with the new one."""
+        schema_name = options["schema"]
+        provider_type = options["provider_type"]
+        prefix = LAYOUT_INDEX_PREFIXES[provider_type]
+        ranges = get_month_ranges(options["months"])
+        with SUMMARY_ACCESSORS[provider_type](schema_name) as accessor:
+            table_name = accessor.line_item_daily_summary_table._meta.db_table
+            before_sql = BENCHMARK_SQL.format(table_name=table_name, predicates=BEFORE_PREDICATES)
+            after_sql = BENCHMARK_SQL.format(table_name=table_name, predicates=AFTER_PREDICATES)
+
+            with schema_context(schema_name):
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"DROP INDEX IF EXISTS {prefix}_usage_start_brin")
+                        cursor.execute(f"DROP INDEX IF EXISTS {prefix}_usage_start_source_idx")
+                    self.stdout.write(f"Before, oldest month {ranges[0][0]}:")
+                    self.explain(before_sql, *ranges[0])
+                    before = self.time_queries(before_sql, ranges, options["runs"])
+                    transaction.set_rollback(True)
+
+                with transaction.atomic():
+                    if options["cluster"]:
+                        clustered = accessor.cluster_summary_partitions(ranges[0][0], ranges[-1][1])
+                        self.stdout.write(f"Clustered {len(clustered)} partitions")
+                    self.stdout.write(f"\nAfter, oldest month {ranges[0][0]}:")
+                    self.explain(after_sql, *ranges[0])
+                    after = self.time_queries(after_sql, ranges, options["runs"])
+                    transaction.set_rollback(True)
+
+        self.stdout.write(f"\n{'month':>10} {'before':>10} {'after':>10}")
+        for (start, _), before_ms, after_ms in zip(ranges, before, after):
+            self.stdout.write(f"{start:%Y-%m}    {before_ms:8.1f}ms {after_ms:8.1f}ms")
+        self.stdout.write(f"{'total':>10} {sum(before):8.1f}ms {sum(after):8.1f}ms")
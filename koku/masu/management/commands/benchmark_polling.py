@@ -0,0 +1,102 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import threading
+import time
+from collections import Counter
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+
+from api.models import Provider
+from masu.config import Config
+from masu.external.date_accessor import DateAccessor
+from masu.processor.orchestrator import Orchestrator
+
+
+class LatencyDownloader:
+    """A ReportDownloader stand-in that takes a set time to find no manifest for a provider."""
+
+    latency = {}
+    discovered = []
+
+    def __init__(self, provider_uuid=None, **kwargs):
+        self.provider_uuid = provider_uuid
+
+    def download_manifest(self, report_month):
+        time.sleep(self.latency[self.provider_uuid])
+        self.discovered.append(self.provider_uuid)
+        return {}
+
+
+class Command(BaseCommand):
+    help = "Benchmark a polling cycle of the orchestrator with mocked downloaders and injected latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--providers", type=int, default=100)
+        parser.add_argument("--latency", type=float, default=0.5, help="Seconds to discover the manifest of a month")
+        parser.add_argument("--slow", type=int, default=2, help="Providers whose discovery hangs")
+        parser.add_argument("--slow-latency", type=float, default=60.0)
+        parser.add_argument("--months", type=int, default=2, help="Report months discovered per provider")
+        parser.add_argument("--timeout", type=int, default=10, help="POLLING_PROVIDER_TIMEOUT in seconds")
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+
+    def handle(self, *args, **options):
+        """Run one polling cycle for each concurrency and report its duration and the providers it finished."""
+        months = DateAccessor().get_billing_months(options["months"])
+        with patch.object(Orchestrator, "get_reports", return_value=months), patch(
+            "masu.processor.orchestrator.ReportDownloader", LatencyDownloader
+        ), patch("masu.processor.orchestrator.AccountLabel") as mock_labeler:
+            mock_labeler.return_value.get_label_details.return_value = (None, None)
+            for concurrency in options["concurrency"]:
+                self.run_cycle(concurrency, months, options)
+            # Discoveries still hanging keep their pool thread until they are done
+            for thread in threading.enumerate():
+                if thread.name.startswith("orchestrator"):
+                    thread.join()
+
+    def run_cycle(self, concurrency, months, options):
+        """Run one polling cycle over new providers, so the hanging discoveries of the last one are not skipped."""
+        accounts = [
+            {
+                "customer_name": "acct10001",
+                "credentials": {},
+                "data_source": {},
+                "provider_type": Provider.PROVIDER_AWS,
+                "schema_name": "acct10001",
+                "provider_uuid": str(uuid4()),
+            }
+            for _ in range(options["providers"])
+        ]
+        LatencyDownloader.latency.update(
+            {
+                account["provider_uuid"]: options["slow_latency"] if index < options["slow"] else options["latency"]
+                for index, account in enumerate(accounts)
+            }
+        )
+        with patch.object(Orchestrator, "get_accounts", return_value=(accounts, accounts)), patch.object(
+            Config, "POLLING_CONCURRENCY", concurrency
+        ), patch.object(Config, "POLLING_PROVIDER_TIMEOUT", options["timeout"]):
+            start = time.perf_counter()
+            Orchestrator().prepare()
+            duration = time.perf_counter() - start
+        counts = Counter(LatencyDownloader.discovered)
+        discovered = sum(1 for account in accounts if counts[account["provider_uuid"]] == len(months))
+        self.stdout.write(
+            f"concurrency {concurrency}: {discovered} of {len(accounts)} providers discovered "
+            f"in a cycle of {duration:.1f}s"
+        )
@@ -0,0 +1,175 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import datetime
+import statistics
+import threading
+import time
+
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from koku import pg_partition as ppart
+
+SUMMARY_TABLES = (
+    "reporting_awscostentrylineitem_daily_summary",
+    "reporting_azurecostentrylineitem_daily_summary",
+    "reporting_gcpcostentrylineitem_daily_summary",
+    "reporting_ocpusagelineitem_daily_summary",
+)
+# The backfilled copies are moved this far into the future, where no partitions exist yet
+BACKFILL_YEARS = 100
+
+
+class QueryProbe(threading.Thread):
+    """Run a report shaped query on a table in a loop and record how long each run took."""
+
+    def __init__(self, schema_name, table_name):
+        """Initialize the probe."""
+        super().__init__(daemon=True)
+        self.sql = f'SELECT count(*) FROM "{schema_name}"."{table_name}" WHERE usage_start >= %s AND usage_start < %s'
+        self.start_date = datetime.date.today().replace(day=1)
+        self.end_date = self.start_date + relativedelta(months=1)
+        self.durations = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        """Query until stopped."""
+        try:
+            with connection.cursor() as cursor:
+                while not self.stopped.is_set():
+                    start = time.monotonic()
+                    cursor.execute(self.sql, [self.start_date, self.end_date])
+                    cursor.fetchall()
+                    self.durations.append(time.monotonic() - start)
+                    self.stopped.wait(0.05)
+        finally:
+            connection.close()
+
+    def stop(self):
+        """Stop querying and wait for the last query to finish."""
+        self.stopped.set()
+        self.join()
+
+
+def backfill_default_partition(schema_name, table_name, months):
+    """Copy the last months of a table far enough into the future that the copies land in its default partition."""
+    start = datetime.date.today().replace(day=1) - relativedelta(months=months - 1)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT column_name
+              FROM information_schema.columns
+             WHERE table_schema = %s
+               AND table_name = %s
+             ORDER BY ordinal_position
+            """,
+            [schema_name, table_name],
+        )
+        columns = [row[0] for row in cursor.fetchall()]
+        values = []
+        for column in columns:
+            if column == "uuid":
+                values.append("md5(random()::text || clock_timestamp()::text)::uuid")
+            elif column in ("usage_start", "usage_end"):
+                values.append(f"{column} + interval '{BACKFILL_YEARS} years'")
+            else:
+                values.append(f'"{column}"')
+        cursor.execute(
+            f"""
+            INSERT INTO "{schema_name}"."{table_name}" ({", ".join(f'"{column}"' for column in columns)})
+            SELECT {", ".join(values)}
+              FROM "{schema_name}"."{table_name}"
+             WHERE usage_start >= %s
+               AND usage_start < %s
+            """,
+            [start, datetime.date.today().replace(day=1) + relativedelta(months=1)],
+        )
+        return cursor.rowcount
+
+
+def drop_backfill(schema_name, table_name):
+    """Drop the partitions and default partition rows of a backfill."""
+    cutoff = datetime.date(datetime.date.today().year + BACKFILL_YEARS - 1, 1, 1)
+    with connection.cursor() as cursor:
+        # Deleting the tracking records drops their partitions
+        cursor.execute(
+            f"""
+            DELETE FROM "{schema_name}"."partitioned_tables"
+             WHERE partition_of_table_name = %s
+               AND partition_parameters->>'default' = 'false'
+               AND (partition_parameters->>'from')::date >= %s
+            """,
+            [table_name, cutoff],
+        )
+        cursor.execute(f'DELETE FROM "{schema_name}"."{table_name}" WHERE usage_start >= %s', [cutoff])
+
+
+def repartition_one_at_a_time(schema_name, max_workers):
+    """Repartition the default partitions of a schema the way the original crawler did."""
+    for default_rec in ppart.get_partitioned_tables_with_default(schema_name):
+        ppart.PartitionDefaultData(
+            default_rec["schema_name"],
+            default_rec["partitioned_table"],
+            default_partition=default_rec["default_partition"],
+        ).repartition_default_data()
+    return []
+
+
+def repartition_staged(schema_name, max_workers):
+    """Repartition the default partitions of a schema with the staged engine."""
+    return ppart.repartition_default_data(schema_name=schema_name, max_workers=max_workers)
+
+
+class Command(BaseCommand):
+    help = "Compare query lock waits while backfilled default partitions are repartitioned in place or staged"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schema", required=True, help="A tenant schema with summarized data")
+        parser.add_argument("--months", type=int, default=12, help="The months of data to backfill")
+        parser.add_argument("--max-workers", type=int, default=None)
+
+    def handle(self, *args, **options):
+        """Backfill each summary table, repartition it with each engine while probing queries, and clean up."""
+        schema_name = options["schema"]
+        self.stdout.write(f"{'engine':>8} {'rows':>10} {'seconds':>8} {'queries':>8} {'p50':>9} {'p99':>9} {'max':>9}")
+        for name, repartition in (("in place", repartition_one_at_a_time), ("staged", repartition_staged)):
+            rows = sum(backfill_default_partition(schema_name, table, options["months"]) for table in SUMMARY_TABLES)
+            probes = [QueryProbe(schema_name, table) for table in SUMMARY_TABLES]
+            for probe in probes:
+                probe.start()
+            start = time.monotonic()
+            try:
+                results = repartition(schema_name, options["max_workers"])
+            finally:
+                duration = time.monotonic() - start
+                for probe in probes:
+                    probe.stop()
+                for table in SUMMARY_TABLES:
+                    drop_backfill(schema_name, table)
+
+            latencies = sorted(latency * 1000 for probe in probes for latency in probe.durations) or [0]
+            self.stdout.write(
+                f"{name:>8} {rows:>10} {duration:>7.1f}s {len(latencies):>8} "
+                f"{statistics.median(latencies):>7.1f}ms {latencies[int(len(latencies) * 0.99)]:>7.1f}ms "
+                f"{latencies[-1]:>7.1f}ms"
+            )
+            for result in results:
+                self.stdout.write(
+                    f"    {result.partitioned_table}: {result.partitions} partitions, {result.rows} rows, "
+                    f"{result.lock_wait * 1000:.1f}ms waiting for locks in {result.seconds:.1f}s"
+                )
@@ -0,0 +1,80 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import resolve
+
+from api.iam.models import Customer
+from api.iam.models import User
+from api.models import Provider
+from api.query_params import QueryParameters
+from koku.cache import invalidate_report_deltas_cache
+
+DEFAULT_URL = (
+    "reports/aws/costs/?group_by[account]=*&filter[resolution]=daily"
+    "&filter[time_scope_units]=month&filter[time_scope_value]=-1&delta=cost"
+)
+
+
+class Command(BaseCommand):
+    help = "Benchmark a delta report without the report deltas cache and with it warm"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schema", required=True, help="The tenant schema to run the report in")
+        parser.add_argument("--url", default=DEFAULT_URL, help="The report URL, relative to the API root")
+        parser.add_argument("--runs", type=int, default=5)
+
+    def handle(self, *args, **options):
+        """Time the report with the previous period queried on every request, then read from the cache."""
+        schema_name = options["schema"]
+        url = f"{settings.API_PATH_PREFIX.rstrip('/')}/v1/{options['url']}"
+        match = resolve(urlsplit(url).path)
+        view = match.func.view_class()
+        request = RequestFactory().get(url)
+        request.user = User(username="deltas-benchmark", customer=Customer.objects.get(schema_name=schema_name))
+        request.user.access = None
+
+        def run_report():
+            handler = view.query_handler(QueryParameters(request=request, caller=view, **match.kwargs))
+            return handler.execute_query().get("delta")
+
+        results = {}
+        for name, enabled in (("uncached", False), ("cached", True)):
+            with override_settings(REPORT_DELTAS_CACHE_ENABLED=enabled):
+                for source_type in (
+                    Provider.PROVIDER_AWS,
+                    Provider.PROVIDER_OCP,
+                    Provider.PROVIDER_AZURE,
+                    Provider.PROVIDER_GCP,
+                ):
+                    invalidate_report_deltas_cache(schema_name, source_type)
+                # The first run fills the cache
+                results[name] = run_report()
+                durations = []
+                for _ in range(options["runs"]):
+                    start = time.perf_counter()
+                    run_report()
+                    durations.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(f"{name:>8}: {statistics.median(durations):10.1f}ms median, delta={results[name]}")
+        if results["uncached"] != results["cached"]:
+            self.stderr.write("The cached delta differs from the uncached delta")
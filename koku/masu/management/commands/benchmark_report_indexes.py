@@ -0,0 +1,77 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import statistics
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db import transaction
+from tenant_schemas.utils import schema_context
+
+from api.report.index_advisor import IndexAdvisor
+from api.report.index_advisor import replay_query_shape
+from masu.management.commands.index_advisor import read_query_shapes
+
+
+def time_query_shape(shape, schema_name, runs):
+    """Return the median duration of a query shape in milliseconds."""
+    durations = []
+    for _ in range(runs):
+        result = replay_query_shape(shape, schema_name)
+        if result.error:
+            raise result.error
+        durations.append(result.duration * 1000)
+    return statistics.median(durations)
+
+
+class Command(BaseCommand):
+    help = "Benchmark the slowest report API query shapes with and without the proposed indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schema", required=True, help="The tenant schema to replay the query shapes in")
+        parser.add_argument("--shapes", help="A file of report URLs, one per line")
+        parser.add_argument("--slowest", type=int, default=5, help="The number of query shapes to benchmark")
+        parser.add_argument("--runs", type=int, default=3)
+        parser.add_argument("--max-indexes", type=int, default=10)
+
+    def handle(self, *args, **options):
+        """Time the slowest shapes, create the proposed indexes in a transaction that is rolled back and time again."""
+        schema_name = options["schema"]
+        advisor = IndexAdvisor(schema_name)
+        results = [result for result in advisor.replay(read_query_shapes(options["shapes"])) if not result.error]
+        slowest = [result.shape for result in sorted(results, key=lambda result: result.duration, reverse=True)]
+        slowest = slowest[: options["slowest"]]
+        candidates = advisor.get_candidates_by_benefit(options["max_indexes"])
+        if not candidates:
+            self.stdout.write("No indexes to propose.")
+            return
+
+        before = {shape: time_query_shape(shape, schema_name, options["runs"]) for shape in slowest}
+        with transaction.atomic():
+            with schema_context(schema_name):
+                with connection.cursor() as cursor:
+                    for candidate in candidates:
+                        self.stdout.write(candidate.create_sql)
+                        cursor.execute(candidate.create_sql)
+                    for table_name in {candidate.table_name for candidate in candidates}:
+                        cursor.execute(f"ANALYZE {table_name}")
+            after = {shape: time_query_shape(shape, schema_name, options["runs"]) for shape in slowest}
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"\n{'before':>10} {'after':>10} {'change':>8}  shape")
+        for shape in slowest:
+            change = (after[shape] - before[shape]) / before[shape] * 100 if before[shape] else 0
+            self.stdout.write(f"{before[shape]:8.1f}ms {after[shape]:8.1f}ms {change:7.1f}%  {shape}")
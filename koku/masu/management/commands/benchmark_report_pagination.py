@@ -0,0 +1,111 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db import transaction
+from django.test import RequestFactory
+from django.urls import resolve
+from rest_framework.request import Request
+from tenant_schemas.utils import schema_context
+
+from api.common.pagination import ReportPagination
+from api.iam.models import Customer
+from api.iam.models import User
+from api.query_params import QueryParameters
+from reporting.models import OCP_MATERIALIZED_VIEWS
+from reporting.models import OCPUsageLineItemDailySummary
+
+DEFAULT_URL = (
+    "reports/openshift/costs/?group_by[project]=*&filter[resolution]=monthly"
+    "&filter[time_scope_units]=month&filter[time_scope_value]=-1"
+)
+
+
+def add_synthetic_projects(count):
+    """Copy a daily summary row into count new projects and refresh the OCP views."""
+    table_name = OCPUsageLineItemDailySummary._meta.db_table
+    sql = f"""
+INSERT INTO {table_name}
+SELECT (jsonb_populate_record(
+            NULL::{table_name},
+            to_jsonb(s) || jsonb_build_object('uuid', md5(s.uuid::text || g)::uuid, 'namespace', 'benchmark-' || g)
+        )).*
+  FROM (SELECT * FROM {table_name} WHERE namespace IS NOT NULL ORDER BY usage_start DESC LIMIT 1) s
+ CROSS
+  JOIN generate_series(1, %s) g;
+"""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (count,))
+        for view in OCP_MATERIALIZED_VIEWS:
+            cursor.execute(f"REFRESH MATERIALIZED VIEW {view._meta.db_table}")
+
+
+class Command(BaseCommand):
+    help = "Benchmark the first page of a group_by report paginated after the query and in the query"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schema", required=True, help="The tenant schema to run the report in")
+        parser.add_argument("--url", default=DEFAULT_URL, help="The report URL, relative to the API root")
+        parser.add_argument("--limit", type=int, default=100)
+        parser.add_argument("--offset", type=int, default=0)
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument(
+            "--synthetic-projects", type=int, default=0, help="Projects added for the benchmark and rolled back after"
+        )
+
+    def handle(self, *args, **options):
+        """Time the page with the whole report paginated after the query, then with the page applied in it."""
+        schema_name = options["schema"]
+        url = f"{settings.API_PATH_PREFIX.rstrip('/')}/v1/{options['url']}"
+        url = f"{url}&limit={options['limit']}&offset={options['offset']}"
+        match = resolve(urlsplit(url).path)
+        view = match.func.view_class()
+        request = RequestFactory().get(url)
+        request.user = User(username="pagination-benchmark", customer=Customer.objects.get(schema_name=schema_name))
+        request.user.access = None
+
+        def paginate_after():
+            handler = view.query_handler(QueryParameters(request=request, caller=view, **match.kwargs))
+            output = handler.execute_query()
+            paginator = ReportPagination()
+            paginator.paginate_queryset(output, Request(request))
+            return paginator.count
+
+        def paginate_in_query():
+            handler = view.query_handler(QueryParameters(request=request, caller=view, **match.kwargs))
+            handler.execute_query_page(options["limit"], options["offset"])
+            return handler.query_count
+
+        with transaction.atomic():
+            with schema_context(schema_name):
+                if options["synthetic_projects"]:
+                    add_synthetic_projects(options["synthetic_projects"])
+            for name, func in (("after the query", paginate_after), ("in the query", paginate_in_query)):
+                durations = []
+                for _ in range(options["runs"]):
+                    start = time.perf_counter()
+                    count = func()
+                    durations.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(
+                    f"paginated {name:>15}: {statistics.median(durations):10.1f}ms median, meta.count={count}"
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,68 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import csv
+import gzip
+import shutil
+import tempfile
+import time
+from os import path
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from api.models import Provider
+from masu.external import GZIP_COMPRESSED
+from masu.external import UNCOMPRESSED
+from masu.processor.report_processor import ReportProcessor
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark loading a report file with and without the pipelined COPY loader. "
+        "Every run loads the file again, so use a scratch provider."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--provider-uuid", required=True)
+        parser.add_argument("--file", required=True, help="An AWS, Azure or OCP report CSV file, optionally gzipped")
+        parser.add_argument("--runs", type=int, default=3)
+
+    def handle(self, *args, **options):
+        """Process the report file in both modes and report rows per second."""
+        provider = Provider.objects.select_related("customer").get(uuid=options["provider_uuid"])
+        compression = GZIP_COMPRESSED if options["file"].endswith(".gz") else UNCOMPRESSED
+        opener = gzip.open if compression == GZIP_COMPRESSED else open
+        with opener(options["file"], "rt") as report_file:
+            rows = sum(1 for _ in csv.reader(report_file)) - 1
+
+        self.stdout.write(f"{provider.type} report with {rows} rows")
+        for pipelined in (False, True):
+            durations = []
+            for _ in range(options["runs"]):
+                with tempfile.TemporaryDirectory() as directory, override_settings(
+                    REPORT_PROCESSING_PIPELINED_COPY=pipelined
+                ):
+                    report_path = shutil.copy(options["file"], path.join(directory, path.basename(options["file"])))
+                    processor = ReportProcessor(
+                        provider.customer.schema_name, report_path, compression, provider.type, provider.uuid, None
+                    )
+                    start = time.perf_counter()
+                    processor.process()
+                    durations.append(time.perf_counter() - start)
+            best = min(durations)
+            mode = "pipelined" if pipelined else "sequential"
+            self.stdout.write(f"{mode:>10}: {best:.2f}s, {rows / best:.0f} rows per second")
@@ -0,0 +1,138 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import cProfile
+import csv
+import json
+import os
+import pstats
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from masu.external import UNCOMPRESSED
+from masu.processor.aws.aws_report_processor import AWSReportProcessor
+from reporting.provider.aws.models import AWSCostEntry
+from reporting.provider.aws.models import AWSCostEntryBill
+from reporting.provider.aws.models import AWSCostEntryLineItem
+from reporting.provider.aws.models import AWSCostEntryPricing
+from reporting.provider.aws.models import AWSCostEntryProduct
+from reporting.provider.aws.models import AWSCostEntryReservation
+from reporting_common import REPORT_COLUMN_MAP
+
+TABLE_NAMES = [
+    model._meta.db_table
+    for model in (
+        AWSCostEntryBill,
+        AWSCostEntry,
+        AWSCostEntryLineItem,
+        AWSCostEntryPricing,
+        AWSCostEntryProduct,
+        AWSCostEntryReservation,
+    )
+]
+# Real CURs carry a few hundred columns, most of them not stored by Koku
+REPORT_COLUMNS = 250
+
+
+def legacy_get_data_for_table(row, table_name):
+    """Extract the data of a table from a row the way the processors did before column projections."""
+    column_map = REPORT_COLUMN_MAP[table_name]
+    return {column_map[key]: value for key, value in row.items() if key in column_map}
+
+
+def legacy_process_tags(row, tag_prefix="resourceTags"):
+    """Build the tags of a row the way the AWS processor did before resolving tag columns once."""
+    tag_dict = {}
+    for key, value in row.items():
+        if tag_prefix in key and row[key]:
+            key_value = key.split(":")
+            if len(key_value) > 1:
+                tag_dict[key_value[-1]] = value
+    return json.dumps(tag_dict)
+
+
+def write_report(report_path, rows, tags):
+    """Write a CUR shaped CSV file of generated rows."""
+    mapped = list(dict.fromkeys(key for table_name in TABLE_NAMES for key in REPORT_COLUMN_MAP[table_name]))
+    tag_columns = [f"resourceTags/user:tag{number}" for number in range(tags)]
+    unmapped = [f"product/attribute{number}" for number in range(REPORT_COLUMNS - len(mapped) - tags)]
+    header = mapped + tag_columns + unmapped
+    with open(report_path, "w", newline="") as report_file:
+        writer = csv.writer(report_file)
+        writer.writerow(header)
+        for number in range(rows):
+            writer.writerow(
+                [f"{number % 1000}" for _ in mapped]
+                + [f"value{number % 7}" if number % (index + 2) else "" for index in range(tags)]
+                + ["" for _ in unmapped]
+            )
+
+
+def parse_report(report_path, get_data_for_table, process_tags, set_report_header=None):
+    """Read a report and extract the data of every AWS table from each row."""
+    rows = 0
+    with open(report_path) as report_file:
+        reader = csv.DictReader(report_file)
+        if set_report_header:
+            set_report_header(reader.fieldnames)
+        for row in reader:
+            for table_name in TABLE_NAMES:
+                get_data_for_table(row, table_name)
+            process_tags(row)
+            rows += 1
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Profile AWS line item row parsing against the per-column parsing it replaced"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schema", required=True, help="A tenant schema to build the AWS processor in")
+        parser.add_argument("--file", help="An uncompressed AWS CUR file, instead of a generated one")
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--tags", type=int, default=20)
+        parser.add_argument("--profile", action="store_true", help="Print the top functions of the current parser")
+
+    def handle(self, *args, **options):
+        """Parse the report with both implementations and report rows per second."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            report_path = options["file"]
+            if not report_path:
+                report_path = os.path.join(tmpdir, "benchmark.csv")
+                write_report(report_path, options["rows"], options["tags"])
+            processor = AWSReportProcessor(options["schema"], report_path, UNCOMPRESSED, None)
+
+            for name, get_data_for_table, process_tags, set_report_header in (
+                ("per-column", legacy_get_data_for_table, legacy_process_tags, None),
+                ("projected", processor._get_data_for_table, processor._process_tags, processor._set_report_header),
+            ):
+                start = time.perf_counter()
+                rows = parse_report(report_path, get_data_for_table, process_tags, set_report_header)
+                duration = time.perf_counter() - start
+                self.stdout.write(f"{name}: {rows} rows in {duration:.1f}s, {rows / duration:.0f} rows per second")
+
+            if options["profile"]:
+                profile = cProfile.Profile()
+                profile.runcall(
+                    parse_report,
+                    report_path,
+                    processor._get_data_for_table,
+                    processor._process_tags,
+                    processor._set_report_header,
+                )
+                pstats.Stats(profile, stream=self.stdout).sort_stats("cumulative").print_stats(20)
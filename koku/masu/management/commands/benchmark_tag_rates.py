@@ -0,0 +1,150 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db import transaction
+from tenant_schemas.utils import schema_context
+
+from api.utils import DateHelper
+from masu.database.ocp_report_db_accessor import OCPReportDBAccessor
+from reporting.models import OCPUsageLineItemDailySummary
+
+CLUSTER_ID = "benchmark-tag-rates"
+TAG_METRICS = (
+    "cpu_core_usage_per_hour",
+    "cpu_core_request_per_hour",
+    "memory_gb_usage_per_hour",
+    "memory_gb_request_per_hour",
+    "storage_gb_usage_per_month",
+    "storage_gb_request_per_month",
+)
+
+
+def build_tag_rates(count, tag_keys):
+    """Build count tag rates, split between infrastructure and supplementary, over tag_keys tag keys."""
+    infrastructure_rates = {}
+    supplementary_rates = {}
+    for number in range(count):
+        rates = infrastructure_rates if number % 2 else supplementary_rates
+        metric = TAG_METRICS[number % len(TAG_METRICS)]
+        tag_values = rates.setdefault(metric, {}).setdefault(f"tag{number % tag_keys}", {})
+        tag_values[f"value{number}"] = f"{number % 10 + 1}.0000000000"
+    return infrastructure_rates, supplementary_rates
+
+
+def add_synthetic_cluster(start_date, days, nodes, pods_per_node, tag_keys, tag_values):
+    """Add daily summary rows for a cluster of nodes, with one volume for every other pod."""
+    table_name = OCPUsageLineItemDailySummary._meta.db_table
+    sql = f"""
+INSERT INTO {table_name} (
+    uuid, cluster_id, data_source, node, namespace, usage_start, usage_end,
+    pod_usage_cpu_core_hours, pod_request_cpu_core_hours,
+    pod_usage_memory_gigabyte_hours, pod_request_memory_gigabyte_hours,
+    persistentvolumeclaim_usage_gigabyte_months, volume_request_storage_gigabyte_months,
+    pod_labels, volume_labels, infrastructure_usage_cost, supplementary_usage_cost
+)
+SELECT md5(concat_ws(':', %(cluster_id)s, d, n, p, s))::uuid,
+       %(cluster_id)s,
+       CASE WHEN s = 0 THEN 'Pod' ELSE 'Storage' END,
+       'node-' || n,
+       'project-' || p,
+       %(start_date)s::date + d,
+       %(start_date)s::date + d,
+       CASE WHEN s = 0 THEN 12 END,
+       CASE WHEN s = 0 THEN 16 END,
+       CASE WHEN s = 0 THEN 48 END,
+       CASE WHEN s = 0 THEN 64 END,
+       CASE WHEN s = 1 THEN 0.5 END,
+       CASE WHEN s = 1 THEN 1 END,
+       CASE WHEN s = 0 THEN labels END,
+       CASE WHEN s = 1 THEN labels END,
+       '{{"cpu": 0, "memory": 0, "storage": 0}}'::jsonb,
+       '{{"cpu": 0, "memory": 0, "storage": 0}}'::jsonb
+  FROM generate_series(0, %(days)s - 1) d
+ CROSS
+  JOIN generate_series(1, %(nodes)s) n
+ CROSS
+  JOIN generate_series(1, %(pods_per_node)s) p
+ CROSS
+  JOIN generate_series(0, 1) s
+ CROSS
+  JOIN LATERAL (
+           SELECT jsonb_object_agg('tag' || k, 'value' || ((n * %(pods_per_node)s + p + k) %% %(tag_values)s)) AS labels
+             FROM generate_series(0, %(tag_keys)s - 1) k
+       ) l
+ WHERE s = 0 OR p %% 2 = 0;
+"""
+    params = {
+        "cluster_id": CLUSTER_ID,
+        "start_date": start_date,
+        "days": days,
+        "nodes": nodes,
+        "pods_per_node": pods_per_node,
+        "tag_keys": tag_keys,
+        "tag_values": tag_values,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+class Command(BaseCommand):
+    help = "Benchmark applying a cost model's tag rates to the daily summary of a synthetic cluster"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schema", required=True, help="The tenant schema to add the cluster to")
+        parser.add_argument("--tag-rates", type=int, default=200)
+        parser.add_argument("--tag-keys", type=int, default=10)
+        parser.add_argument("--nodes", type=int, default=100)
+        parser.add_argument("--pods-per-node", type=int, default=20)
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument("--runs", type=int, default=3)
+
+    def handle(self, *args, **options):
+        """Time populate_all_tag_usage_costs on the synthetic cluster, then roll the cluster back."""
+        schema_name = options["schema"]
+        dh = DateHelper()
+        start_date = dh.this_month_start.date()
+        end_date = start_date + dh.one_day * (options["days"] - 1)
+        infrastructure_rates, supplementary_rates = build_tag_rates(options["tag_rates"], options["tag_keys"])
+
+        with transaction.atomic():
+            with schema_context(schema_name):
+                rows = add_synthetic_cluster(
+                    start_date,
+                    options["days"],
+                    options["nodes"],
+                    options["pods_per_node"],
+                    options["tag_keys"],
+                    options["tag_rates"],
+                )
+                accessor = OCPReportDBAccessor(schema_name)
+                durations = []
+                for _ in range(options["runs"]):
+                    start = time.perf_counter()
+                    accessor.populate_all_tag_usage_costs(
+                        infrastructure_rates, supplementary_rates, {}, {}, start_date, end_date, CLUSTER_ID
+                    )
+                    durations.append(time.perf_counter() - start)
+            self.stdout.write(
+                f"{options['tag_rates']} tag rates on {options['nodes']} nodes ({rows} rows): "
+                f"{statistics.median(durations):.2f}s median"
+            )
+            transaction.set_rollback(True)
@@ -0,0 +1,106 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from koku.celery import app
+from koku.task_registry import TaskRegistry
+
+TASK_NAMES = (
+    "masu.processor.tasks.update_summary_tables",
+    "masu.processor.tasks.update_cost_model_costs",
+    "masu.processor.tasks.refresh_materialized_views",
+    "masu.processor.tasks.get_report_files",
+    "masu.celery.tasks.crawl_account_hierarchy",
+)
+
+
+class Command(BaseCommand):
+    help = "Benchmark running task checks against the task registry as the number of workers grows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, nargs="+", default=[5, 10, 25, 50, 100])
+        parser.add_argument("--lookups", type=int, default=200)
+        parser.add_argument(
+            "--inspect", action="store_true", help="Also time an inspect broadcast to the workers of this cluster"
+        )
+
+    def handle(self, *args, **options):
+        """Register simulated workers and tasks, then time the running task checks."""
+        registry = TaskRegistry()
+        self.stdout.write(
+            f"{'workers':>8} {'is_running p50':>15} {'is_running p99':>15} {'list p50':>10} "
+            f"{'start p50':>10} {'finish p50':>11}"
+        )
+        for worker_count in options["workers"]:
+            hostnames = [f"benchmark@worker-{i}" for i in range(worker_count)]
+            tasks = [
+                (str(uuid.uuid4()), TASK_NAMES[i % len(TASK_NAMES)], hostname) for i, hostname in enumerate(hostnames)
+            ]
+            for hostname in hostnames:
+                registry.heartbeat(hostname)
+            # Every task start and finish pays these cache round trips in the worker running it
+            starts = []
+            for task_id, task_name, hostname in tasks:
+                start = time.perf_counter()
+                registry.task_started(task_id, task_name, [f"acct{i}" for i in range(5)], hostname)
+                starts.append((time.perf_counter() - start) * 1000)
+            finishes = []
+            try:
+                checks = self.time_calls(
+                    lambda: registry.is_running(TASK_NAMES[0], ["acct1"], exclude_task_id=tasks[0][0]),
+                    options["lookups"],
+                )
+                listings = self.time_calls(registry.get_running_tasks, options["lookups"])
+            finally:
+                for task_id, task_name, _ in tasks:
+                    start = time.perf_counter()
+                    registry.task_finished(task_id, task_name)
+                    finishes.append((time.perf_counter() - start) * 1000)
+                for hostname in hostnames:
+                    registry.worker_stopped(hostname)
+            self.stdout.write(
+                f"{worker_count:>8} {self.percentile(checks, 50):>13.2f}ms "
+                f"{self.percentile(checks, 99):>13.2f}ms {self.percentile(listings, 50):>8.2f}ms "
+                f"{self.percentile(starts, 50):>8.2f}ms {self.percentile(finishes, 50):>9.2f}ms"
+            )
+
+        if options["inspect"]:
+            start = time.perf_counter()
+            replies = app.control.inspect().active() or {}
+            duration = (time.perf_counter() - start) * 1000
+            self.stdout.write(f"inspect().active() answered by {len(replies)} workers in {duration:.2f}ms")
+
+    @staticmethod
+    def time_calls(func, count):
+        """Return the duration of count calls of func in milliseconds."""
+        durations = []
+        for _ in range(count):
+            start = time.perf_counter()
+            func()
+            durations.append((time.perf_counter() - start) * 1000)
+        return durations
+
+    @staticmethod
+    def percentile(durations, percent):
+        """Return a percentile of the durations."""
+        if len(durations) < 2:
+            return durations[0]
+        return statistics.quantiles(durations, n=100)[percent - 1]
@@ -0,0 +1,86 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import copy
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from api.report.view import _convert_report_units
+from api.report.view import _convert_units
+from api.report.view import _fill_in_missing_units
+from api.report.view import _find_unit
+from api.utils import UnitConverter
+
+MEMORY_METRICS = ("usage", "request", "limit", "capacity")
+
+
+def build_memory_report(num_dates, num_projects, from_unit):
+    """Build a memory report grouped by project, with a total for each metric and some units left blank."""
+    data = []
+    for day in range(num_dates):
+        date = f"2021-01-{day % 28 + 1:02d}"
+        projects = []
+        for project in range(num_projects):
+            name = f"project-{project}"
+            value = {"date": date, "project": name, "units": "" if project % 10 == 0 else from_unit}
+            value["total"] = Decimal(project) + Decimal("0.25")
+            for index, metric in enumerate(MEMORY_METRICS):
+                value[metric] = {"total": {"value": Decimal(project * (index + 1)) / 3, "units": from_unit}}
+            projects.append({"project": name, "values": [value]})
+        data.append({"date": date, "projects": projects})
+    total = {metric: {"total": {"value": Decimal("12.5"), "units": from_unit}} for metric in MEMORY_METRICS}
+    return {"group_by": {"project": ["*"]}, "data": data, "total": total}
+
+
+def legacy_convert_report_units(converter, report, to_unit):
+    """Convert report units the way ReportView did before _convert_report_units."""
+    from_unit = _find_unit()(report["data"])
+    if from_unit:
+        report = _fill_in_missing_units(from_unit)(report)
+        report = _convert_units(converter, report, to_unit)
+    return report
+
+
+class Command(BaseCommand):
+    help = "Benchmark the unit conversion of a large memory report against the conversion it replaced"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dates", type=int, default=31)
+        parser.add_argument("--projects", type=int, default=1000)
+        parser.add_argument("--from-units", default="GiB", help="The units of the report data")
+        parser.add_argument("--units", default="GB", help="The units parameter of the report request")
+        parser.add_argument("--runs", type=int, default=5)
+
+    def handle(self, *args, **options):
+        """Convert copies of the report both ways and report the median time of each."""
+        report = build_memory_report(options["dates"], options["projects"], options["from_units"])
+        self.stdout.write(f"Report of {options['dates']} dates by {options['projects']} projects")
+        results = {}
+        for name, convert in (("legacy", legacy_convert_report_units), ("single pass", _convert_report_units)):
+            durations = []
+            for _ in range(options["runs"]):
+                # Each run gets a new converter, as each request does
+                converter = UnitConverter()
+                run_report = copy.deepcopy(report)
+                start = time.perf_counter()
+                results[name] = convert(converter, run_report, options["units"])
+                durations.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(f"{name:>12}: {statistics.median(durations):10.1f}ms median")
+        if results["legacy"] != results["single pass"]:
+            self.stderr.write("The single pass conversion differs from the legacy conversion")
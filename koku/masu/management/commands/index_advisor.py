@@ -0,0 +1,63 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+from django.core.management.base import BaseCommand
+
+from api.report.index_advisor import DEFAULT_QUERY_SHAPES
+from api.report.index_advisor import IndexAdvisor
+from api.report.index_advisor import write_migration
+
+
+def read_query_shapes(path):
+    """Return the query shapes in a file, one report URL per line."""
+    if not path:
+        return DEFAULT_QUERY_SHAPES
+    with open(path) as shapes_file:
+        return [line.strip() for line in shapes_file if line.strip() and not line.startswith("#")]
+
+
+class Command(BaseCommand):
+    help = "Replay report API query shapes and propose indexes for their slow scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schema", required=True, help="The tenant schema to replay the query shapes in")
+        parser.add_argument(
+            "--shapes", help="A file of report URLs, one per line, e.g. reports/aws/costs/?group_by[account]=*"
+        )
+        parser.add_argument("--max-indexes", type=int, default=10)
+        parser.add_argument("--migration", action="store_true", help="Write a reporting migration for the indexes")
+        parser.add_argument("--migration-name", default="report_query_indexes")
+
+    def handle(self, *args, **options):
+        """Replay the query shapes and print the proposed indexes."""
+        advisor = IndexAdvisor(options["schema"])
+        for result in advisor.replay(read_query_shapes(options["shapes"])):
+            status = f"failed: {result.error}" if result.error else f"{len(result.statements)} statements"
+            self.stdout.write(f"{result.duration * 1000:8.1f} ms  {result.shape} ({status})")
+
+        candidates = advisor.get_candidates_by_benefit(options["max_indexes"])
+        self.stdout.write(f"\nProposed indexes: {len(candidates)}")
+        for candidate in candidates:
+            self.stdout.write(
+                f"{candidate.duration:10.1f} ms {candidate.blocks:10d} blocks {len(candidate.shapes):3d} shapes  "
+                f"{candidate.create_sql}"
+            )
+        for note in sorted(advisor.notes):
+            self.stdout.write(f"Note: {note}")
+
+        if options["migration"] and candidates:
+            path = write_migration(candidates, options["migration_name"])
+            self.stdout.write(f"Wrote {path}")
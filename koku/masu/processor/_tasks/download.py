@@ -15,6 +15,8 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 """Asynchronous tasks."""
+import os
+
 import psutil
 from celery.utils.log import get_task_logger
 
@@ -25,6 +27,7 @@ from masu.exceptions import MasuProcessingError
 from masu.exceptions import MasuProviderError
 from masu.external.report_downloader import ReportDownloader
 from masu.external.report_downloader import ReportDownloaderError
+from masu.processor.tracing import stage_timer
 from masu.processor.worker_cache import WorkerCache
 
 LOG = get_task_logger(__name__)
@@ -94,7 +97,11 @@ def _get_report_files(
             account=customer_name[4:],
             request_id=task.request.id,
         )
-        report = downloader.download_report(report_context)
+        with stage_timer("download", provider_type, context) as span:
+            report = downloader.download_report(report_context)
+            file_name = report.get("file") if isinstance(report, dict) else None
+            if file_name and os.path.isfile(file_name):
+                span.add_bytes(os.path.getsize(file_name))
     except (MasuProcessingError, MasuProviderError, ReportDownloaderError) as err:
         worker_stats.REPORT_FILE_DOWNLOAD_ERROR_COUNTER.labels(provider_type=provider_type).inc()
         WorkerCache().remove_task_from_cache(cache_key)
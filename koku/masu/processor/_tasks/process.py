@@ -26,6 +26,7 @@ from masu.database.report_stats_db_accessor import ReportStatsDBAccessor
 from masu.processor.report_processor import ReportProcessor
 from masu.processor.report_processor import ReportProcessorDBError
 from masu.processor.report_processor import ReportProcessorError
+from masu.processor.tracing import stage_timer
 
 LOG = get_task_logger(__name__)
 
@@ -77,7 +78,8 @@ def _process_report_file(schema_name, provider, report_dict):
             context=report_dict,
         )
 
-        processor.process()
+        with stage_timer("process", provider, {"provider_uuid": provider_uuid, "manifest_id": manifest_id}):
+            processor.process()
     except (ReportProcessorError, ReportProcessorDBError) as processing_error:
         with ReportStatsDBAccessor(file_name, manifest_id) as stats_recorder:
             stats_recorder.clear_last_started_datetime()
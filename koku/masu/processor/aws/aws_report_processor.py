@@ -27,6 +27,7 @@ from django.db import transaction
 
 from masu.config import Config
 from masu.database.aws_report_db_accessor import AWSReportDBAccessor
+from masu.processor.copy_loader import CopyLoader
 from masu.processor.report_processor_base import ReportProcessorBase
 from masu.util.common import split_alphanumeric_string
 from reporting.provider.aws.models import AWSCostEntry
@@ -36,7 +37,6 @@ from reporting.provider.aws.models import AWSCostEntryLineItemDailySummary
 from reporting.provider.aws.models import AWSCostEntryPricing
 from reporting.provider.aws.models import AWSCostEntryProduct
 from reporting.provider.aws.models import AWSCostEntryReservation
-from reporting_common import REPORT_COLUMN_MAP
 
 LOG = logging.getLogger(__name__)
 
@@ -55,6 +55,7 @@ class ProcessedReport:
         self.products = {}
         self.reservations = {}
         self.pricing = {}
+        self.updated_reservations = set()
         self.requested_partitions = set()
 
     def remove_processed_rows(self):
@@ -65,6 +66,7 @@ class ProcessedReport:
         self.products = {}
         self.reservations = {}
         self.pricing = {}
+        self.updated_reservations = set()
 
 
 class AWSReportProcessor(ReportProcessorBase):
@@ -93,6 +95,7 @@ class AWSReportProcessor(ReportProcessorBase):
         self._report_name = path.basename(report_path)
         self._datetime_format = Config.AWS_DATETIME_STR_FORMAT
         self._batch_size = Config.REPORT_PROCESSING_BATCH_SIZE
+        self._tag_columns = {}
 
         # Gather database accessors
 
@@ -137,10 +140,14 @@ class AWSReportProcessor(ReportProcessorBase):
         self._delete_line_items(AWSReportDBAccessor, is_finalized=is_finalized_data)
         opener, mode = self._get_file_opener(self._compression)
         with opener(self._report_path, mode) as f:
-            with AWSReportDBAccessor(self._schema) as report_db:
-                temp_table = report_db.create_temp_table(self.table_name._meta.db_table, drop_column="id")
+            with AWSReportDBAccessor(self._schema) as report_db, CopyLoader(
+                report_db, self.table_name._meta.db_table
+            ) as loader:
                 LOG.info("File %s opened for processing", str(f))
                 reader = csv.DictReader(f)
+                self._set_report_header(reader.fieldnames)
+                bill_id = None
+                rows = []
                 for row in reader:
                     # If this isn't an initial load and it isn't finalized data
                     # we should only process recent data.
@@ -161,35 +168,18 @@ class AWSReportProcessor(ReportProcessorBase):
                             if li_usage_dt not in self.processed_report.requested_partitions:
                                 self.processed_report.requested_partitions.add(li_usage_dt)
 
-                    bill_id = self.create_cost_entry_objects(row, report_db)
-                    if len(self.processed_report.line_items) >= self._batch_size:
-                        LOG.debug(
-                            "Saving report rows %d to %d for %s",
-                            row_count,
-                            row_count + len(self.processed_report.line_items),
-                            self._report_name,
-                        )
-                        self._save_to_db(temp_table, report_db)
-
-                        row_count += len(self.processed_report.line_items)
-                        self._update_mappings()
-
-                if self.processed_report.line_items:
-                    LOG.debug(
-                        "Saving report rows %d to %d for %s",
-                        row_count,
-                        row_count + len(self.processed_report.line_items),
-                        self._report_name,
-                    )
-                    self._save_to_db(temp_table, report_db)
-
-                    row_count += len(self.processed_report.line_items)
-
-                if is_finalized_data:
-                    report_db.mark_bill_as_finalized(bill_id)
+                    rows.append(row)
+                    if len(rows) >= self._batch_size:
+                        bill_id = self._process_batch(rows, loader, report_db, row_count)
+                        row_count += len(rows)
+                        rows = []
+
+                if rows:
+                    bill_id = self._process_batch(rows, loader, report_db, row_count)
+                    row_count += len(rows)
 
-                if self.processed_report.line_items:
-                    report_db.merge_temp_table(self.table_name._meta.db_table, temp_table, self.line_item_columns)
+                if is_finalized_data and bill_id:
+                    report_db.mark_bill_as_finalized(bill_id)
 
         LOG.info("Completed report processing for file: %s and schema: %s", self._report_name, self._schema)
 
@@ -258,9 +248,12 @@ class AWSReportProcessor(ReportProcessorBase):
             (dict): The data from the row keyed on the DB table's column names
 
         """
-        column_map = REPORT_COLUMN_MAP[table_name]
+        return self._get_column_projection(row, table_name)(row)
 
-        return {column_map[key]: value for key, value in row.items() if key in column_map}
+    def _set_report_header(self, header):
+        """Set the column names of the report file and reset the tag columns found for the last one."""
+        super()._set_report_header(header)
+        self._tag_columns = {}
 
     def _process_tags(self, row, tag_prefix="resourceTags"):
         """Return a JSON string of AWS resource tags.
@@ -273,12 +266,17 @@ class AWSReportProcessor(ReportProcessorBase):
             (str): A JSON string of AWS resource tags
 
         """
-        tag_dict = {}
-        for key, value in row.items():
-            if tag_prefix in key and row[key]:
-                key_value = key.split(":")
-                if len(key_value) > 1:
-                    tag_dict[key_value[-1]] = value
+        header = self._report_header
+        tag_columns = self._tag_columns.get(tag_prefix) if header is not None else None
+        if tag_columns is None:
+            tag_columns = [
+                (key, key.split(":")[-1])
+                for key in (header if header is not None else row)
+                if tag_prefix in key and len(key.split(":")) > 1
+            ]
+            if header is not None:
+                self._tag_columns[tag_prefix] = tag_columns
+        tag_dict = {tag_key: row[key] for key, tag_key in tag_columns if row[key]}
         return json.dumps(tag_dict)
 
     def _get_cost_entry_time_interval(self, interval):
@@ -480,7 +478,8 @@ class AWSReportProcessor(ReportProcessorBase):
         elif arn in self.existing_reservation_map:
             reservation_id = self.existing_reservation_map[arn]
 
-        if reservation_id is None or line_item_type == "rifee":
+        is_new_fee = line_item_type == "rifee" and arn not in self.processed_report.updated_reservations
+        if reservation_id is None or is_new_fee:
             data = self._get_data_for_table(row, table_name._meta.db_table)
             value_set = set(data.values())
             if value_set == {""}:
@@ -516,9 +515,158 @@ class AWSReportProcessor(ReportProcessorBase):
 
         return bill_id
 
-    def _save_to_db(self, temp_table, report_db):
+    def _process_batch(self, rows, loader, report_db, row_count):
+        """Create the objects for a batch of rows and save its line items.
+
+        Returns:
+            (int): The cost entry bill id of the batch
+
+        """
+        self._create_dimension_objects(rows, report_db)
+        for row in rows:
+            bill_id = self.create_cost_entry_objects(row, report_db)
+        LOG.debug("Saving report rows %d to %d for %s", row_count, row_count + len(rows), self._report_name)
+        self._save_to_db(loader, report_db)
+        self._update_mappings()
+        return bill_id
+
+    def _get_dimension_id(self, processed_map, existing_map, key):
+        """Return the id of a dimension row already created or found in the database."""
+        if key in processed_map:
+            return processed_map[key]
+        return existing_map.get(key)
+
+    def _create_dimension_objects(self, rows, report_db_accessor):  # noqa: C901
+        """Bulk create the cost entry, product, pricing and reservation rows a batch needs.
+
+        New rows are collected by natural key and inserted with one statement
+        per table, which fills the processed maps so that creating the line
+        items of the batch needs no further database round trips.
+
+        Args:
+            rows (list): The CSV rows of the batch
+            report_db_accessor (AWSReportDBAccessor): The database accessor
+
+        """
+        report = self.processed_report
+        cost_entries = {}
+        products = {}
+        pricing = {}
+        reservations = {}
+        reservation_updates = {}
+        for row in rows:
+            bill_id = self._create_cost_entry_bill(row, report_db_accessor)
+
+            start, end = self._get_cost_entry_time_interval(row.get("identity/TimeInterval"))
+            key = (bill_id, start)
+            if key not in cost_entries and not self._get_dimension_id(
+                report.cost_entries, self.existing_cost_entry_map, key
+            ):
+                cost_entries[key] = {
+                    "bill_id": bill_id,
+                    "interval_start": ciso8601.parse_datetime(start),
+                    "interval_end": ciso8601.parse_datetime(end),
+                }
+
+            key = (row.get("product/sku"), row.get("product/ProductName"), row.get("product/region"))
+            if key not in products and not self._get_dimension_id(report.products, self.existing_product_map, key):
+                data = self._get_data_for_table(row, AWSCostEntryProduct._meta.db_table)
+                if set(data.values()) != {""}:
+                    products[key] = self._process_memory_value(data)
+
+            key = f"{row.get('pricing/term') or 'None'}-{row.get('pricing/unit') or 'None'}"
+            if key not in pricing and not self._get_dimension_id(report.pricing, self.existing_pricing_map, key):
+                data = self._get_data_for_table(row, AWSCostEntryPricing._meta.db_table)
+                if set(data.values()) != {""}:
+                    pricing[key] = data
+
+            arn = row.get("reservation/ReservationARN")
+            is_fee = row.get("lineItem/LineItemType", "").lower() == "rifee"
+            if is_fee or (
+                arn not in reservations
+                and arn not in reservation_updates
+                and not self._get_dimension_id(report.reservations, self.existing_reservation_map, arn)
+            ):
+                data = self._get_data_for_table(row, AWSCostEntryReservation._meta.db_table)
+                if set(data.values()) != {""}:
+                    # The latest fee row for a reservation holds its current terms
+                    if is_fee:
+                        reservations.pop(arn, None)
+                        reservation_updates[arn] = data
+                    elif arn not in reservation_updates:
+                        reservations[arn] = data
+
+        self._bulk_create_dimension(
+            report_db_accessor, AWSCostEntry, cost_entries, report.cost_entries, ["bill_id", "interval_start"]
+        )
+        self._bulk_create_dimension(
+            report_db_accessor,
+            AWSCostEntryProduct,
+            products,
+            report.products,
+            ["sku", "product_name", "region"],
+            conflict_columns=["sku", "product_name", "region"],
+        )
+        self._bulk_create_dimension(report_db_accessor, AWSCostEntryPricing, pricing, report.pricing, ["term", "unit"])
+        self._bulk_create_dimension(
+            report_db_accessor,
+            AWSCostEntryReservation,
+            reservations,
+            report.reservations,
+            ["reservation_arn"],
+            conflict_columns=["reservation_arn"],
+        )
+        for set_columns in {tuple(data) for data in reservation_updates.values()}:
+            self._bulk_create_dimension(
+                report_db_accessor,
+                AWSCostEntryReservation,
+                {arn: data for arn, data in reservation_updates.items() if tuple(data) == set_columns},
+                report.reservations,
+                ["reservation_arn"],
+                conflict_columns=["reservation_arn"],
+                set_columns=list(set_columns),
+            )
+        report.updated_reservations.update(reservation_updates)
+
+    def _bulk_create_dimension(
+        self, report_db_accessor, table, new_rows, processed_map, key_columns, conflict_columns=None, set_columns=None
+    ):
+        """Insert new dimension rows in one statement and record their ids.
+
+        Args:
+            report_db_accessor (AWSReportDBAccessor): The database accessor
+            table (DjangoModel): The dimension table
+            new_rows (dict): The data of each new row keyed on its natural key
+            processed_map (dict): The map of natural keys to ids to fill
+            key_columns (list): The columns that make up the natural key
+            conflict_columns (list): Columns to check conflict on
+            set_columns (list): Columns to update on conflict
+
+        """
+        if not new_rows:
+            return
+        table_name = table._meta.db_table
+        keys_by_value = {}
+        for key, data in new_rows.items():
+            data = report_db_accessor.clean_data(data, table_name)
+            keys_by_value[tuple(data.get(column) for column in key_columns)] = key
+
+        with transaction.atomic():
+            inserted = report_db_accessor.bulk_insert_on_conflict(
+                table, list(new_rows.values()), conflict_columns, key_columns, set_columns
+            )
+        for row in inserted:
+            key = keys_by_value.pop(tuple(row[column] for column in key_columns), None)
+            if key is not None:
+                processed_map[key] = row["id"]
+
+        # Rows another process inserted since our maps were loaded
+        for values, key in keys_by_value.items():
+            processed_map[key] = report_db_accessor._get_primary_key(table, dict(zip(key_columns, values)))
+
+    def _save_to_db(self, loader, report_db):
         # Create any needed partitions
         existing_partitions = report_db.get_existing_partitions(AWSCostEntryLineItemDailySummary)
         report_db.add_partitions(existing_partitions, self.processed_report.requested_partitions)
         # Save batch to DB
-        super()._save_to_db(temp_table, report_db)
+        self._load_line_items(loader)
@@ -28,6 +28,7 @@ from django.db import transaction
 
 from masu.config import Config
 from masu.database.azure_report_db_accessor import AzureReportDBAccessor
+from masu.processor.copy_loader import CopyLoader
 from masu.processor.report_processor_base import ReportProcessorBase
 from masu.util import common as utils
 from reporting.provider.azure.models import AzureCostEntryBill
@@ -358,10 +359,12 @@ class AzureReportProcessor(ReportProcessorBase):
             original_header = normalize_header(f.readline())
             header = self._update_header(original_header)
 
-            with AzureReportDBAccessor(self._schema) as report_db:
-                temp_table = report_db.create_temp_table(self.table_name._meta.db_table, drop_column="id")
+            with AzureReportDBAccessor(self._schema) as report_db, CopyLoader(
+                report_db, self.table_name._meta.db_table
+            ) as loader:
                 LOG.info("File %s opened for processing", str(f))
                 reader = csv.DictReader(f, fieldnames=header)
+                self._set_report_header(header)
 
                 for row in reader:
                     if self._is_row_unassigned(row):
@@ -391,7 +394,7 @@ class AzureReportProcessor(ReportProcessorBase):
                             row_count + len(self.processed_report.line_items),
                             self._report_name,
                         )
-                        self._save_to_db(temp_table, report_db)
+                        self._save_to_db(loader, report_db)
                         row_count += len(self.processed_report.line_items)
                         self._update_mappings()
 
@@ -402,11 +405,9 @@ class AzureReportProcessor(ReportProcessorBase):
                         row_count + len(self.processed_report.line_items),
                         self._report_name,
                     )
-                    self._save_to_db(temp_table, report_db)
+                    self._save_to_db(loader, report_db)
                     row_count += len(self.processed_report.line_items)
 
-                if self.processed_report.line_items:
-                    report_db.merge_temp_table(self.table_name._meta.db_table, temp_table, self.line_item_columns)
                 LOG.info("Completed report processing for file: %s and schema: %s", self._report_name, self._schema)
             if not settings.DEVELOPMENT:
                 LOG.info("Removing processed file: %s", self._report_path)
@@ -421,9 +422,9 @@ class AzureReportProcessor(ReportProcessorBase):
 
         self.processed_report.remove_processed_rows()
 
-    def _save_to_db(self, temp_table, report_db):
+    def _save_to_db(self, loader, report_db):
         # Create any needed partitions
         existing_partitions = report_db.get_existing_partitions(AzureCostEntryLineItemDailySummary)
         report_db.add_partitions(existing_partitions, self.processed_report.requested_partitions)
         # Save batch to DB
-        super()._save_to_db(temp_table, report_db)
+        self._load_line_items(loader)
@@ -0,0 +1,229 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Stream report line items into Postgres with COPY."""
+import csv
+import io
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+LOG = logging.getLogger(__name__)
+
+# Line items serialized into each CSV chunk handed to COPY
+CHUNK_ROWS = 1000
+# Chunks waiting to be copied before the producer blocks
+MAX_PENDING_CHUNKS = 64
+# Seconds the producer waits on a full queue before checking the consumer for errors
+PUT_TIMEOUT = 1
+
+_END_OF_SEGMENT = object()
+_END_OF_LOAD = object()
+_ABORT = object()
+
+
+class CopyAborted(Exception):
+    """The producer abandoned a load."""
+
+
+class _ChunkReader:
+    """The file object COPY ... FROM STDIN reads the chunks of one segment from."""
+
+    def __init__(self, chunks):
+        """Initialize the reader."""
+        self.chunks = chunks
+        self.chunks_read = 0
+        self.end_of_load = False
+
+    def read(self, size=-1):
+        """Return the next chunk, or an empty string at the end of the segment."""
+        chunk = self.chunks.get()
+        if chunk is _ABORT:
+            raise CopyAborted("Line item load aborted.")
+        if chunk is _END_OF_SEGMENT or chunk is _END_OF_LOAD:
+            self.end_of_load = chunk is _END_OF_LOAD
+            return ""
+        self.chunks_read += 1
+        return chunk
+
+
+class CopyLoader:
+    """Stream line items into a reporting table with COPY.
+
+    Line items are serialized to CSV chunks and queued for a consumer that
+    feeds them to COPY ... FROM STDIN. With REPORT_PROCESSING_PIPELINED_COPY the
+    consumer runs on its own thread and database connection, so the report
+    processor parses the next batch while the last one is being copied, and
+    the bounded queue keeps the producer from running too far ahead.
+
+    Without conflict_columns, a pipelined load copies every line item
+    straight into the table in a single COPY, so the rows of a file are loaded
+    all together or not at all. Otherwise each batch is copied into one
+    temporary table. With conflict_columns the batch is upserted into the table
+    and the temporary table truncated for the next one; without them the
+    temporary table is merged into the table once the load is closed.
+
+    Use the loader as a context manager, it is closed when the block exits
+    and aborted if the block raises.
+    """
+
+    def __init__(self, report_db, table_name, conflict_columns=None, pipelined=None):
+        """Initialize the loader.
+
+        Args:
+            report_db (ReportDBAccessorBase): The accessor of the customer schema.
+            table_name (str): The table to load the line items into.
+            conflict_columns (list): Columns of the unique constraint to upsert on.
+            pipelined (bool): Copy on a background thread, defaults to REPORT_PROCESSING_PIPELINED_COPY.
+
+        """
+        self.report_db = report_db
+        self.table_name = table_name
+        self.conflict_columns = conflict_columns
+        self.pipelined = settings.REPORT_PROCESSING_PIPELINED_COPY if pipelined is None else pipelined
+        self.columns = None
+        self.rows = 0
+        self._direct = self.pipelined and not conflict_columns
+        self._chunks = queue.Queue(MAX_PENDING_CHUNKS if self.pipelined else 0)
+        self._thread = None
+        self._error = None
+        self._temp_table = None
+        self._unmerged = False
+
+    def __enter__(self):
+        """Return the loader."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the loader, or abort it if the block raised."""
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def write(self, line_items):
+        """Queue line items for loading.
+
+        Args:
+            line_items (list): Dictionaries keyed on the table columns, all with the same keys.
+
+        """
+        if not line_items:
+            return
+        if self.columns is None:
+            self.columns = list(line_items[0].keys())
+            if self.pipelined:
+                self._thread = threading.Thread(target=self._consume, name=f"copy-{self.table_name}", daemon=True)
+                self._thread.start()
+        for start in range(0, len(line_items), CHUNK_ROWS):
+            end = start + CHUNK_ROWS
+            chunk = io.StringIO()
+            writer = csv.writer(chunk, delimiter=",", quoting=csv.QUOTE_MINIMAL, quotechar='"')
+            writer.writerows(tuple(item.values()) for item in line_items[start:end])
+            self._put(chunk.getvalue())
+        self.rows += len(line_items)
+
+    def end_segment(self):
+        """Mark the end of a batch of line items."""
+        if self.columns is None or self._direct:
+            return
+        self._put(_END_OF_SEGMENT)
+        if not self.pipelined:
+            self._load_segment()
+
+    def close(self):
+        """Load the remaining line items and wait for the load to finish.
+
+        Returns:
+            (int): The number of line items loaded.
+
+        """
+        if self.columns is None:
+            return 0
+        self._put(_END_OF_LOAD)
+        if self.pipelined:
+            self._thread.join()
+            if self._error:
+                raise self._error
+        else:
+            self._load_segment()
+            self._drop_temp_table()
+        return self.rows
+
+    def abort(self):
+        """Discard the line items not yet loaded."""
+        if self.columns is None:
+            return
+        if self.pipelined:
+            try:
+                self._put(_ABORT)
+            except Exception:
+                pass  # The consumer already stopped
+            self._thread.join()
+        else:
+            self._drop_temp_table()
+
+    def _put(self, item):
+        """Queue an item for the consumer, raising its error if it stopped."""
+        while self._error is None:
+            try:
+                self._chunks.put(item, timeout=PUT_TIMEOUT)
+                return
+            except queue.Full:
+                continue
+        raise self._error
+
+    def _consume(self):
+        """Copy the queued segments on the connection of this thread."""
+        try:
+            # The connection of a new thread starts on the public schema, set the customer schema
+            # before the first cursor is opened so its search_path is the one the COPY runs with.
+            connection.set_schema(self.report_db.schema)
+            while self._load_segment():
+                pass
+        except Exception as error:
+            LOG.warning(f"Loading line items into {self.table_name} failed: {error}")
+            self._error = error
+        finally:
+            try:
+                self._drop_temp_table()
+            finally:
+                connection.close()
+
+    def _load_segment(self):
+        """Copy one segment of queued chunks, returning False at the end of the load."""
+        reader = _ChunkReader(self._chunks)
+        if self._direct:
+            self.report_db.bulk_insert_rows(reader, self.table_name, self.columns)
+            return not reader.end_of_load
+        if self._temp_table is None:
+            self._temp_table = self.report_db.create_temp_table(self.table_name, drop_column="id")
+        self.report_db.bulk_insert_rows(reader, self._temp_table, self.columns)
+        self._unmerged = self._unmerged or reader.chunks_read > 0
+        if self._unmerged and (self.conflict_columns or reader.end_of_load):
+            self.report_db.merge_temp_table(self.table_name, self._temp_table, self.columns, self.conflict_columns)
+            self._unmerged = False
+        return not reader.end_of_load
+
+    def _drop_temp_table(self):
+        """Drop the temporary table, which would otherwise live as long as the connection."""
+        if self._temp_table is not None:
+            self.report_db.drop_temp_table(self._temp_table)
+            self._temp_table = None
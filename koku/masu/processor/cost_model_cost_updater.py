@@ -18,12 +18,15 @@
 import logging
 
 from api.models import Provider
+from koku.cache import invalidate_finalized_view_cache
+from koku.cache import invalidate_report_deltas_cache
 from koku.cache import invalidate_view_cache_for_tenant_and_source_type
 from masu.database.provider_db_accessor import ProviderDBAccessor
 from masu.processor.aws.aws_cost_model_cost_updater import AWSCostModelCostUpdater
 from masu.processor.azure.azure_cost_model_cost_updater import AzureCostModelCostUpdater
 from masu.processor.gcp.gcp_cost_model_cost_updater import GCPCostModelCostUpdater
 from masu.processor.ocp.ocp_cost_model_cost_updater import OCPCostModelCostUpdater
+from masu.processor.tracing import stage_timer
 
 LOG = logging.getLogger(__name__)
 
@@ -93,5 +96,9 @@ class CostModelCostUpdater:
 
         """
         if self._updater:
-            self._updater.update_summary_cost_model_costs(start_date, end_date)
+            context = {"schema_name": self._schema, "provider_uuid": str(self._provider.uuid)}
+            with stage_timer("cost_model_update", self._provider.type, context):
+                self._updater.update_summary_cost_model_costs(start_date, end_date)
             invalidate_view_cache_for_tenant_and_source_type(self._schema, self._provider.type)
+            invalidate_report_deltas_cache(self._schema, self._provider.type, start_date, end_date)
+            invalidate_finalized_view_cache(self._schema, self._provider.type, start_date)
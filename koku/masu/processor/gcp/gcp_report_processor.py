@@ -362,11 +362,13 @@ class GCPReportProcessor(ReportProcessorBase):
 
                 # Group the information in the csv by the start time and the project id
                 report_groups = chunk.groupby(by=["invoice.month", "project.id"])
+                header = chunk.columns.tolist()
+                self._set_report_header(header)
                 for group, rows in report_groups:
 
                     # Each row in the group contains information that we'll need to create the bill
                     # and the project. Just get the first row to pull this information.
-                    first_row = OrderedDict(zip(rows.columns.tolist(), rows.iloc[0].tolist()))
+                    first_row = OrderedDict(zip(header, rows.iloc[0].tolist()))
 
                     bill_id = self._get_or_create_cost_entry_bill(first_row, report_db)
                     if bill_id not in bills_purged:
@@ -376,7 +378,7 @@ class GCPReportProcessor(ReportProcessorBase):
                     project_id = self._get_or_create_gcp_project(first_row, report_db)
 
                     for row in rows.values:
-                        processed_row = OrderedDict(zip(rows.columns.tolist(), row.tolist()))
+                        processed_row = OrderedDict(zip(header, row.tolist()))
                         service_product_id = self._get_or_create_gcp_service_product(processed_row, report_db)
                         self._create_cost_entry_line_item(
                             processed_row, bill_id, project_id, report_db, service_product_id
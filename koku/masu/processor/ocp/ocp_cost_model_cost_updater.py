@@ -304,17 +304,12 @@ class OCPCostModelCostUpdater(OCPCloudUpdaterBase):
                 self._infra_rates, self._supplementary_rates, start_date, end_date, self._cluster_id
             )
 
-    def _update_tag_usage_costs(self, start_date, end_date):
-        """Update infrastructure and supplementary tag based usage costs."""
+    def _update_all_tag_usage_costs(self, start_date, end_date):
+        """Update tag based and tag default usage costs in one pass over the summary table."""
         with OCPReportDBAccessor(self._schema) as report_accessor:
-            report_accessor.populate_tag_usage_costs(
-                self._tag_infra_rates, self._tag_supplementary_rates, start_date, end_date, self._cluster_id
-            )
-
-    def _update_tag_usage_default_costs(self, start_date, end_date):
-        """Update infrastructure and supplementary tag based usage costs based on default values."""
-        with OCPReportDBAccessor(self._schema) as report_accessor:
-            report_accessor.populate_tag_usage_default_costs(
+            report_accessor.populate_all_tag_usage_costs(
+                self._tag_infra_rates,
+                self._tag_supplementary_rates,
                 self._tag_default_infra_rates,
                 self._tag_default_supplementary_rates,
                 start_date,
@@ -351,8 +346,7 @@ class OCPCostModelCostUpdater(OCPCloudUpdaterBase):
         # only update based on tag rates if there are tag rates
         # this also lets costs get removed if there is no tiered rate and then add to them if there is a tag_rate
         if self._tag_infra_rates != {} or self._tag_supplementary_rates != {}:
-            self._update_tag_usage_costs(start_date, end_date)
-            self._update_tag_usage_default_costs(start_date, end_date)
+            self._update_all_tag_usage_costs(start_date, end_date)
             self._update_monthly_tag_based_cost(start_date, end_date)
             self._update_monthly_tag_based_default_cost(start_date, end_date)
 
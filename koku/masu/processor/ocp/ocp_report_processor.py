@@ -27,6 +27,7 @@ from django.db import transaction
 
 from masu.config import Config
 from masu.database.ocp_report_db_accessor import OCPReportDBAccessor
+from masu.processor.copy_loader import CopyLoader
 from masu.processor.report_processor_base import ReportProcessorBase
 from masu.util.ocp import common as utils
 from reporting.provider.ocp.models import OCPNamespaceLabelLineItem
@@ -230,10 +231,12 @@ class OCPReportProcessorBase(ReportProcessorBase):
         row_count = 0
         opener, mode = self._get_file_opener(self._compression)
         with opener(self._report_path, mode) as f:
-            with OCPReportDBAccessor(self._schema) as report_db:
-                temp_table = report_db.create_temp_table(self.table_name._meta.db_table, drop_column="id")
+            with OCPReportDBAccessor(self._schema) as report_db, CopyLoader(
+                report_db, self.table_name._meta.db_table, self.line_item_conflict_columns
+            ) as loader:
                 LOG.info(f"File '{self._report_path}' opened for processing")
                 reader = csv.DictReader(f)
+                self._set_report_header(reader.fieldnames)
                 for row in reader:
                     li_usage_dt = row.get("report_period_start")
                     if li_usage_dt:
@@ -264,13 +267,7 @@ class OCPReportProcessorBase(ReportProcessorBase):
                             row_count + len(self.processed_report.line_items),
                             self._report_name,
                         )
-                        self._save_to_db(temp_table, report_db)
-                        report_db.merge_temp_table(
-                            self.table_name._meta.db_table,
-                            temp_table,
-                            self.line_item_columns,
-                            self.line_item_conflict_columns,
-                        )
+                        self._save_to_db(loader, report_db)
                         row_count += len(self.processed_report.line_items)
                         self._update_mappings()
 
@@ -281,13 +278,7 @@ class OCPReportProcessorBase(ReportProcessorBase):
                         row_count + len(self.processed_report.line_items),
                         self._report_name,
                     )
-                    self._save_to_db(temp_table, report_db)
-                    report_db.merge_temp_table(
-                        self.table_name._meta.db_table,
-                        temp_table,
-                        self.line_item_columns,
-                        self.line_item_conflict_columns,
-                    )
+                    self._save_to_db(loader, report_db)
                     row_count += len(self.processed_report.line_items)
 
         LOG.info("Completed report processing for file: %s and schema: %s", self._report_path, self._schema)
@@ -296,12 +287,12 @@ class OCPReportProcessorBase(ReportProcessorBase):
             LOG.info("Removing processed file: %s", self._report_path)
             remove(self._report_path)
 
-    def _save_to_db(self, temp_table, report_db):
+    def _save_to_db(self, loader, report_db):
         # Create any needed partitions
         existing_partitions = report_db.get_existing_partitions(OCPUsageLineItemDailySummary)
         report_db.add_partitions(existing_partitions, self.processed_report.requested_partitions)
         # Save batch to DB
-        super()._save_to_db(temp_table, report_db)
+        self._load_line_items(loader)
 
 
 class OCPCpuMemReportProcessor(OCPReportProcessorBase):
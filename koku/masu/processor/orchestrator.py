@@ -16,8 +16,14 @@
 #
 """Report Processing Orchestrator."""
 import logging
+import time
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 
 from celery import chord
+from django.db import connections
+from django.db import DEFAULT_DB_ALIAS
 
 from masu.config import Config
 from masu.database.provider_db_accessor import ProviderDBAccessor
@@ -32,10 +38,19 @@ from masu.processor.tasks import record_all_manifest_files
 from masu.processor.tasks import record_report_status
 from masu.processor.tasks import remove_expired_data
 from masu.processor.tasks import summarize_reports
+from masu.processor.tracing import trace_context
 from masu.processor.worker_cache import WorkerCache
+from masu.prometheus_stats import POLLING_CYCLE_DURATION
+from masu.prometheus_stats import PROVIDER_MANIFEST_DISCOVERY_DURATION
+from masu.prometheus_stats import PROVIDER_MANIFEST_DISCOVERY_TIMEOUT_COUNTER
 
 LOG = logging.getLogger(__name__)
 
+# Manifest discoveries started by a polling cycle of this process, {provider_uuid: future}
+_DISCOVERY_IN_FLIGHT = {}
+# Seconds between checks for the start of discoveries still queued on the thread pool
+_DISCOVERY_START_POLL_INTERVAL = 1
+
 
 class Orchestrator:
     """
@@ -189,10 +204,136 @@ class Orchestrator:
             LOG.info("Download queued - schema_name: %s.", schema_name)
 
         if report_tasks:
-            async_id = chord(report_tasks, summarize_reports.s())()
+            with trace_context():
+                async_id = chord(report_tasks, summarize_reports.s())()
             LOG.info(f"Manifest Processing Async ID: {async_id}")
         return manifest
 
+    def prepare_account(self, account):
+        """
+        Discover and queue manifests for every report month of a single account.
+
+        Args:
+            account (dict): Polling account from AccountsAccessor.
+
+        Returns:
+            None
+
+        """
+        provider_uuid = account.get("provider_uuid")
+        report_months = self.get_reports(provider_uuid)
+        for month in report_months:
+            LOG.info("Getting %s report files for account (provider uuid): %s", month.strftime("%B %Y"), provider_uuid)
+            account_month = account.copy()
+            account_month["report_month"] = month
+            try:
+                self.start_manifest_processing(**account_month)
+            except ReportDownloaderError as err:
+                LOG.warning(f"Unable to download manifest for provider: {provider_uuid}. Error: {str(err)}.")
+                continue
+            except Exception as err:
+                # Broad exception catching is important here because any errors thrown can
+                # block all subsequent account processing.
+                LOG.error(f"Unexpected manifest processing error for provider: {provider_uuid}. Error: {str(err)}.")
+                continue
+
+            # update labels
+            labeler = AccountLabel(
+                auth=account.get("credentials"),
+                schema=account.get("schema_name"),
+                provider_type=account.get("provider_type"),
+            )
+            account_number, label = labeler.get_label_details()
+            if account_number:
+                LOG.info("Account: %s Label: %s updated.", account_number, label)
+
+    def _timed_prepare_account(self, account, threaded=False):
+        """Run prepare_account and record its duration."""
+        provider_type = account.get("provider_type")
+        try:
+            with PROVIDER_MANIFEST_DISCOVERY_DURATION.labels(provider_type=provider_type).time():
+                self.prepare_account(account)
+        except Exception as err:
+            LOG.error(f"Unexpected error preparing provider: {account.get('provider_uuid')}. Error: {str(err)}.")
+        finally:
+            if threaded:
+                # Each worker thread holds its own database connection.
+                connections[DEFAULT_DB_ALIAS].close()
+
+    def _prepare_concurrently(self, concurrency):  # noqa: C901
+        """
+        Fan manifest discovery for the polling accounts out over a bounded thread pool.
+
+        The discovery of each account may take Config.POLLING_PROVIDER_TIMEOUT seconds from
+        the time it starts on the pool, so accounts queued behind slow ones get the full
+        timeout too. The cycle stops waiting on an account once its timeout has passed, and
+        its discovery keeps going in the background. Those accounts are skipped by the next
+        cycles until it finishes, so a provider is never discovered twice at the same time.
+        Accounts still queued once every thread is held by an account that timed out are
+        left for the next cycle.
+        """
+        timeout = Config.POLLING_PROVIDER_TIMEOUT
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="orchestrator")
+        futures = {}
+        started = {}
+
+        def discover(account):
+            started[account.get("provider_uuid")] = time.monotonic()
+            self._timed_prepare_account(account, True)
+
+        for account in self._polling_accounts:
+            provider_uuid = account.get("provider_uuid")
+            in_flight = _DISCOVERY_IN_FLIGHT.get(provider_uuid)
+            if in_flight and not in_flight.done():
+                LOG.warning(f"Manifest discovery for provider: {provider_uuid} is still running, skipping it.")
+                continue
+            future = executor.submit(discover, account)
+            futures[future] = account
+            _DISCOVERY_IN_FLIGHT[provider_uuid] = future
+
+        pending = set(futures)
+        timed_out = set()
+        while pending:
+            now = time.monotonic()
+            deadlines = {}
+            for future in list(pending):
+                account = futures[future]
+                start = started.get(account.get("provider_uuid"))
+                if start is None:
+                    continue
+                if now - start < timeout:
+                    deadlines[future] = start + timeout
+                    continue
+                pending.remove(future)
+                timed_out.add(future)
+                PROVIDER_MANIFEST_DISCOVERY_TIMEOUT_COUNTER.labels(provider_type=account.get("provider_type")).inc()
+                LOG.warning(
+                    f"Manifest discovery for provider: {account.get('provider_uuid')} "
+                    f"did not finish within {timeout} seconds."
+                )
+
+            timed_out = {future for future in timed_out if not future.done()}
+            if len(timed_out) >= concurrency:
+                # No thread is left to start the queued accounts
+                for future in list(pending):
+                    if future.cancel():
+                        pending.remove(future)
+                        LOG.info(
+                            f"Manifest discovery for provider: {futures[future].get('provider_uuid')} "
+                            "left for the next cycle."
+                        )
+            if not pending:
+                break
+
+            wake = list(deadlines.values())
+            if len(deadlines) < len(pending):
+                wake.append(now + _DISCOVERY_START_POLL_INTERVAL)
+            wait(pending | timed_out, timeout=max(min(wake) - now, 0), return_when=FIRST_COMPLETED)
+            pending = {future for future in pending if not future.done()}
+
+        # Do not hold the polling cycle on providers that timed out.
+        executor.shutdown(wait=False)
+
     def prepare(self):
         """
         Prepare a processing request for each account.
@@ -201,6 +342,10 @@ class Orchestrator:
         Any report it finds is queued to the appropriate celery task to download
         and process those reports.
 
+        When Config.POLLING_CONCURRENCY is greater than 1 the accounts are
+        polled on a bounded thread pool so that one slow provider does not
+        delay the rest of the cycle.
+
         Args:
             None
 
@@ -209,36 +354,13 @@ class Orchestrator:
 
         """
         async_result = None
-        for account in self._polling_accounts:
-            provider_uuid = account.get("provider_uuid")
-            report_months = self.get_reports(provider_uuid)
-            for month in report_months:
-                LOG.info(
-                    "Getting %s report files for account (provider uuid): %s", month.strftime("%B %Y"), provider_uuid
-                )
-                account["report_month"] = month
-                try:
-                    self.start_manifest_processing(**account)
-                except ReportDownloaderError as err:
-                    LOG.warning(f"Unable to download manifest for provider: {provider_uuid}. Error: {str(err)}.")
-                    continue
-                except Exception as err:
-                    # Broad exception catching is important here because any errors thrown can
-                    # block all subsequent account processing.
-                    LOG.error(
-                        f"Unexpected manifest processing error for provider: {provider_uuid}. Error: {str(err)}."
-                    )
-                    continue
-
-                # update labels
-                labeler = AccountLabel(
-                    auth=account.get("credentials"),
-                    schema=account.get("schema_name"),
-                    provider_type=account.get("provider_type"),
-                )
-                account_number, label = labeler.get_label_details()
-                if account_number:
-                    LOG.info("Account: %s Label: %s updated.", account_number, label)
+        concurrency = min(Config.POLLING_CONCURRENCY, len(self._polling_accounts))
+        with POLLING_CYCLE_DURATION.time():
+            if concurrency > 1:
+                self._prepare_concurrently(concurrency)
+            else:
+                for account in self._polling_accounts:
+                    self._timed_prepare_account(account)
 
         return async_result
 
@@ -35,6 +35,7 @@ from masu.processor.aws.aws_report_parquet_processor import AWSReportParquetProc
 from masu.processor.azure.azure_report_parquet_processor import AzureReportParquetProcessor
 from masu.processor.gcp.gcp_report_parquet_processor import GCPReportParquetProcessor
 from masu.processor.ocp.ocp_report_parquet_processor import OCPReportParquetProcessor
+from masu.processor.tracing import stage_timer
 from masu.util.aws.common import aws_post_processor
 from masu.util.aws.common import copy_data_to_s3_bucket
 from masu.util.aws.common import get_s3_resource
@@ -50,6 +51,7 @@ from masu.util.ocp.common import REPORT_TYPES
 LOG = logging.getLogger(__name__)
 CSV_GZIP_EXT = ".csv.gz"
 CSV_EXT = ".csv"
+PARQUET_EXT = ".parquet"
 
 
 class ParquetReportProcessor:
@@ -265,6 +267,8 @@ class ParquetReportProcessor:
     ):
         """
         Convert CSV files to parquet on S3.
+
+        Files that are already parquet are uploaded as is.
         """
 
         csv_path, csv_name = os.path.split(csv_filename)
@@ -281,7 +285,12 @@ class ParquetReportProcessor:
 
         kwargs = {}
         parquet_file = None
-        if csv_name.lower().endswith(CSV_EXT):
+        converted = False
+        if csv_name.lower().endswith(PARQUET_EXT):
+            # Already written as parquet by the downloader, only the upload remains.
+            parquet_filename = csv_name
+            converted = True
+        elif csv_name.lower().endswith(CSV_EXT):
             ext = -len(CSV_EXT)
             parquet_filename = f"{csv_name[:ext]}.parquet"
         elif csv_name.lower().endswith(CSV_GZIP_EXT):
@@ -297,12 +306,17 @@ class ParquetReportProcessor:
 
         parquet_file = f"{local_path}/{parquet_filename}"
         try:
-            col_names = pd.read_csv(csv_filename, nrows=0, **kwargs).columns
-            converters.update({col: str for col in col_names if col not in converters})
-            data_frame = pd.read_csv(csv_filename, converters=converters, **kwargs)
-            if post_processor:
-                data_frame = post_processor(data_frame)
-            data_frame.to_parquet(parquet_file, allow_truncated_timestamps=True, coerce_timestamps="ms")
+            if converted:
+                shutil.move(csv_filename, parquet_file)
+            else:
+                with stage_timer("parquet_conversion", self._provider_type, context) as span:
+                    col_names = pd.read_csv(csv_filename, nrows=0, **kwargs).columns
+                    converters.update({col: str for col in col_names if col not in converters})
+                    data_frame = pd.read_csv(csv_filename, converters=converters, **kwargs)
+                    if post_processor:
+                        data_frame = post_processor(data_frame)
+                    data_frame.to_parquet(parquet_file, allow_truncated_timestamps=True, coerce_timestamps="ms")
+                    span.add_rows(len(data_frame))
         except Exception as err:
             shutil.rmtree(local_path, ignore_errors=True)
             msg = (
@@ -19,6 +19,7 @@ import csv
 import gzip
 import io
 import logging
+from operator import itemgetter
 
 import ciso8601
 from dateutil.relativedelta import relativedelta
@@ -37,6 +38,46 @@ from reporting_common import REPORT_COLUMN_MAP
 LOG = logging.getLogger(__name__)
 
 
+class ColumnProjection:
+    """
+    The report columns of a DB table, resolved once for a report header.
+
+    Projecting a row fetches every mapped column with a single itemgetter
+    call, instead of testing each column of each row against the column map.
+    """
+
+    def __init__(self, header, column_map, case_sensitive=True):
+        """Match the header columns to the report columns of a table.
+
+        Args:
+            header (tuple): The column names of the report
+            column_map (dict): The report column to DB column map of the table
+            case_sensitive (bool): Whether report column names must match the map exactly
+
+        """
+        if not case_sensitive:
+            column_map = {key.lower(): value for key, value in column_map.items()}
+        report_columns = []
+        db_columns = []
+        for key in header:
+            db_column = column_map.get(key if case_sensitive else key.lower())
+            if db_column is not None:
+                report_columns.append(key)
+                db_columns.append(db_column)
+        self.db_columns = tuple(db_columns)
+        self._get_values = itemgetter(*report_columns) if report_columns else None
+        self._single_column = len(report_columns) == 1
+
+    def __call__(self, row):
+        """Return the data from a row keyed on the DB table's column names."""
+        if self._get_values is None:
+            return {}
+        values = self._get_values(row)
+        if self._single_column:
+            values = (values,)
+        return dict(zip(self.db_columns, values))
+
+
 class ReportProcessorBase:
     """
     Download cost reports from a provider.
@@ -65,6 +106,8 @@ class ReportProcessorBase:
         self._manifest_id = manifest_id
         self.processed_report = processed_report
         self.date_accessor = DateAccessor()
+        self._report_header = None
+        self._column_projections = {}
 
     @property
     def data_cutoff_date(self):
@@ -86,15 +129,35 @@ class ReportProcessorBase:
             (dict): The data from the row keyed on the DB table's column names
 
         """
-        column_map = REPORT_COLUMN_MAP[table_name]
-        lower_case_column_map = {key.lower(): value for key, value in column_map.items()}
+        return self._get_column_projection(row, table_name, case_sensitive=False)(row)
+
+    def _set_report_header(self, header):
+        """Set the column names shared by every row of the report file being processed.
 
-        result = {
-            lower_case_column_map[key.lower()]: value
-            for key, value in row.items()
-            if key.lower() in lower_case_column_map
-        }
-        return result
+        Args:
+            header (list): The column names of the report, or None when rows
+                are not read from a report file
+
+        """
+        self._report_header = header
+        self._column_projections = {}
+
+    def _get_column_projection(self, row, table_name, case_sensitive=True):
+        """Return the projection of a row onto a table.
+
+        Every row of a report shares its header, so the projection is built
+        once per header and reused for the rest of the file. Rows processed
+        without a report header are projected on their own columns.
+        """
+        header = self._report_header
+        if header is None:
+            return ColumnProjection(tuple(row), REPORT_COLUMN_MAP[table_name], case_sensitive)
+        key = (table_name, id(header), case_sensitive)
+        projection = self._column_projections.get(key)
+        if projection is None:
+            projection = ColumnProjection(header, REPORT_COLUMN_MAP[table_name], case_sensitive)
+            self._column_projections[key] = projection
+        return projection
 
     @staticmethod
     def _get_file_opener(compression):
@@ -130,6 +193,11 @@ class ReportProcessorBase:
 
         report_db_accessor.bulk_insert_rows(csv_file, temp_table, columns)
 
+    def _load_line_items(self, loader):
+        """Hand the current batch of line items to a CopyLoader."""
+        loader.write(self.processed_report.line_items)
+        loader.end_segment()
+
     def _should_process_row(self, row, date_column, is_full_month, is_finalized=None):
         """Determine if we want to process this row.
 
@@ -21,7 +21,13 @@ import logging
 from django.conf import settings
 
 from api.models import Provider
+from koku.cache import invalidate_finalized_view_cache
+from koku.cache import invalidate_report_deltas_cache
 from koku.cache import invalidate_view_cache_for_tenant_and_source_type
+from masu.database.aws_report_db_accessor import AWSReportDBAccessor
+from masu.database.azure_report_db_accessor import AzureReportDBAccessor
+from masu.database.gcp_report_db_accessor import GCPReportDBAccessor
+from masu.database.ocp_report_db_accessor import OCPReportDBAccessor
 from masu.database.provider_db_accessor import ProviderDBAccessor
 from masu.database.report_manifest_db_accessor import ReportManifestDBAccessor
 from masu.external.date_accessor import DateAccessor
@@ -38,6 +44,16 @@ from masu.processor.ocp.ocp_report_summary_updater import OCPReportSummaryUpdate
 
 LOG = logging.getLogger(__name__)
 
+SUMMARY_ACCESSORS = {
+    Provider.PROVIDER_AWS: AWSReportDBAccessor,
+    Provider.PROVIDER_AWS_LOCAL: AWSReportDBAccessor,
+    Provider.PROVIDER_AZURE: AzureReportDBAccessor,
+    Provider.PROVIDER_AZURE_LOCAL: AzureReportDBAccessor,
+    Provider.PROVIDER_GCP: GCPReportDBAccessor,
+    Provider.PROVIDER_GCP_LOCAL: GCPReportDBAccessor,
+    Provider.PROVIDER_OCP: OCPReportDBAccessor,
+}
+
 
 class ReportSummaryUpdaterError(Exception):
     """Report Summary Updater Error."""
@@ -152,6 +168,8 @@ class ReportSummaryUpdater:
         start_date, end_date = self._updater.update_daily_tables(start_date, end_date)
 
         invalidate_view_cache_for_tenant_and_source_type(self._schema, self._provider.type)
+        invalidate_report_deltas_cache(self._schema, self._provider.type, start_date, end_date)
+        invalidate_finalized_view_cache(self._schema, self._provider.type, start_date)
 
         return start_date, end_date
 
@@ -174,9 +192,21 @@ class ReportSummaryUpdater:
 
         start_date, end_date = self._updater.update_summary_tables(start_date, end_date)
 
+        if settings.REPORT_SUMMARY_CLUSTER_PARTITIONS:
+            self._cluster_summary_partitions(start_date, end_date)
+
         self._ocp_cloud_updater.update_summary_tables(start_date, end_date)
 
         invalidate_view_cache_for_tenant_and_source_type(self._schema, self._provider.type)
+        invalidate_report_deltas_cache(self._schema, self._provider.type, start_date, end_date)
+        invalidate_finalized_view_cache(self._schema, self._provider.type, start_date)
+
+    def _cluster_summary_partitions(self, start_date, end_date):
+        """Restore the date order of the summary partitions just written, for BRIN scans."""
+        with SUMMARY_ACCESSORS[self._provider.type](self._schema) as accessor:
+            clustered = accessor.cluster_summary_partitions(start_date, end_date)
+        if clustered:
+            LOG.info(f"Clustered summary partitions {clustered} for provider uuid {self._provider.uuid}")
 
     def update_cost_summary_table(self, start_date, end_date):
         """
@@ -195,3 +225,5 @@ class ReportSummaryUpdater:
         self._ocp_cloud_updater.update_cost_summary_table(start_date, end_date)
 
         invalidate_view_cache_for_tenant_and_source_type(self._schema, self._provider.type)
+        invalidate_report_deltas_cache(self._schema, self._provider.type, start_date, end_date)
+        invalidate_finalized_view_cache(self._schema, self._provider.type, start_date)
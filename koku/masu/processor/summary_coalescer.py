@@ -0,0 +1,277 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Coalesce overlapping summary requests for a provider."""
+import logging
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from uuid import uuid4
+
+import ciso8601
+from django.conf import settings
+from django.core.cache import caches
+
+from koku.task_registry import TaskRegistry
+from masu.prometheus_stats import SUMMARY_DAYS_COALESCED_COUNTER
+from masu.prometheus_stats import SUMMARY_REQUESTS_COALESCED_COUNTER
+
+LOG = logging.getLogger(__name__)
+
+# Seconds a worker may hold the lock guarding the pending request
+LOCK_TIMEOUT = 30
+# Seconds after which a summary run outside of a worker, still marked as running, is assumed lost
+IN_FLIGHT_TIMEOUT = 6 * 60 * 60
+# A steady stream of requests delays a summary by at most this many windows
+MAX_DEBOUNCE_WINDOWS = 5
+
+
+def _days(start_date, end_date):
+    """Return the number of days from start_date to end_date, inclusive."""
+    start = ciso8601.parse_datetime(start_date).date()
+    end = ciso8601.parse_datetime(end_date).date()
+    return (end - start).days + 1
+
+
+def split_by_month(start_date, end_date):
+    """Split a date range into one range per billing month.
+
+    Args:
+        start_date (str): The first day of the range.
+        end_date (str): The last day of the range.
+
+    Returns:
+        (list): [(billing_month, start_date, end_date)], billing_month being "YYYY-MM".
+
+    """
+    start = ciso8601.parse_datetime(start_date).date()
+    end = ciso8601.parse_datetime(end_date).date()
+    months = []
+    month_start = start
+    while True:
+        next_month = (month_start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        month_end = min(next_month - timedelta(days=1), end)
+        months.append(
+            (
+                month_start.strftime("%Y-%m"),
+                start_date if month_start == start else str(month_start),
+                end_date if month_end == end else str(month_end),
+            )
+        )
+        if month_end >= end:
+            return months
+        month_start = next_month
+
+
+class SummaryCoalescerLockError(Exception):
+    """The lock guarding a pending summary request could not be taken."""
+
+
+class SummaryCoalescer:
+    """Pending summary requests for a single provider and billing month.
+
+    Summary requests for the same provider and billing month are merged into
+    one pending request covering the union of their date ranges. Months are
+    kept apart because the summary updaters resolve a single bill from the
+    start date of the range. The merged request is
+    due once no new request has arrived for SUMMARY_COALESCE_WINDOW seconds,
+    or MAX_DEBOUNCE_WINDOWS windows after the first request, and only one
+    summary of the provider may run at a time. The running summary is the
+    celery task named in the running marker, and is assumed lost as soon as
+    the task registry no longer lists that task, for example because its
+    worker was killed mid-summary.
+
+    The state is kept in the worker cache so every worker sees it.
+
+    Format:
+
+        cache_key                                   |  value
+        "summary:{schema}:{uuid}:{month}:pending"   |  {"provider_type": "OCP", "start_date": "2021-01-01", ...}
+        "summary:{schema}:{uuid}:{month}:lock"      |  token of the worker updating the pending request
+        "summary:{schema}:{uuid}:running"           |  {"task_id": ..., "task_name": ...} of the running summary
+        "summary:{schema}:{uuid}:running:lock"      |  token of the worker taking over a lost running summary
+
+    """
+
+    cache = caches["worker"]
+
+    def __init__(self, schema_name, provider_uuid, billing_month=None):
+        """Initialize the coalescer."""
+        key = f"summary:{schema_name}:{provider_uuid}"
+        month_key = f"{key}:{billing_month}" if billing_month else key
+        self.pending_key = f"{month_key}:pending"
+        self.lock_key = f"{month_key}:lock"
+        self.running_key = f"{key}:running"
+        self.window = settings.SUMMARY_COALESCE_WINDOW
+
+    @contextmanager
+    def _lock(self, lock_key=None):
+        """Serialize updates of the pending request, or of another key, across workers.
+
+        Raises:
+            (SummaryCoalescerLockError): The lock was not released by its holder in time.
+
+        """
+        lock_key = lock_key or self.lock_key
+        token = uuid4().hex
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while not self.cache.add(lock_key, token, LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                raise SummaryCoalescerLockError(f"Timed out waiting for {lock_key}")
+            time.sleep(0.05)
+        try:
+            yield
+        finally:
+            # A lock held past its timeout may already belong to another worker
+            if self.cache.get(lock_key) == token:
+                self.cache.delete(lock_key)
+
+    def add(self, provider_type, start_date, end_date, manifest_id=None, now=None):
+        """Merge a summary request into the pending request of the provider.
+
+        Args:
+            provider_type (str): The provider type.
+            start_date (str): The first day to summarize.
+            end_date (str): The last day to summarize.
+            manifest_id (int): The manifest that triggered the request.
+            now (float): The current time, defaults to time.time().
+
+        Returns:
+            (bool): True if the caller needs to schedule a flush, either because
+                the request started a new pending request or because the
+                pending request is long overdue and its flush was lost.
+
+        """
+        now = time.time() if now is None else now
+        with self._lock():
+            pending = self.cache.get(self.pending_key)
+            if pending is None:
+                pending = {
+                    "provider_type": provider_type,
+                    "start_date": start_date,
+                    "end_date": end_date,
+                    "manifest_ids": [],
+                    "requests": 0,
+                    "days_coalesced": 0,
+                    "first_requested": now,
+                }
+                schedule = True
+            else:
+                days_before = _days(pending["start_date"], pending["end_date"])
+                pending["start_date"] = min(pending["start_date"], start_date)
+                pending["end_date"] = max(pending["end_date"], end_date)
+                days_added = _days(pending["start_date"], pending["end_date"]) - days_before
+                days_coalesced = max(_days(start_date, end_date) - days_added, 0)
+                pending["days_coalesced"] = pending.get("days_coalesced", 0) + days_coalesced
+                SUMMARY_REQUESTS_COALESCED_COUNTER.labels(provider_type=provider_type).inc()
+                SUMMARY_DAYS_COALESCED_COUNTER.labels(provider_type=provider_type).inc(days_coalesced)
+                schedule = now - pending["first_requested"] > 2 * MAX_DEBOUNCE_WINDOWS * self.window
+            pending["requests"] += 1
+            pending["last_requested"] = now
+            if manifest_id and manifest_id not in pending["manifest_ids"]:
+                pending["manifest_ids"].append(manifest_id)
+            self.cache.set(self.pending_key, pending, None)
+        return schedule
+
+    def seconds_until_due(self, now=None):
+        """Return the seconds left before the pending request is due, 0 once it is."""
+        now = time.time() if now is None else now
+        pending = self.cache.get(self.pending_key)
+        if pending is None:
+            return 0
+        due = min(
+            pending["last_requested"] + self.window, pending["first_requested"] + MAX_DEBOUNCE_WINDOWS * self.window
+        )
+        return max(due - now, 0)
+
+    @staticmethod
+    def _is_live(running):
+        """Return True if the summary of a running marker is still running."""
+        # Summaries run outside of a worker are not registered, their marker expires instead
+        if not isinstance(running, dict) or not running.get("task_id"):
+            return bool(running)
+        return running["task_id"] in TaskRegistry().get_running_tasks(running["task_name"])
+
+    def is_running(self):
+        """Return True if a summary of the provider is running."""
+        return self._is_live(self.cache.get(self.running_key))
+
+    def start(self, task=None):
+        """Mark a summary of the provider as running.
+
+        A marker left by a summary that is no longer running, because its
+        worker or pool process died before finish() was called, is taken over.
+
+        Args:
+            task (celery.Task): The task running the summary.
+
+        Returns:
+            (bool): False if another summary of the provider is already running.
+
+        """
+        running = {"task_id": None, "task_name": None}
+        if task is not None and not task.request.is_eager:
+            running = {"task_id": task.request.id, "task_name": task.name}
+        timeout = IN_FLIGHT_TIMEOUT if running["task_id"] is None else None
+        if self.cache.add(self.running_key, running, timeout):
+            return True
+        try:
+            with self._lock(f"{self.running_key}:lock"):
+                current = self.cache.get(self.running_key)
+                if current is None:
+                    return self.cache.add(self.running_key, running, timeout)
+                if self._is_live(current):
+                    return False
+                LOG.warning(f"Taking over {self.running_key} from summary task {current['task_id']}, it is gone.")
+                self.cache.set(self.running_key, running, timeout)
+        except SummaryCoalescerLockError as error:
+            LOG.warning(f"Could not check the running summary: {error}")
+            return False
+        return True
+
+    def finish(self):
+        """Mark the summary of the provider as done."""
+        self.cache.delete(self.running_key)
+
+    def pop(self):
+        """Remove and return the pending request, or None if there is none."""
+        with self._lock():
+            pending = self.cache.get(self.pending_key)
+            self.cache.delete(self.pending_key)
+        return pending
+
+    def restore(self, request):
+        """Put back a popped request whose summary failed, merged with any request added since.
+
+        Args:
+            request (dict): The request returned by pop().
+
+        """
+        with self._lock():
+            pending = self.cache.get(self.pending_key)
+            if pending is not None:
+                request = dict(request)
+                request["start_date"] = min(request["start_date"], pending["start_date"])
+                request["end_date"] = max(request["end_date"], pending["end_date"])
+                request["manifest_ids"] = request["manifest_ids"] + [
+                    manifest_id
+                    for manifest_id in pending["manifest_ids"]
+                    if manifest_id not in request["manifest_ids"]
+                ]
+                request["requests"] += pending["requests"]
+                request["days_coalesced"] = request.get("days_coalesced", 0) + pending.get("days_coalesced", 0)
+                request["last_requested"] = pending["last_requested"]
+            self.cache.set(self.pending_key, request, None)
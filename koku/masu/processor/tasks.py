@@ -17,7 +17,6 @@
 """Asynchronous tasks."""
 import datetime
 import json
-import os
 import time
 from decimal import Decimal
 from decimal import InvalidOperation
@@ -36,6 +35,7 @@ from api.common import log_json
 from api.iam.models import Tenant
 from api.provider.models import Provider
 from api.utils import DateHelper
+from koku.cache import invalidate_report_deltas_cache
 from koku.cache import invalidate_view_cache_for_tenant_and_source_type
 from koku.celery import app
 from koku.middleware import KokuTenantMiddleware
@@ -53,6 +53,13 @@ from masu.processor.cost_model_cost_updater import CostModelCostUpdater
 from masu.processor.report_processor import ReportProcessorDBError
 from masu.processor.report_processor import ReportProcessorError
 from masu.processor.report_summary_updater import ReportSummaryUpdater
+from masu.processor.summary_coalescer import split_by_month
+from masu.processor.summary_coalescer import SummaryCoalescer
+from masu.processor.summary_coalescer import SummaryCoalescerLockError
+from masu.processor.tracing import stage_timer
+from masu.processor.vacuum_scheduler import get_autovacuum_scale_factor
+from masu.processor.vacuum_scheduler import get_autovacuum_scale_table
+from masu.processor.vacuum_scheduler import VacuumScheduler
 from masu.processor.worker_cache import WorkerCache
 from reporting.models import AWS_MATERIALIZED_VIEWS
 from reporting.models import AZURE_MATERIALIZED_VIEWS
@@ -244,6 +251,9 @@ def remove_expired_data(schema_name, provider, simulate, provider_uuid=None, lin
     LOG.info(stmt)
     _remove_expired_data(schema_name, provider, simulate, provider_uuid, line_items_only)
     if not line_items_only:
+        if not simulate:
+            # The purged months are older than the ones masu rebuilds, drop every period's deltas
+            invalidate_report_deltas_cache(schema_name, provider)
         refresh_materialized_views.delay(schema_name, provider, provider_uuid=provider_uuid)
 
 
@@ -281,16 +291,135 @@ def summarize_reports(reports_to_summarize):
                     start_date = start_date.strftime("%Y-%m-%d")
                     end_date = DateAccessor().today().strftime("%Y-%m-%d")
                 LOG.info("report to summarize: %s", str(report))
-                update_summary_tables.delay(
+                queue_summary(
                     report.get("schema_name"),
                     report.get("provider_type"),
                     report.get("provider_uuid"),
-                    start_date=start_date,
-                    end_date=end_date,
+                    start_date,
+                    end_date,
                     manifest_id=report.get("manifest_id"),
                 )
 
 
+def queue_summary(schema_name, provider, provider_uuid, start_date, end_date, manifest_id=None):
+    """Queue a summary, merging it into the pending summary of the provider.
+
+    Overlapping manifests of the same provider are summarized by a single
+    update_summary_tables run over the union of their date ranges, one run
+    per billing month. Setting SUMMARY_COALESCE_WINDOW to 0 queues every
+    summary on its own.
+
+    Args:
+        schema_name (str) The DB schema name.
+        provider    (str) The provider type.
+        provider_uuid (str) The provider uuid.
+        start_date  (str) The date to start populating the table.
+        end_date    (str) The date to end on.
+        manifest_id (int) The manifest that is ready to summarize.
+
+    Returns
+        None
+
+    """
+    if not settings.SUMMARY_COALESCE_WINDOW or not provider_uuid:
+        update_summary_tables.delay(
+            schema_name, provider, provider_uuid, start_date=start_date, end_date=end_date, manifest_id=manifest_id
+        )
+        return
+    for billing_month, month_start, month_end in split_by_month(start_date, end_date):
+        coalescer = SummaryCoalescer(schema_name, provider_uuid, billing_month)
+        try:
+            schedule = coalescer.add(provider, month_start, month_end, manifest_id)
+        except SummaryCoalescerLockError as error:
+            LOG.warning(log_json(provider_uuid, f"Summarizing without coalescing: {error}"))
+            update_summary_tables.delay(
+                schema_name,
+                provider,
+                provider_uuid,
+                start_date=month_start,
+                end_date=month_end,
+                manifest_id=manifest_id,
+            )
+            continue
+        if schedule:
+            summarize_coalesced.apply_async(
+                (schema_name, provider_uuid, billing_month), countdown=settings.SUMMARY_COALESCE_WINDOW
+            )
+
+
+@app.task(name="masu.processor.tasks.summarize_coalesced", queue_name="reporting")
+def summarize_coalesced(schema_name, provider_uuid, billing_month=None):
+    """Run the pending summary of a provider billing month once it is due.
+
+    The task reschedules itself while the pending summary is still within
+    its debounce window or another summary of the provider is running. A
+    summary that fails is put back to be retried with the next requests.
+
+    Args:
+        schema_name (str) The DB schema name.
+        provider_uuid (str) The provider uuid.
+        billing_month (str) The billing month of the pending summary, "YYYY-MM".
+
+    Returns
+        None
+
+    """
+    task_args = (schema_name, provider_uuid, billing_month)
+    coalescer = SummaryCoalescer(schema_name, provider_uuid, billing_month)
+    countdown = coalescer.seconds_until_due()
+    if countdown or not coalescer.start(summarize_coalesced):
+        summarize_coalesced.apply_async(task_args, countdown=countdown or settings.SUMMARY_COALESCE_WINDOW)
+        return
+    try:
+        try:
+            pending = coalescer.pop()
+        except SummaryCoalescerLockError:
+            summarize_coalesced.apply_async(task_args, countdown=settings.SUMMARY_COALESCE_WINDOW)
+            return
+        if not pending:
+            return
+        context = {"schema_name": schema_name, "provider_uuid": provider_uuid, "manifest_ids": pending["manifest_ids"]}
+        LOG.info(log_json(provider_uuid, f"Summarizing {pending['requests']} coalesced requests.", context))
+        manifest_ids = pending["manifest_ids"]
+        start = time.monotonic()
+        try:
+            update_summary_tables(
+                schema_name,
+                pending["provider_type"],
+                provider_uuid,
+                pending["start_date"],
+                pending["end_date"],
+                manifest_id=manifest_ids[-1] if manifest_ids else None,
+            )
+        except Exception:
+            coalescer.restore(pending)
+            summarize_coalesced.apply_async(task_args, countdown=settings.SUMMARY_COALESCE_WINDOW)
+            raise
+        duration = time.monotonic() - start
+        # The days merged away would have cost about as much per day as the ones summarized
+        days_summarized = (
+            ciso8601.parse_datetime(pending["end_date"]) - ciso8601.parse_datetime(pending["start_date"])
+        ).days + 1
+        seconds_coalesced = duration / days_summarized * pending.get("days_coalesced", 0)
+        worker_stats.SUMMARY_SECONDS_COALESCED_COUNTER.labels(provider_type=pending["provider_type"]).inc(
+            seconds_coalesced
+        )
+        LOG.info(
+            log_json(
+                provider_uuid,
+                f"Summarized {days_summarized} days in {duration:.1f}s, "
+                f"saving an estimated {seconds_coalesced:.1f}s on {pending.get('days_coalesced', 0)} coalesced days.",
+                context,
+            )
+        )
+        # The chain of the last manifest marks it complete, the ones merged into it are done now.
+        with ReportManifestDBAccessor() as manifest_accessor:
+            for manifest_id in manifest_ids[:-1]:
+                manifest_accessor.mark_manifest_as_completed(manifest_accessor.get_manifest_by_id(manifest_id))
+    finally:
+        coalescer.finish()
+
+
 @app.task(name="masu.processor.tasks.update_summary_tables", queue_name="reporting")
 def update_summary_tables(schema_name, provider, provider_uuid, start_date, end_date=None, manifest_id=None):
     """Populate the summary tables for reporting.
@@ -319,9 +448,12 @@ def update_summary_tables(schema_name, provider, provider_uuid, start_date, end_
     )
     LOG.info(stmt)
 
+    context = {"schema_name": schema_name, "provider_uuid": provider_uuid, "manifest_id": manifest_id}
     updater = ReportSummaryUpdater(schema_name, provider_uuid, manifest_id)
-    start_date, end_date = updater.update_daily_tables(start_date, end_date)
-    updater.update_summary_tables(start_date, end_date)
+    with stage_timer("daily_summary", provider, context):
+        start_date, end_date = updater.update_daily_tables(start_date, end_date)
+    with stage_timer("summary", provider, context):
+        updater.update_summary_tables(start_date, end_date)
 
     if not provider_uuid:
         refresh_materialized_views.delay(schema_name, provider, manifest_id=manifest_id)
@@ -480,7 +612,8 @@ def refresh_materialized_views(schema_name, provider_type, manifest_id=None, pro
     elif provider_type in (Provider.PROVIDER_GCP, Provider.PROVIDER_GCP_LOCAL):
         materialized_views = GCP_MATERIALIZED_VIEWS
 
-    with schema_context(schema_name):
+    context = {"schema_name": schema_name, "provider_uuid": provider_uuid, "manifest_id": manifest_id}
+    with stage_timer("materialized_view_refresh", provider_type, context), schema_context(schema_name):
         for view in materialized_views:
             table_name = view._meta.db_table
             with connection.cursor() as cursor:
@@ -488,6 +621,9 @@ def refresh_materialized_views(schema_name, provider_type, manifest_id=None, pro
                 LOG.info(f"Refreshed {table_name}.")
 
     invalidate_view_cache_for_tenant_and_source_type(schema_name, provider_type)
+    # The materialized views hold the current and previous month
+    dh = DateHelper()
+    invalidate_report_deltas_cache(schema_name, provider_type, dh.last_month_start, dh.today)
 
     if provider_uuid:
         ProviderDBAccessor(provider_uuid).set_data_updated_timestamp()
@@ -503,25 +639,8 @@ def refresh_materialized_views(schema_name, provider_type, manifest_id=None, pro
 
 @app.task(name="masu.processor.tasks.vacuum_schema", queue_name="reporting")
 def vacuum_schema(schema_name):
-    """Vacuum the reporting tables in the specified schema."""
-    table_sql = """
-        SELECT table_name
-        FROM information_schema.tables
-        WHERE table_schema = %s
-            AND table_name like 'reporting_%%'
-            AND table_type != 'VIEW'
-    """
-
-    with schema_context(schema_name):
-        with connection.cursor() as cursor:
-            cursor.execute(table_sql, [schema_name])
-            tables = cursor.fetchall()
-            tables = [table[0] for table in tables]
-            for table in tables:
-                sql = f"VACUUM ANALYZE {schema_name}.{table}"
-                cursor.execute(sql)
-                LOG.info(sql)
-                LOG.info(cursor.statusmessage)
+    """Vacuum the reporting tables in the specified schema that need it."""
+    return VacuumScheduler([schema_name]).run()
 
 
 def normalize_table_options(table_options):
@@ -572,26 +691,11 @@ SELECT s.relname as "table_name",
 """
 
     # initialize settings
-    scale_table = [(10000000, Decimal("0.01")), (1000000, Decimal("0.02")), (100000, Decimal("0.05"))]
+    scale_table = get_autovacuum_scale_table()
     alter_count = 0
     no_scale = Decimal("100")
     zero = Decimal("0")
     reset = Decimal("-1")
-    scale_factor = zero
-
-    # override with environment
-    # This environment variable's data will be a JSON string in the form of:
-    # [[threshold, scale], ...]
-    # Where:
-    #     threshold is a integer number representing the approximate number of rows (tuples)
-    #     scale is the autovacuum_vacuum_scale_factor value (deimal number as string. ex "0.05")
-    #     See: https://www.postgresql.org/docs/10/runtime-config-autovacuum.html
-    #          https://www.2ndquadrant.com/en/blog/autovacuum-tuning-basics/
-    autovacuum_settings = json.loads(os.environ.get("AUTOVACUUM_TUNING", "[]"))
-    if autovacuum_settings:
-        scale_table = [[int(e[0]), Decimal(str(e[1]))] for e in autovacuum_settings]
-
-    scale_table.sort(key=lambda e: e[0], reverse=True)
 
     # Execute the scale based on table analyzsis
     with schema_context(schema_name):
@@ -600,7 +704,6 @@ SELECT s.relname as "table_name",
             tables = cursor.fetchall()
 
             for table in tables:
-                scale_factor = zero
                 table_name, n_live_tup, table_options = table
                 table_options = normalize_table_options(table_options)
                 try:
@@ -608,14 +711,11 @@ SELECT s.relname as "table_name",
                 except InvalidOperation:
                     table_scale_option = no_scale
 
-                for threshold, scale in scale_table:
-                    if n_live_tup >= threshold:
-                        scale_factor = scale
-                        break
+                scale_factor = get_autovacuum_scale_factor(n_live_tup, scale_table) or zero
 
                 # If current scale factor is the same as the table setting, then do nothing
                 # Reset if table tuples have changed
-                if scale_factor > zero and table_scale_option <= scale:
+                if scale_factor > zero and table_scale_option <= scale_factor:
                     continue
                 elif scale_factor == zero and "autovacuum_vacuum_scale_factor" in table_options:
                     scale_factor = reset
@@ -0,0 +1,154 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Stage timing and trace context for the report processing pipeline."""
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from celery.signals import before_task_publish
+from celery.signals import task_postrun
+from celery.signals import task_prerun
+
+from api.common import log_json
+from masu.prometheus_stats import PIPELINE_STAGE_BYTES_COUNTER
+from masu.prometheus_stats import PIPELINE_STAGE_DURATION
+from masu.prometheus_stats import PIPELINE_STAGE_ERRORS_COUNTER
+from masu.prometheus_stats import PIPELINE_STAGE_ROWS_COUNTER
+
+LOG = logging.getLogger(__name__)
+
+TRACE_HEADER = "koku_trace_id"
+UNKNOWN_PROVIDER_TYPE = "unknown"
+
+_TRACE_ID = ContextVar("koku_trace_id", default=None)
+_CURRENT_SPAN = ContextVar("koku_current_span", default=None)
+
+
+def get_trace_id():
+    """Return the trace id for the current context, if any."""
+    return _TRACE_ID.get()
+
+
+@contextmanager
+def trace_context(trace_id=None):
+    """
+    Run a block of work under a trace id.
+
+    Celery tasks published inside the block carry the trace id in their
+    message headers, so every task in the resulting chain logs and times
+    its stages against the same trace.
+
+    Args:
+        trace_id (str): The trace id to use. A new id is created when not
+            given and no trace is already active.
+
+    """
+    trace_id = trace_id or _TRACE_ID.get() or uuid.uuid4().hex
+    token = _TRACE_ID.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        _TRACE_ID.reset(token)
+
+
+class StageSpan:
+    """A single timed pipeline stage."""
+
+    def __init__(self, stage, provider_type, parent=None):
+        """Initialize the span."""
+        self.stage = stage
+        self.provider_type = provider_type
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.bytes = 0
+        self.rows = 0
+        self.duration = None
+
+    def add_bytes(self, count):
+        """Record bytes processed by this stage."""
+        self.bytes += count or 0
+
+    def add_rows(self, count):
+        """Record rows processed by this stage."""
+        self.rows += count or 0
+
+
+@contextmanager
+def stage_timer(stage, provider_type=None, context={}):
+    """
+    Time a pipeline stage and record its throughput.
+
+    Args:
+        stage (str): The pipeline stage name, e.g. "download" or "parquet_conversion".
+        provider_type (str): The provider type label. Inherited from the
+            enclosing stage when not given.
+        context (Dict): Context for logging (account, provider_uuid, etc)
+
+    """
+    parent = _CURRENT_SPAN.get()
+    if provider_type is None:
+        provider_type = parent.provider_type if parent else UNKNOWN_PROVIDER_TYPE
+    span = StageSpan(stage, provider_type, parent)
+    token = _CURRENT_SPAN.set(span)
+    start = time.monotonic()
+    try:
+        yield span
+    except Exception:
+        PIPELINE_STAGE_ERRORS_COUNTER.labels(stage=stage, provider_type=provider_type).inc()
+        raise
+    finally:
+        span.duration = time.monotonic() - start
+        _CURRENT_SPAN.reset(token)
+        PIPELINE_STAGE_DURATION.labels(stage=stage, provider_type=provider_type).observe(span.duration)
+        if span.bytes:
+            PIPELINE_STAGE_BYTES_COUNTER.labels(stage=stage, provider_type=provider_type).inc(span.bytes)
+        if span.rows:
+            PIPELINE_STAGE_ROWS_COUNTER.labels(stage=stage, provider_type=provider_type).inc(span.rows)
+        span_context = {
+            "stage": stage,
+            "provider_type": provider_type,
+            "span_id": span.span_id,
+            "parent_span_id": span.parent_id,
+            "duration_seconds": round(span.duration, 3),
+            "bytes": span.bytes,
+            "rows": span.rows,
+        }
+        span_context.update(context)
+        LOG.info(log_json(get_trace_id(), f"Stage {stage} finished.", span_context))
+
+
+@before_task_publish.connect
+def inject_trace_header(headers=None, **kwargs):
+    """Add the current trace id to outgoing celery task headers."""
+    trace_id = get_trace_id()
+    if trace_id and headers is not None:
+        headers.setdefault(TRACE_HEADER, trace_id)
+
+
+@task_prerun.connect
+def start_task_trace(task_id=None, task=None, **kwargs):
+    """Restore the trace id from the incoming celery task headers."""
+    trace_id = task.request.get(TRACE_HEADER) or (task.request.headers or {}).get(TRACE_HEADER)
+    _TRACE_ID.set(trace_id or task_id)
+
+
+@task_postrun.connect
+def end_task_trace(task_id=None, task=None, **kwargs):
+    """Clear the trace id once a celery task finishes."""
+    _TRACE_ID.set(None)
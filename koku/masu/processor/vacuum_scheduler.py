@@ -0,0 +1,236 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Vacuum the reporting tables that need it across tenant schemas."""
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import as_completed
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from decimal import InvalidOperation
+
+from django.conf import settings
+from django.db import connection
+from django.db import DatabaseError
+
+from api.common import log_json
+from masu.prometheus_stats import VACUUM_TABLES_COUNTER
+
+LOG = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+VACUUM = "VACUUM ANALYZE"
+ANALYZE = "ANALYZE"
+
+# PostgreSQL's autovacuum defaults, used where a table has no tuned setting.
+# See: https://www.postgresql.org/docs/10/runtime-config-autovacuum.html
+VACUUM_THRESHOLD = 50
+VACUUM_SCALE_FACTOR = Decimal("0.2")
+ANALYZE_THRESHOLD = 50
+ANALYZE_SCALE_FACTOR = Decimal("0.1")
+
+TABLE_STATS_SQL = """
+SELECT s.schemaname,
+       s.relname,
+       s.n_live_tup,
+       s.n_dead_tup,
+       s.n_mod_since_analyze,
+       greatest(s.last_vacuum, s.last_autovacuum) as "last_vacuum",
+       pg_total_relation_size(s.relid) as "table_bytes",
+       substring(
+           array_to_string(c.reloptions, ',') from 'autovacuum_vacuum_scale_factor=([0-9.]+)'
+       ) as "scale_factor"
+  FROM pg_stat_user_tables s
+  JOIN pg_class c
+    ON c.oid = s.relid
+ WHERE s.schemaname = any(%s)
+   AND s.relname like 'reporting_%%'
+"""
+
+TableStats = namedtuple(
+    "TableStats",
+    [
+        "schema_name",
+        "table_name",
+        "n_live_tup",
+        "n_dead_tup",
+        "n_mod_since_analyze",
+        "last_vacuum",
+        "table_bytes",
+        "scale_factor",
+    ],
+)
+
+
+def get_autovacuum_scale_table():
+    """Return the [(live tuples, autovacuum_vacuum_scale_factor), ...] tuning table, largest first."""
+    scale_table = [(10000000, Decimal("0.01")), (1000000, Decimal("0.02")), (100000, Decimal("0.05"))]
+
+    # override with environment
+    # This environment variable's data will be a JSON string in the form of:
+    # [[threshold, scale], ...]
+    # Where:
+    #     threshold is a integer number representing the approximate number of rows (tuples)
+    #     scale is the autovacuum_vacuum_scale_factor value (deimal number as string. ex "0.05")
+    #     See: https://www.postgresql.org/docs/10/runtime-config-autovacuum.html
+    #          https://www.2ndquadrant.com/en/blog/autovacuum-tuning-basics/
+    autovacuum_settings = json.loads(os.environ.get("AUTOVACUUM_TUNING", "[]"))
+    if autovacuum_settings:
+        scale_table = [[int(e[0]), Decimal(str(e[1]))] for e in autovacuum_settings]
+
+    scale_table.sort(key=lambda e: e[0], reverse=True)
+    return scale_table
+
+
+def get_autovacuum_scale_factor(n_live_tup, scale_table):
+    """Return the tuned scale factor for a table of n_live_tup rows, or None if it is too small to tune."""
+    for threshold, scale in scale_table:
+        if n_live_tup >= threshold:
+            return scale
+    return None
+
+
+class VacuumScheduler:
+    """Vacuum the reporting tables of many schemas, skipping the ones that do not need it.
+
+    The statistics of every table are read from pg_stat_user_tables in one
+    query. A table is vacuumed when its dead tuples pass the threshold
+    autovacuum would use for it, with the scale factor autovacuum_tune_schema
+    sets, and analyzed when enough rows changed since its last analyze.
+
+    The most bloated tables go first. Vacuums stop being scheduled once the
+    tables they read add up to io_budget MB, and at most max_workers run at
+    the same time, each on its own connection.
+    """
+
+    def __init__(self, schema_names, io_budget=None, max_workers=None):
+        """Initialize the scheduler."""
+        self.schema_names = list(schema_names)
+        io_budget = settings.VACUUM_IO_BUDGET if io_budget is None else io_budget
+        self.io_budget = io_budget * MB
+        self.max_workers = max_workers or settings.VACUUM_MAX_WORKERS
+        self.scale_table = get_autovacuum_scale_table()
+
+    def get_table_stats(self):
+        """Return the statistics of every reporting table in the schemas."""
+        with connection.cursor() as cursor:
+            cursor.execute(TABLE_STATS_SQL, [self.schema_names])
+            return [TableStats(*row) for row in cursor.fetchall()]
+
+    def get_action(self, table):
+        """Return VACUUM, ANALYZE or None for a table."""
+        try:
+            scale_factor = Decimal(table.scale_factor)
+        except (TypeError, InvalidOperation):
+            scale_factor = get_autovacuum_scale_factor(table.n_live_tup, self.scale_table) or VACUUM_SCALE_FACTOR
+        if table.n_dead_tup > VACUUM_THRESHOLD + scale_factor * table.n_live_tup:
+            return VACUUM
+        if table.n_mod_since_analyze > ANALYZE_THRESHOLD + ANALYZE_SCALE_FACTOR * table.n_live_tup:
+            return ANALYZE
+        return None
+
+    def plan(self, tables):
+        """Split the tables into the ones to maintain and the ones skipped.
+
+        Returns:
+            (list, list, list): The (table, action) pairs to run, the tables
+                that do not need maintenance and the tables over the I/O budget.
+
+        """
+        planned, skipped, deferred = [], [], []
+        budget_used = 0
+        for table in sorted(tables, key=lambda t: (t.n_dead_tup, t.n_mod_since_analyze), reverse=True):
+            action = self.get_action(table)
+            if action is None:
+                skipped.append(table)
+            elif action == VACUUM and self.io_budget and budget_used + table.table_bytes > self.io_budget:
+                deferred.append(table)
+            else:
+                # ANALYZE reads a fixed size sample, only a vacuum scans the whole table
+                if action == VACUUM:
+                    budget_used += table.table_bytes
+                planned.append((table, action))
+        return planned, skipped, deferred
+
+    def run_action(self, table, action):
+        """Run the maintenance of one table on this thread's connection and return how long it took."""
+        sql = f"{action} {table.schema_name}.{table.table_name}"
+        start = time.monotonic()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+        finally:
+            connection.close()
+        LOG.info(f"{sql} (last vacuumed {table.last_vacuum or 'never'})")
+        return time.monotonic() - start
+
+    def run(self):
+        """Vacuum the tables that need it and return a report of the run."""
+        start = time.monotonic()
+        tables = self.get_table_stats()
+        planned, skipped, deferred = self.plan(tables)
+
+        durations = {VACUUM: [], ANALYZE: []}
+        vacuumed_bytes = 0
+        failed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.run_action, table, action): (table, action) for table, action in planned}
+            for future in as_completed(futures):
+                table, action = futures[future]
+                try:
+                    durations[action].append(future.result())
+                except DatabaseError as error:
+                    LOG.warning(f"{action} {table.schema_name}.{table.table_name} failed: {error}")
+                    failed += 1
+                    continue
+                if action == VACUUM:
+                    vacuumed_bytes += table.table_bytes
+
+        VACUUM_TABLES_COUNTER.labels(action="vacuum").inc(len(durations[VACUUM]))
+        VACUUM_TABLES_COUNTER.labels(action="analyze").inc(len(durations[ANALYZE]))
+        VACUUM_TABLES_COUNTER.labels(action="skipped").inc(len(skipped))
+        VACUUM_TABLES_COUNTER.labels(action="deferred").inc(len(deferred))
+        report = self.report(time.monotonic() - start, tables, durations, vacuumed_bytes, skipped, deferred, failed)
+        LOG.info(log_json("vacuum", "Vacuum finished.", report))
+        return report
+
+    def report(self, elapsed, tables, durations, vacuumed_bytes, skipped, deferred, failed):
+        """Summarize a run and estimate the time saved against vacuuming every table one by one.
+
+        The time a skipped table would have taken is estimated from the
+        throughput of the tables vacuumed in this run.
+        """
+        serial_seconds = sum(durations[VACUUM]) + sum(durations[ANALYZE])
+        vacuum_seconds = sum(durations[VACUUM])
+        skipped_bytes = sum(table.table_bytes for table in skipped)
+        skipped_seconds = skipped_bytes * vacuum_seconds / vacuumed_bytes if vacuumed_bytes else 0
+
+        return {
+            "schemas": len(self.schema_names),
+            "tables": len(tables),
+            "vacuumed": len(durations[VACUUM]),
+            "analyzed": len(durations[ANALYZE]),
+            "skipped": len(skipped),
+            "deferred": len(deferred),
+            "failed": failed,
+            "skipped_mb": round(skipped_bytes / MB, 1),
+            "seconds": round(elapsed, 3),
+            "serial_seconds": round(serial_seconds, 3),
+            "estimated_seconds_saved": round(skipped_seconds + max(serial_seconds - elapsed, 0), 3),
+        }
@@ -21,7 +21,7 @@ import re
 from django.conf import settings
 from django.core.cache import caches
 
-from koku.celery import CELERY_INSPECT
+from koku.task_registry import TaskRegistry
 
 TASK_CACHE_EXPIRE = 30
 LOG = logging.getLogger(__name__)
@@ -74,19 +74,12 @@ class WorkerCache:
     def active_workers(self):
         """Return a list of active workers."""
         running_workers = []
-        celery_inspect_instance = CELERY_INSPECT.reserved()
-        if celery_inspect_instance:
-            hosts = celery_inspect_instance.keys()
-            for host in hosts:
-
-                # Celery returns workers in the form of celery@hostname.
-                hostname_pattern = r"[^@]*$"
-                found = re.search(hostname_pattern, host)
-                if found:
-                    hostname = found.group()
-                    running_workers.append(hostname)
-        else:
-            LOG.warning("Unable to get celery inspect instance.")
+        for host in sorted(TaskRegistry().get_live_workers()):
+            # Celery names workers in the form of celery@hostname.
+            hostname_pattern = r"[^@]*$"
+            found = re.search(hostname_pattern, host)
+            if found:
+                running_workers.append(found.group())
         return running_workers
 
     @property
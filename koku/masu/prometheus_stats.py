@@ -17,6 +17,8 @@
 """Prometheus Stats."""
 from prometheus_client import CollectorRegistry
 from prometheus_client import Counter
+from prometheus_client import Gauge
+from prometheus_client import Histogram
 from prometheus_client import multiprocess
 
 
@@ -72,3 +74,88 @@ SOURCES_PROVIDER_OP_RETRY_LOOP_COUNTER = Counter(
 SOURCES_HTTP_CLIENT_ERROR_COUNTER = Counter(
     "sources_http_client_errors", "Number of sources http client errors", registry=WORKER_REGISTRY
 )
+
+SOURCES_SYNC_QUEUE_DEPTH = Gauge(
+    "sources_sync_queue_depth",
+    "Number of provider synchronization events waiting in the sources sync pool",
+    multiprocess_mode="livesum",
+    registry=WORKER_REGISTRY,
+)
+
+SOURCES_SYNC_LATENCY = Histogram(
+    "sources_sync_latency_seconds",
+    "Time from queueing a provider synchronization event until it completes",
+    ["operation"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, float("inf")),
+    registry=WORKER_REGISTRY,
+)
+
+POLLING_CYCLE_DURATION = Histogram(
+    "orchestrator_polling_cycle_seconds",
+    "Duration of an orchestrator polling cycle across all providers",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, float("inf")),
+    registry=WORKER_REGISTRY,
+)
+PROVIDER_MANIFEST_DISCOVERY_DURATION = Histogram(
+    "provider_manifest_discovery_seconds",
+    "Duration of manifest discovery for a single provider",
+    ["provider_type"],
+    buckets=(0.5, 1, 5, 15, 30, 60, 120, 300, 600, float("inf")),
+    registry=WORKER_REGISTRY,
+)
+PROVIDER_MANIFEST_DISCOVERY_TIMEOUT_COUNTER = Counter(
+    "provider_manifest_discovery_timeouts",
+    "Number of provider manifest discoveries that exceeded the polling timeout",
+    ["provider_type"],
+    registry=WORKER_REGISTRY,
+)
+
+PIPELINE_STAGE_DURATION = Histogram(
+    "pipeline_stage_duration_seconds",
+    "Duration of a report processing pipeline stage",
+    ["stage", "provider_type"],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, float("inf")),
+    registry=WORKER_REGISTRY,
+)
+PIPELINE_STAGE_BYTES_COUNTER = Counter(
+    "pipeline_stage_bytes",
+    "Number of bytes processed by a report processing pipeline stage",
+    ["stage", "provider_type"],
+    registry=WORKER_REGISTRY,
+)
+PIPELINE_STAGE_ROWS_COUNTER = Counter(
+    "pipeline_stage_rows",
+    "Number of rows processed by a report processing pipeline stage",
+    ["stage", "provider_type"],
+    registry=WORKER_REGISTRY,
+)
+PIPELINE_STAGE_ERRORS_COUNTER = Counter(
+    "pipeline_stage_errors",
+    "Number of report processing pipeline stages that raised an error",
+    ["stage", "provider_type"],
+    registry=WORKER_REGISTRY,
+)
+SUMMARY_REQUESTS_COALESCED_COUNTER = Counter(
+    "summary_requests_coalesced",
+    "Number of summary requests merged into a pending summary of the same provider",
+    ["provider_type"],
+    registry=WORKER_REGISTRY,
+)
+SUMMARY_DAYS_COALESCED_COUNTER = Counter(
+    "summary_days_coalesced",
+    "Number of days not re-summarized because their summary request was merged into a pending one",
+    ["provider_type"],
+    registry=WORKER_REGISTRY,
+)
+SUMMARY_SECONDS_COALESCED_COUNTER = Counter(
+    "summary_seconds_coalesced",
+    "Estimated seconds of summary database time saved by the days that were not re-summarized",
+    ["provider_type"],
+    registry=WORKER_REGISTRY,
+)
+VACUUM_TABLES_COUNTER = Counter(
+    "vacuum_tables",
+    "Number of reporting tables vacuumed, analyzed, skipped or deferred by the vacuum scheduler",
+    ["action"],
+    registry=WORKER_REGISTRY,
+)
@@ -17,6 +17,7 @@ class MasuTestCase(IamTestCase):
 
     def setUp(self):
         """Set up each test case."""
+        super().setUp()
         self.customer, __ = Customer.objects.get_or_create(account_id=self.acct, schema_name=self.schema)
 
         self.aws_provider = Provider.objects.filter(type=Provider.PROVIDER_AWS_LOCAL).first()
@@ -30,10 +30,9 @@ from masu.processor.orchestrator import Orchestrator
 class ExpiredDataTest(TestCase):
     """Test Cases for the expired_data endpoint."""
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("koku.middleware.MASU", return_value=True)
     @patch.object(Orchestrator, "remove_expired_report_data")
-    def test_get_expired_data(self, mock_orchestrator, _, mock_service):
+    def test_get_expired_data(self, mock_orchestrator, _):
         """Test the GET expired_data endpoint."""
         mock_response = [{"customer": "acct10001", "async_id": "f9eb2ce7-4564-4509-aecc-1200958c07cf"}]
         expected_key = "Async jobs for expired data removal (simulated)"
@@ -45,11 +44,10 @@ class ExpiredDataTest(TestCase):
         self.assertIn(expected_key, body)
         self.assertIn(str(mock_response), body.get(expected_key))
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("koku.middleware.MASU", return_value=True)
     @patch.object(Config, "DEBUG", return_value=False)
     @patch.object(Orchestrator, "remove_expired_report_data")
-    def test_del_expired_data(self, mock_orchestrator, mock_debug, _, mock_service):
+    def test_del_expired_data(self, mock_orchestrator, mock_debug, _):
         """Test the DELETE expired_data endpoint."""
         mock_response = [{"customer": "acct10001", "async_id": "f9eb2ce7-4564-4509-aecc-1200958c07cf"}]
         expected_key = "Async jobs for expired data removal"
@@ -62,10 +60,9 @@ class ExpiredDataTest(TestCase):
         self.assertIn(expected_key, body)
         self.assertIn(str(mock_response), body.get(expected_key))
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("koku.middleware.MASU", return_value=True)
     @patch.object(Orchestrator, "remove_expired_report_data")
-    def test_get_expired_data_line_items_only(self, mock_orchestrator, _, mock_service):
+    def test_get_expired_data_line_items_only(self, mock_orchestrator, _):
         """Test the GET expired_data endpoint."""
         mock_response = [{"customer": "acct10001", "async_id": "f9eb2ce7-4564-4509-aecc-1200958c07cf"}]
         expected_key = "Async jobs for expired data removal (simulated)"
@@ -80,11 +77,10 @@ class ExpiredDataTest(TestCase):
         self.assertIn(expected_key, body)
         self.assertIn(str(mock_response), body.get(expected_key))
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("koku.middleware.MASU", return_value=True)
     @patch.object(Config, "DEBUG", return_value=False)
     @patch.object(Orchestrator, "remove_expired_report_data")
-    def test_del_expired_data_line_items_only(self, mock_orchestrator, mock_debug, _, mock_service):
+    def test_del_expired_data_line_items_only(self, mock_orchestrator, mock_debug, _):
         """Test the DELETE expired_data endpoint."""
         mock_response = [{"customer": "acct10001", "async_id": "f9eb2ce7-4564-4509-aecc-1200958c07cf"}]
         expected_key = "Async jobs for expired data removal"
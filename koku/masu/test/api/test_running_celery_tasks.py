@@ -22,6 +22,8 @@ from django.test import TestCase
 from django.test.utils import override_settings
 from django.urls import reverse
 
+from koku.task_registry import TaskRegistry
+
 LOG = logging.getLogger(__name__)
 
 
@@ -30,32 +32,24 @@ class RunningCeleryTasksTests(TestCase):
     """Test cases for the running_celery_tasks endpoint."""
 
     @patch("koku.middleware.MASU", return_value=True)
-    @patch("masu.api.running_celery_tasks.CELERY_INSPECT")
-    def test_get_running_celery_tasks_empty(self, mock_celery, _):
+    def test_get_running_celery_tasks_empty(self, _):
         """Test the GET of running_celery_tasks endpoint no tasks running."""
-        mock_celery.active.return_value = {}
         response = self.client.get(reverse("running_celery_tasks"))
         self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"active_tasks": []})
 
     @patch("koku.middleware.MASU", return_value=True)
-    @patch("masu.api.running_celery_tasks.CELERY_INSPECT")
-    def test_get_one_running_task(self, mock_celery, _):
+    def test_get_one_running_task(self, _):
         """Test the GET of running_celery_tasks endpoint."""
-        mock_celery.active.return_value = {
-            "celery@koku-worker-1": [
-                {
-                    "id": "a789bda7-f3fe-4af0-a327-fee32d777cd5",
-                    "name": "masu.celery.tasks.crawl_account_hierarchy",
-                    "args": [],
-                    "kwargs": {"provider_uuid": "1fdb20f1-c68c-457f-a1d5-4b8544284e40"},
-                    "type": "masu.celery.tasks.crawl_account_hierarchy",
-                    "hostname": "celery@koku-worker-1",
-                    "time_start": 1606753210.7729583,
-                    "acknowledged": True,
-                    "delivery_info": {"exchange": "", "routing_key": "celery", "priority": 0, "redelivered": False},
-                    "worker_pid": 153,
-                }
-            ]
-        }
+        task_id = "a789bda7-f3fe-4af0-a327-fee32d777cd5"
+        task_name = "masu.celery.tasks.crawl_account_hierarchy"
+        registry = TaskRegistry()
+        registry.heartbeat("celery@koku-worker-1")
+        registry.task_started(task_id, task_name, [], "celery@koku-worker-1")
+
         response = self.client.get(reverse("running_celery_tasks"))
         self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"active_tasks": [task_id]})
+
+        registry.task_finished(task_id, task_name)
+        registry.worker_stopped("celery@koku-worker-1")
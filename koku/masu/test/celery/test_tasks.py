@@ -21,10 +21,12 @@ from api.dataexport.syncer import SyncedFileInColdStorageError
 from api.models import Provider
 from api.utils import DateHelper
 from masu.celery import tasks
+from masu.celery.export import table_export_settings
 from masu.database.report_manifest_db_accessor import ReportManifestDBAccessor
 from masu.processor.orchestrator import Orchestrator
 from masu.test import MasuTestCase
 from masu.test.database.helpers import ManifestCreationHelper
+from masu.util.common import dictify_table_export_settings
 
 fake = faker.Faker()
 DummyS3Object = namedtuple("DummyS3Object", "key")
@@ -187,6 +189,62 @@ class TestCeleryTasks(MasuTestCase):
             tasks.delete_archived_data(schema_name, provider_type, provider_uuid)
             self.assertIn("Skipping delete_archived_data. Upload feature is disabled.", captured_logs.output[0])
 
+    @override_settings(ENABLE_S3_ARCHIVING=False)
+    def test_upload_normalized_data_archiving_false(self):
+        """Test that upload_normalized_data does nothing when archiving is disabled."""
+        with self.assertLogs("masu.celery.tasks", "INFO") as captured_logs:
+            tasks.upload_normalized_data()
+            self.assertIn("Skipping upload_normalized_data. Upload feature is disabled.", captured_logs.output[0])
+
+    @override_settings(ENABLE_S3_ARCHIVING=True)
+    @patch("masu.celery.tasks.query_and_upload_to_s3")
+    @patch("masu.celery.tasks.Orchestrator.get_accounts")
+    def test_upload_normalized_data(self, mock_accounts, mock_query_upload):
+        """Test that upload_normalized_data starts one export per table, month and day."""
+        account = {"schema_name": self.schema, "provider_type": "AWS-local", "provider_uuid": self.aws_provider_uuid}
+        mock_accounts.return_value = ([account], [])
+        dh = DateHelper()
+        days = len(dh.list_days(dh.this_month_start, dh.today)) + len(
+            dh.list_days(dh.last_month_start, dh.last_month_end)
+        )
+        aws_tables = [table for table in table_export_settings if table.provider == "aws"]
+        expected = sum(days if table.iterate_daily else 2 for table in aws_tables)
+
+        tasks.upload_normalized_data()
+
+        self.assertEqual(mock_query_upload.delay.call_count, expected)
+        exported_tables = {call_args[0][3]["output_name"] for call_args in mock_query_upload.delay.call_args_list}
+        self.assertEqual(exported_tables, {table.output_name for table in aws_tables})
+        for call_args in mock_query_upload.delay.call_args_list:
+            schema_name, provider_type, provider_uuid, table_export_setting, start_date, end_date = call_args[0]
+            self.assertEqual(provider_type, "AWS-local")
+            if table_export_setting["iterate_daily"]:
+                self.assertEqual(start_date, end_date)
+
+    @override_settings(ENABLE_S3_ARCHIVING=True, S3_BUCKET_PATH="bucket", NORMALIZED_DATA_EXPORT_FORMAT="parquet")
+    @patch("masu.celery.tasks.get_s3_resource")
+    @patch("masu.celery.tasks.export_query_to_s3", return_value=(10, 1024))
+    def test_query_and_upload_to_s3(self, mock_export, mock_resource):
+        """Test that query_and_upload_to_s3 exports the table to its daily path."""
+        table_export_setting = next(table for table in table_export_settings if table.iterate_daily)
+        tasks.query_and_upload_to_s3(
+            self.schema,
+            Provider.PROVIDER_AWS_LOCAL,
+            self.aws_provider_uuid,
+            dictify_table_export_settings(table_export_setting),
+            "2020-04-03",
+            "2020-04-03",
+        )
+        _, bucket, upload_path, sql, params, file_format = mock_export.call_args[0]
+        self.assertEqual(
+            upload_path,
+            f"bucket/{self.schema}/aws/{self.aws_provider_uuid}/2020/04/03/"
+            f"{table_export_setting.output_name}.parquet",
+        )
+        self.assertIn(f"{self.schema}.", sql)
+        self.assertEqual(params["start_date"], "2020-04-03")
+        self.assertEqual(file_format, "parquet")
+
     @patch("masu.celery.tasks.vacuum_schema")
     def test_vacuum_schemas(self, mock_vacuum):
         """Test that the vacuum_schemas scheduled task runs for all schemas."""
@@ -205,6 +263,7 @@ class TestCeleryTasks(MasuTestCase):
 
         for schema_name in [schema_one, schema_two]:
             mock_vacuum.delay.assert_any_call(schema_name)
+        self.assertNotIn(call("public"), mock_vacuum.delay.call_args_list)
 
     @patch("masu.celery.tasks.Config")
     @patch("masu.external.date_accessor.DateAccessor.get_billing_months")
@@ -323,6 +323,41 @@ class AWSReportDBAccessorTest(MasuTestCase):
             self.assertEqual(row_id, row_id_2)
             self.assertEqual(row.number_of_reservations, initial_res_count + 1)
 
+    def test_bulk_insert_on_conflict(self):
+        """Test that a bulk INSERT returns the inserted rows and skips conflicting ones."""
+        table_name = AWS_CUR_TABLE_MAP["product"]
+        table = AWSCostEntryProduct
+        rows = [self.creator.create_columns_for_table(table_name) for _ in range(3)]
+        key_columns = ["sku", "product_name", "region"]
+        with schema_context(self.schema):
+            inserted = self.accessor.bulk_insert_on_conflict(
+                table, rows[:2], conflict_columns=key_columns, return_columns=key_columns
+            )
+            self.assertEqual([row["sku"] for row in inserted], [row["sku"] for row in rows[:2]])
+            for row in inserted:
+                self.assertEqual(table.objects.get(sku=row["sku"]).id, row["id"])
+
+            inserted = self.accessor.bulk_insert_on_conflict(
+                table, rows, conflict_columns=key_columns, return_columns=key_columns
+            )
+            self.assertEqual([row["sku"] for row in inserted], [rows[2]["sku"]])
+            self.assertEqual(self.accessor.bulk_insert_on_conflict(table, []), [])
+
+    def test_bulk_insert_on_conflict_do_update(self):
+        """Test that a bulk INSERT updates and returns conflicting rows when given set columns."""
+        table_name = AWS_CUR_TABLE_MAP["reservation"]
+        table = AWSCostEntryReservation
+        data = self.creator.create_columns_for_table(table_name)
+        data["number_of_reservations"] = 1
+        with schema_context(self.schema):
+            row_id = self.accessor.insert_on_conflict_do_nothing(table, dict(data), ["reservation_arn"])
+            data["number_of_reservations"] = 2
+            updated = self.accessor.bulk_insert_on_conflict(
+                table, [data], conflict_columns=["reservation_arn"], set_columns=list(data.keys())
+            )
+            self.assertEqual(updated, [{"id": row_id}])
+            self.assertEqual(table.objects.get(id=row_id).number_of_reservations, 2)
+
     def test_insert_on_conflict_do_update_without_conflict(self):
         """Test that an INSERT succeeds inserting all non-conflicting rows."""
         table_name = AWS_CUR_TABLE_MAP["reservation"]
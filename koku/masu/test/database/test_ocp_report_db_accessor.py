@@ -1947,8 +1947,8 @@ select * from eek where val1 in {{report_period_ids}} ;
                         results_dict[word] = temp_dict
 
                     # call populate monthly tag_cost with the rates defined above
-                    self.accessor.populate_tag_usage_costs(
-                        infrastructure_rates, supplementary_rates, start_date, end_date, self.cluster_id
+                    self.accessor.populate_all_tag_usage_costs(
+                        infrastructure_rates, supplementary_rates, {}, {}, start_date, end_date, self.cluster_id
                     )
 
                     # get the three querysets to be evaluated based on the pod_labels after the update
@@ -2059,8 +2059,8 @@ select * from eek where val1 in {{report_period_ids}} ;
                         results_dict[word] = temp_dict
 
                     # call populate monthly tag_cost with the rates defined above
-                    self.accessor.populate_tag_usage_default_costs(
-                        infrastructure_rates, supplementary_rates, start_date, end_date, self.cluster_id
+                    self.accessor.populate_all_tag_usage_costs(
+                        {}, {}, infrastructure_rates, supplementary_rates, start_date, end_date, self.cluster_id
                     )
 
                     # get the three querysets to be evaluated based on the pod_labels after the update
@@ -2104,6 +2104,62 @@ select * from eek where val1 in {{report_period_ids}} ;
                                 )
                                 self.assertAlmostEqual(actual_diff, expected_diff)
 
+    def test_populate_all_tag_usage_costs_existing_usage_types(self):
+        """Test that the tag rate update only changes usage types already in the usage cost."""
+        dh = DateHelper()
+        start_date = dh.this_month_start
+        end_date = dh.this_month_end
+        cluster_id = "OCP-on-Azure"
+        infrastructure_rates = {
+            "cpu_core_usage_per_hour": {"app": {"banking": 5}},
+            "storage_gb_usage_per_month": {"app": {"banking": 3}},
+        }
+
+        with schema_context(self.schema):
+            line_item = (
+                OCPUsageLineItemDailySummary.objects.filter(
+                    cluster_id=cluster_id,
+                    pod_labels__contains={"app": "banking"},
+                    usage_start__gte=start_date,
+                    pod_usage_cpu_core_hours__isnull=False,
+                )
+                .order_by("uuid")
+                .first()
+            )
+            self.assertIsNotNone(line_item)
+            line_items = OCPUsageLineItemDailySummary.objects.filter(uuid=line_item.uuid)
+            line_items.update(infrastructure_usage_cost={"cpu": 1}, supplementary_usage_cost=None)
+
+            self.accessor.populate_all_tag_usage_costs(
+                infrastructure_rates, {}, {}, {}, start_date, end_date, cluster_id
+            )
+            line_item.refresh_from_db()
+
+        self.assertEqual(set(line_item.infrastructure_usage_cost), {"cpu"})
+        self.assertAlmostEqual(
+            line_item.infrastructure_usage_cost.get("cpu"), 1 + float(line_item.pod_usage_cpu_core_hours) * 5, 6
+        )
+        self.assertIsNone(line_item.supplementary_usage_cost)
+
+    def test_populate_all_tag_usage_costs_single_query(self):
+        """Test that a cost model with 200 tag rates is applied in a single query."""
+        dh = DateHelper()
+        start_date = dh.this_month_start
+        end_date = dh.this_month_end
+        cluster_id = "OCP-on-Azure"
+        tag_values = {f"value-{i}": i % 10 + 1 for i in range(100)}
+        infrastructure_rates = {"cpu_core_usage_per_hour": {"app": tag_values}}
+        supplementary_rates = {"memory_gb_usage_per_hour": {"app": tag_values}}
+
+        with patch.object(
+            OCPReportDBAccessor, "_execute_raw_sql_query", wraps=self.accessor._execute_raw_sql_query
+        ) as mock_execute:
+            self.accessor.populate_all_tag_usage_costs(
+                infrastructure_rates, supplementary_rates, {}, {}, start_date, end_date, cluster_id
+            )
+
+        mock_execute.assert_called_once()
+
     def test_update_line_item_daily_summary_with_enabled_tags(self):
         """Test that we filter the daily summary table's tags with only enabled tags."""
         dh = DateHelper()
@@ -2169,3 +2225,31 @@ select * from eek where val1 in {{report_period_ids}} ;
 
         with schema_context(self.schema):
             self.assertEqual(table_query.count(), 0)
+
+    def test_cluster_summary_partitions(self):
+        """Test that only summary partitions out of date order are clustered."""
+        with schema_context(self.schema):
+            start_date = OCPUsageLineItemDailySummary.objects.aggregate(Min("usage_start")).get("usage_start__min")
+            end_date = OCPUsageLineItemDailySummary.objects.aggregate(Max("usage_start")).get("usage_start__max")
+
+        with patch("masu.database.report_db_accessor_base.CLUSTER_CORRELATION_THRESHOLD", 0):
+            self.assertEqual(self.accessor.cluster_summary_partitions(start_date, end_date), [])
+
+        with patch("masu.database.report_db_accessor_base.CLUSTER_CORRELATION_THRESHOLD", 2):
+            clustered = self.accessor.cluster_summary_partitions(str(start_date), str(end_date))
+        self.assertNotEqual(clustered, [])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT t.relname
+                  FROM pg_index x
+                  JOIN pg_class t ON t.oid = x.indrelid
+                  JOIN pg_namespace n ON n.oid = t.relnamespace
+                 WHERE n.nspname = %s
+                   AND x.indisclustered
+                """,
+                [self.schema],
+            )
+            self.assertTrue(set(clustered) <= {row[0] for row in cursor.fetchall()})
+        for partition in clustered:
+            self.assertTrue(partition.startswith(OCPUsageLineItemDailySummary._meta.db_table))
@@ -16,6 +16,7 @@
 #
 """Test the AWSOrgUnitCrawler object."""
 import logging
+import time
 from datetime import timedelta
 from unittest.mock import MagicMock
 from unittest.mock import patch
@@ -26,8 +27,10 @@ from faker import Faker
 from tenant_schemas.utils import schema_context
 
 from api.models import Provider
+from masu.config import Config
 from masu.external.accounts.hierarchy.aws.aws_org_unit_crawler import AWSOrgUnitCrawler
 from masu.external.accounts.hierarchy.aws.aws_org_unit_crawler import LOG as crawler_log
+from masu.external.accounts.hierarchy.aws.aws_org_unit_crawler import RateLimiter
 from masu.test import MasuTestCase
 from masu.test.external.downloader.aws import fake_arn
 from reporting.provider.aws.models import AWSAccountAlias
@@ -74,6 +77,53 @@ def _mock_boto3_general_client_error():
     raise ClientError(operation_name="", error_response={})
 
 
+class FakeOrganizationsClient:
+    """In memory stand-in for the boto3 organizations client."""
+
+    page_size = 2
+
+    def __init__(self, tree, accounts):
+        """
+        Build the fake organization.
+
+        Args:
+            tree (dict): parent id to list of child org unit ids
+            accounts (dict): parent id to list of account dicts
+        """
+        self.tree = tree
+        self.accounts = accounts
+        self.call_count = 0
+
+    def _page(self, items, resource_key, NextToken=None):
+        self.call_count += 1
+        start = int(NextToken or 0)
+        response = {resource_key: items[start : start + self.page_size]}  # noqa: E203
+        if start + self.page_size < len(items):
+            response["NextToken"] = str(start + self.page_size)
+        return response
+
+    def get_paginator(self, operation_name):
+        paginator = MagicMock()
+        paginator.paginate.side_effect = lambda ParentId: MagicMock(
+            build_full_result=lambda: {
+                "OrganizationalUnits": [
+                    {"Id": ou_id, "Arn": f"arn-{ou_id}", "Name": f"name-{ou_id}"} for ou_id in self.tree[ParentId]
+                ]
+            }
+        )
+        return paginator
+
+    def list_roots(self):
+        return {"Roots": [{"Id": "r-0", "Arn": "arn-r-0", "Name": "root_0"}]}
+
+    def list_accounts_for_parent(self, ParentId, NextToken=None):
+        return self._page(self.accounts.get(ParentId, []), "Accounts", NextToken)
+
+    def list_organizational_units_for_parent(self, ParentId, NextToken=None):
+        org_units = [{"Id": ou_id, "Arn": f"arn-{ou_id}", "Name": f"name-{ou_id}"} for ou_id in self.tree[ParentId]]
+        return self._page(org_units, "OrganizationalUnits", NextToken)
+
+
 class AWSOrgUnitCrawlerTest(MasuTestCase):
     """Test Cases for the AWSOrgUnitCrawler object."""
 
@@ -435,3 +485,110 @@ class AWSOrgUnitCrawlerTest(MasuTestCase):
             unit_crawler.crawl_account_hierarchy()
             self.assertEqual(True, unit_crawler.errors_raised)
             self.assertEqual(False, mock_deleted.called)
+
+    def _build_fake_org(self, width=3, depth=3, accounts_per_ou=3):
+        """Build a fake organization client with width sub org units per node to the given depth."""
+        tree = {}
+        accounts = {}
+        parents = ["r-0"]
+        for level in range(depth + 1):
+            children = []
+            for parent in parents:
+                tree[parent] = [f"{parent}-ou{idx}" for idx in range(width)] if level < depth else []
+                accounts[parent] = [
+                    {"Id": f"{parent}-act{idx}", "Name": f"{parent}-name{idx}"} for idx in range(accounts_per_ou)
+                ]
+                children.extend(tree[parent])
+            parents = children
+        return FakeOrganizationsClient(tree, accounts)
+
+    @patch("masu.util.aws.common.get_assume_role_session")
+    def test_crawl_org_concurrently(self, mock_session):
+        """Test the concurrent crawl persists the same tree as the serial crawl."""
+        results = {}
+        for concurrency in (1, 4):
+            with schema_context(self.schema):
+                AWSOrganizationalUnit.objects.all().delete()
+                AWSAccountAlias.objects.all().delete()
+            client = self._build_fake_org()
+            unit_crawler = AWSOrgUnitCrawler(self.account)
+            with patch.object(Config, "AWS_ORG_CRAWL_CONCURRENCY", concurrency), patch.object(
+                Config, "AWS_ORG_API_RATE_LIMIT", 0
+            ), patch.object(AWSOrgUnitCrawler, "_init_session", lambda crawler: setattr(crawler, "_client", client)):
+                unit_crawler.crawl_account_hierarchy()
+            with schema_context(self.schema):
+                results[concurrency] = set(
+                    AWSOrganizationalUnit.objects.values_list(
+                        "org_unit_name", "org_unit_id", "org_unit_path", "level", "account_alias__account_id"
+                    )
+                )
+                self.assertFalse(AWSOrganizationalUnit.objects.filter(provider__isnull=True).exists())
+                self.assertEqual(AWSAccountAlias.objects.get(account_id="r-0-ou1-act2").account_alias, "r-0-ou1-name2")
+        # 1 + 3 + 9 + 27 org units each holding 3 accounts
+        self.assertEqual(len(results[4]), 40 * 4)
+        self.assertEqual(results[1], results[4])
+
+    @patch("masu.util.aws.common.get_assume_role_session")
+    def test_crawl_org_concurrently_soft_deletes(self, mock_session):
+        """Test the concurrent crawl marks removed nodes deleted and restores returning nodes."""
+        unit_crawler = AWSOrgUnitCrawler(self.account)
+        today = unit_crawler._date_accessor.today()
+        yesterday = today - timedelta(days=1)
+        client = self._build_fake_org(width=2, depth=1, accounts_per_ou=1)
+        with patch.object(Config, "AWS_ORG_CRAWL_CONCURRENCY", 4), patch.object(Config, "AWS_ORG_API_RATE_LIMIT", 0):
+            unit_crawler._client = client
+            unit_crawler._account_alias_map = {}
+            unit_crawler._structure_yesterday = {}
+            unit_crawler._save_org_nodes(unit_crawler._crawl_org_concurrently(client.list_roots()["Roots"][0]))
+            with schema_context(self.schema):
+                AWSOrganizationalUnit.objects.update(created_timestamp=yesterday)
+                AWSOrganizationalUnit.objects.filter(org_unit_id="r-0-ou0", account_alias__isnull=True).update(
+                    deleted_timestamp=yesterday
+                )
+
+            # Drop the second org unit and its account from the organization.
+            client.tree["r-0"] = ["r-0-ou0"]
+            unit_crawler._compute_org_structure_yesterday()
+            unit_crawler._save_org_nodes(unit_crawler._crawl_org_concurrently(client.list_roots()["Roots"][0]))
+
+        with schema_context(self.schema):
+            removed = AWSOrganizationalUnit.objects.filter(org_unit_id="r-0-ou1")
+            self.assertEqual(removed.count(), 2)
+            for org_unit in removed:
+                self.assertEqual(org_unit.deleted_timestamp, today.date())
+            restored = AWSOrganizationalUnit.objects.get(org_unit_id="r-0-ou0", account_alias__isnull=True)
+            self.assertIsNone(restored.deleted_timestamp)
+            self.assertEqual(AWSOrganizationalUnit.objects.count(), 6)
+
+    @patch("masu.util.aws.common.get_assume_role_session")
+    def test_crawl_org_concurrently_no_delete_on_exceptions(self, mock_session):
+        """Test that the concurrent crawl does not soft delete when a node fails."""
+        client = self._build_fake_org(width=2, depth=1, accounts_per_ou=1)
+        unit_crawler = AWSOrgUnitCrawler(self.account)
+        unit_crawler._client = client
+        unit_crawler._account_alias_map = {}
+        unit_crawler._structure_yesterday = {"stale": MagicMock(id=-1)}
+        with patch.object(client, "list_accounts_for_parent", side_effect=Exception()):
+            with patch.object(Config, "AWS_ORG_CRAWL_CONCURRENCY", 4), patch.object(
+                Config, "AWS_ORG_API_RATE_LIMIT", 0
+            ):
+                nodes = unit_crawler._crawl_org_concurrently(client.list_roots()["Roots"][0])
+        self.assertTrue(unit_crawler.errors_raised)
+        self.assertEqual(len(nodes), 1)
+        with patch.object(AWSOrganizationalUnit.objects, "filter") as mock_filter:
+            unit_crawler._save_org_nodes(nodes)
+            mock_filter.assert_not_called()
+
+    def test_rate_limiter(self):
+        """Test that the rate limiter spaces out calls."""
+        limiter = RateLimiter(50)
+        start = time.monotonic()
+        for _ in range(11):
+            limiter.wait()
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+        unlimited = RateLimiter(0)
+        start = time.monotonic()
+        for _ in range(100):
+            unlimited.wait()
+        self.assertLess(time.monotonic() - start, 0.1)
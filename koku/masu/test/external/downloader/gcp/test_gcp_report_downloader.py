@@ -1,10 +1,14 @@
 """Test the GCPReportDownloader class."""
+import datetime
 import os
 import shutil
+import tempfile
+from unittest.mock import MagicMock
 from unittest.mock import patch
 from uuid import uuid4
 
 import pandas as pd
+import pyarrow as pa
 from django.test.utils import override_settings
 from faker import Faker
 from google.cloud.exceptions import GoogleCloudError
@@ -13,14 +17,81 @@ from rest_framework.exceptions import ValidationError
 from api.utils import DateHelper
 from masu.external import UNCOMPRESSED
 from masu.external.downloader.gcp.gcp_report_downloader import create_daily_archives
+from masu.external.downloader.gcp.gcp_report_downloader import create_daily_parquet_files
 from masu.external.downloader.gcp.gcp_report_downloader import DATA_DIR
 from masu.external.downloader.gcp.gcp_report_downloader import divide_csv_daily
+from masu.external.downloader.gcp.gcp_report_downloader import divide_record_batches_daily
 from masu.external.downloader.gcp.gcp_report_downloader import GCPReportDownloader
 from masu.external.downloader.gcp.gcp_report_downloader import GCPReportDownloaderError
 from masu.test import MasuTestCase
 
 FAKE = Faker()
 
+LABEL_TYPE = pa.list_(pa.struct([("key", pa.string()), ("value", pa.string())]))
+CREDIT_TYPE = pa.list_(
+    pa.struct([("name", pa.string()), ("amount", pa.float64()), ("full_name", pa.string()), ("id", pa.string())])
+)
+TIMESTAMP_TYPE = pa.timestamp("us", tz="UTC")
+
+
+def fake_arrow_batches(num_rows, batch_size=10000, start=datetime.datetime(2021, 2, 1, tzinfo=datetime.timezone.utc)):
+    """Generate BigQuery billing export rows as Arrow record batches spread over four days."""
+    for offset in range(0, num_rows, batch_size):
+        size = min(batch_size, num_rows - offset)
+        usage_start = [start + datetime.timedelta(hours=(offset + idx) % 96) for idx in range(size)]
+        labels = [[{"key": "environment", "value": f"env-{idx % 3}"}] for idx in range(size)]
+        credits = [
+            [{"name": "FreeTier", "amount": -0.5, "full_name": None, "id": "c1"}] if idx % 2 else []
+            for idx in range(size)
+        ]
+        strings = pa.array([FAKE.slug()] * size)
+        columns = {
+            "billing_account_id": strings,
+            "service.id": strings,
+            "service.description": pa.array(["Compute Engine"] * size),
+            "sku.id": strings,
+            "sku.description": strings,
+            "usage_start_time": pa.array(usage_start, TIMESTAMP_TYPE),
+            "usage_end_time": pa.array([value + datetime.timedelta(hours=1) for value in usage_start], TIMESTAMP_TYPE),
+            "project.id": strings,
+            "project.name": strings,
+            "project.labels": pa.array(labels, LABEL_TYPE),
+            "project.ancestry_numbers": pa.array([None] * size, pa.string()),
+            "labels": pa.array(labels, LABEL_TYPE),
+            "system_labels": pa.array([[]] * size, LABEL_TYPE),
+            "location.location": strings,
+            "location.country": strings,
+            "location.region": strings,
+            "location.zone": strings,
+            "export_time": pa.array(usage_start, TIMESTAMP_TYPE),
+            "cost": pa.array([1.25] * size),
+            "currency": pa.array(["USD"] * size),
+            "currency_conversion_rate": pa.array([1.0] * size),
+            "usage.amount": pa.array([3600.0] * size),
+            "usage.unit": pa.array(["seconds"] * size),
+            "usage.amount_in_pricing_units": pa.array([1.0] * size),
+            "usage.pricing_unit": pa.array(["hour"] * size),
+            "credits": pa.array(credits, CREDIT_TYPE),
+            "invoice.month": pa.array(["202102"] * size),
+            "cost_type": pa.array(["regular"] * size),
+        }
+        # BigQuery names selected struct fields by their leaf name.
+        yield pa.RecordBatch.from_arrays(list(columns.values()), names=[name.split(".")[-1] for name in columns])
+
+
+class FakeQueryJob:
+    """BigQuery query job stand-in that returns Arrow record batches."""
+
+    def __init__(self, num_rows):
+        """Create a job returning num_rows rows."""
+        self.num_rows = num_rows
+
+    def result(self):
+        """Return a row iterator of the fake rows."""
+        rows = MagicMock(spec=["to_arrow_iterable"])
+        rows.to_arrow_iterable.return_value = fake_arrow_batches(self.num_rows)
+        return rows
+
 
 class GCPReportDownloaderTest(MasuTestCase):
     """Test Cases for the GCPReportDownloader object."""
@@ -305,3 +376,52 @@ class GCPReportDownloaderTest(MasuTestCase):
                     )
 
             self.assertEqual(downloader._get_dataset_name(), dataset_name)
+
+    @override_settings(ENABLE_PARQUET_PROCESSING=True, ENABLE_GCP_ARROW_EXPORT=True)
+    @patch("masu.external.downloader.gcp.gcp_report_downloader.copy_local_report_file_to_s3_bucket")
+    @patch("masu.external.downloader.gcp.gcp_report_downloader.bigquery")
+    def test_download_file_parquet(self, mock_bigquery, mock_s3):
+        """Assert download_file writes daily parquet files when the Arrow export is enabled."""
+        mock_bigquery.Client.return_value.query.return_value = FakeQueryJob(200)
+        key = "202102_1234_2021-02-01:2021-02-05.csv"
+        downloader = self.create_gcp_downloader_with_mocked_values(customer_name="Cody")
+        full_path, etag, date, file_names = downloader.download_file(key, start_date=DateHelper().this_month_start)
+
+        self.assertEqual(etag, self.etag)
+        self.assertIsNone(full_path)
+        self.assertEqual(
+            [os.path.basename(name) for name in sorted(file_names)], [f"2021-02-0{day}.parquet" for day in range(1, 5)]
+        )
+        mock_s3.assert_not_called()
+
+        data_frame = pd.concat(pd.read_parquet(name) for name in file_names)
+        self.assertEqual(len(data_frame), 200)
+        self.assertNotIn("usage.amount", data_frame.columns)
+        self.assertIn("usage_amount", data_frame.columns)
+        self.assertIn('"environment": "env-', data_frame["labels"].iloc[0])
+        self.assertEqual(set(data_frame["system_labels"]), {"{}"})
+        self.assertEqual(set(data_frame["project_ancestry_numbers"]), {""})
+        self.assertEqual(set(data_frame["credits"].str[:2]), {"{}", '{"'})
+
+    @override_settings(ENABLE_PARQUET_PROCESSING=True, GCP_ARROW_EXPORT_CSV_ARCHIVES=True)
+    @patch("masu.external.downloader.gcp.gcp_report_downloader.copy_local_report_file_to_s3_bucket")
+    def test_create_daily_parquet_files_with_csv_archives(self, mock_s3):
+        """Test that daily CSV files are still archived when requested."""
+        gcp_columns = self.create_gcp_downloader_with_mocked_values().gcp_big_query_columns
+        daily_tables = divide_record_batches_daily(fake_arrow_batches(100), gcp_columns)
+        with tempfile.TemporaryDirectory() as directory:
+            file_names = create_daily_parquet_files(
+                "request_id", "account", self.gcp_provider_uuid, directory, daily_tables, 1, DateHelper().today
+            )
+            self.assertEqual(len(file_names), 4)
+            self.assertEqual(mock_s3.call_count, 4)
+            self.assertEqual(sorted(os.listdir(directory)), sorted(os.path.basename(name) for name in file_names))
+
+    def test_divide_record_batches_daily(self):
+        """Test that Arrow record batches are partitioned by usage day."""
+        gcp_columns = self.create_gcp_downloader_with_mocked_values().gcp_big_query_columns
+        daily_tables = divide_record_batches_daily(fake_arrow_batches(1000, batch_size=300), gcp_columns)
+        self.assertEqual(sorted(daily_tables), ["2021-02-01", "2021-02-02", "2021-02-03", "2021-02-04"])
+        self.assertEqual(sum(table.num_rows for table in daily_tables.values()), 1000)
+        for table in daily_tables.values():
+            self.assertEqual(table.column_names, gcp_columns)
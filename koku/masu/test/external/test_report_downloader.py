@@ -214,6 +214,24 @@ class ReportDownloaderTest(MasuTestCase):
             self.assertEqual(result.get("assembly_id"), assembly_id)
             self.assertEqual(result.get("manifest_id"), manifest_id)
 
+    @patch("masu.external.downloader.aws.aws_report_downloader.AWSReportDownloader.download_file")
+    @patch("masu.external.downloader.aws.aws_report_downloader.AWSReportDownloader.__init__", return_value=None)
+    def test_download_reports_split_files_only(self, mock_dl_init, mock_dl):
+        """Test that a download writing only split files is still identified by its report name."""
+        downloader = self.create_downloader(Provider.PROVIDER_AWS)
+        manifest_id = 99
+        baker.make(CostUsageReportManifest, id=manifest_id)
+        assembly_id = "882083b7-ea62-4aab-aa6a-f0d08d65ee2b"
+        split_files = ["/full/path/to/2021-02-01.parquet", "/full/path/to/2021-02-02.parquet"]
+        mock_dl.return_value = (None, "fake_etag", DateAccessor().today(), split_files)
+        current_file = f"/my/{assembly_id}/koku-1.csv.gz"
+        report_context = {"date": FAKE.date(), "manifest_id": manifest_id, "current_file": current_file}
+
+        with patch("masu.external.report_downloader.ReportDownloader.is_report_processed", return_value=False):
+            result = downloader.download_report(report_context)
+        self.assertEqual(result.get("file"), downloader._downloader.get_local_file_for_report(current_file))
+        self.assertEqual(result.get("split_files"), split_files)
+
     @patch("masu.external.downloader.aws.aws_report_downloader.AWSReportDownloader.download_file")
     @patch("masu.external.downloader.aws.aws_report_downloader.AWSReportDownloader.__init__", return_value=None)
     def test_download_reports_already_processed(self, mock_dl_init, mock_dl):
@@ -19,17 +19,22 @@ import copy
 import csv
 import datetime
 import gzip
+import io
 import json
 import logging
 import os
 import random
 import shutil
 import tempfile
+import threading
 from unittest.mock import Mock
 from unittest.mock import patch
 
 from dateutil.relativedelta import relativedelta
+from django.db import connection
 from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import override_settings
 from tenant_schemas.utils import schema_context
 
 from api.utils import DateHelper
@@ -43,8 +48,11 @@ from masu.external import UNCOMPRESSED
 from masu.external.date_accessor import DateAccessor
 from masu.processor.aws.aws_report_processor import AWSReportProcessor
 from masu.processor.aws.aws_report_processor import ProcessedReport
+from masu.processor.report_processor_base import ColumnProjection
 from masu.test import MasuTestCase
 from masu.test.database.helpers import ManifestCreationHelper
+from reporting.provider.aws.models import AWSCostEntryLineItem
+from reporting.provider.aws.models import AWSCostEntryProduct
 from reporting_common import REPORT_COLUMN_MAP
 from reporting_common.models import CostUsageReportManifest
 from reporting_common.models import CostUsageReportStatus
@@ -242,6 +250,45 @@ class AWSReportProcessorTest(MasuTestCase):
             processor.process()
             self.assertIn(expected, logger.output)
 
+    @override_settings(REPORT_PROCESSING_PIPELINED_COPY=True)
+    def test_process_pipelined_copy(self):
+        """Test the processing of a file with its line items copied on a separate thread."""
+        copies = []
+        bulk_insert_rows = AWSReportDBAccessor.bulk_insert_rows
+
+        def copy_later(report_db, file_obj, table, columns, sep=","):
+            """Read the COPY stream on the loader thread and keep it to copy on this thread."""
+            self.assertIsNot(threading.current_thread(), threading.main_thread())
+            data = ""
+            chunk = file_obj.read(8192)
+            while chunk:
+                data += chunk
+                chunk = file_obj.read(8192)
+            copies.append((report_db, data, table, columns))
+
+        processor = AWSReportProcessor(
+            schema_name=self.schema,
+            report_path=self.test_report,
+            compression=UNCOMPRESSED,
+            provider_uuid=self.aws_provider_uuid,
+            manifest_id=self.manifest.id,
+        )
+        with schema_context(self.schema):
+            line_item_count = AWSCostEntryLineItem.objects.count()
+
+        with patch.object(AWSReportDBAccessor, "bulk_insert_rows", autospec=True, side_effect=copy_later):
+            processor.process()
+
+        # The loader thread has its own connection, which cannot see the rows of this test's transaction
+        for report_db, data, table, columns in copies:
+            bulk_insert_rows(report_db, io.StringIO(data), table, columns)
+        self.assertEqual(len(copies), 1)
+        with open(self.test_report_test_path) as f:
+            file_rows = len(list(csv.DictReader(f)))
+        self.assertEqual(len(list(csv.reader(io.StringIO(copies[0][1])))), file_rows)
+        with schema_context(self.schema):
+            self.assertGreater(AWSCostEntryLineItem.objects.count(), line_item_count)
+
     def test_process_gzip(self):
         """Test the processing of a gzip compressed file."""
         counts = {}
@@ -466,6 +513,44 @@ class AWSReportProcessorTest(MasuTestCase):
             final_count = bill_table.objects.filter(finalized_datetime__isnull=False).count()
             self.assertEqual(final_count, 1)
 
+    def test_process_first_load_creates_dimensions_in_bulk(self):
+        """Test that a first load inserts new dimension rows per batch instead of per row."""
+        with open(self.test_report, "r") as f:
+            reader = csv.DictReader(f)
+            field_names = reader.fieldnames
+            data = list(reader)
+        # Give every row a product and reservation never seen before
+        for index, row in enumerate(data):
+            row["product/sku"] = f"BULK-SKU-{index}"
+            row["reservation/ReservationARN"] = f"arn:aws:ec2:us-east-1:1:reserved-instances/bulk-{index}"
+        with open(self.test_report, "w") as f:
+            writer = csv.DictWriter(f, fieldnames=field_names)
+            writer.writeheader()
+            writer.writerows(data)
+
+        processor = AWSReportProcessor(
+            schema_name=self.schema,
+            report_path=self.test_report,
+            compression=UNCOMPRESSED,
+            provider_uuid=self.aws_provider_uuid,
+        )
+        processor._batch_size = len(data) // 2 + 1
+        with CaptureQueriesContext(connection) as captured:
+            processor.process()
+
+        def count_queries(table_name):
+            return len(
+                [q for q in captured.captured_queries if f".{table_name}(" in q["sql"] and "INSERT" in q["sql"]]
+            )
+
+        self.assertEqual(count_queries(AWS_CUR_TABLE_MAP["product"]), 2)
+        self.assertLessEqual(count_queries(AWS_CUR_TABLE_MAP["reservation"]), 4)
+        with schema_context(self.schema):
+            skus = set(AWSCostEntryProduct.objects.filter(sku__startswith="BULK-SKU-").values_list("sku", flat=True))
+            line_items = AWSCostEntryLineItem.objects.filter(cost_entry_product__sku__startswith="BULK-SKU-")
+            self.assertEqual(skus, {row["product/sku"] for row in data})
+            self.assertEqual(line_items.count(), len(data))
+
     def test_do_not_overwrite_finalized_bill_timestamp(self):
         """Test that a finalized bill timestamp does not get overwritten."""
         data = []
@@ -605,6 +690,43 @@ class AWSReportProcessorTest(MasuTestCase):
             for key in data:
                 self.assertIn(key, expected_columns)
 
+    def test_get_data_for_table_reuses_projection(self):
+        """Test that rows with the same header share one column projection."""
+        table_name = AWSCostEntryProduct._meta.db_table
+        column_map = REPORT_COLUMN_MAP[table_name]
+        self.processor._set_report_header(list(self.row))
+        with patch("masu.processor.report_processor_base.ColumnProjection", wraps=ColumnProjection) as mock_projection:
+            first = self.processor._get_data_for_table(self.row, table_name)
+            other_row = {key: f"{value}-other" for key, value in self.row.items()}
+            second = self.processor._get_data_for_table(other_row, table_name)
+
+        self.assertEqual(first, {column_map[key]: value for key, value in self.row.items() if key in column_map})
+        self.assertEqual(second, {column_map[key]: value for key, value in other_row.items() if key in column_map})
+        mock_projection.assert_called_once()
+
+    def test_get_data_for_table_new_header(self):
+        """Test that a new report header gets its own column projection."""
+        table_name = AWSCostEntryProduct._meta.db_table
+        column_map = REPORT_COLUMN_MAP[table_name]
+        mapped_key = next(key for key in self.row if key in column_map)
+        self.processor._set_report_header(list(self.row))
+        self.processor._get_data_for_table(self.row, table_name)
+
+        row = {mapped_key: "value"}
+        self.processor._set_report_header(list(row))
+        self.assertEqual(self.processor._get_data_for_table(row, table_name), {column_map[mapped_key]: "value"})
+
+    def test_column_projection(self):
+        """Test that a projection keeps the mapped columns in header order."""
+        column_map = {"Product/SKU": "sku", "product/region": "region"}
+        row = {"product/region": "us-east-1", "ignored": "value", "product/sku": "abc"}
+
+        self.assertEqual(ColumnProjection(tuple(row), column_map)(row), {})
+        self.assertEqual(
+            ColumnProjection(tuple(row), column_map, case_sensitive=False)(row), {"region": "us-east-1", "sku": "abc"}
+        )
+        self.assertEqual(ColumnProjection(("product/region",), column_map, False)(row), {"region": "us-east-1"})
+
     def test_process_tags(self):
         """Test that tags are properly packaged in a JSON string."""
         row = {
@@ -619,6 +741,16 @@ class AWSReportProcessorTest(MasuTestCase):
         self.assertNotIn(row["notATag"], actual)
         self.assertEqual(expected, actual)
 
+        self.processor._set_report_header(list(row))
+        self.assertEqual(json.loads(self.processor._process_tags(row)), expected)
+        self.assertEqual(
+            self.processor._tag_columns["resourceTags"],
+            [
+                ("resourceTags/user:environment", "environment"),
+                ("resourceTags/system:system_key", "system_key"),
+            ],
+        )
+
     def test_get_cost_entry_time_interval(self):
         """Test that an interval string is properly split."""
         fmt = Config.AWS_DATETIME_STR_FORMAT
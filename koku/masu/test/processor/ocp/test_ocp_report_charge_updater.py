@@ -492,24 +492,32 @@ class OCPCostModelCostUpdaterTest(MasuTestCase):
             "Cluster", "Supplementary", "a tag rate", start_date, end_date, self.cluster_id, updater._cluster_alias
         )
 
-    @patch("masu.database.ocp_report_db_accessor.OCPReportDBAccessor.populate_tag_usage_costs")
+    @patch("masu.database.ocp_report_db_accessor.OCPReportDBAccessor.populate_all_tag_usage_costs")
     @patch("masu.processor.ocp.ocp_cost_model_cost_updater.CostModelDBAccessor")
-    def test_update_tag_usage_costs(self, mock_cost_accessor, mock_update_usage):
-        """Test that populate_tag_usage_cost is called with the correct cost_type and rate."""
-        # using a string instead of an actual rate for the purposes of testing that the function is called
-        infrastructure_rates = {"cpu_core_usage_per_hour": "another tag rate"}
-        supplementary_rates = {"memory_gb_usage_per_hour": "a tag rate"}
-        mock_cost_accessor.return_value.__enter__.return_value.tag_infrastructure_rates = infrastructure_rates
-        mock_cost_accessor.return_value.__enter__.return_value.tag_supplementary_rates = supplementary_rates
+    def test_update_all_tag_usage_costs(self, mock_cost_accessor, mock_update_usage):
+        """Test that tag rates and tag defaults are applied with one accessor call."""
+        infrastructure_rates = {"cpu_core_usage_per_hour": {"app": {"banking": 1}}}
+        supplementary_rates = {"memory_gb_usage_per_hour": {"app": {"mobile": 2}}}
+        default_infrastructure_rates = {"cpu_core_usage_per_hour": {"app": {"default_value": 3}}}
+        default_supplementary_rates = {"memory_gb_usage_per_hour": {"app": {"default_value": 4}}}
+        mock_accessor = mock_cost_accessor.return_value.__enter__.return_value
+        mock_accessor.tag_infrastructure_rates = infrastructure_rates
+        mock_accessor.tag_supplementary_rates = supplementary_rates
+        mock_accessor.tag_default_infrastructure_rates = default_infrastructure_rates
+        mock_accessor.tag_default_supplementary_rates = default_supplementary_rates
 
-        usage_period = self.accessor.get_current_usage_period()
-        start_date = usage_period.report_period_start.date() + relativedelta(days=-1)
-        end_date = usage_period.report_period_end.date() + relativedelta(days=+1)
+        start_date = self.dh.this_month_start
+        end_date = self.dh.this_month_end
         updater = OCPCostModelCostUpdater(schema=self.schema, provider=self.provider)
-        updater._update_tag_usage_costs(start_date, end_date)
-        # assert that populate_tag_usage_costs was called with the correct info
+        updater._update_all_tag_usage_costs(start_date, end_date)
         mock_update_usage.assert_called_once_with(
-            infrastructure_rates, supplementary_rates, start_date, end_date, self.cluster_id
+            infrastructure_rates,
+            supplementary_rates,
+            default_infrastructure_rates,
+            default_supplementary_rates,
+            start_date,
+            end_date,
+            self.cluster_id,
         )
 
     @patch("masu.database.ocp_report_db_accessor.OCPReportDBAccessor.populate_monthly_tag_default_cost")
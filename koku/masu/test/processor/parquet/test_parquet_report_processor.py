@@ -337,6 +337,33 @@ class TestParquetReportProcessor(MasuTestCase):
                                             self.assertTrue(result)
                                             mock_create_table.assert_not_called()
 
+    def test_convert_csv_to_parquet_already_parquet(self):
+        """Test that parquet files written by the downloader are uploaded without conversion."""
+        with patch("masu.processor.parquet.parquet_report_processor.settings", ENABLE_S3_ARCHIVING=True):
+            with patch("masu.processor.parquet.parquet_report_processor.Path"):
+                with patch("masu.processor.parquet.parquet_report_processor.shutil") as mock_shutil:
+                    with patch("masu.processor.parquet.parquet_report_processor.pd") as mock_pd:
+                        with patch("masu.processor.parquet.parquet_report_processor.open"):
+                            with patch(
+                                "masu.processor.parquet.parquet_report_processor.copy_data_to_s3_bucket"
+                            ) as mock_copy:
+                                self.report_processor.presto_table_exists["report_type"] = True
+                                result = self.report_processor.convert_csv_to_parquet(
+                                    "request_id",
+                                    "s3_csv_path",
+                                    "s3_parquet_path",
+                                    "local_path",
+                                    "manifest_id",
+                                    "/tmp/2021-02-01.parquet",
+                                    report_type="report_type",
+                                )
+                                self.assertTrue(result)
+                                mock_pd.read_csv.assert_not_called()
+                                mock_shutil.move.assert_called_with(
+                                    "/tmp/2021-02-01.parquet", "local_path/2021-02-01.parquet"
+                                )
+                                self.assertEqual(mock_copy.call_args[0][2], "2021-02-01.parquet")
+
     @patch.object(ReportParquetProcessorBase, "get_or_create_postgres_partition")
     @patch.object(ReportParquetProcessorBase, "create_table")
     def test_create_parquet_table(self, mock_create_table, mock_partition):
@@ -0,0 +1,197 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Test the CopyLoader."""
+from unittest.mock import Mock
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TransactionTestCase
+from tenant_schemas.utils import schema_context
+
+from masu.database.aws_report_db_accessor import AWSReportDBAccessor
+from masu.processor.copy_loader import CopyLoader
+from masu.test import MasuTestCase
+
+TABLE_NAME = "test_copy_loader"
+THREAD_SCHEMA = "test_copy_loader_thread"
+
+
+def read_rows(file_obj, *args):
+    """Read a segment the way COPY does and return its CSV lines."""
+    data = ""
+    chunk = file_obj.read(8192)
+    while chunk:
+        data += chunk
+        chunk = file_obj.read(8192)
+    return data.splitlines()
+
+
+class CopyLoaderTest(MasuTestCase):
+    """Test cases for the CopyLoader."""
+
+    def setUp(self):
+        """Create a table to load into."""
+        super().setUp()
+        self.accessor = AWSReportDBAccessor(self.schema)
+        with schema_context(self.schema), connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE_NAME}")
+            cursor.execute(f"CREATE TABLE {TABLE_NAME} (id serial primary key, name varchar(8) unique, value int)")
+
+    def get_rows(self):
+        """Return the rows of the table."""
+        with schema_context(self.schema), connection.cursor() as cursor:
+            cursor.execute(f"SELECT name, value FROM {TABLE_NAME} ORDER BY name")
+            return cursor.fetchall()
+
+    def get_temp_tables(self):
+        """Return the temporary tables left by the loader."""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT tablename FROM pg_tables WHERE tablename LIKE %s", [f"{TABLE_NAME}_%"])
+            return cursor.fetchall()
+
+    def test_load_batches(self):
+        """Test that every batch is loaded once the loader is closed."""
+        with CopyLoader(self.accessor, TABLE_NAME, pipelined=False) as loader:
+            for batch in range(3):
+                loader.write([{"name": f"n{batch}{i}", "value": i} for i in range(5)])
+                loader.end_segment()
+            self.assertEqual(self.get_rows(), [])
+        self.assertEqual(loader.rows, 15)
+        self.assertEqual(len(self.get_rows()), 15)
+        self.assertEqual(self.get_temp_tables(), [])
+
+    def test_load_with_conflicts(self):
+        """Test that each batch is upserted on the conflict columns."""
+        with CopyLoader(self.accessor, TABLE_NAME, ["name"], pipelined=False) as loader:
+            loader.write([{"name": "a", "value": 1}, {"name": "b", "value": 1}])
+            loader.end_segment()
+            self.assertEqual(self.get_rows(), [("a", 1), ("b", 1)])
+            loader.write([{"name": "a", "value": 2}])
+            loader.end_segment()
+        self.assertEqual(self.get_rows(), [("a", 2), ("b", 1)])
+
+    def test_abort(self):
+        """Test that an aborted load leaves the table unchanged."""
+        with self.assertRaises(ValueError):
+            with CopyLoader(self.accessor, TABLE_NAME, pipelined=False) as loader:
+                loader.write([{"name": "a", "value": 1}])
+                loader.end_segment()
+                raise ValueError("bad row")
+        self.assertEqual(self.get_rows(), [])
+        self.assertEqual(self.get_temp_tables(), [])
+
+    def test_nothing_written(self):
+        """Test that closing an empty loader does nothing."""
+        report_db = Mock()
+        with CopyLoader(report_db, TABLE_NAME) as loader:
+            pass
+        self.assertEqual(loader.rows, 0)
+        report_db.bulk_insert_rows.assert_not_called()
+
+    @patch("masu.processor.copy_loader.connection")
+    def test_pipelined_load(self, mock_connection):
+        """Test that a pipelined load streams every batch into the table in one COPY."""
+        copied = []
+        report_db = Mock()
+        report_db.bulk_insert_rows.side_effect = lambda file_obj, *args: copied.extend(read_rows(file_obj))
+        with CopyLoader(report_db, TABLE_NAME, pipelined=True) as loader:
+            for batch in range(3):
+                loader.write([{"name": f"n{batch}{i}", "value": i} for i in range(2500)])
+                loader.end_segment()
+        self.assertEqual(len(copied), 7500)
+        report_db.bulk_insert_rows.assert_called_once()
+        self.assertEqual(report_db.bulk_insert_rows.call_args[0][1:], (TABLE_NAME, ["name", "value"]))
+        report_db.create_temp_table.assert_not_called()
+        mock_connection.set_schema.assert_called_once_with(report_db.schema)
+        mock_connection.close.assert_called_once()
+
+    @patch("masu.processor.copy_loader.connection")
+    def test_pipelined_load_with_conflicts(self, mock_connection):
+        """Test that a pipelined load with conflict columns upserts each batch from a temporary table."""
+        report_db = Mock()
+        report_db.create_temp_table.return_value = "temp_table"
+        report_db.bulk_insert_rows.side_effect = read_rows
+        with CopyLoader(report_db, TABLE_NAME, ["name"], pipelined=True) as loader:
+            for batch in range(2):
+                loader.write([{"name": f"n{batch}", "value": 1}])
+                loader.end_segment()
+        self.assertEqual(report_db.merge_temp_table.call_count, 2)
+        report_db.merge_temp_table.assert_called_with(TABLE_NAME, "temp_table", ["name", "value"], ["name"])
+        report_db.drop_temp_table.assert_called_once_with("temp_table")
+
+    @patch("masu.processor.copy_loader.connection")
+    def test_pipelined_load_error(self, mock_connection):
+        """Test that an error in the COPY thread is raised to the producer."""
+        report_db = Mock()
+        report_db.bulk_insert_rows.side_effect = RuntimeError("COPY failed")
+        with self.assertRaises(RuntimeError):
+            with CopyLoader(report_db, TABLE_NAME, pipelined=True) as loader:
+                for batch in range(100):
+                    loader.write([{"name": f"n{batch}{i}", "value": i} for i in range(1000)])
+        mock_connection.close.assert_called_once()
+
+
+class CopyLoaderThreadTest(TransactionTestCase):
+    """Test the pipelined CopyLoader on the connection of its own thread."""
+
+    # The loader thread only sees committed rows, so these tests run outside a test transaction.
+    # No models are flushed after each test, the tests drop the schema they create instead.
+    available_apps = ["masu"]
+
+    def setUp(self):
+        """Create a schema and a table to load into."""
+        super().setUp()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {THREAD_SCHEMA} CASCADE")
+            cursor.execute(f"CREATE SCHEMA {THREAD_SCHEMA}")
+            cursor.execute(
+                f"CREATE TABLE {THREAD_SCHEMA}.{TABLE_NAME} (id serial primary key, name varchar(8) unique, value int)"
+            )
+        self.accessor = AWSReportDBAccessor(THREAD_SCHEMA)
+
+    def tearDown(self):
+        """Drop the schema."""
+        connection.set_schema_to_public()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {THREAD_SCHEMA} CASCADE")
+        super().tearDown()
+
+    def get_rows(self):
+        """Return the rows of the table."""
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT name, value FROM {THREAD_SCHEMA}.{TABLE_NAME} ORDER BY name")
+            return cursor.fetchall()
+
+    def test_pipelined_load(self):
+        """Test that the loader thread copies into the table of the customer schema."""
+        connection.set_schema_to_public()
+        with CopyLoader(self.accessor, TABLE_NAME, pipelined=True) as loader:
+            for batch in range(3):
+                loader.write([{"name": f"n{batch}{i}", "value": i} for i in range(2500)])
+                loader.end_segment()
+        self.assertEqual(loader.rows, 7500)
+        self.assertEqual(len(self.get_rows()), 7500)
+
+    def test_pipelined_load_with_conflicts(self):
+        """Test that the loader thread upserts through a temporary table of the customer table."""
+        connection.set_schema_to_public()
+        with CopyLoader(self.accessor, TABLE_NAME, ["name"], pipelined=True) as loader:
+            loader.write([{"name": "a", "value": 1}, {"name": "b", "value": 1}])
+            loader.end_segment()
+            loader.write([{"name": "a", "value": 2}])
+            loader.end_segment()
+        self.assertEqual(self.get_rows(), [("a", 2), ("b", 1)])
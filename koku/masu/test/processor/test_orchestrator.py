@@ -17,10 +17,13 @@
 """Test the Orchestrator object."""
 import logging
 import random
+import threading
+import time
 from unittest.mock import patch
 
 import faker
 
+import masu.processor.orchestrator as orchestrator_module
 from api.models import Provider
 from masu.config import Config
 from masu.external.accounts_accessor import AccountsAccessor
@@ -78,8 +81,7 @@ class OrchestratorTest(MasuTestCase):
             }
         ]
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_initializer(self, mock_inspect):  # noqa: C901
+    def test_initializer(self):  # noqa: C901
         """Test to init."""
         orchestrator = Orchestrator()
         provider_count = Provider.objects.filter(active=True).count()
@@ -127,27 +129,24 @@ class OrchestratorTest(MasuTestCase):
                 else:
                     self.fail("Unexpected provider")
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("masu.external.report_downloader.ReportDownloader._set_downloader", return_value=FakeDownloader)
     @patch("masu.external.accounts_accessor.AccountsAccessor.get_accounts", return_value=[])
-    def test_prepare_no_accounts(self, mock_downloader, mock_accounts_accessor, mock_inspect):
+    def test_prepare_no_accounts(self, mock_downloader, mock_accounts_accessor):
         """Test downloading cost usage reports."""
         orchestrator = Orchestrator()
         reports = orchestrator.prepare()
 
         self.assertIsNone(reports)
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch.object(AccountsAccessor, "get_accounts")
-    def test_init_all_accounts(self, mock_accessor, mock_inspect):
+    def test_init_all_accounts(self, mock_accessor):
         """Test initializing orchestrator with forced billing source."""
         mock_accessor.return_value = self.mock_accounts
         orchestrator_all = Orchestrator()
         self.assertEqual(orchestrator_all._accounts, self.mock_accounts)
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch.object(AccountsAccessor, "get_accounts")
-    def test_init_with_billing_source(self, mock_accessor, mock_inspect):
+    def test_init_with_billing_source(self, mock_accessor):
         """Test initializing orchestrator with forced billing source."""
         mock_accessor.return_value = self.mock_accounts
 
@@ -158,9 +157,8 @@ class OrchestratorTest(MasuTestCase):
         found_account = individual._accounts[0]
         self.assertEqual(found_account.get("data_source"), fake_source.get("data_source"))
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch.object(AccountsAccessor, "get_accounts")
-    def test_init_all_accounts_error(self, mock_accessor, mock_inspect):
+    def test_init_all_accounts_error(self, mock_accessor):
         """Test initializing orchestrator accounts error."""
         mock_accessor.side_effect = AccountsAccessorError("Sample timeout error")
         try:
@@ -168,10 +166,9 @@ class OrchestratorTest(MasuTestCase):
         except Exception:
             self.fail("unexpected error")
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch.object(ExpiredDataRemover, "remove")
     @patch("masu.processor.orchestrator.remove_expired_data.apply_async", return_value=True)
-    def test_remove_expired_report_data(self, mock_task, mock_remover, mock_inspect):
+    def test_remove_expired_report_data(self, mock_task, mock_remover):
         """Test removing expired report data."""
         expected_results = [{"account_payer_id": "999999999", "billing_period_start": "2018-06-24 15:47:33.052509"}]
         mock_remover.return_value = expected_results
@@ -187,11 +184,10 @@ class OrchestratorTest(MasuTestCase):
             async_id = results.pop().get("async_id")
             self.assertIn(expected.format(async_id), logger.output)
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch.object(AccountsAccessor, "get_accounts")
     @patch.object(ExpiredDataRemover, "remove")
     @patch("masu.processor.orchestrator.remove_expired_data.apply_async", return_value=True)
-    def test_remove_expired_report_data_no_accounts(self, mock_task, mock_remover, mock_accessor, mock_inspect):
+    def test_remove_expired_report_data_no_accounts(self, mock_task, mock_remover, mock_accessor):
         """Test removing expired report data with no accounts."""
         expected_results = [{"account_payer_id": "999999999", "billing_period_start": "2018-06-24 15:47:33.052509"}]
         mock_remover.return_value = expected_results
@@ -202,10 +198,9 @@ class OrchestratorTest(MasuTestCase):
 
         self.assertEqual(results, [])
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("masu.processor.orchestrator.AccountLabel", spec=True)
     @patch("masu.processor.orchestrator.Orchestrator.start_manifest_processing", side_effect=ReportDownloaderError)
-    def test_prepare_w_downloader_error(self, mock_task, mock_labeler, mock_inspect):
+    def test_prepare_w_downloader_error(self, mock_task, mock_labeler):
         """Test that Orchestrator.prepare() handles downloader errors."""
 
         orchestrator = Orchestrator()
@@ -213,10 +208,9 @@ class OrchestratorTest(MasuTestCase):
         mock_task.assert_called()
         mock_labeler.assert_not_called()
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("masu.processor.orchestrator.AccountLabel", spec=True)
     @patch("masu.processor.orchestrator.Orchestrator.start_manifest_processing", side_effect=Exception)
-    def test_prepare_w_exception(self, mock_task, mock_labeler, mock_inspect):
+    def test_prepare_w_exception(self, mock_task, mock_labeler):
         """Test that Orchestrator.prepare() handles broad exceptions."""
 
         orchestrator = Orchestrator()
@@ -224,10 +218,9 @@ class OrchestratorTest(MasuTestCase):
         mock_task.assert_called()
         mock_labeler.assert_not_called()
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("masu.processor.orchestrator.AccountLabel", spec=True)
     @patch("masu.processor.orchestrator.Orchestrator.start_manifest_processing", return_value=True)
-    def test_prepare_w_manifest_processing_successful(self, mock_task, mock_labeler, mock_inspect):
+    def test_prepare_w_manifest_processing_successful(self, mock_task, mock_labeler):
         """Test that Orchestrator.prepare() works when manifest processing is successful."""
         mock_labeler().get_label_details.return_value = (True, True)
 
@@ -235,20 +228,18 @@ class OrchestratorTest(MasuTestCase):
         orchestrator.prepare()
         mock_labeler.assert_called()
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("masu.processor.orchestrator.get_report_files.apply_async", return_value=True)
-    def test_prepare_w_no_manifest_found(self, mock_task, mock_inspect):
+    def test_prepare_w_no_manifest_found(self, mock_task):
         """Test that Orchestrator.prepare() is skipped when no manifest is found."""
         orchestrator = Orchestrator()
         orchestrator.prepare()
         mock_task.assert_not_called()
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("masu.processor.orchestrator.record_report_status", return_value=True)
     @patch("masu.processor.orchestrator.chord", return_value=True)
     @patch("masu.processor.orchestrator.ReportDownloader.download_manifest", return_value={})
     def test_start_manifest_processing_already_progressed(
-        self, mock_record_report_status, mock_download_manifest, mock_task, mock_inspect
+        self, mock_record_report_status, mock_download_manifest, mock_task
     ):
         """Test start_manifest_processing with report already processed."""
         orchestrator = Orchestrator()
@@ -265,13 +256,10 @@ class OrchestratorTest(MasuTestCase):
         )
         mock_task.assert_not_called()
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("masu.processor.orchestrator.WorkerCache.task_is_running", return_value=True)
     @patch("masu.processor.orchestrator.chord", return_value=True)
     @patch("masu.processor.orchestrator.ReportDownloader.download_manifest", return_value={})
-    def test_start_manifest_processing_in_progress(
-        self, mock_record_report_status, mock_download_manifest, mock_task, mock_inspect
-    ):
+    def test_start_manifest_processing_in_progress(self, mock_record_report_status, mock_download_manifest, mock_task):
         """Test start_manifest_processing with report in progressed."""
         orchestrator = Orchestrator()
         account = self.mock_accounts[0]
@@ -287,10 +275,9 @@ class OrchestratorTest(MasuTestCase):
         )
         mock_task.assert_not_called()
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("masu.processor.orchestrator.chord")
     @patch("masu.processor.orchestrator.ReportDownloader.download_manifest")
-    def test_start_manifest_processing(self, mock_download_manifest, mock_task, mock_inspect):
+    def test_start_manifest_processing(self, mock_download_manifest, mock_task):
         """Test start_manifest_processing."""
         test_matrix = [
             {"mock_downloader_manifest": {}, "expect_chord_called": False},
@@ -320,9 +307,8 @@ class OrchestratorTest(MasuTestCase):
             else:
                 mock_task.assert_not_called()
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("masu.database.provider_db_accessor.ProviderDBAccessor.get_setup_complete")
-    def test_get_reports(self, fake_accessor, mock_inspect):
+    def test_get_reports(self, fake_accessor):
         """Test get_reports for combinations of setup_complete and ingest override."""
         initial_month_qty = Config.INITIAL_INGEST_NUM_MONTHS
         test_matrix = [
@@ -343,3 +329,95 @@ class OrchestratorTest(MasuTestCase):
 
         Config.INGEST_OVERRIDE = False
         Config.INITIAL_INGEST_NUM_MONTHS = initial_month_qty
+
+    @patch.dict("masu.processor.orchestrator._DISCOVERY_IN_FLIGHT", clear=True)
+    @patch("masu.processor.orchestrator.AccountLabel", spec=True)
+    @patch("masu.processor.orchestrator.Orchestrator.get_reports")
+    @patch("masu.processor.orchestrator.Orchestrator.start_manifest_processing")
+    def test_prepare_concurrently(self, mock_start, mock_get_reports, mock_labeler):
+        """Test that the polling accounts are prepared at the same time."""
+        accounts = [dict(self.mock_accounts[0], provider_uuid=self.fake.uuid4()) for _ in range(4)]
+        # Only returns once every account is being prepared
+        all_started = threading.Barrier(len(accounts))
+        broken = []
+
+        def fake_start(**kwargs):
+            try:
+                all_started.wait(timeout=10)
+            except threading.BrokenBarrierError:
+                broken.append(kwargs.get("provider_uuid"))
+
+        mock_start.side_effect = fake_start
+        mock_get_reports.return_value = DateAccessor().get_billing_months(1)
+        mock_labeler().get_label_details.return_value = (None, None)
+
+        with patch.object(Config, "POLLING_CONCURRENCY", len(accounts)):
+            orchestrator = Orchestrator()
+            orchestrator._polling_accounts = accounts
+            orchestrator.prepare()
+
+        self.assertEqual(mock_start.call_count, len(accounts))
+        self.assertEqual(broken, [])
+
+    @patch.dict("masu.processor.orchestrator._DISCOVERY_IN_FLIGHT", clear=True)
+    @patch("masu.processor.orchestrator.AccountLabel", spec=True)
+    @patch("masu.processor.orchestrator.Orchestrator.get_reports")
+    @patch("masu.processor.orchestrator.Orchestrator.start_manifest_processing")
+    def test_prepare_concurrently_timeout_per_provider(self, mock_start, mock_get_reports, mock_labeler):
+        """Test that a provider queued behind others gets the whole timeout from when it starts."""
+        mock_start.side_effect = lambda **kwargs: time.sleep(0.6)
+        mock_get_reports.return_value = DateAccessor().get_billing_months(1)
+        mock_labeler().get_label_details.return_value = (None, None)
+        accounts = [dict(self.mock_accounts[0], provider_uuid=self.fake.uuid4()) for _ in range(3)]
+
+        # The third provider starts after 0.6 seconds and finishes after 1.2, past a timeout for the whole cycle
+        with patch.object(Config, "POLLING_CONCURRENCY", 2), patch.object(Config, "POLLING_PROVIDER_TIMEOUT", 1):
+            with patch("masu.processor.orchestrator.LOG") as mock_log:
+                orchestrator = Orchestrator()
+                orchestrator._polling_accounts = accounts
+                orchestrator.prepare()
+
+        self.assertEqual(mock_start.call_count, len(accounts))
+        mock_log.warning.assert_not_called()
+
+    @patch.dict("masu.processor.orchestrator._DISCOVERY_IN_FLIGHT", clear=True)
+    @patch("masu.processor.orchestrator.AccountLabel", spec=True)
+    @patch("masu.processor.orchestrator.Orchestrator.get_reports")
+    @patch("masu.processor.orchestrator.Orchestrator.start_manifest_processing")
+    def test_prepare_concurrently_provider_timeout(self, mock_start, mock_get_reports, mock_labeler):
+        """Test that a provider exceeding the polling timeout does not block the cycle and is not polled twice."""
+        slow_uuid = self.fake.uuid4()
+        release = threading.Event()
+
+        def fake_start(**kwargs):
+            if kwargs.get("provider_uuid") == slow_uuid:
+                release.wait(timeout=10)
+
+        mock_start.side_effect = fake_start
+        mock_get_reports.return_value = DateAccessor().get_billing_months(1)
+        mock_labeler().get_label_details.return_value = (None, None)
+        accounts = [dict(self.mock_accounts[0], provider_uuid=slow_uuid)] + [
+            dict(self.mock_accounts[0], provider_uuid=self.fake.uuid4()) for _ in range(3)
+        ]
+
+        def slow_calls():
+            return [c for c in mock_start.call_args_list if c[1].get("provider_uuid") == slow_uuid]
+
+        logging.disable(logging.NOTSET)
+        with patch.object(Config, "POLLING_CONCURRENCY", 4), patch.object(Config, "POLLING_PROVIDER_TIMEOUT", 1):
+            with self.assertLogs("masu.processor.orchestrator", level="WARNING") as logger:
+                orchestrator = Orchestrator()
+                orchestrator._polling_accounts = accounts
+                orchestrator.prepare()
+                self.assertTrue(any(slow_uuid in line and "did not finish" in line for line in logger.output))
+
+                # The next cycle skips the provider still being discovered
+                orchestrator.prepare()
+                self.assertTrue(any(slow_uuid in line and "still running" in line for line in logger.output))
+            self.assertEqual(len(slow_calls()), 1)
+            self.assertEqual(mock_start.call_count, 1 + 2 * 3)
+
+            release.set()
+            orchestrator_module._DISCOVERY_IN_FLIGHT[slow_uuid].result(timeout=10)
+            orchestrator.prepare()
+        self.assertEqual(len(slow_calls()), 2)
@@ -154,6 +154,23 @@ class ReportSummaryUpdaterTest(MasuTestCase):
         mock_update.assert_called_with(self.today, self.tomorrow)
         mock_cloud.assert_called_with(mock_start, mock_end)
 
+    @override_settings(REPORT_SUMMARY_CLUSTER_PARTITIONS=True)
+    @patch("masu.processor.report_summary_updater.OCPReportDBAccessor.cluster_summary_partitions")
+    @patch("masu.processor.report_summary_updater.OCPCloudReportSummaryUpdater.update_summary_tables")
+    @patch("masu.processor.report_summary_updater.OCPReportSummaryUpdater.update_summary_tables")
+    def test_cluster_summary_partitions(self, mock_update, mock_cloud, mock_cluster):
+        """Test that the summarized partitions are clustered when enabled."""
+        mock_update.return_value = (self.today, self.tomorrow)
+        mock_cluster.return_value = []
+        updater = ReportSummaryUpdater(self.schema, self.ocp_test_provider_uuid)
+        updater.update_summary_tables(self.today, self.tomorrow)
+        mock_cluster.assert_called_with(self.today, self.tomorrow)
+
+        mock_cluster.reset_mock()
+        with override_settings(REPORT_SUMMARY_CLUSTER_PARTITIONS=False):
+            updater.update_summary_tables(self.today, self.tomorrow)
+        mock_cluster.assert_not_called()
+
     def test_bad_provider(self):
         """Test that an unimplemented provider throws an error."""
         credentials = {"credentials": {"role_arn": "unknown"}}
@@ -15,6 +15,7 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 """Test the download task."""
+import heapq
 import json
 import logging
 import os
@@ -25,6 +26,7 @@ from datetime import date
 from datetime import timedelta
 from decimal import Decimal
 from unittest.mock import ANY
+from unittest.mock import call
 from unittest.mock import Mock
 from unittest.mock import patch
 from uuid import uuid4
@@ -35,6 +37,7 @@ from django.core.cache import caches
 from django.db.models import Max
 from django.db.models import Min
 from django.db.utils import IntegrityError
+from django.test import override_settings
 from tenant_schemas.utils import schema_context
 
 import koku.celery as koku_celery
@@ -54,20 +57,25 @@ from masu.processor._tasks.download import _get_report_files
 from masu.processor._tasks.process import _process_report_file
 from masu.processor.expired_data_remover import ExpiredDataRemover
 from masu.processor.report_processor import ReportProcessorError
+from masu.processor.summary_coalescer import SummaryCoalescer
+from masu.processor.summary_coalescer import SummaryCoalescerLockError
 from masu.processor.tasks import autovacuum_tune_schema
 from masu.processor.tasks import get_report_files
 from masu.processor.tasks import normalize_table_options
+from masu.processor.tasks import queue_summary
 from masu.processor.tasks import record_all_manifest_files
 from masu.processor.tasks import record_report_status
 from masu.processor.tasks import refresh_materialized_views
 from masu.processor.tasks import remove_expired_data
 from masu.processor.tasks import remove_stale_tenants
+from masu.processor.tasks import summarize_coalesced
 from masu.processor.tasks import summarize_reports
 from masu.processor.tasks import update_all_summary_tables
 from masu.processor.tasks import update_cost_model_costs
 from masu.processor.tasks import update_summary_tables
 from masu.processor.tasks import vacuum_schema
 from masu.processor.worker_cache import create_single_task_cache_key
+from masu.prometheus_stats import WORKER_REGISTRY
 from masu.test import MasuTestCase
 from masu.test.database.helpers import ReportObjectCreator
 from masu.test.external.downloader.aws import fake_arn
@@ -173,9 +181,8 @@ class GetReportFileTests(MasuTestCase):
                     statement_found = True
             self.assertTrue(statement_found)
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("masu.processor._tasks.download.ReportDownloader._set_downloader", side_effect=Exception("only a test"))
-    def test_get_report_task_exception(self, fake_downloader, mock_inspect):
+    def test_get_report_task_exception(self, fake_downloader):
         """Test task."""
         account = fake_arn(service="iam", generate_account_id=True)
 
@@ -446,10 +453,9 @@ class TestProcessorTasks(MasuTestCase):
         }
 
     @patch("masu.processor.tasks.WorkerCache.remove_task_from_cache")
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("masu.processor.tasks._get_report_files")
     @patch("masu.processor.tasks._process_report_file", side_effect=ReportProcessorError("Mocked process error!"))
-    def test_get_report_process_exception(self, mock_process_files, mock_get_files, mock_inspect, mock_cache_remove):
+    def test_get_report_process_exception(self, mock_process_files, mock_get_files, mock_cache_remove):
         """Test raising processor exception is handled."""
         mock_get_files.return_value = {"file": self.fake.word(), "compression": "GZIP"}
 
@@ -457,12 +463,9 @@ class TestProcessorTasks(MasuTestCase):
         mock_cache_remove.assert_called()
 
     @patch("masu.processor.tasks.WorkerCache.remove_task_from_cache")
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("masu.processor.tasks._get_report_files")
     @patch("masu.processor.tasks._process_report_file", side_effect=NotImplementedError)
-    def test_get_report_process_not_implemented_error(
-        self, mock_process_files, mock_get_files, mock_inspect, mock_cache_remove
-    ):
+    def test_get_report_process_not_implemented_error(self, mock_process_files, mock_get_files, mock_cache_remove):
         """Test raising processor exception is handled."""
         mock_get_files.return_value = {"file": self.fake.word(), "compression": "PLAIN"}
 
@@ -470,9 +473,8 @@ class TestProcessorTasks(MasuTestCase):
         mock_cache_remove.assert_called()
 
     @patch("masu.processor.tasks.WorkerCache.remove_task_from_cache")
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("masu.processor.tasks._get_report_files", side_effect=Exception("Mocked download error!"))
-    def test_get_report_broad_exception(self, mock_get_files, mock_inspect, mock_cache_remove):
+    def test_get_report_broad_exception(self, mock_get_files, mock_cache_remove):
         """Test raising download broad exception is handled."""
         mock_get_files.return_value = {"file": self.fake.word(), "compression": "GZIP"}
 
@@ -515,6 +517,22 @@ class TestRemoveExpiredDataTasks(MasuTestCase):
             )
             self.assertIn(expected.format(str(expected_results)), logger.output)
 
+    @patch.object(ExpiredDataRemover, "remove")
+    @patch("masu.processor.tasks.refresh_materialized_views.delay")
+    @patch("masu.processor.tasks.invalidate_report_deltas_cache")
+    def test_remove_expired_data_invalidates_deltas(self, mock_invalidate, fake_view, fake_remover):
+        """Test that purging report data drops the cached report deltas, unless it is simulated."""
+        remove_expired_data(schema_name=self.schema, provider=Provider.PROVIDER_AWS, simulate=True)
+        mock_invalidate.assert_not_called()
+
+        remove_expired_data(
+            schema_name=self.schema, provider=Provider.PROVIDER_AWS, simulate=False, line_items_only=True
+        )
+        mock_invalidate.assert_not_called()
+
+        remove_expired_data(schema_name=self.schema, provider=Provider.PROVIDER_AWS, simulate=False)
+        mock_invalidate.assert_called_once_with(self.schema, Provider.PROVIDER_AWS)
+
 
 class TestUpdateSummaryTablesTask(MasuTestCase):
     """Test cases for Processor summary table Celery tasks."""
@@ -621,14 +639,13 @@ class TestUpdateSummaryTablesTask(MasuTestCase):
         self.assertEqual(result_start_date, expected_start_date.date())
         self.assertEqual(result_end_date, expected_end_date.date())
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
     @patch("masu.processor.tasks.CostModelDBAccessor")
     @patch("masu.processor.tasks.chain")
     @patch("masu.processor.tasks.refresh_materialized_views")
     @patch("masu.processor.tasks.update_cost_model_costs")
     @patch("masu.processor.ocp.ocp_cost_model_cost_updater.CostModelDBAccessor")
     def test_update_summary_tables_ocp(
-        self, mock_cost_model, mock_charge_info, mock_view, mock_chain, mock_task_cost_model, mock_cache
+        self, mock_cost_model, mock_charge_info, mock_view, mock_chain, mock_task_cost_model
     ):
         """Test that the summary table task runs."""
         infrastructure_rates = {
@@ -771,8 +788,7 @@ class TestUpdateSummaryTablesTask(MasuTestCase):
 
         mock_update.delay.assert_called_with(ANY, ANY, ANY, str(start_date), ANY)
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_refresh_materialized_views_aws(self, mock_cache):
+    def test_refresh_materialized_views_aws(self):
         """Test that materialized views are refreshed."""
         manifest_dict = {
             "assembly_id": "12345",
@@ -802,8 +818,7 @@ class TestUpdateSummaryTablesTask(MasuTestCase):
         with ProviderDBAccessor(self.aws_provider_uuid) as accessor:
             self.assertIsNotNone(accessor.provider.data_updated_timestamp)
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_refresh_materialized_views_azure(self, mock_cache):
+    def test_refresh_materialized_views_azure(self):
         """Test that materialized views are refreshed."""
         manifest_dict = {
             "assembly_id": "12345",
@@ -833,8 +848,7 @@ class TestUpdateSummaryTablesTask(MasuTestCase):
         with ProviderDBAccessor(self.azure_provider_uuid) as accessor:
             self.assertIsNotNone(accessor.provider.data_updated_timestamp)
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_refresh_materialized_views_ocp(self, mock_cache):
+    def test_refresh_materialized_views_ocp(self):
         """Test that materialized views are refreshed."""
         manifest_dict = {
             "assembly_id": "12345",
@@ -864,8 +878,7 @@ class TestUpdateSummaryTablesTask(MasuTestCase):
         with ProviderDBAccessor(self.ocp_provider_uuid) as accessor:
             self.assertIsNotNone(accessor.provider.data_updated_timestamp)
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_refresh_materialized_views_gcp(self, mock_cache):
+    def test_refresh_materialized_views_gcp(self):
         """Test that materialized views are refreshed."""
         manifest_dict = {
             "assembly_id": "12345",
@@ -897,8 +910,7 @@ class TestUpdateSummaryTablesTask(MasuTestCase):
 
     @patch("masu.processor.tasks.WorkerCache.release_single_task")
     @patch("masu.processor.tasks.WorkerCache.lock_single_task")
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_update_cost_model_costs_throttled(self, mock_inspect, mock_lock, mock_release):
+    def test_update_cost_model_costs_throttled(self, mock_lock, mock_release):
         """Test that refresh materialized views runs with cache lock."""
 
         def single_task_is_running(self, task_name, task_args=None):
@@ -941,8 +953,7 @@ class TestUpdateSummaryTablesTask(MasuTestCase):
 
     @patch("masu.processor.tasks.WorkerCache.release_single_task")
     @patch("masu.processor.tasks.WorkerCache.lock_single_task")
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_refresh_materialized_views_throttled(self, mock_inspect, mock_lock, mock_release):
+    def test_refresh_materialized_views_throttled(self, mock_lock, mock_release):
         """Test that refresh materialized views runs with cache lock."""
 
         def single_task_is_running(self, task_name, task_args=None):
@@ -980,15 +991,12 @@ class TestUpdateSummaryTablesTask(MasuTestCase):
         time.sleep(3)
         self.assertFalse(single_task_is_running(task_name, cache_args))
 
-    @patch("masu.processor.tasks.connection")
-    def test_vacuum_schema(self, mock_conn):
-        """Test that the vacuum schema task runs."""
-        logging.disable(logging.NOTSET)
-        mock_conn.cursor.return_value.__enter__.return_value.fetchall.return_value = [("table",)]
-        expected = "INFO:masu.processor.tasks:VACUUM ANALYZE acct10001.table"
-        with self.assertLogs("masu.processor.tasks", level="INFO") as logger:
-            vacuum_schema(self.schema)
-            self.assertIn(expected, logger.output)
+    @patch("masu.processor.tasks.VacuumScheduler")
+    def test_vacuum_schema(self, mock_scheduler):
+        """Test that the vacuum schema task runs the scheduler for its schema."""
+        vacuum_schema(self.schema)
+        mock_scheduler.assert_called_once_with([self.schema])
+        mock_scheduler.return_value.run.assert_called_once()
 
     @patch("masu.processor.tasks.connection")
     def test_autovacuum_tune_schema_default_table(self, mock_conn):
@@ -1213,3 +1221,243 @@ class TestRemoveStaleTenants(MasuTestCase):
             after_len = Tenant.objects.count()
             self.assertGreater(before_len, after_len)
             self.assertEquals(KokuTenantMiddleware.tenant_cache.currsize, 0)
+
+
+@override_settings(SUMMARY_COALESCE_WINDOW=120)
+class TestSummaryCoalescing(MasuTestCase):
+    """Test cases for merging overlapping summary requests."""
+
+    def setUp(self):
+        """Set up the test."""
+        super().setUp()
+        caches["worker"].clear()
+        self.coalescer = SummaryCoalescer(self.schema, self.ocp_provider_uuid, "2021-03")
+
+    @override_settings(SUMMARY_COALESCE_WINDOW=0)
+    @patch("masu.processor.tasks.update_summary_tables")
+    def test_queue_summary_without_window(self, mock_update):
+        """Test that every summary is queued on its own when coalescing is off."""
+        for manifest_id in (1, 2):
+            queue_summary(
+                self.schema, Provider.PROVIDER_OCP, self.ocp_provider_uuid, "2021-03-08", "2021-03-10", manifest_id
+            )
+        self.assertEqual(mock_update.delay.call_count, 2)
+        self.assertIsNone(self.coalescer.pop())
+
+    @patch("masu.processor.tasks.summarize_coalesced.apply_async")
+    @patch("masu.processor.tasks.update_summary_tables")
+    def test_queue_summary_merges_requests(self, mock_update, mock_flush):
+        """Test that overlapping requests become one pending request over the union of their dates."""
+        queue_summary(self.schema, Provider.PROVIDER_OCP, self.ocp_provider_uuid, "2021-03-08", "2021-03-10", 1)
+        queue_summary(self.schema, Provider.PROVIDER_OCP, self.ocp_provider_uuid, "2021-03-05", "2021-03-09", 2)
+        queue_summary(self.schema, Provider.PROVIDER_OCP, self.ocp_provider_uuid, "2021-03-09", "2021-03-11", 2)
+
+        mock_update.delay.assert_not_called()
+        mock_flush.assert_called_once_with((self.schema, self.ocp_provider_uuid, "2021-03"), countdown=120)
+        pending = self.coalescer.pop()
+        self.assertEqual(pending["start_date"], "2021-03-05")
+        self.assertEqual(pending["end_date"], "2021-03-11")
+        self.assertEqual(pending["manifest_ids"], [1, 2])
+        self.assertEqual(pending["requests"], 3)
+
+    @patch("masu.processor.tasks.summarize_coalesced.apply_async")
+    @patch("masu.processor.tasks.update_summary_tables")
+    def test_summarize_coalesced_waits_for_window(self, mock_update, mock_flush):
+        """Test that a pending request is not summarized while requests keep arriving."""
+        self.coalescer.add(Provider.PROVIDER_OCP, "2021-03-08", "2021-03-10", 1)
+
+        summarize_coalesced(self.schema, self.ocp_provider_uuid, "2021-03")
+
+        mock_update.assert_not_called()
+        mock_flush.assert_called_once()
+        self.assertGreater(mock_flush.call_args[1]["countdown"], 0)
+        self.assertIsNotNone(self.coalescer.pop())
+
+    @patch("masu.processor.tasks.summarize_coalesced.apply_async")
+    @patch("masu.processor.tasks.update_summary_tables")
+    def test_summarize_coalesced_one_in_flight(self, mock_update, mock_flush):
+        """Test that a provider is not summarized twice at the same time."""
+        self.coalescer.add(Provider.PROVIDER_OCP, "2021-03-08", "2021-03-10", 1, now=time.time() - 600)
+        self.assertTrue(self.coalescer.start())
+
+        summarize_coalesced(self.schema, self.ocp_provider_uuid, "2021-03")
+
+        mock_update.assert_not_called()
+        mock_flush.assert_called_once_with((self.schema, self.ocp_provider_uuid, "2021-03"), countdown=120)
+        self.assertTrue(self.coalescer.is_running())
+
+    def test_start_takes_over_lost_summary(self):
+        """Test that a summary whose task is no longer running does not block the provider."""
+        lost = Mock(request=Mock(id="lost-task", is_eager=False))
+        lost.name = "masu.processor.tasks.summarize_coalesced"
+        task = Mock(request=Mock(id="new-task", is_eager=False))
+        task.name = "masu.processor.tasks.summarize_coalesced"
+        self.assertTrue(self.coalescer.start(lost))
+
+        running = {"lost-task": {"name": lost.name, "args": []}}
+        with patch("masu.processor.summary_coalescer.TaskRegistry.get_running_tasks", return_value=running):
+            self.assertTrue(self.coalescer.is_running())
+            self.assertFalse(self.coalescer.start(task))
+
+        # The worker running the lost task was killed, so the registry no longer lists it
+        with patch("masu.processor.summary_coalescer.TaskRegistry.get_running_tasks", return_value={}):
+            self.assertFalse(self.coalescer.is_running())
+            self.assertTrue(self.coalescer.start(task))
+        self.assertEqual(caches["worker"].get(self.coalescer.running_key)["task_id"], "new-task")
+
+    @patch("masu.processor.tasks.ReportManifestDBAccessor")
+    @patch("masu.processor.tasks.summarize_coalesced.apply_async")
+    @patch("masu.processor.tasks.update_summary_tables")
+    def test_summarize_coalesced_runs_union(self, mock_update, mock_flush, mock_accessor):
+        """Test that a due request is summarized once and every merged manifest is completed."""
+        now = time.time() - 600
+        self.coalescer.add(Provider.PROVIDER_OCP, "2021-03-08", "2021-03-10", 1, now=now)
+        self.coalescer.add(Provider.PROVIDER_OCP, "2021-03-06", "2021-03-09", 2, now=now)
+        self.coalescer.add(Provider.PROVIDER_OCP, "2021-03-06", "2021-03-11", 3, now=now)
+
+        summarize_coalesced(self.schema, self.ocp_provider_uuid, "2021-03")
+
+        mock_flush.assert_not_called()
+        mock_update.assert_called_once_with(
+            self.schema, Provider.PROVIDER_OCP, self.ocp_provider_uuid, "2021-03-06", "2021-03-11", manifest_id=3
+        )
+        manifest_accessor = mock_accessor.return_value.__enter__.return_value
+        manifest_accessor.get_manifest_by_id.assert_has_calls([call(1), call(2)])
+        self.assertEqual(manifest_accessor.mark_manifest_as_completed.call_count, 2)
+        self.assertFalse(self.coalescer.is_running())
+        self.assertIsNone(self.coalescer.pop())
+
+    @patch("masu.processor.tasks.summarize_coalesced.apply_async")
+    @patch("masu.processor.tasks.update_summary_tables")
+    def test_queue_summary_splits_billing_months(self, mock_update, mock_flush):
+        """Test that a request spanning a month boundary is coalesced per billing month."""
+        queue_summary(self.schema, Provider.PROVIDER_OCP, self.ocp_provider_uuid, "2021-02-25", "2021-03-03", 1)
+        queue_summary(self.schema, Provider.PROVIDER_OCP, self.ocp_provider_uuid, "2021-03-02", "2021-03-05", 2)
+
+        mock_update.delay.assert_not_called()
+        mock_flush.assert_has_calls(
+            [
+                call((self.schema, self.ocp_provider_uuid, "2021-02"), countdown=120),
+                call((self.schema, self.ocp_provider_uuid, "2021-03"), countdown=120),
+            ]
+        )
+        self.assertEqual(mock_flush.call_count, 2)
+        february = SummaryCoalescer(self.schema, self.ocp_provider_uuid, "2021-02").pop()
+        self.assertEqual((february["start_date"], february["end_date"]), ("2021-02-25", "2021-02-28"))
+        self.assertEqual(february["manifest_ids"], [1])
+        march = self.coalescer.pop()
+        self.assertEqual((march["start_date"], march["end_date"]), ("2021-03-01", "2021-03-05"))
+        self.assertEqual(march["manifest_ids"], [1, 2])
+
+    @patch("masu.processor.tasks.summarize_coalesced.apply_async")
+    @patch("masu.processor.tasks.update_summary_tables")
+    def test_summarize_coalesced_failure_restores_request(self, mock_update, mock_flush):
+        """Test that a request whose summary fails is put back and rescheduled."""
+        self.coalescer.add(Provider.PROVIDER_OCP, "2021-03-08", "2021-03-10", 1, now=time.time() - 600)
+        mock_update.side_effect = Exception("summary failed")
+
+        with self.assertRaises(Exception):
+            summarize_coalesced(self.schema, self.ocp_provider_uuid, "2021-03")
+
+        mock_flush.assert_called_once_with((self.schema, self.ocp_provider_uuid, "2021-03"), countdown=120)
+        self.assertFalse(self.coalescer.is_running())
+        pending = self.coalescer.pop()
+        self.assertEqual((pending["start_date"], pending["end_date"]), ("2021-03-08", "2021-03-10"))
+        self.assertEqual(pending["manifest_ids"], [1])
+
+    @patch("masu.processor.tasks.ReportManifestDBAccessor")
+    @patch("masu.processor.tasks.update_summary_tables")
+    def test_summarize_coalesced_reports_seconds_saved(self, mock_update, mock_accessor):
+        """Test that the summary time of the days merged away is reported."""
+        now = time.time() - 600
+        self.coalescer.add(Provider.PROVIDER_OCP, "2021-03-01", "2021-03-10", 1, now=now)
+        self.coalescer.add(Provider.PROVIDER_OCP, "2021-03-01", "2021-03-10", 2, now=now)
+        saved_before = (
+            WORKER_REGISTRY.get_sample_value("summary_seconds_coalesced_total", {"provider_type": "OCP"}) or 0
+        )
+
+        # 10 days summarized in 5 seconds, 10 more days merged away
+        with patch("masu.processor.tasks.time") as mock_time:
+            mock_time.monotonic.side_effect = [100.0, 105.0]
+            summarize_coalesced(self.schema, self.ocp_provider_uuid, "2021-03")
+
+        self.assertEqual(
+            WORKER_REGISTRY.get_sample_value("summary_seconds_coalesced_total", {"provider_type": "OCP"}),
+            saved_before + 5.0,
+        )
+
+    def test_lock_timeout(self):
+        """Test that a lock held by another worker is neither skipped nor released."""
+        self.coalescer.cache.set(self.coalescer.lock_key, "other-worker", 30)
+        with patch("masu.processor.summary_coalescer.LOCK_TIMEOUT", 0):
+            with self.assertRaises(SummaryCoalescerLockError):
+                self.coalescer.pop()
+        self.assertEqual(self.coalescer.cache.get(self.coalescer.lock_key), "other-worker")
+
+    def test_lock_released_by_owner_only(self):
+        """Test that a lock taken over after its timeout is left to its new holder."""
+        with self.coalescer._lock():
+            self.coalescer.cache.set(self.coalescer.lock_key, "other-worker", 30)
+        self.assertEqual(self.coalescer.cache.get(self.coalescer.lock_key), "other-worker")
+
+    def test_stale_pending_request_is_rescheduled(self):
+        """Test that a pending request whose flush was lost gets a new one."""
+        self.assertTrue(self.coalescer.add(Provider.PROVIDER_OCP, "2021-03-08", "2021-03-10", now=0))
+        self.assertFalse(self.coalescer.add(Provider.PROVIDER_OCP, "2021-03-08", "2021-03-10", now=60))
+        self.assertTrue(self.coalescer.add(Provider.PROVIDER_OCP, "2021-03-08", "2021-03-10", now=3600))
+
+    def replay(self, requests):
+        """Replay (seconds, start_date, end_date) requests against the coalescer and return the summaries run."""
+        events = [(offset, seq, start, end) for seq, (offset, start, end) in enumerate(requests)]
+        heapq.heapify(events)
+        seq = len(events)
+        runs = []
+        while events:
+            now, __, start, end = heapq.heappop(events)
+            seq += 1
+            if start:
+                if self.coalescer.add(Provider.PROVIDER_OCP, start, end, now=now):
+                    heapq.heappush(events, (now + self.coalescer.window, seq, None, None))
+                continue
+            countdown = self.coalescer.seconds_until_due(now=now)
+            if countdown:
+                heapq.heappush(events, (now + countdown, seq, None, None))
+                continue
+            pending = self.coalescer.pop()
+            if pending:
+                runs.append((now, pending["start_date"], pending["end_date"]))
+        return runs
+
+    def test_replay_overlapping_manifests(self):
+        """Test the summaries saved on a replay of overlapping OCP uploads."""
+        # A burst of payloads, a lone upload an hour later, then a 20 minute catch-up after an outage.
+        requests = [(30 * i, "2021-03-08", "2021-03-10") for i in range(6)]
+        requests.append((3600, "2021-03-09", "2021-03-11"))
+        requests.extend((7200 + 60 * i, f"2021-03-{i % 10 + 1:02d}", "2021-03-11") for i in range(20))
+
+        coalesced_before = (
+            WORKER_REGISTRY.get_sample_value("summary_requests_coalesced_total", {"provider_type": "OCP"}) or 0
+        )
+        runs = self.replay(requests)
+
+        days_requested = sum(
+            (date.fromisoformat(end) - date.fromisoformat(start)).days + 1 for __, start, end in requests
+        )
+        days_summarized = sum(
+            (date.fromisoformat(end) - date.fromisoformat(start)).days + 1 for __, start, end in runs
+        )
+        LOG.info(
+            f"Replayed {len(requests)} summary requests as {len(runs)} summaries, "
+            f"summarizing {days_summarized} days instead of {days_requested}."
+        )
+        self.assertEqual(len(runs), 4)
+        self.assertLess(days_summarized, days_requested / 4)
+        self.assertEqual(
+            WORKER_REGISTRY.get_sample_value("summary_requests_coalesced_total", {"provider_type": "OCP"}),
+            coalesced_before + len(requests) - len(runs),
+        )
+        # Every request is covered by a summary that ran after it arrived
+        for requested, start, end in requests:
+            self.assertTrue(
+                any(ran >= requested and ran_start <= start and ran_end >= end for ran, ran_start, ran_end in runs)
+            )
@@ -0,0 +1,124 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Test the pipeline stage timing and trace context."""
+from unittest.mock import Mock
+
+from celery.app.task import Context
+from prometheus_client import generate_latest
+
+from api.models import Provider
+from masu.processor.tracing import end_task_trace
+from masu.processor.tracing import get_trace_id
+from masu.processor.tracing import inject_trace_header
+from masu.processor.tracing import stage_timer
+from masu.processor.tracing import start_task_trace
+from masu.processor.tracing import trace_context
+from masu.processor.tracing import TRACE_HEADER
+from masu.prometheus_stats import WORKER_REGISTRY
+from masu.test import MasuTestCase
+
+
+def get_stage_sample(name, stage, provider_type):
+    """Return a pipeline stage sample from the worker registry."""
+    value = WORKER_REGISTRY.get_sample_value(name, {"stage": stage, "provider_type": provider_type})
+    return value or 0
+
+
+class TracingTest(MasuTestCase):
+    """Test cases for the pipeline tracing helpers."""
+
+    def test_stage_timer_records_metrics(self):
+        """Test that a stage records its duration, bytes and rows."""
+        stage = "test_stage_metrics"
+        count_before = get_stage_sample("pipeline_stage_duration_seconds_count", stage, Provider.PROVIDER_OCP)
+        bytes_before = get_stage_sample("pipeline_stage_bytes_total", stage, Provider.PROVIDER_OCP)
+        rows_before = get_stage_sample("pipeline_stage_rows_total", stage, Provider.PROVIDER_OCP)
+
+        with stage_timer(stage, Provider.PROVIDER_OCP) as span:
+            span.add_bytes(1024)
+            span.add_rows(10)
+
+        self.assertIsNotNone(span.duration)
+        self.assertEqual(
+            get_stage_sample("pipeline_stage_duration_seconds_count", stage, Provider.PROVIDER_OCP), count_before + 1
+        )
+        self.assertEqual(
+            get_stage_sample("pipeline_stage_bytes_total", stage, Provider.PROVIDER_OCP), bytes_before + 1024
+        )
+        self.assertEqual(get_stage_sample("pipeline_stage_rows_total", stage, Provider.PROVIDER_OCP), rows_before + 10)
+
+    def test_stage_timer_exported(self):
+        """Test that stage metrics are exposed by the multiprocess exporter."""
+        with stage_timer("test_stage_export", Provider.PROVIDER_AWS):
+            pass
+        output = generate_latest(WORKER_REGISTRY).decode("utf-8")
+        self.assertIn('pipeline_stage_duration_seconds_count{provider_type="AWS",stage="test_stage_export"}', output)
+
+    def test_stage_timer_nested_span(self):
+        """Test that a nested stage inherits the provider type and parent span."""
+        with stage_timer("test_stage_outer", Provider.PROVIDER_GCP) as outer:
+            with stage_timer("test_stage_inner") as inner:
+                pass
+        self.assertEqual(inner.provider_type, Provider.PROVIDER_GCP)
+        self.assertEqual(inner.parent_id, outer.span_id)
+        self.assertIsNone(outer.parent_id)
+
+    def test_stage_timer_error(self):
+        """Test that a failing stage is counted and the error is raised."""
+        stage = "test_stage_error"
+        errors_before = get_stage_sample("pipeline_stage_errors_total", stage, Provider.PROVIDER_AZURE)
+        with self.assertRaises(ValueError):
+            with stage_timer(stage, Provider.PROVIDER_AZURE):
+                raise ValueError("boom")
+        self.assertEqual(
+            get_stage_sample("pipeline_stage_errors_total", stage, Provider.PROVIDER_AZURE), errors_before + 1
+        )
+
+    def test_trace_context(self):
+        """Test that a trace id is set for the block and nested blocks reuse it."""
+        self.assertIsNone(get_trace_id())
+        with trace_context("request-id") as trace_id:
+            self.assertEqual(trace_id, "request-id")
+            with trace_context() as nested_trace_id:
+                self.assertEqual(nested_trace_id, "request-id")
+        self.assertIsNone(get_trace_id())
+
+        with trace_context() as trace_id:
+            self.assertIsNotNone(trace_id)
+
+    def test_trace_propagates_through_task_headers(self):
+        """Test that the trace id travels from the publisher to the task."""
+        headers = {}
+        inject_trace_header(headers=headers)
+        self.assertNotIn(TRACE_HEADER, headers)
+
+        with trace_context("request-id"):
+            inject_trace_header(headers=headers)
+        self.assertEqual(headers.get(TRACE_HEADER), "request-id")
+
+        task = Mock(request=Context(headers))
+        start_task_trace(task_id="task-id", task=task)
+        self.assertEqual(get_trace_id(), "request-id")
+        end_task_trace(task_id="task-id", task=task)
+        self.assertIsNone(get_trace_id())
+
+    def test_task_without_trace_uses_task_id(self):
+        """Test that a task published without a trace starts one from its id."""
+        task = Mock(request=Context({}))
+        start_task_trace(task_id="task-id", task=task)
+        self.assertEqual(get_trace_id(), "task-id")
+        end_task_trace(task_id="task-id", task=task)
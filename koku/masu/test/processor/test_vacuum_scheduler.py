@@ -0,0 +1,123 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Test the VacuumScheduler."""
+from unittest.mock import patch
+
+from django.db import DatabaseError
+
+from masu.processor.vacuum_scheduler import ANALYZE
+from masu.processor.vacuum_scheduler import MB
+from masu.processor.vacuum_scheduler import TableStats
+from masu.processor.vacuum_scheduler import VACUUM
+from masu.processor.vacuum_scheduler import VacuumScheduler
+from masu.test import MasuTestCase
+
+
+def make_stats(table_name, n_live_tup, n_dead_tup=0, n_mod_since_analyze=0, table_mb=1, scale_factor=None):
+    """Return table statistics for a test table."""
+    return TableStats(
+        "acct10001", table_name, n_live_tup, n_dead_tup, n_mod_since_analyze, None, table_mb * MB, scale_factor
+    )
+
+
+class VacuumSchedulerTest(MasuTestCase):
+    """Test cases for the VacuumScheduler."""
+
+    def test_get_table_stats(self):
+        """Test that the statistics of the reporting tables are read in one query."""
+        tables = VacuumScheduler([self.schema]).get_table_stats()
+        self.assertTrue(tables)
+        for table in tables:
+            self.assertEqual(table.schema_name, self.schema)
+            self.assertTrue(table.table_name.startswith("reporting_"))
+
+    def test_get_action(self):
+        """Test that only tables past the autovacuum thresholds are maintained."""
+        scheduler = VacuumScheduler([self.schema])
+        self.assertEqual(scheduler.get_action(make_stats("reporting_a", 1000, n_dead_tup=300)), VACUUM)
+        self.assertEqual(scheduler.get_action(make_stats("reporting_a", 1000, n_mod_since_analyze=200)), ANALYZE)
+        self.assertIsNone(scheduler.get_action(make_stats("reporting_a", 1000, n_dead_tup=200)))
+
+    def test_get_action_uses_tuned_scale_factor(self):
+        """Test that large tables use the scale factor autovacuum_tune_schema sets."""
+        scheduler = VacuumScheduler([self.schema])
+        # 0.01 for tables of over 10M rows
+        self.assertEqual(scheduler.get_action(make_stats("reporting_a", 20000000, n_dead_tup=300000)), VACUUM)
+        self.assertIsNone(scheduler.get_action(make_stats("reporting_a", 20000000, n_dead_tup=150000)))
+        # A table setting wins over the tuning table
+        self.assertIsNone(
+            scheduler.get_action(make_stats("reporting_a", 20000000, n_dead_tup=300000, scale_factor="0.05"))
+        )
+
+    def test_plan_io_budget(self):
+        """Test that vacuums over the I/O budget are deferred, most dead tuples first."""
+        tables = [
+            make_stats("reporting_small", 1000, n_dead_tup=500, table_mb=10),
+            make_stats("reporting_large", 1000, n_dead_tup=900, table_mb=80),
+            make_stats("reporting_medium", 1000, n_dead_tup=700, table_mb=50),
+            make_stats("reporting_analyze", 1000, n_mod_since_analyze=500, table_mb=500),
+            make_stats("reporting_idle", 1000, table_mb=1000),
+        ]
+        planned, skipped, deferred = VacuumScheduler([self.schema], io_budget=100).plan(tables)
+
+        self.assertEqual(
+            [(table.table_name, action) for table, action in planned],
+            [("reporting_large", VACUUM), ("reporting_small", VACUUM), ("reporting_analyze", ANALYZE)],
+        )
+        self.assertEqual([table.table_name for table in skipped], ["reporting_idle"])
+        self.assertEqual([table.table_name for table in deferred], ["reporting_medium"])
+
+    def test_run_report(self):
+        """Test that a run reports the tables skipped and the time saved."""
+        tables = [
+            make_stats("reporting_a", 1000, n_dead_tup=500, table_mb=10),
+            make_stats("reporting_b", 1000, n_dead_tup=500, table_mb=10),
+            make_stats("reporting_c", 1000, n_mod_since_analyze=500),
+            make_stats("reporting_d", 1000, table_mb=100),
+            make_stats("reporting_e", 1000, n_dead_tup=500, table_mb=10),
+        ]
+        durations = {"reporting_a": 1.0, "reporting_b": 1.0, "reporting_c": 0.5}
+
+        def run_action(table, action):
+            if table.table_name not in durations:
+                raise DatabaseError("canceling statement due to lock timeout")
+            return durations[table.table_name]
+
+        scheduler = VacuumScheduler([self.schema], io_budget=0, max_workers=2)
+        with patch.object(scheduler, "get_table_stats", return_value=tables):
+            with patch.object(scheduler, "run_action", side_effect=run_action):
+                report = scheduler.run()
+
+        self.assertEqual(report["tables"], 5)
+        self.assertEqual(report["vacuumed"], 2)
+        self.assertEqual(report["analyzed"], 1)
+        self.assertEqual(report["skipped"], 1)
+        self.assertEqual(report["deferred"], 0)
+        self.assertEqual(report["failed"], 1)
+        self.assertEqual(report["serial_seconds"], 2.5)
+        # The skipped 100MB would have taken 10s at the 10MB/s of the tables vacuumed
+        self.assertGreaterEqual(report["estimated_seconds_saved"], 10)
+
+    def test_run_action(self):
+        """Test that a table is vacuumed on its own connection."""
+        table = VacuumScheduler([self.schema]).get_table_stats()[0]
+        with patch("masu.processor.vacuum_scheduler.connection") as mock_connection:
+            VacuumScheduler([self.schema]).run_action(table, VACUUM)
+        mock_connection.cursor.return_value.__enter__.return_value.execute.assert_called_once_with(
+            f"VACUUM ANALYZE {self.schema}.{table.table_name}"
+        )
+        mock_connection.close.assert_called_once()
@@ -16,11 +16,11 @@
 #
 """Test Cache of worker tasks currently running."""
 import logging
-from unittest.mock import patch
 
 from django.core.cache import cache
 from django.test.utils import override_settings
 
+from koku.task_registry import TaskRegistry
 from masu.processor.worker_cache import WorkerCache
 from masu.test import MasuTestCase
 
@@ -40,14 +40,12 @@ class WorkerCacheTest(MasuTestCase):
         super().tearDown()
         cache.clear()
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_worker_cache(self, mock_inspect):
+    def test_worker_cache(self):
         """Test the worker_cache property."""
         _worker_cache = WorkerCache().worker_cache
         self.assertEqual(_worker_cache, [])
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_invalidate_host(self, mock_inspect):
+    def test_invalidate_host(self):
         """Test that a host's cache is invalidated."""
         task_list = [1, 2, 3]
         _cache = WorkerCache()
@@ -60,8 +58,7 @@ class WorkerCacheTest(MasuTestCase):
 
         self.assertEqual(_cache.worker_cache, [])
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_add_task_to_cache(self, mock_inspect):
+    def test_add_task_to_cache(self):
         """Test that a single task is added."""
         task_key = "task_key"
         _cache = WorkerCache()
@@ -71,8 +68,7 @@ class WorkerCacheTest(MasuTestCase):
         _cache.add_task_to_cache(task_key)
         self.assertEqual(_cache.worker_cache, [task_key])
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_remove_task_from_cache(self, mock_inspect):
+    def test_remove_task_from_cache(self):
         """Test that a task is removed."""
         task_key = "task_key"
         _cache = WorkerCache()
@@ -82,8 +78,7 @@ class WorkerCacheTest(MasuTestCase):
         _cache.remove_task_from_cache(task_key)
         self.assertEqual(_cache.worker_cache, [])
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_remove_task_from_cache_value_not_in_cache(self, mock_inspect):
+    def test_remove_task_from_cache_value_not_in_cache(self):
         """Test that a task is removed."""
         task_list = [1, 2, 3, 4]
         _cache = WorkerCache()
@@ -95,8 +90,7 @@ class WorkerCacheTest(MasuTestCase):
         self.assertEqual(_cache.worker_cache, task_list)
 
     @override_settings(HOSTNAME="kokuworker")
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_get_all_running_tasks(self, mock_inspect):
+    def test_get_all_running_tasks(self):
         """Test that multiple hosts' task lists are combined."""
 
         second_host = "koku-worker-2-sdfsdff"
@@ -104,8 +98,9 @@ class WorkerCacheTest(MasuTestCase):
         second_host_list = [4, 5, 6]
         expected = first_host_list + second_host_list
 
-        mock_worker_list = {"celery@kokuworker": "", f"celery@{second_host}": ""}
-        mock_inspect.reserved.return_value = mock_worker_list
+        registry = TaskRegistry()
+        registry.heartbeat("celery@kokuworker")
+        registry.heartbeat(f"celery@{second_host}")
 
         _cache = WorkerCache()
         for task in first_host_list:
@@ -119,11 +114,9 @@ class WorkerCacheTest(MasuTestCase):
         self.assertEqual(sorted(_cache.get_all_running_tasks()), sorted(expected))
 
     @override_settings(HOSTNAME="kokuworker")
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_task_is_running_true(self, mock_inspect):
+    def test_task_is_running_true(self):
         """Test that a task is running."""
-        mock_worker_list = {"celery@kokuworker": ""}
-        mock_inspect.reserved.return_value = mock_worker_list
+        TaskRegistry().heartbeat("celery@kokuworker")
 
         task_list = [1, 2, 3]
 
@@ -133,8 +126,7 @@ class WorkerCacheTest(MasuTestCase):
 
         self.assertTrue(_cache.task_is_running(1))
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_task_is_running_false(self, mock_inspect):
+    def test_task_is_running_false(self):
         """Test that a task is not running."""
         task_list = [1, 2, 3]
         _cache = WorkerCache()
@@ -143,8 +135,7 @@ class WorkerCacheTest(MasuTestCase):
 
         self.assertFalse(_cache.task_is_running(4))
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_active_worker_property(self, mock_inspect):
+    def test_active_worker_property(self):
         """Test the active_workers property."""
         test_matrix = [
             {"hostname": "celery@kokuworker", "expected_workers": ["kokuworker"]},
@@ -155,29 +146,31 @@ class WorkerCacheTest(MasuTestCase):
         ]
         for test in test_matrix:
             with self.subTest(test=test):
-                mock_worker_list = {test.get("hostname"): ""}
-                mock_inspect.reserved.return_value = mock_worker_list
+                registry = TaskRegistry()
+                registry.heartbeat(test.get("hostname"))
                 _cache = WorkerCache()
                 self.assertEqual(_cache.active_workers, test.get("expected_workers"))
+                registry.worker_stopped(test.get("hostname"))
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_active_worker_property_instance_not_available(self, mock_inspect):
-        """Test the active_workers property when celery inspect is not available."""
-        mock_inspect.reserved.return_value = None
+    def test_active_worker_property_no_heartbeat(self):
+        """Test that workers without a recent heartbeat are not active."""
+        registry = TaskRegistry()
+        registry.heartbeat("celery@kokuworker")
+        registry.cache.delete(registry._heartbeat_key("celery@kokuworker"))
         _cache = WorkerCache()
         self.assertEqual(_cache.active_workers, [])
 
     @override_settings(HOSTNAME="kokuworker")
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_remove_offline_worker_keys(self, mock_inspect):
+    def test_remove_offline_worker_keys(self):
         """Test the remove_offline_worker_keys function."""
         second_host = "kokuworker2"
         first_host_list = [1, 2, 3]
         second_host_list = [4, 5, 6]
         all_work_list = first_host_list + second_host_list
 
-        mock_worker_list = {"celery@kokuworker": "", f"celery@{second_host}": ""}
-        mock_inspect.reserved.return_value = mock_worker_list
+        registry = TaskRegistry()
+        registry.heartbeat("celery@kokuworker")
+        registry.heartbeat(f"celery@{second_host}")
 
         _cache = WorkerCache()
         for task in first_host_list:
@@ -191,14 +184,11 @@ class WorkerCacheTest(MasuTestCase):
         self.assertEqual(sorted(_cache.get_all_running_tasks()), sorted(all_work_list))
 
         # kokuworker2 goes offline
-        mock_inspect.reset()
-        mock_worker_list = {"celery@kokuworker": ""}
-        mock_inspect.reserved.return_value = mock_worker_list
+        registry.worker_stopped(f"celery@{second_host}")
         _cache.remove_offline_worker_keys()
         self.assertEqual(sorted(_cache.get_all_running_tasks()), sorted(first_host_list))
 
-    @patch("masu.processor.worker_cache.CELERY_INSPECT")
-    def test_single_task_caching(self, mock_inspect):
+    def test_single_task_caching(self):
         """Test that single task cache creates and deletes a cache entry."""
         cache = WorkerCache()
 
@@ -142,6 +142,15 @@ class TestGCPUtils(MasuTestCase):
 
         self.assertEqual(credit_result, expected)
 
+    def test_arrow_credits_match_csv_credits(self):
+        """Test that Arrow credits are formatted like credits read from the CSV export."""
+        credits = [{"first": "yes", "second": None, "third": "no"}]
+
+        expected = utils.process_gcp_credits(str(credits))
+        credit_result = utils._gcp_credits_to_json(credits)
+
+        self.assertEqual(credit_result, expected)
+
     def test_post_processor(self):
         """Test that data frame post processing succeeds."""
         data = {"column.one": [1, 2, 3], "column.two": [4, 5, 6], "three": [7, 8, 9]}
@@ -1,10 +1,57 @@
 """Upload utils tests."""
+import gzip
+import io
+import tracemalloc
 import uuid
 from datetime import date
+from decimal import Decimal
+from unittest.mock import Mock
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 from django.test import TestCase
 
+from masu.util.upload import EXPORT_FORMAT_PARQUET
+from masu.util.upload import export_query_to_s3
 from masu.util.upload import get_upload_path
+from masu.util.upload import MIN_UPLOAD_PART_SIZE
+from masu.util.upload import S3MultipartWriter
+
+BENCHMARK_SQL = """
+    SELECT g AS id, md5(g::text) AS resource_id, g::numeric / 7 AS cost, g AS id
+      FROM generate_series(1, %(rows)s) g
+"""
+
+
+class FakeS3Client:
+    """An S3 client that keeps objects in memory, or discards them."""
+
+    def __init__(self, keep=True):
+        """Initialize the client."""
+        self.keep = keep
+        self.objects = {}
+        self.parts = {}
+        self.aborted = []
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Key] = Body
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.parts[Key] = {}
+        return {"UploadId": Key}
+
+    def upload_part(self, Bucket, Key, PartNumber, UploadId, Body):
+        self.parts[Key][PartNumber] = Body if self.keep else len(Body)
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.parts.pop(UploadId)
+        if self.keep:
+            self.objects[Key] = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.parts.pop(UploadId)
+        self.aborted.append(Key)
 
 
 class TestUploadUtils(TestCase):
@@ -35,3 +82,142 @@ class TestUploadUtils(TestCase):
             self.assertEquals(
                 "bucket/test_acct/test_type/de4db3ef-a185-4bad-b33f-d15ea5edc0de/2018/04/01/test_table.csv.gz", path
             )
+
+    def test_get_upload_path_parquet(self):
+        """Assert get_upload_path uses the requested file format."""
+        provider_uuid = uuid.UUID("de4db3ef-a185-4bad-b33f-d15ea5edc0de", version=4)
+        with self.settings(S3_BUCKET_PATH="bucket"):
+            path = get_upload_path(
+                "test_acct", "test_type", provider_uuid, date(2018, 4, 1), "test_table", file_format="parquet"
+            )
+            self.assertTrue(path.endswith("/2018/04/00/test_table.parquet"))
+
+
+class TestS3MultipartWriter(TestCase):
+    """Test cases for the streaming S3 writer."""
+
+    def test_small_object_uses_put_object(self):
+        """Test that data smaller than a part is uploaded in one request."""
+        client = FakeS3Client()
+        with S3MultipartWriter(client, "bucket", "key") as writer:
+            writer.write(b"small")
+        self.assertEqual(client.objects["key"], b"small")
+        self.assertEqual(client.parts, {})
+
+    def test_multipart_upload(self):
+        """Test that large data is uploaded in ordered parts."""
+        client = FakeS3Client()
+        data = bytes(range(256)) * (MIN_UPLOAD_PART_SIZE // 256) * 3 + b"tail"
+        with S3MultipartWriter(client, "bucket", "key", max_pending=2) as writer:
+            stream = io.BytesIO(data)
+            for chunk in iter(lambda: stream.read(65536), b""):
+                writer.write(chunk)
+            self.assertEqual(writer.tell(), len(data))
+        self.assertEqual(client.objects["key"], data)
+
+    def test_abort(self):
+        """Test that a failing block aborts the upload."""
+        client = FakeS3Client()
+        with self.assertRaises(ValueError):
+            with S3MultipartWriter(client, "bucket", "key") as writer:
+                writer.write(b"x" * (MIN_UPLOAD_PART_SIZE + 1))
+                raise ValueError("boom")
+        self.assertEqual(client.aborted, ["key"])
+        self.assertNotIn("key", client.objects)
+        with self.assertRaises(ValueError):
+            writer.write(b"x")
+
+    def test_failed_part_aborts_upload(self):
+        """Test that a failed part upload aborts the upload when closing."""
+        client = FakeS3Client()
+        client.upload_part = Mock(side_effect=OSError("network"))
+        writer = S3MultipartWriter(client, "bucket", "key")
+        writer.write(b"x" * MIN_UPLOAD_PART_SIZE)
+        with self.assertRaises(OSError):
+            writer.close()
+        self.assertEqual(client.aborted, ["key"])
+
+    def test_memory_is_bounded(self):
+        """Test that the writer holds a fixed number of parts however much is written."""
+        chunk = b"x" * 65536
+        client = FakeS3Client(keep=False)
+        writer = S3MultipartWriter(client, "bucket", "key", max_pending=2)
+        tracemalloc.start()
+        for _ in range(20 * MIN_UPLOAD_PART_SIZE // len(chunk)):
+            writer.write(chunk)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        writer.close()
+        self.assertEqual(len(client.parts), 0)
+        # The buffer, the part being cut from it and the parts in flight
+        self.assertLess(peak, (writer.max_pending + 3) * MIN_UPLOAD_PART_SIZE)
+
+
+class TestExportQueryToS3(TestCase):
+    """Test cases for streaming query exports."""
+
+    def test_export_csv(self):
+        """Test that a query is exported as gzipped CSV."""
+        client = FakeS3Client()
+        rows, size = export_query_to_s3(client, "bucket", "key.csv.gz", BENCHMARK_SQL, {"rows": 10})
+        self.assertEqual(rows, 10)
+        self.assertEqual(size, len(client.objects["key.csv.gz"]))
+        lines = gzip.decompress(client.objects["key.csv.gz"]).decode("utf-8").splitlines()
+        self.assertEqual(lines[0], "id,resource_id,cost,id")
+        self.assertEqual(len(lines), 11)
+
+    def test_export_parquet(self):
+        """Test that a query is exported as Parquet with unique column names."""
+        client = FakeS3Client()
+        rows, _ = export_query_to_s3(
+            client, "bucket", "key.parquet", BENCHMARK_SQL, {"rows": 10}, EXPORT_FORMAT_PARQUET
+        )
+        self.assertEqual(rows, 10)
+        table = pq.read_table(pa.BufferReader(client.objects["key.parquet"]))
+        self.assertEqual(table.column_names, ["id", "resource_id", "cost", "id_1"])
+        self.assertEqual(table.num_rows, 10)
+
+    def test_export_csv_counts_rows(self):
+        """Test that CSV rows are counted from the COPY stream, including rows with line breaks."""
+        client = FakeS3Client()
+        sql = "SELECT g AS id, E'two\\nlines' AS note FROM generate_series(1, %(rows)s) g"
+        rows, _ = export_query_to_s3(client, "bucket", "key.csv.gz", sql, {"rows": 3})
+        self.assertEqual(rows, 3)
+
+    def test_export_parquet_numeric(self):
+        """Test that numeric columns keep their exact values in Parquet."""
+        client = FakeS3Client()
+        sql = """
+            SELECT (g / 7.0)::numeric(24, 9) AS cost, g::numeric / 7 AS rate
+              FROM generate_series(1, %(rows)s) g
+        """
+        export_query_to_s3(client, "bucket", "key.parquet", sql, {"rows": 3}, EXPORT_FORMAT_PARQUET)
+        table = pq.read_table(pa.BufferReader(client.objects["key.parquet"]))
+        self.assertEqual(table.schema.field("cost").type, pa.decimal128(24, 9))
+        self.assertEqual(table.column("cost").to_pylist()[0], Decimal("0.142857143"))
+        # numeric without a declared precision is written as a string
+        self.assertEqual(table.schema.field("rate").type, pa.string())
+        self.assertEqual(table.column("rate").to_pylist()[0], "0.14285714285714285714")
+
+    def test_export_no_rows(self):
+        """Test that nothing is uploaded for an empty result."""
+        client = FakeS3Client()
+        for file_format in ("csv.gz", EXPORT_FORMAT_PARQUET):
+            rows, _ = export_query_to_s3(client, "bucket", "key", BENCHMARK_SQL, {"rows": 0}, file_format)
+            self.assertEqual(rows, 0)
+        self.assertEqual(client.objects, {})
+
+    def test_export_memory_is_bounded(self):
+        """Test that the export memory does not grow with the number of rows."""
+        peaks = []
+        for row_count in (20000, 200000):
+            client = FakeS3Client(keep=False)
+            tracemalloc.start()
+            rows, _ = export_query_to_s3(
+                client, "bucket", "key", BENCHMARK_SQL, {"rows": row_count}, part_size=MIN_UPLOAD_PART_SIZE
+            )
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            self.assertEqual(rows, row_count)
+        self.assertLess(peaks[1], 5 * MIN_UPLOAD_PART_SIZE)
+        self.assertLess(peaks[1], peaks[0] + MIN_UPLOAD_PART_SIZE)
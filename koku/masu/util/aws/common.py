@@ -32,6 +32,7 @@ from api.common import log_json
 from api.models import Provider
 from masu.database.aws_report_db_accessor import AWSReportDBAccessor
 from masu.database.provider_db_accessor import ProviderDBAccessor
+from masu.processor.tracing import stage_timer
 from masu.util import common as utils
 from reporting.provider.aws.models import PRESTO_REQUIRED_COLUMNS
 
@@ -302,7 +303,10 @@ def copy_data_to_s3_bucket(request_id, path, filename, data, manifest_id=None, c
         put_value = {"Body": data}
         if manifest_id:
             put_value["Metadata"] = {"ManifestId": str(manifest_id)}
-        upload.put(**put_value)
+        with stage_timer("s3_upload", context=context) as span:
+            if isinstance(data, BytesIO):
+                span.add_bytes(data.getbuffer().nbytes)
+            upload.put(**put_value)
     except (EndpointConnectionError, ClientError) as err:
         msg = f"Unable to copy data to {upload_key} in bucket {settings.S3_BUCKET_NAME}.  Reason: {str(err)}"
         LOG.info(log_json(request_id, msg, context))
@@ -28,6 +28,10 @@ from masu.database.provider_db_accessor import ProviderDBAccessor
 
 LOG = logging.getLogger(__name__)
 
+GCP_ARROW_LABEL_COLUMNS = ("project.labels", "labels", "system_labels")
+GCP_ARROW_NUMERIC_COLUMNS = ("cost", "currency_conversion_rate", "usage.amount", "usage.amount_in_pricing_units")
+GCP_ARROW_DATETIME_COLUMNS = ("usage_start_time", "usage_end_time", "export_time")
+
 GCP_SERVICE_LINE_ITEM_TYPE_MAP = {
     "Compute Engine": "usage",
     "Kubernetes Engine": "usage",
@@ -142,3 +146,46 @@ def gcp_post_processor(data_frame):
             data_frame[new_col_name] = data_frame[column]
             data_frame = data_frame.drop(columns=[column])
     return data_frame
+
+
+def _gcp_labels_to_json(labels):
+    """Convert a BigQuery list of key/value label records to a JSON dictionary."""
+    if labels is None:
+        labels = []
+    return json.dumps({entry.get("key"): entry.get("value") for entry in labels})
+
+
+def _gcp_credits_to_json(credits):
+    """Keep the first credit record as JSON, matching process_gcp_credits."""
+    credit_dict = {}
+    if credits is not None and len(credits):
+        # process_gcp_credits reads null fields from the CSV export as the string "None".
+        credit_dict = {key: "None" if value is None else value for key, value in credits[0].items()}
+    return json.dumps(credit_dict, default=str)
+
+
+def gcp_arrow_table_to_data_frame(table):
+    """
+    Convert an Arrow table of BigQuery billing export rows to a parquet ready data frame.
+
+    The result has the same columns and types as a daily GCP CSV file read with
+    get_column_converters and passed through gcp_post_processor.
+
+    Args:
+        table (pyarrow.Table): Billing export rows named with the BigQuery column list
+
+    Returns:
+        (pandas.DataFrame): The converted data frame
+
+    """
+    data_frame = table.to_pandas()
+    for column in data_frame.columns:
+        if column in GCP_ARROW_LABEL_COLUMNS:
+            data_frame[column] = data_frame[column].map(_gcp_labels_to_json)
+        elif column == "credits":
+            data_frame[column] = data_frame[column].map(_gcp_credits_to_json)
+        elif column in GCP_ARROW_NUMERIC_COLUMNS:
+            data_frame[column] = data_frame[column].astype(float)
+        elif column not in GCP_ARROW_DATETIME_COLUMNS:
+            data_frame[column] = data_frame[column].fillna("").astype(str)
+    return gcp_post_processor(data_frame)
@@ -1,13 +1,47 @@
 """Upload utility functions."""
+import gzip
+import io
+import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 from django.conf import settings
+from django.db import connection
 
 LOG = logging.getLogger(__name__)
 _DB_FETCH_BATCH_SIZE = 2000
 
+MB = 1024 * 1024
+# S3 rejects multipart parts smaller than 5MB, except for the last one.
+MIN_UPLOAD_PART_SIZE = 5 * MB
 
-def get_upload_path(schema_name, provider_type, provider_uuid, date, table_name, daily=False):
+EXPORT_FORMAT_CSV = "csv.gz"
+EXPORT_FORMAT_PARQUET = "parquet"
+EXPORT_FORMATS = (EXPORT_FORMAT_CSV, EXPORT_FORMAT_PARQUET)
+
+_NUMERIC_OID = 1700
+# The largest precision a Parquet decimal128 column holds
+_MAX_DECIMAL128_PRECISION = 38
+# PostgreSQL type OIDs mapped to Parquet column types. numeric is mapped by
+# _parquet_type, anything else, including jsonb and hstore, is written as a string.
+_PARQUET_TYPES = {
+    16: pa.bool_(),  # bool
+    20: pa.int64(),  # int8
+    21: pa.int64(),  # int2
+    23: pa.int64(),  # int4
+    700: pa.float64(),  # float4
+    701: pa.float64(),  # float8
+    1082: pa.date32(),  # date
+    1114: pa.timestamp("us"),  # timestamp
+    1184: pa.timestamp("us", tz="UTC"),  # timestamptz
+}
+
+
+def get_upload_path(
+    schema_name, provider_type, provider_uuid, date, table_name, daily=False, file_format=EXPORT_FORMAT_CSV
+):
     """
     Get the s3 upload_path for a file.
 
@@ -18,6 +52,7 @@ def get_upload_path(schema_name, provider_type, provider_uuid, date, table_name,
         date (date): Date at which the exported data is relevant.
         table_name (str): Name of the table being exported.
         daily (bool): If true, include the day of month in the path.
+        file_format (str): The file extension of the exported file.
 
     Returns:
         upload_path (str): Path that file should be stored at in S3.
@@ -31,13 +66,271 @@ def get_upload_path(schema_name, provider_type, provider_uuid, date, table_name,
         date_part = f"{date.year}/{date.month:02d}/00"
     upload_path = (
         "{bucket_path}/{account_name}/{provider_type}/{provider_uuid}/"
-        "{date_part}/{table_name}.csv.gz".format(
+        "{date_part}/{table_name}.{file_format}".format(
             bucket_path=settings.S3_BUCKET_PATH,
             account_name=schema_name,
             provider_type=provider_type,
             provider_uuid=provider_uuid,
             date_part=date_part,
             table_name=table_name,
+            file_format=file_format,
         )
     )
     return upload_path
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    A write-only file object that streams its contents to an S3 object.
+
+    Written bytes are cut into parts of part_size bytes. Each full part is
+    uploaded on a background thread while the caller produces the next one,
+    and no more than max_pending parts are held in memory at once, so the
+    memory used does not depend on the size of the object. Objects smaller
+    than one part are written with a single put_object call.
+
+    close() completes the upload, abort() discards everything written.
+    """
+
+    def __init__(self, s3_client, bucket, key, part_size=MIN_UPLOAD_PART_SIZE, max_pending=2):
+        """Initialize the writer."""
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_UPLOAD_PART_SIZE)
+        self.max_pending = max_pending
+        self.bytes_written = 0
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+        self._pending = []
+        self._executor = ThreadPoolExecutor(max_workers=max_pending)
+
+    def writable(self):
+        """Return True, the writer only supports writing."""
+        return True
+
+    def tell(self):
+        """Return the number of bytes written."""
+        return self.bytes_written
+
+    def write(self, data):
+        """Buffer data and upload every full part."""
+        if self.closed:
+            raise ValueError("write to closed file")
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(memoryview(self._buffer)[: self.part_size])
+            del self._buffer[: self.part_size]
+            self._upload_part(part)
+        return len(data)
+
+    def _upload_part(self, data):
+        """Queue a part for upload, waiting for the oldest one when too many are in flight."""
+        if self._upload_id is None:
+            response = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key)
+            self._upload_id = response["UploadId"]
+        while len(self._pending) >= self.max_pending:
+            self._collect_part(self._pending.pop(0))
+        part_number = len(self._parts) + len(self._pending) + 1
+        future = self._executor.submit(
+            self.s3_client.upload_part,
+            Bucket=self.bucket,
+            Key=self.key,
+            PartNumber=part_number,
+            UploadId=self._upload_id,
+            Body=data,
+        )
+        self._pending.append((part_number, future))
+
+    def _collect_part(self, pending_part):
+        """Wait for a part upload to finish and record its ETag."""
+        part_number, future = pending_part
+        self._parts.append({"ETag": future.result()["ETag"], "PartNumber": part_number})
+
+    def close(self):
+        """Upload the remaining data and complete the upload."""
+        if self.closed:
+            return
+        try:
+            if self._upload_id is None:
+                self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer))
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                while self._pending:
+                    self._collect_part(self._pending.pop(0))
+                self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": self._parts},
+                )
+        except Exception:
+            self.abort()
+            raise
+        self._buffer.clear()
+        self._executor.shutdown()
+        super().close()
+
+    def abort(self):
+        """Discard the buffered data and any uploaded parts."""
+        if self.closed:
+            return
+        self._executor.shutdown(wait=True)
+        self._pending.clear()
+        self._buffer.clear()
+        if self._upload_id is not None:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+        super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Complete the upload, or abort it if the block raised."""
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+class _CopyRowCounter:
+    """
+    The file object COPY ... TO STDOUT writes to, counting the rows it passes on.
+
+    PostgreSQL sends every row of COPY output, and the header, in a message of
+    its own and psycopg2 writes each message separately, so rows are counted
+    even where the cursor's rowcount is not set.
+    """
+
+    def __init__(self, fileobj):
+        """Initialize the counter."""
+        self.fileobj = fileobj
+        self.writes = 0
+
+    def write(self, data):
+        """Pass a row on to the file object."""
+        self.writes += 1
+        return self.fileobj.write(data)
+
+
+def copy_query_to_csv(sql, params, fileobj):
+    """
+    Stream the results of a query to a gzipped CSV file object with COPY TO STDOUT.
+
+    Rows are compressed as PostgreSQL sends them, so nothing is held in
+    memory beyond the current chunk.
+
+    Returns:
+        (int): The number of rows exported.
+
+    """
+    with connection.cursor() as cursor:
+        query = cursor.mogrify(sql, params).decode("utf-8")
+        with gzip.GzipFile(fileobj=fileobj, mode="wb") as gzip_file:
+            counter = _CopyRowCounter(gzip_file)
+            cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV HEADER", counter)
+    # The first write is the header
+    return max(counter.writes - 1, 0)
+
+
+def _parquet_type(column):
+    """Return the Parquet type of a query result column.
+
+    numeric columns keep their exact values, as decimal128 when their
+    precision is declared and fits, as strings otherwise.
+    """
+    if column.type_code == _NUMERIC_OID:
+        if column.precision and column.precision <= _MAX_DECIMAL128_PRECISION:
+            return pa.decimal128(column.precision, column.scale or 0)
+        return pa.string()
+    return _PARQUET_TYPES.get(column.type_code, pa.string())
+
+
+def _parquet_string(value):
+    """Convert a database value without a Parquet type mapping to a string."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def _unique_column_names(names):
+    """Suffix repeated column names, which SELECT * joins produce for columns like id."""
+    seen = {}
+    unique_names = []
+    for name in names:
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        unique_names.append(f"{name}_{count}" if count else name)
+    return unique_names
+
+
+def fetch_query_to_parquet(sql, params, fileobj, batch_size=_DB_FETCH_BATCH_SIZE):
+    """
+    Stream the results of a query to a Parquet file object.
+
+    Rows are read from a server-side cursor batch_size rows at a time and
+    each batch is written as its own row group.
+
+    Returns:
+        (int): The number of rows exported.
+
+    """
+    rows = 0
+    writer = None
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        batch = cursor.fetchmany(batch_size)
+        names = _unique_column_names(column.name for column in cursor.description)
+        schema = pa.schema([(name, _parquet_type(column)) for name, column in zip(names, cursor.description)])
+        converters = [_parquet_string if pa.types.is_string(field.type) else None for field in schema]
+        while batch:
+            if writer is None:
+                writer = pq.ParquetWriter(fileobj, schema)
+            arrays = [
+                pa.array([convert(value) for value in values] if convert else values, type=field.type)
+                for values, field, convert in zip(zip(*batch), schema, converters)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(batch)
+            batch = cursor.fetchmany(batch_size)
+    if writer is not None:
+        writer.close()
+    return rows
+
+
+def export_query_to_s3(s3_client, bucket, key, sql, params, file_format=EXPORT_FORMAT_CSV, part_size=None):
+    """
+    Stream the results of a query to an S3 object.
+
+    Nothing is uploaded when the query returns no rows.
+
+    Args:
+        s3_client (botocore.client.S3): The S3 client to upload with.
+        bucket (str): The S3 bucket name.
+        key (str): The S3 object key.
+        sql (str): The query to export.
+        params (dict): The query parameters.
+        file_format (str): Either EXPORT_FORMAT_CSV or EXPORT_FORMAT_PARQUET.
+        part_size (int): The multipart upload part size in bytes.
+
+    Returns:
+        (int, int): The number of rows and bytes exported.
+
+    """
+    part_size = part_size or settings.NORMALIZED_DATA_EXPORT_PART_SIZE * MB
+    export = fetch_query_to_parquet if file_format == EXPORT_FORMAT_PARQUET else copy_query_to_csv
+    writer = S3MultipartWriter(s3_client, bucket, key, part_size)
+    try:
+        rows = export(sql, params, writer)
+    except Exception:
+        writer.abort()
+        raise
+    if rows:
+        writer.close()
+    else:
+        writer.abort()
+    return rows, writer.bytes_written
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+SUMMARY_TABLES = (
+    ("ocp_summ", "reporting_ocpusagelineitem_daily_summary"),
+    ("aws_summ", "reporting_awscostentrylineitem_daily_summary"),
+    ("azure_summ", "reporting_azurecostentrylineitem_daily_summary"),
+    ("gcp_summ", "reporting_gcpcostentrylineitem_daily_summary"),
+)
+
+
+def summary_index_operations(prefix, table_name):
+    """Return the BRIN and clustering indexes of a partitioned daily summary table."""
+    return [
+        migrations.RunSQL(
+            sql=f"""
+CREATE INDEX IF NOT EXISTS {prefix}_usage_start_brin ON {table_name} USING BRIN (usage_start) WITH (pages_per_range = 32);
+            """,
+            reverse_sql=f"DROP INDEX IF EXISTS {prefix}_usage_start_brin;",
+        ),
+        migrations.RunSQL(
+            sql=f"""
+CREATE INDEX IF NOT EXISTS {prefix}_usage_start_source_idx ON {table_name} (usage_start, source_uuid);
+            """,
+            reverse_sql=f"DROP INDEX IF EXISTS {prefix}_usage_start_source_idx;",
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("reporting", "0170_auto_20210305_1659")]
+
+    operations = [
+        operation
+        for prefix, table_name in SUMMARY_TABLES
+        for operation in summary_index_operations(prefix, table_name)
+    ]
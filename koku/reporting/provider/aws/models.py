@@ -236,6 +236,9 @@ class AWSCostEntryLineItemDailySummary(models.Model):
             # A GIN functional index named "aws_summ_usage_pcode_ilike" was created manually
             # via RunSQL migration operation
             # Function: (upper(product_code) gin_trgm_ops)
+            # A BRIN index named "aws_summ_usage_start_brin" on (usage_start) and a btree index named
+            # "aws_summ_usage_start_source_idx" on (usage_start, source_uuid) were created manually
+            # via RunSQL migration operation
         ]
 
     uuid = models.UUIDField(primary_key=True)
@@ -202,6 +202,9 @@ class AzureCostEntryLineItemDailySummary(models.Model):
         # A GIN functional index named "ix_azure_costentrydlysumm_service_name" was created manually
         # via RunSQL migration operation
         # Function: (upper(service_name) gin_trgm_ops)
+        # A BRIN index named "azure_summ_usage_start_brin" on (usage_start) and a btree index named
+        # "azure_summ_usage_start_source_idx" on (usage_start, source_uuid) were created manually
+        # via RunSQL migration operation
 
     uuid = models.UUIDField(primary_key=True)
     cost_entry_bill = models.ForeignKey("AzureCostEntryBill", on_delete=models.CASCADE)
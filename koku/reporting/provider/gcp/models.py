@@ -181,6 +181,9 @@ class GCPCostEntryLineItemDailySummary(models.Model):
             models.Index(fields=["project_name"], name="gcp_summary_project_name_idx"),
             models.Index(fields=["service_id"], name="gcp_summary_service_id_idx"),
             models.Index(fields=["service_alias"], name="gcp_summary_service_alias_idx"),
+            # A BRIN index named "gcp_summ_usage_start_brin" on (usage_start) and a btree index named
+            # "gcp_summ_usage_start_source_idx" on (usage_start, source_uuid) were created manually
+            # via RunSQL migration operation
         ]
 
     uuid = models.UUIDField(primary_key=True)
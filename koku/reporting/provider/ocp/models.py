@@ -226,6 +226,9 @@ class OCPUsageLineItemDailySummary(models.Model):
             models.Index(fields=["node"], name="summary_node_idx", opclasses=["varchar_pattern_ops"]),
             models.Index(fields=["data_source"], name="summary_data_source_idx"),
             GinIndex(fields=["pod_labels"], name="pod_labels_idx"),
+            # A BRIN index named "ocp_summ_usage_start_brin" on (usage_start) and a btree index named
+            # "ocp_summ_usage_start_source_idx" on (usage_start, source_uuid) were created manually
+            # via RunSQL migration operation
         ]
 
         managed = False
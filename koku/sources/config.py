@@ -55,4 +55,5 @@ class Config:
     KOKU_API_URL = f"http://{KOKU_API_HOST}:{KOKU_API_PORT}{KOKU_API_PATH_PREFIX}/v1"
 
     RETRY_SECONDS = int(os.getenv("RETRY_SECONDS", "10"))
+    SOURCES_SYNC_WORKERS = int(os.getenv("SOURCES_SYNC_WORKERS", "0"))
     SOURCES_CLIENT_RPC_PORT = int(KOKU_SOURCES_CLIENT_PORT)
@@ -54,12 +54,15 @@ from sources.sources_http_client import SourcesHTTPClientError
 from sources.sources_patch_handler import SourcesPatchHandler
 from sources.sources_provider_coordinator import SourcesProviderCoordinator
 from sources.sources_provider_coordinator import SourcesProviderCoordinatorError
+from sources.sources_sync_pool import SourcesSyncPool
 from sources.tasks import delete_source
 
 LOG = logging.getLogger(__name__)
 
 PROCESS_QUEUE = queue.PriorityQueue()
 COUNT = itertools.count()  # next(COUNT) returns next sequential number
+SYNC_POOL = None
+SYNC_POOL_LOCK = threading.Lock()
 KAFKA_APPLICATION_CREATE = "Application.create"
 KAFKA_APPLICATION_UPDATE = "Application.update"
 KAFKA_APPLICATION_DESTROY = "Application.destroy"
@@ -145,6 +148,29 @@ def close_and_set_db_connection():  # pragma: no cover
     connections[DEFAULT_DB_ALIAS].connection = None
 
 
+def get_sync_pool():
+    """Return the sources sync pool, starting it on first use when enabled."""
+    global SYNC_POOL
+    if SYNC_POOL is None and Config.SOURCES_SYNC_WORKERS > 0:
+        with SYNC_POOL_LOCK:
+            if SYNC_POOL is None:
+                pool = SourcesSyncPool(synchronize_sources_event, Config.SOURCES_SYNC_WORKERS, Config.RETRY_SECONDS)
+                pool.start()
+                SYNC_POOL = pool
+    return SYNC_POOL
+
+
+def _queue_sync_event(event):
+    """Hand a synchronization event to the sync pool, or the process queue when the pool is disabled."""
+    pool = get_sync_pool()
+    if pool is not None:
+        _log_process_queue_event(pool, event)
+        pool.put(event)
+    else:
+        _log_process_queue_event(PROCESS_QUEUE, event)
+        PROCESS_QUEUE.put_nowait((next(COUNT), event))
+
+
 def load_process_queue():
     """
     Re-populate the process queue for any Source events that need synchronization.
@@ -161,8 +187,7 @@ def load_process_queue():
     """
     pending_events = _collect_pending_items()
     for event in pending_events:
-        _log_process_queue_event(PROCESS_QUEUE, event)
-        PROCESS_QUEUE.put_nowait((next(COUNT), event))
+        _queue_sync_event(event)
 
 
 def execute_process_queue():
@@ -175,24 +200,31 @@ def execute_process_queue():
 @receiver(post_save, sender=Sources)
 def storage_callback(sender, instance, **kwargs):
     """Load Sources ready for Koku Synchronization when Sources table is updated."""
+    events = []
     if instance.koku_uuid and instance.pending_update and not instance.pending_delete:
-        update_event = {"operation": "update", "provider": instance}
-        _log_process_queue_event(PROCESS_QUEUE, update_event)
         LOG.debug(f"Update Event Queued for:\n{str(instance)}")
-        PROCESS_QUEUE.put_nowait((next(COUNT), update_event))
+        events.append({"operation": "update", "provider": instance})
 
     if instance.pending_delete:
-        delete_event = {"operation": "destroy", "provider": instance}
-        _log_process_queue_event(PROCESS_QUEUE, delete_event)
         LOG.debug(f"Delete Event Queued for:\n{str(instance)}")
-        PROCESS_QUEUE.put_nowait((next(COUNT), delete_event))
+        events.append({"operation": "destroy", "provider": instance})
 
     process_event = storage.screen_and_build_provider_sync_create_event(instance)
     if process_event:
-        _log_process_queue_event(PROCESS_QUEUE, process_event)
         LOG.debug(f"Create Event Queued for:\n{str(instance)}")
-        PROCESS_QUEUE.put_nowait((next(COUNT), process_event))
+        events.append(process_event)
 
+    def queue_events():
+        for event in events:
+            _queue_sync_event(event)
+
+    if get_sync_pool() is not None:
+        # Workers use their own DB connections, so only hand the events over
+        # once the change that triggered them is visible outside this transaction.
+        transaction.on_commit(queue_events)
+        return
+
+    queue_events()
     execute_process_queue()
 
 
@@ -596,7 +628,6 @@ def execute_koku_provider_op(msg):
 
 def _requeue_provider_sync_message(priority, msg, queue):
     """Helper to requeue provider sync messages."""
-    SOURCES_PROVIDER_OP_RETRY_LOOP_COUNTER.inc()
     time.sleep(Config.RETRY_SECONDS)
     _log_process_queue_event(queue, msg)
     queue.put((priority, msg))
@@ -606,28 +637,18 @@ def _requeue_provider_sync_message(priority, msg, queue):
     )
 
 
-def process_synchronize_sources_msg(msg_tuple, process_queue):
+def synchronize_sources_event(msg):
     """
-    Synchronize Platform Sources with Koku Providers.
-
-    Task will process the process_queue which contains filtered
-    events (Cost Management Platform-Sources).
-
-    The items on the queue are Koku-Provider 'create' or 'destroy
-    events.  If the Koku-Provider operation fails the event will
-    be re-queued until the operation is successful.
+    Execute a single Koku-Provider synchronization event.
 
     Args:
-        process_queue (Asyncio.Queue): Dictionary messages containing operation,
-                                       provider and offset.
+        msg (dict): Message containing operation and provider.
             example: {'operation': 'create', 'provider': SourcesModelObj, 'offset': 3}
 
     Returns:
-        None
+        (Boolean): True if the operation failed and should be retried.
 
     """
-    priority, msg = msg_tuple
-
     LOG.info(
         f'Koku provider operation to execute: {msg.get("operation")} '
         f'for Source ID: {str(msg.get("provider").source_id)}'
@@ -643,14 +664,16 @@ def process_synchronize_sources_msg(msg_tuple, process_queue):
 
     except (IntegrityError, SourcesIntegrationError) as error:
         LOG.warning(f"[synchronize_sources] Re-queuing failed operation. Error: {error}")
-        _requeue_provider_sync_message(priority, msg, process_queue)
+        SOURCES_PROVIDER_OP_RETRY_LOOP_COUNTER.inc()
+        return True
     except (InterfaceError, OperationalError) as error:
         close_and_set_db_connection()
         LOG.warning(
             f"[synchronize_sources] Closing DB connection and re-queueing failed operation."
             f" Encountered {type(error).__name__}: {error}"
         )
-        _requeue_provider_sync_message(priority, msg, process_queue)
+        SOURCES_PROVIDER_OP_RETRY_LOOP_COUNTER.inc()
+        return True
     except Exception as error:
         # The reason for catching all exceptions is to ensure that the event
         # loop remains active in the event that provider synchronization fails unexpectedly.
@@ -661,6 +684,32 @@ def process_synchronize_sources_msg(msg_tuple, process_queue):
             f"encountered: {type(error).__name__}: {error}",
             exc_info=True,
         )
+    return False
+
+
+def process_synchronize_sources_msg(msg_tuple, process_queue):
+    """
+    Synchronize Platform Sources with Koku Providers.
+
+    Task will process the process_queue which contains filtered
+    events (Cost Management Platform-Sources).
+
+    The items on the queue are Koku-Provider 'create' or 'destroy
+    events.  If the Koku-Provider operation fails the event will
+    be re-queued until the operation is successful.
+
+    Args:
+        process_queue (Asyncio.Queue): Dictionary messages containing operation,
+                                       provider and offset.
+            example: {'operation': 'create', 'provider': SourcesModelObj, 'offset': 3}
+
+    Returns:
+        None
+
+    """
+    priority, msg = msg_tuple
+    if synchronize_sources_event(msg):
+        _requeue_provider_sync_message(priority, msg, process_queue)
 
 
 def backoff(interval, maximum=120):
@@ -0,0 +1,163 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Worker pool for synchronizing Platform Sources with Koku Providers."""
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+
+from django.db import connections
+from django.db import DEFAULT_DB_ALIAS
+
+from masu.prometheus_stats import SOURCES_SYNC_LATENCY
+from masu.prometheus_stats import SOURCES_SYNC_QUEUE_DEPTH
+
+LOG = logging.getLogger(__name__)
+
+
+class SourcesSyncPool:
+    """
+    Run provider synchronization events on a pool of worker threads.
+
+    Events for the same source are processed one at a time in the order they
+    were queued. Events for different sources run concurrently, so a source
+    that keeps failing only delays its own events.
+
+    A failed event stays at the head of its source's queue and is retried
+    after `retry_seconds` without holding a worker thread while it waits.
+    """
+
+    def __init__(self, process_func, workers, retry_seconds):
+        """
+        Initialize the pool.
+
+        Args:
+            process_func (Callable): Called with an event dict. Returns True when
+                the event should be retried later.
+            workers (int): Number of worker threads.
+            retry_seconds (float): Delay before a failed event is retried.
+
+        """
+        self._process_func = process_func
+        self._workers = max(1, workers)
+        self._retry_seconds = retry_seconds
+        self._condition = threading.Condition()
+        self._pending = {}
+        self._ready = deque()
+        self._delayed = []
+        self._size = 0
+        self._threads = []
+        self._stopped = False
+
+    def start(self):
+        """Start the worker threads."""
+        for index in range(self._workers):
+            thread = threading.Thread(target=self._work, name=f"sources-sync-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        LOG.info(f"Started sources sync pool with {self._workers} workers.")
+
+    def stop(self, timeout=None):
+        """Stop the worker threads once their current event is finished."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def qsize(self):
+        """Return the number of queued events, including the ones waiting for a retry."""
+        return self._size
+
+    def put(self, event):
+        """Queue a synchronization event behind any pending events for the same source."""
+        source_id = event.get("provider").source_id
+        with self._condition:
+            if source_id in self._pending:
+                self._pending[source_id].append((event, time.monotonic()))
+            else:
+                self._pending[source_id] = deque([(event, time.monotonic())])
+                self._ready.append(source_id)
+            self._size += 1
+            SOURCES_SYNC_QUEUE_DEPTH.inc()
+            self._condition.notify()
+
+    def join(self, timeout=None):
+        """Block until every queued event has been processed. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._size:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _next_source(self):
+        """Wait for a source with a runnable event. Returns None when the pool is stopped."""
+        with self._condition:
+            while not self._stopped:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, source_id = heapq.heappop(self._delayed)
+                    self._ready.append(source_id)
+                if self._ready:
+                    source_id = self._ready.popleft()
+                    return source_id, self._pending[source_id][0]
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._condition.wait(timeout)
+        return None
+
+    def _finish(self, source_id, event, queued_at, retry):
+        """Schedule the next event for a source once its current event is done."""
+        with self._condition:
+            if retry:
+                heapq.heappush(self._delayed, (time.monotonic() + self._retry_seconds, source_id))
+            else:
+                SOURCES_SYNC_LATENCY.labels(operation=event.get("operation")).observe(time.monotonic() - queued_at)
+                events = self._pending[source_id]
+                events.popleft()
+                if events:
+                    self._ready.append(source_id)
+                else:
+                    del self._pending[source_id]
+                self._size -= 1
+                SOURCES_SYNC_QUEUE_DEPTH.dec()
+            self._condition.notify_all()
+
+    def _work(self):
+        """Worker thread loop."""
+        try:
+            while True:
+                item = self._next_source()
+                if item is None:
+                    return
+                source_id, (event, queued_at) = item
+                retry = False
+                try:
+                    retry = self._process_func(event)
+                except Exception as error:
+                    LOG.error(
+                        f"[sources_sync_pool] Unexpected error for Source ID {source_id}: "
+                        f"{type(error).__name__}: {error}",
+                        exc_info=True,
+                    )
+                self._finish(source_id, event, queued_at, retry)
+        finally:
+            connections[DEFAULT_DB_ALIAS].close()
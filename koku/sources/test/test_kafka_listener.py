@@ -1379,6 +1379,21 @@ class SourcesKafkaMsgHandlerTest(TestCase):
             _, msg = PROCESS_QUEUE.get_nowait()
             self.assertEqual(msg.get("operation"), "update")
 
+    def test_storage_callback_sync_pool(self):
+        """Test storage callback hands events to the sync pool on commit instead of executing inline."""
+        local_source = Sources(**self.aws_local_source, pending_update=True)
+        local_source.save()
+
+        with patch("sources.kafka_listener.get_sync_pool") as mock_pool, patch(
+            "sources.kafka_listener.transaction.on_commit", side_effect=lambda func: func()
+        ) as mock_on_commit, patch("sources.kafka_listener.execute_process_queue") as mock_execute:
+            storage_callback("", local_source)
+            mock_on_commit.assert_called_once()
+            mock_execute.assert_not_called()
+            msg = mock_pool.return_value.put.call_args[0][0]
+            self.assertEqual(msg.get("operation"), "create")
+            self.assertTrue(PROCESS_QUEUE.empty())
+
     def test_storage_callback_update_and_delete(self):
         """Test storage callback only deletes on pending update and delete."""
         uuid = self.aws_local_source.get("source_uuid")
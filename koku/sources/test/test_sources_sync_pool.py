@@ -0,0 +1,119 @@
+#
+# Copyright 2021 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Test the Sources sync pool."""
+import threading
+from collections import defaultdict
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from sources.kafka_listener import SourcesIntegrationError
+from sources.kafka_listener import synchronize_sources_event
+from sources.sources_sync_pool import SourcesSyncPool
+
+
+def _event(source_id, operation="create"):
+    """Build a synchronization event for a fake source."""
+    return {"operation": operation, "provider": SimpleNamespace(source_id=source_id, name=f"source-{source_id}")}
+
+
+class SourcesSyncPoolTest(TestCase):
+    """Test cases for SourcesSyncPool."""
+
+    def test_per_source_ordering(self):
+        """Test that events for a source run in order while a retry is pending."""
+        processed = defaultdict(list)
+        attempts = defaultdict(int)
+        lock = threading.Lock()
+
+        def process(event):
+            source_id = event["provider"].source_id
+            with lock:
+                attempts[(source_id, event["operation"])] += 1
+                if source_id == 1 and event["operation"] == "create" and attempts[(1, "create")] < 3:
+                    return True
+                processed[source_id].append(event["operation"])
+            return False
+
+        pool = SourcesSyncPool(process, workers=4, retry_seconds=0)
+        pool.start()
+        for operation in ("create", "update", "destroy"):
+            pool.put(_event(1, operation))
+            pool.put(_event(2, operation))
+        self.assertTrue(pool.join(timeout=10))
+        pool.stop()
+
+        self.assertEqual(processed[1], ["create", "update", "destroy"])
+        self.assertEqual(processed[2], ["create", "update", "destroy"])
+        self.assertEqual(attempts[(1, "create")], 3)
+        self.assertEqual(pool.qsize(), 0)
+
+    def test_unexpected_error_does_not_stop_worker(self):
+        """Test that an unexpected exception drops the event and the worker keeps going."""
+        processed = []
+
+        def process(event):
+            if event["provider"].source_id == 1:
+                raise ValueError("boom")
+            processed.append(event["provider"].source_id)
+            return False
+
+        pool = SourcesSyncPool(process, workers=1, retry_seconds=0)
+        pool.start()
+        pool.put(_event(1))
+        pool.put(_event(2))
+        self.assertTrue(pool.join(timeout=10))
+        pool.stop()
+        self.assertEqual(processed, [2])
+
+    def test_failing_source_does_not_block_others(self):
+        """Test that one source failing repeatedly does not stall 1,000 other sources."""
+        failing_source_id = 0
+        synced = set()
+        attempts = defaultdict(int)
+        lock = threading.Lock()
+        all_synced = threading.Event()
+        retried = threading.Event()
+
+        def execute_op(msg):
+            source_id = msg.get("provider").source_id
+            with lock:
+                attempts[source_id] += 1
+                if source_id == failing_source_id:
+                    if attempts[source_id] >= 3:
+                        retried.set()
+                    raise SourcesIntegrationError("still failing")
+                synced.add(source_id)
+                if len(synced) == 1000:
+                    all_synced.set()
+
+        with patch("sources.kafka_listener.execute_koku_provider_op", side_effect=execute_op), patch(
+            "sources.storage.clear_update_flag"
+        ):
+            pool = SourcesSyncPool(synchronize_sources_event, workers=4, retry_seconds=0)
+            pool.start()
+            pool.put(_event(failing_source_id))
+            for source_id in range(1, 1001):
+                pool.put(_event(source_id))
+            self.assertTrue(all_synced.wait(timeout=30))
+            self.assertTrue(retried.wait(timeout=30))
+            self.assertGreater(pool.qsize(), 0)
+            pool.stop(timeout=5)
+
+        self.assertEqual(synced, set(range(1, 1001)))
+        self.assertNotIn(failing_source_id, synced)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+#
+# Copyright 2021 Red Hat, Inc.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Load test the koku API and report latency percentiles and database connection churn.
+
+Run it once against a server started with DATABASE_CONN_MAX_AGE=0 and once
+with the default persistent connections to compare them, e.g.:
+
+    ./benchmark_api.py --url http://localhost:8000 --account 10001 --requests 2000 --concurrency 16
+
+Given the pid of the gunicorn master, it also reports the memory of the master
+and its workers. compare_worker_modes.sh runs it against each worker mode.
+"""
+import argparse
+import base64
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+API_PATH = "/api/cost-management/v1"
+DEFAULT_ENDPOINTS = (
+    "/reports/aws/costs/?filter[time_scope_units]=month",
+    "/reports/aws/costs/?group_by[service]=*",
+    "/reports/openshift/costs/?group_by[project]=*",
+    "/reports/openshift/compute/?filter[resolution]=daily",
+    "/tags/aws/",
+    "/sources/",
+)
+CONNECTIONS_METRIC = re.compile(r'^koku_db_new_connections_total\{source="(\w+)"\} ([0-9.e+]+)$', re.MULTILINE)
+SEARCH_PATH_METRIC = re.compile(r"^koku_db_search_path_reused_total ([0-9.e+]+)$", re.MULTILINE)
+
+
+def identity_header(account):
+    """Return an x-rh-identity header for an org admin of the account."""
+    identity = {
+        "identity": {
+            "account_number": account,
+            "type": "User",
+            "user": {"username": "benchmark", "email": "benchmark@example.com", "is_org_admin": True},
+        },
+        "entitlements": {"cost_management": {"is_entitled": True}},
+    }
+    return base64.b64encode(json.dumps(identity).encode("utf-8")).decode("utf-8")
+
+
+def scrape(url):
+    """Return the connections opened by source and the search paths reused, from the server metrics."""
+    text = requests.get(f"{url}/metrics").text
+    connections = {source: float(value) for source, value in CONNECTIONS_METRIC.findall(text)}
+    search_paths = sum(float(value) for value in SEARCH_PATH_METRIC.findall(text))
+    return connections, search_paths
+
+
+def timed_get(session, url, headers):
+    """Return the latency and status of a request."""
+    start = time.perf_counter()
+    response = session.get(url, headers=headers)
+    return time.perf_counter() - start, response.status_code
+
+
+def process_tree_rss(pid):
+    """Return the resident memory in MB of a process and all of its children."""
+    rss_kb = 0
+    pids = [pid]
+    while pids:
+        pid = pids.pop()
+        try:
+            with open(f"/proc/{pid}/status") as status:
+                rss_kb += next(int(line.split()[1]) for line in status if line.startswith("VmRSS:"))
+            for task in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{task}/children") as children:
+                    pids.extend(int(child) for child in children.read().split())
+        except (FileNotFoundError, StopIteration):
+            continue
+    return rss_kb / 1024
+
+
+def percentile(latencies, pct):
+    """Return the pct percentile of the latencies, in milliseconds."""
+    return statistics.quantiles(latencies, n=100)[pct - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="Koku server URL")
+    parser.add_argument("--account", default="10001", help="Account number of the identity header")
+    parser.add_argument("--requests", type=int, default=1000, help="Number of requests to send")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of requests in flight")
+    parser.add_argument("--endpoint", action="append", dest="endpoints", help="API path to request, repeatable")
+    parser.add_argument("--server-pid", type=int, help="Pid of the gunicorn master, to report the memory used")
+    args = parser.parse_args()
+
+    headers = {"x-rh-identity": identity_header(args.account), "Cache-Control": "no-cache"}
+    endpoints = args.endpoints or DEFAULT_ENDPOINTS
+    urls = [f"{args.url}{API_PATH}{endpoints[i % len(endpoints)]}" for i in range(args.requests)]
+
+    connections_before, search_paths_before = scrape(args.url)
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=args.concurrency, pool_maxsize=args.concurrency)
+    session.mount(args.url, adapter)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda url: timed_get(session, url, headers), urls))
+    duration = time.perf_counter() - start
+    rss = process_tree_rss(args.server_pid) if args.server_pid else None
+    connections_after, search_paths_after = scrape(args.url)
+
+    latencies = [latency for latency, __ in results]
+    errors = sum(1 for __, status in results if status >= 400)
+    print(f"Requests: {len(results)} in {duration:.1f}s ({len(results) / duration:.1f}/s), errors: {errors}")
+    print(f"Latency p50: {percentile(latencies, 50):.1f}ms p99: {percentile(latencies, 99):.1f}ms")
+    for source in sorted(set(connections_before) | set(connections_after)):
+        opened = connections_after.get(source, 0) - connections_before.get(source, 0)
+        print(f"DB connections ({source}): {opened:.0f} ({opened / len(results):.2f} per request)")
+    print(f"SET search_path skipped: {search_paths_after - search_paths_before:.0f}")
+    if rss is not None:
+        print(f"Server RSS: {rss:.0f}MB")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+#!/bin/bash
+#
+# Compare requests/sec, latency and memory of the API under each gunicorn worker mode.
+#
+# Run from a shell set up like run_server.sh, with the database and a test customer loaded.
+# Pass benchmark_api.py options after the script name, e.g.:
+#
+#     scripts/compare_worker_modes.sh --account 10001 --requests 2000 --concurrency 16
+#
+set -e
+
+PORT=${PORT:-8001}
+MODES=${MODES:-"sync gthread"}
+PID_FILE=$(mktemp)
+SCRIPTS_DIR=$(cd "$(dirname "$0")" && pwd)
+
+cd "${SCRIPTS_DIR}/../koku"
+export PYTHONPATH="$(pwd):${PYTHONPATH}"
+
+for mode in ${MODES}; do
+    echo "== ${mode} workers =="
+    GUNICORN_WORKER_CLASS=${mode} gunicorn koku.wsgi --bind="127.0.0.1:${PORT}" --config gunicorn.py \
+        --pid "${PID_FILE}" --daemon
+    until curl -sf "http://127.0.0.1:${PORT}/api/cost-management/v1/status/" > /dev/null; do
+        sleep 1
+    done
+    python "${SCRIPTS_DIR}/benchmark_api.py" --url "http://127.0.0.1:${PORT}" --server-pid "$(cat "${PID_FILE}")" "$@" || true
+    kill "$(cat "${PID_FILE}")"
+    while curl -sf "http://127.0.0.1:${PORT}/api/cost-management/v1/status/" > /dev/null; do
+        sleep 1
+    done
+done
+rm -f "${PID_FILE}"